@@ -0,0 +1,197 @@
+"""
+Data access for the Streamlit dashboards.
+
+Reads go to the backend API (XOOHOOX_API_URL, default
+http://localhost:8000/api/v1) through one pooled httpx client per process:
+
+* each dataset is memoized with st.cache_data for its own TTL, so reruns
+  after a widget change don't touch the network;
+* once a TTL lapses the page is revalidated with If-None-Match, and an
+  unchanged page comes back as an empty 304 and is served from memory;
+* every Dataset carries a version (its ETags), and map_html() caches
+  rendered folium HTML on those versions, so a map is only rebuilt when
+  its data changes;
+* maps of many points use clusters(): markers pre-aggregated by the API
+  for one zoom level and the visible viewport (see viewport_bbox).
+
+When the API can't be reached, load() falls back to the dashboard's mock
+data, versioned "mock".
+"""
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import httpx
+import streamlit as st
+
+API_URL = os.environ.get("XOOHOOX_API_URL", "http://localhost:8000/api/v1")
+PAGE_SIZE = 100  # the largest limit the list endpoints accept
+MAX_PAGES = 50
+MAX_CACHED_MAPS = 32
+
+# south, west, north, east
+BBox = Tuple[float, float, float, float]
+
+
+class Dataset(NamedTuple):
+    data: Any
+    version: str
+
+
+@st.cache_resource
+def client() -> httpx.Client:
+    return httpx.Client(
+        base_url=API_URL,
+        timeout=httpx.Timeout(10.0, connect=2.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    )
+
+
+class _Store:
+    """Last body and ETag per URL, shared by every session of this process"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.items: "OrderedDict[Hashable, Tuple[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, Any]]:
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None:
+                self.items.move_to_end(key)
+            return item
+
+    def put(self, key: Hashable, value: Tuple[str, Any]) -> None:
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+
+@st.cache_resource
+def _responses() -> _Store:
+    return _Store(maxsize=512)
+
+
+@st.cache_resource
+def _maps() -> _Store:
+    return _Store(maxsize=MAX_CACHED_MAPS)
+
+
+def fetch(path: str, params: Optional[Dict[str, Any]] = None) -> Dataset:
+    """GET path, revalidating the copy held from last time"""
+    key = (path, tuple(sorted((params or {}).items())))
+    held = _responses().get(key)
+    headers = {"If-None-Match": held[0]} if held else {}
+    response = client().get(path, params=params, headers=headers)
+    if response.status_code == 304 and held:
+        return Dataset(held[1], held[0])
+    response.raise_for_status()
+    data = response.json()
+    etag = response.headers.get("ETag")
+    if etag:
+        _responses().put(key, (etag, data))
+    else:
+        etag = hashlib.sha1(response.content).hexdigest()[:20]
+    return Dataset(data, etag)
+
+
+def fetch_all(path: str, params: Optional[Dict[str, Any]] = None) -> Dataset:
+    """Every page of a skip/limit list endpoint"""
+    rows: List[Any] = []
+    versions = []
+    for page in range(MAX_PAGES):
+        dataset = fetch(path, {**(params or {}), "skip": page * PAGE_SIZE, "limit": PAGE_SIZE})
+        rows.extend(dataset.data)
+        versions.append(dataset.version)
+        if len(dataset.data) < PAGE_SIZE:
+            break
+    return Dataset(rows, "+".join(versions))
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def farms() -> Dataset:
+    return fetch_all("/geolocation/farms/")
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def paddocks() -> Dataset:
+    return fetch_all("/geolocation/paddocks/")
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def geofences() -> Dataset:
+    return fetch_all("/geolocation/geofences/")
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def harvests() -> Dataset:
+    return fetch_all("/geolocation/harvests/")
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def clusters(layer: str, zoom: int, bbox: BBox, window: str = "24h") -> Dataset:
+    """Server-side clusters of a map layer for one zoom level and viewport"""
+    south, west, north, east = bbox
+    return fetch("/geolocation/clusters", {
+        "layer": layer, "zoom": zoom, "south": south, "west": west, "north": north, "east": east, "window": window,
+    })
+
+
+def viewport_bbox(bounds: Optional[Dict[str, Dict[str, float]]], zoom: int) -> BBox:
+    """
+    The bbox to request for a Leaflet viewport (bounds as st_folium returns
+    them): padded by half a screen each way, so small pans stay inside it, and
+    snapped outward to a grid so nearby viewports share cache entries
+    """
+    if not bounds:
+        return (-90.0, -180.0, 90.0, 180.0)
+    south, west = bounds["_southWest"]["lat"], bounds["_southWest"]["lng"]
+    north, east = bounds["_northEast"]["lat"], bounds["_northEast"]["lng"]
+    pad_lat, pad_lng = (north - south) / 2, (east - west) / 2
+    step = 180.0 / 2 ** max(zoom, 0)
+    return (
+        max(math.floor((south - pad_lat) / step) * step, -90.0),
+        max(math.floor((west - pad_lng) / step) * step, -180.0),
+        min(math.ceil((north + pad_lat) / step) * step, 90.0),
+        min(math.ceil((east + pad_lng) / step) * step, 180.0),
+    )
+
+
+def as_clusters(rows: List[Dict[str, Any]], id_key: str, label_key: str, bbox: BBox) -> List[Dict[str, Any]]:
+    """Rows as single-point clusters, for when the API can't cluster them"""
+    south, west, north, east = bbox
+    result = []
+    for row in rows:
+        latitude, longitude = row.get("latitude"), row.get("longitude")
+        if latitude is None and row.get("coordinates"):
+            latitude = sum(point[0] for point in row["coordinates"]) / len(row["coordinates"])
+            longitude = sum(point[1] for point in row["coordinates"]) / len(row["coordinates"])
+        if latitude is not None and south <= latitude <= north and west <= longitude <= east:
+            result.append({
+                "latitude": latitude, "longitude": longitude, "count": 1, "id": row[id_key], "label": row.get(label_key),
+            })
+    return result
+
+
+def load(source: Callable[[], Dataset], fallback: Callable[[], Any]) -> Dataset:
+    """source() from the API, or the mock data when the API can't be reached"""
+    try:
+        return source()
+    except httpx.HTTPError:
+        return Dataset(fallback(), "mock")
+
+
+def map_html(key: Hashable, build: Callable[[], Any]) -> str:
+    """Rendered HTML of the folium map build() makes, cached on key (include the data versions)"""
+    held = _maps().get(key)
+    if held is not None:
+        return held[1]
+    html = build().get_root().render()
+    _maps().put(key, ("", html))
+    return html
@@ -4,10 +4,12 @@ import plotly.graph_objects as go
 import plotly.express as px
 from streamlit_agraph import agraph, Node, Edge, Config
 import psycopg2
-from psycopg2.extras import RealDictCursor
 import networkx as nx
 from collections import defaultdict
+import hashlib
 import json
+import os
+from pathlib import Path
 
 # Page configuration
 st.set_page_config(
@@ -59,115 +61,228 @@ def get_database_connection():
         st.error(f"Database connection failed: {e}")
         return None
 
-def get_database_stats():
-    """Get database statistics"""
+# One round trip for the whole schema: tables with their columns, foreign key
+# column pairs and enum types, read from pg_catalog as a single JSON document
+CATALOG_QUERY = """
+    SELECT json_build_object(
+        'tables', (
+            SELECT coalesce(json_agg(json_build_object(
+                'name', c.relname,
+                'columns', (
+                    SELECT coalesce(json_agg(json_build_array(a.attname, format_type(a.atttypid, a.atttypmod)) ORDER BY a.attnum), '[]')
+                    FROM pg_attribute a
+                    WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                )
+            ) ORDER BY c.relname), '[]')
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p', 'v', 'm')
+        ),
+        'foreign_keys', (
+            SELECT coalesce(json_agg(json_build_object(
+                'source_table', src.relname,
+                'source_column', sa.attname,
+                'target_table', dst.relname,
+                'target_column', da.attname
+            ) ORDER BY src.relname, sa.attname, dst.relname, da.attname), '[]')
+            FROM pg_constraint con
+            JOIN pg_namespace n ON n.oid = con.connamespace
+            JOIN pg_class src ON src.oid = con.conrelid
+            JOIN pg_class dst ON dst.oid = con.confrelid
+            CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(source_attnum, target_attnum)
+            JOIN pg_attribute sa ON sa.attrelid = con.conrelid AND sa.attnum = k.source_attnum
+            JOIN pg_attribute da ON da.attrelid = con.confrelid AND da.attnum = k.target_attnum
+            WHERE con.contype = 'f' AND n.nspname = 'public'
+        ),
+        'enums', (
+            SELECT coalesce(json_agg(json_build_object(
+                'name', t.typname,
+                'labels', (SELECT json_agg(e.enumlabel ORDER BY e.enumsortorder) FROM pg_enum e WHERE e.enumtypid = t.oid)
+            ) ORDER BY t.typname), '[]')
+            FROM pg_type t
+            JOIN pg_namespace n ON n.oid = t.typnamespace
+            WHERE n.nspname = 'public' AND t.typtype = 'e'
+        )
+    )
+"""
+
+# Snapshots, their graph layouts and the order schema hashes were seen in
+SCHEMA_CACHE_DIR = Path(os.environ.get("XOOHOOX_SCHEMA_CACHE_DIR", Path.home() / ".cache" / "xoohoox" / "schema"))
+LAYOUT_SCALE = 600  # layouts are stored in [-1, 1]; vis.js places nodes in pixels
+
+def table_category(table_name):
+    """Category of a table, from its name"""
+    if 'batch' in table_name:
+        return 'Core Production'
+    if 'result' in table_name:
+        return 'Process Results'
+    if 'quality' in table_name or 'eval' in table_name:
+        return 'Quality & Evaluation'
+    if 'equipment' in table_name or 'maintenance' in table_name:
+        return 'Equipment & Maintenance'
+    if 'inventory' in table_name:
+        return 'Inventory & Management'
+    if 'plan' in table_name or 'kinetic' in table_name:
+        return 'Planning & Kinetics'
+    if 'log' in table_name:
+        return 'Logs & Tracking'
+    return 'Other'
+
+def _write_json(path, content):
+    """Write JSON atomically, so concurrent sessions never read half a file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_text(json.dumps(content, sort_keys=True))
+    os.replace(temporary, path)
+
+def _read_json(path, default=None):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return default
+
+def _record_snapshot(snapshot):
+    """Persist a snapshot and note its hash in the history when the schema changed"""
+    path = SCHEMA_CACHE_DIR / f"{snapshot['hash']}.snapshot.json"
+    if not path.exists():
+        _write_json(path, snapshot)
+    history = _read_json(SCHEMA_CACHE_DIR / "history.json", [])
+    if not history or history[-1] != snapshot['hash']:
+        history.append(snapshot['hash'])
+        _write_json(SCHEMA_CACHE_DIR / "history.json", history)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_schema_snapshot():
+    """The public schema, from one catalog query, keyed by a hash of its content"""
     conn = get_database_connection()
     if not conn:
         return None
     
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Get table counts
-            cur.execute("""
-                SELECT COUNT(*) as table_count 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public'
-            """)
-            table_count = cur.fetchone()['table_count']
-            
-            # Get field count
-            cur.execute("""
-                SELECT COUNT(*) as field_count 
-                FROM information_schema.columns 
-                WHERE table_schema = 'public'
-            """)
-            field_count = cur.fetchone()['field_count']
-            
-            # Get enum count
-            cur.execute("""
-                SELECT COUNT(*) as enum_count 
-                FROM pg_type 
-                WHERE typnamespace = (SELECT oid FROM pg_namespace WHERE nspname = 'public') 
-                AND typtype = 'e'
-            """)
-            enum_count = cur.fetchone()['enum_count']
-            
-            return {
-                'tables': table_count,
-                'fields': field_count,
-                'enums': enum_count
-            }
+        with conn.cursor() as cur:
+            cur.execute(CATALOG_QUERY)
+            catalog = cur.fetchone()[0]
+        conn.rollback()  # read-only; don't hold a transaction open
     except Exception as e:
-        st.error(f"Error getting database stats: {e}")
+        conn.rollback()
+        st.error(f"Error reading the schema catalog: {e}")
+        return None
+    
+    snapshot = {
+        'tables': {table['name']: [list(column) for column in table['columns']] for table in catalog['tables']},
+        'foreign_keys': catalog['foreign_keys'],
+        'enums': {enum['name']: enum['labels'] for enum in catalog['enums']},
+    }
+    snapshot['hash'] = hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode()).hexdigest()[:16]
+    _record_snapshot(snapshot)
+    return snapshot
+
+def get_previous_snapshot(snapshot):
+    """The snapshot recorded before this schema was first seen, if any"""
+    history = _read_json(SCHEMA_CACHE_DIR / "history.json", [])
+    if snapshot['hash'] not in history or history.index(snapshot['hash']) == 0:
         return None
+    previous = history[history.index(snapshot['hash']) - 1]
+    return _read_json(SCHEMA_CACHE_DIR / f"{previous}.snapshot.json")
 
-def get_tables_with_field_counts():
+def get_database_stats(snapshot):
+    """Get database statistics"""
+    if not snapshot:
+        return None
+    return {
+        'tables': len(snapshot['tables']),
+        'fields': sum(len(columns) for columns in snapshot['tables'].values()),
+        'enums': len(snapshot['enums'])
+    }
+
+def get_tables_with_field_counts(snapshot):
     """Get all tables with their field counts"""
-    conn = get_database_connection()
-    if not conn:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-            SELECT 
-                table_name,
-                COUNT(*) as field_count,
-                CASE 
-                    WHEN table_name LIKE '%batch%' THEN 'Core Production'
-                    WHEN table_name LIKE '%result%' THEN 'Process Results'
-                    WHEN table_name LIKE '%quality%' OR table_name LIKE '%eval%' THEN 'Quality & Evaluation'
-                    WHEN table_name LIKE '%equipment%' OR table_name LIKE '%maintenance%' THEN 'Equipment & Maintenance'
-                    WHEN table_name LIKE '%inventory%' THEN 'Inventory & Management'
-                    WHEN table_name LIKE '%plan%' OR table_name LIKE '%kinetic%' THEN 'Planning & Kinetics'
-                    WHEN table_name LIKE '%log%' THEN 'Logs & Tracking'
-                    ELSE 'Other'
-                END as category
-            FROM information_schema.columns 
-            WHERE table_schema = 'public'
-            GROUP BY table_name
-            ORDER BY field_count DESC
-        """
-        return pd.read_sql_query(query, conn)
-    except Exception as e:
-        st.error(f"Error getting tables: {e}")
+    if not snapshot:
         return pd.DataFrame()
+    tables_df = pd.DataFrame([
+        {'table_name': name, 'field_count': len(columns), 'category': table_category(name)}
+        for name, columns in snapshot['tables'].items()
+    ])
+    return tables_df.sort_values('field_count', ascending=False, ignore_index=True) if not tables_df.empty else tables_df
 
-def get_foreign_key_relationships():
+def get_foreign_key_relationships(snapshot):
     """Get foreign key relationships"""
-    conn = get_database_connection()
-    if not conn:
-        return []
-    
-    try:
-        query = """
-            SELECT 
-                tc.table_name as source_table,
-                kcu.column_name as source_column,
-                ccu.table_name as target_table,
-                ccu.column_name as target_column
-            FROM information_schema.table_constraints tc
-            JOIN information_schema.key_column_usage kcu 
-                ON tc.constraint_name = kcu.constraint_name
-            JOIN information_schema.constraint_column_usage ccu 
-                ON ccu.constraint_name = tc.constraint_name
-            WHERE tc.constraint_type = 'FOREIGN KEY'
-            AND tc.table_schema = 'public'
-            ORDER BY tc.table_name, kcu.column_name
-        """
-        return pd.read_sql_query(query, conn)
-    except Exception as e:
-        st.error(f"Error getting relationships: {e}")
+    if not snapshot:
         return pd.DataFrame()
+    return pd.DataFrame(snapshot['foreign_keys'], columns=['source_table', 'source_column', 'target_table', 'target_column'])
+
+def schema_graph(snapshot):
+    G = nx.DiGraph()
+    for name, columns in snapshot['tables'].items():
+        G.add_node(name, field_count=len(columns), category=table_category(name))
+    for fk in snapshot['foreign_keys']:
+        G.add_edge(fk['source_table'], fk['target_table'], label=f"{fk['source_column']} → {fk['target_column']}")
+    return G
 
-def create_interactive_graph():
+@st.cache_data(show_spinner="Laying out the schema graph...")
+def get_graph_layout(schema_hash, _snapshot):
+    """
+    Node positions for a schema, computed once per schema hash and kept on
+    disk. A changed schema starts from the previous layout, so tables that
+    were already there stay roughly where they were.
+    """
+    path = SCHEMA_CACHE_DIR / f"{schema_hash}.layout.json"
+    layout = _read_json(path)
+    if layout is not None:
+        return layout
+    
+    G = schema_graph(_snapshot)
+    if G.number_of_nodes() == 0:
+        return {}
+    previous = get_previous_snapshot(_snapshot)
+    seed = _read_json(SCHEMA_CACHE_DIR / f"{previous['hash']}.layout.json", {}) if previous else {}
+    seed = {name: position for name, position in seed.items() if name in G}
+    # New tables start at random positions; a short run settles them in
+    positions = nx.spring_layout(G, k=3, iterations=20 if seed else 50, pos=seed or None, seed=42)
+    layout = {name: [float(x), float(y)] for name, (x, y) in positions.items()}
+    _write_json(path, layout)
+    return layout
+
+def diff_snapshots(old, new):
+    """What changed between two schema snapshots"""
+    old_tables, new_tables = old['tables'], new['tables']
+    changes = {
+        'tables_added': sorted(set(new_tables) - set(old_tables)),
+        'tables_removed': sorted(set(old_tables) - set(new_tables)),
+        'columns_added': [],
+        'columns_removed': [],
+        'columns_changed': [],
+    }
+    for table in sorted(set(old_tables) & set(new_tables)):
+        old_columns, new_columns = dict(old_tables[table]), dict(new_tables[table])
+        for column in sorted(new_columns.keys() - old_columns.keys()):
+            changes['columns_added'].append({'table': table, 'column': column, 'type': new_columns[column]})
+        for column in sorted(old_columns.keys() - new_columns.keys()):
+            changes['columns_removed'].append({'table': table, 'column': column, 'type': old_columns[column]})
+        for column in sorted(old_columns.keys() & new_columns.keys()):
+            if old_columns[column] != new_columns[column]:
+                changes['columns_changed'].append(
+                    {'table': table, 'column': column, 'was': old_columns[column], 'now': new_columns[column]}
+                )
+    fk_key = lambda fk: (fk['source_table'], fk['source_column'], fk['target_table'], fk['target_column'])
+    old_fks, new_fks = {fk_key(fk): fk for fk in old['foreign_keys']}, {fk_key(fk): fk for fk in new['foreign_keys']}
+    changes['foreign_keys_added'] = [new_fks[key] for key in sorted(new_fks.keys() - old_fks.keys())]
+    changes['foreign_keys_removed'] = [old_fks[key] for key in sorted(old_fks.keys() - new_fks.keys())]
+    changes['enums_added'] = sorted(new['enums'].keys() - old['enums'].keys())
+    changes['enums_removed'] = sorted(old['enums'].keys() - new['enums'].keys())
+    return changes
+
+def create_interactive_graph(snapshot):
     """Create interactive network graph"""
-    tables_df = get_tables_with_field_counts()
-    relationships_df = get_foreign_key_relationships()
+    tables_df = get_tables_with_field_counts(snapshot)
+    relationships_df = get_foreign_key_relationships(snapshot)
     
     if tables_df.empty or relationships_df.empty:
         st.error("No data available for graph visualization")
         return
     
+    layout = get_graph_layout(snapshot['hash'], snapshot)
+    
     # Create nodes
     nodes = []
     node_colors = {
@@ -187,10 +302,13 @@ def create_interactive_graph():
         short_label = short_label.replace('results', 'res').replace('quality', 'qual').replace('equipment', 'equip')
         short_label = short_label.replace('maintenance', 'maint').replace('inventory', 'inv').replace('evaluation', 'eval')
         
+        x, y = layout[row['table_name']]
         nodes.append(
             Node(
                 id=row['table_name'],
                 label=short_label,
+                x=x * LAYOUT_SCALE,
+                y=y * LAYOUT_SCALE,
                 size=min(20, max(8, row['field_count'] * 1.5)),  # Smaller size range
                 color=node_colors.get(row['category'], '#F7DC6F'),
                 title=f"{row['table_name']} - {row['field_count']} fields - {row['category']}",  # Clean title without HTML
@@ -216,7 +334,7 @@ def create_interactive_graph():
         height=800,
         width=1200,
         directed=True,
-        physics=True,
+        physics=False,  # positions come from the persisted layout
         hierarchical=False,
         nodeHighlightBehavior=True,
         highlightColor="#F7A7A6",
@@ -243,31 +361,14 @@ def create_interactive_graph():
     
     return agraph(nodes=nodes, edges=edges, config=config)
 
-def create_plotly_network():
+def create_plotly_network(snapshot):
     """Create Plotly network graph"""
-    tables_df = get_tables_with_field_counts()
-    relationships_df = get_foreign_key_relationships()
-    
-    if tables_df.empty or relationships_df.empty:
+    if not snapshot or not snapshot['tables'] or not snapshot['foreign_keys']:
         st.error("No data available for graph visualization")
         return
     
-    # Create NetworkX graph
-    G = nx.DiGraph()
-    
-    # Add nodes
-    for _, row in tables_df.iterrows():
-        G.add_node(row['table_name'], 
-                  field_count=row['field_count'], 
-                  category=row['category'])
-    
-    # Add edges
-    for _, row in relationships_df.iterrows():
-        G.add_edge(row['source_table'], row['target_table'], 
-                  label=f"{row['source_column']} → {row['target_column']}")
-    
-    # Position nodes using spring layout
-    pos = nx.spring_layout(G, k=3, iterations=50)
+    G = schema_graph(snapshot)
+    pos = get_graph_layout(snapshot['hash'], snapshot)
     
     # Create edge trace
     edge_x = []
@@ -361,11 +462,12 @@ def main():
     st.sidebar.title("🎛️ Visualization Options")
     viz_type = st.sidebar.selectbox(
         "Choose Visualization Type",
-        ["Interactive Network Graph", "Plotly Network Graph", "Table Overview", "Statistics Dashboard"]
+        ["Interactive Network Graph", "Plotly Network Graph", "Table Overview", "Statistics Dashboard", "Schema Changes"]
     )
     
-    # Get database stats
-    stats = get_database_stats()
+    # Everything on the page comes from one catalog snapshot
+    snapshot = get_schema_snapshot()
+    stats = get_database_stats(snapshot)
     
     if viz_type == "Statistics Dashboard":
         st.header("📊 Database Statistics")
@@ -389,7 +491,7 @@ def main():
     elif viz_type == "Table Overview":
         st.header("📋 Database Tables Overview")
         
-        tables_df = get_tables_with_field_counts()
+        tables_df = get_tables_with_field_counts(snapshot)
         if not tables_df.empty:
             # Category summary
             category_summary = tables_df.groupby('category').agg({
@@ -420,11 +522,11 @@ def main():
         st.info("💡 Drag nodes to rearrange, zoom in/out, and hover for details")
         
         # Create the interactive graph
-        create_interactive_graph()
+        create_interactive_graph(snapshot)
         
         # Add relationship details
         st.subheader("🔗 Foreign Key Relationships")
-        relationships_df = get_foreign_key_relationships()
+        relationships_df = get_foreign_key_relationships(snapshot)
         if not relationships_df.empty:
             st.dataframe(relationships_df, use_container_width=True)
     
@@ -433,15 +535,53 @@ def main():
         st.info("💡 Interactive graph with hover details and zoom capabilities")
         
         # Create Plotly network
-        fig = create_plotly_network()
+        fig = create_plotly_network(snapshot)
         if fig:
             st.plotly_chart(fig, use_container_width=True)
     
+    elif viz_type == "Schema Changes":
+        st.header("🧬 Schema Changes")
+        
+        previous = get_previous_snapshot(snapshot) if snapshot else None
+        if not snapshot:
+            st.error("❌ Unable to connect to database")
+        elif not previous:
+            st.info(f"💡 No earlier schema recorded yet. Current schema: {snapshot['hash']}")
+        else:
+            st.caption(f"{previous['hash']} → {snapshot['hash']}")
+            changes = diff_snapshots(previous, snapshot)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("📋 Tables", len(snapshot['tables']), len(changes['tables_added']) - len(changes['tables_removed']))
+            with col2:
+                st.metric("🔢 Columns", stats['fields'], len(changes['columns_added']) - len(changes['columns_removed']))
+            with col3:
+                st.metric("🔗 Foreign Keys", len(snapshot['foreign_keys']),
+                          len(changes['foreign_keys_added']) - len(changes['foreign_keys_removed']))
+            
+            sections = [
+                ("➕ Tables Added", [{'table': table} for table in changes['tables_added']]),
+                ("➖ Tables Removed", [{'table': table} for table in changes['tables_removed']]),
+                ("➕ Columns Added", changes['columns_added']),
+                ("➖ Columns Removed", changes['columns_removed']),
+                ("✏️ Column Types Changed", changes['columns_changed']),
+                ("➕ Foreign Keys Added", changes['foreign_keys_added']),
+                ("➖ Foreign Keys Removed", changes['foreign_keys_removed']),
+                ("➕ Enum Types Added", [{'enum': enum} for enum in changes['enums_added']]),
+                ("➖ Enum Types Removed", [{'enum': enum} for enum in changes['enums_removed']]),
+            ]
+            for title, rows in sections:
+                if rows:
+                    st.subheader(title)
+                    st.dataframe(pd.DataFrame(rows), use_container_width=True)
+    
     # Footer
     st.markdown("---")
-    st.markdown("""
+    summary = f" | {stats['tables']} Tables | {stats['fields']} Fields | {stats['enums']} Enum Types" if stats else ""
+    st.markdown(f"""
     <div style='text-align: center; color: #666;'>
-        <p>🍊 XooHooX Distillation Database Visualizer | 41 Tables | 553 Fields | 14 Enum Types</p>
+        <p>🍊 XooHooX Distillation Database Visualizer{summary}</p>
     </div>
     """, unsafe_allow_html=True)
 
@@ -5,9 +5,12 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import folium
 from streamlit_folium import st_folium
+import streamlit.components.v1 as components
 import numpy as np
 from typing import List, Dict, Any
 
+import dashboard_data
+
 
 # Page configuration
 st.set_page_config(
@@ -116,7 +119,7 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Mock data functions
+# Mock data functions, used when the backend API can't be reached
 def get_australian_farms():
     return [
         {
@@ -465,72 +468,145 @@ def get_mock_location_tracking():
         }
     ]
 
-def create_farm_map(farms, paddocks, geofences):
-    """Create an interactive farm map"""
-    # Center on Australia
-    m = folium.Map(
+AUSTRALIA_CENTER = [-25.2744, 133.7751]
+DEFAULT_VIEW = {"center": {"lat": AUSTRALIA_CENTER[0], "lng": AUSTRALIA_CENTER[1]}, "zoom": 5, "bounds": None}
+
+def farm_popup(farm):
+    return f"""
+    <div style="min-width: 200px;">
+        <h4 style="color: #2E7D32; margin: 0 0 10px 0;">🏡 {farm['name']}</h4>
+        <p style="margin: 5px 0;"><strong>👨‍🌾 Producer:</strong> {farm['farmer_name']}</p>
+        <p style="margin: 5px 0;"><strong>🌍 Region:</strong> {farm['region']}</p>
+        <p style="margin: 5px 0;"><strong>🌱 Production Zones:</strong> {farm['total_paddocks']}</p>
+        <p style="margin: 5px 0;"><strong>📏 Total Area:</strong> {farm['total_area_hectares']} ha</p>
+        <p style="margin: 5px 0;"><strong>🏆 Certification:</strong> {farm['certification']}</p>
+    </div>
+    """
+
+def paddock_popup(paddock):
+    return f"""
+    <div style="min-width: 180px;">
+        <h4 style="color: #1976D2; margin: 0 0 10px 0;">🌱 {paddock['name']}</h4>
+        <p style="margin: 5px 0;"><strong>🍎 Crop Type:</strong> {paddock['fruit_type']}</p>
+        <p style="margin: 5px 0;"><strong>📏 Production Area:</strong> {paddock['area_hectares']} ha</p>
+        <p style="margin: 5px 0;"><strong>📊 Harvest Yield:</strong> {paddock.get('yield_kg')} kg</p>
+        <p style="margin: 5px 0;"><strong>📈 Status:</strong> {paddock.get('status')}</p>
+    </div>
+    """
+
+def geofence_popup(geofence):
+    return f"""
+    <div style="min-width: 200px;">
+        <h4 style="color: #D32F2F; margin: 0 0 10px 0;">🚨 {geofence['name']}</h4>
+        <p style="margin: 5px 0;"><strong>🔍 Monitoring Type:</strong> {geofence['type']}</p>
+        <p style="margin: 5px 0;"><strong>📊 Status:</strong> {geofence['status']}</p>
+        <p style="margin: 5px 0;"><strong>📝 Description:</strong> {geofence['description']}</p>
+    </div>
+    """
+
+def tracking_popup(track):
+    return f"""
+    <b>Batch {track['batch_id']}</b><br>
+    Location: {track['location_name']}<br>
+    Status: {track['status']}<br>
+    Time: {track['timestamp'][:16]}
+    """
+
+def add_clusters(group, clusters, details, popup, color):
+    """Add server-side clusters to a feature group: counted circles, or a marker for a single point"""
+    for cluster in clusters:
+        location = [cluster["latitude"], cluster["longitude"]]
+        if cluster["count"] > 1:
+            folium.CircleMarker(
+                location,
+                radius=min(10 + 4 * np.log2(cluster["count"]), 40),
+                tooltip=f"{cluster['count']} points - zoom in for detail",
+                color=color,
+                fill=True,
+                fillColor=color,
+                fillOpacity=0.5
+            ).add_to(group)
+            folium.Marker(
+                location,
+                icon=folium.DivIcon(html=f'<div style="font-weight: bold; transform: translate(-50%, -50%);">{cluster["count"]}</div>')
+            ).add_to(group)
+        else:
+            item = details.get(cluster.get("id"))
+            folium.CircleMarker(
+                location,
+                radius=8,
+                popup=popup(item) if item else cluster.get("label"),
+                color=color,
+                fill=True,
+                fillColor=color,
+                fillOpacity=0.7
+            ).add_to(group)
+    return group
+
+def viewport_map(key, groups):
+    """
+    Show clustered feature groups on a map and keep the map's viewport in
+    session state; a pan or zoom reruns the page so only what's visible is requested
+    """
+    view = st.session_state.setdefault(key, dict(DEFAULT_VIEW))
+    base_map = folium.Map(location=AUSTRALIA_CENTER, zoom_start=DEFAULT_VIEW["zoom"], tiles='OpenStreetMap')
+    feature_group = folium.FeatureGroup(name="clusters")
+    for group in groups:
+        group.add_to(feature_group)
+    state = st_folium(
+        base_map,
+        center=[view["center"]["lat"], view["center"]["lng"]],
+        zoom=view["zoom"],
+        feature_group_to_add=feature_group,
+        key=f"{key}_widget",
+        width=800,
+        height=600,
+        returned_objects=["bounds", "zoom", "center"]
+    )
+    if state and state.get("bounds") and state.get("zoom") is not None:
+        new_view = {"center": state["center"], "zoom": state["zoom"], "bounds": state["bounds"]}
+        if new_view != view:
+            st.session_state[key] = new_view
+            st.rerun()
+
+def load_clusters(key, layer, rows, id_key, label_key, window="24h"):
+    """Clusters of a layer for the viewport held under key; rows stand in (unclustered) when the API is down"""
+    view = st.session_state.get(key, DEFAULT_VIEW)
+    bbox = dashboard_data.viewport_bbox(view["bounds"], view["zoom"])
+    return dashboard_data.load(
+        lambda: dashboard_data.clusters(layer, view["zoom"], bbox, window),
+        lambda: {"clusters": dashboard_data.as_clusters(rows, id_key, label_key, bbox)}
+    ).data["clusters"]
+
+def create_geofence_map(geofences):
+    """Create a map of laboratory zones"""
+    geofence_map = folium.Map(
         location=[-25.2744, 133.7751],
         zoom_start=5,
         tiles='OpenStreetMap'
     )
     
-    # Add farm markers
-    for farm in farms:
-        folium.Marker(
-            [farm["latitude"], farm["longitude"]],
-            popup=f"""
-            <div style="min-width: 200px;">
-                <h4 style="color: #2E7D32; margin: 0 0 10px 0;">🏡 {farm['name']}</h4>
-                <p style="margin: 5px 0;"><strong>👨‍🌾 Producer:</strong> {farm['farmer_name']}</p>
-                <p style="margin: 5px 0;"><strong>🌍 Region:</strong> {farm['region']}</p>
-                <p style="margin: 5px 0;"><strong>🌱 Production Zones:</strong> {farm['total_paddocks']}</p>
-                <p style="margin: 5px 0;"><strong>📏 Total Area:</strong> {farm['total_area_hectares']} ha</p>
-                <p style="margin: 5px 0;"><strong>🏆 Certification:</strong> {farm['certification']}</p>
-            </div>
-            """,
-            icon=folium.Icon(color='green', icon='leaf')
-        ).add_to(m)
-    
-    # Add paddock markers
-    for paddock in paddocks:
-        folium.CircleMarker(
-            [paddock["latitude"], paddock["longitude"]],
-            radius=8,
-            popup=f"""
-            <div style="min-width: 180px;">
-                <h4 style="color: #1976D2; margin: 0 0 10px 0;">🌱 {paddock['name']}</h4>
-                <p style="margin: 5px 0;"><strong>🍎 Crop Type:</strong> {paddock['fruit_type']}</p>
-                <p style="margin: 5px 0;"><strong>📏 Production Area:</strong> {paddock['area_hectares']} ha</p>
-                <p style="margin: 5px 0;"><strong>📊 Harvest Yield:</strong> {paddock['yield_kg']} kg</p>
-                <p style="margin: 5px 0;"><strong>📈 Status:</strong> {paddock['status']}</p>
-            </div>
-            """,
-            color='blue',
-            fill=True,
-            fillColor='blue',
-            fillOpacity=0.7
-        ).add_to(m)
-    
-    # Add geofence polygons
+    # Add geofences
     for geofence in geofences:
+        if not geofence.get("coordinates"):
+            continue
         folium.Polygon(
             locations=geofence["coordinates"],
             popup=f"""
-            <div style="min-width: 200px;">
-                <h4 style="color: #D32F2F; margin: 0 0 10px 0;">🚨 {geofence['name']}</h4>
-                <p style="margin: 5px 0;"><strong>🔍 Monitoring Type:</strong> {geofence['type']}</p>
-                <p style="margin: 5px 0;"><strong>📊 Status:</strong> {geofence['status']}</p>
-                <p style="margin: 5px 0;"><strong>📝 Description:</strong> {geofence['description']}</p>
-            </div>
+            <b>{geofence['name']}</b><br>
+            Type: {geofence['type']}<br>
+            Status: {geofence['status']}<br>
+            Alerts: {'Enabled' if geofence['alerts_enabled'] else 'Disabled'}<br>
+            {geofence['description']}
             """,
             color='red',
-            weight=2,
+            weight=3,
             fill=True,
             fillColor='red',
-            fillOpacity=0.2
-        ).add_to(m)
+            fillOpacity=0.3
+        ).add_to(geofence_map)
     
-    return m
+    return geofence_map
 
 def main():
     st.markdown('<h1 class="main-header">🌾 XooHooX Australian Farm & Producer Tracking</h1>', unsafe_allow_html=True)
@@ -542,12 +618,15 @@ def main():
         ["Farm Overview", "Batch Tracking", "Geofence Alerts", "Sample Collection"]
     )
     
-    # Load data
-    farms = get_australian_farms()
-    paddocks = get_mock_paddocks()
-    geofences = get_mock_geofences()
-    harvests = get_mock_harvests()
-    location_tracking = get_mock_location_tracking()
+    # Load data (memoized; only revalidated against the API once a TTL lapses)
+    farms_data = dashboard_data.load(dashboard_data.farms, get_australian_farms)
+    paddocks_data = dashboard_data.load(dashboard_data.paddocks, get_mock_paddocks)
+    geofences_data = dashboard_data.load(dashboard_data.geofences, get_mock_geofences)
+    harvests_data = dashboard_data.load(dashboard_data.harvests, get_mock_harvests)
+    farms = farms_data.data
+    paddocks = paddocks_data.data
+    geofences = geofences_data.data
+    harvests = harvests_data.data
     
     # Farm selection
     farm_names = [farm["name"] for farm in farms]
@@ -577,8 +656,23 @@ def main():
         
         # Interactive map
         st.markdown('<h3 class="section-header">🗺️ Farm & Producer Locations</h3>', unsafe_allow_html=True)
-        farm_map = create_farm_map(farms, paddocks, geofences)
-        st_folium(farm_map, width=800, height=600)
+        viewport_map("farm_map", [
+            add_clusters(
+                folium.FeatureGroup(name="Geofences"),
+                load_clusters("farm_map", "geofences", geofences, "geofence_id", "name"),
+                {g["geofence_id"]: g for g in geofences}, geofence_popup, "red"
+            ),
+            add_clusters(
+                folium.FeatureGroup(name="Paddocks"),
+                load_clusters("farm_map", "paddocks", paddocks, "paddock_id", "name"),
+                {p["paddock_id"]: p for p in paddocks}, paddock_popup, "blue"
+            ),
+            add_clusters(
+                folium.FeatureGroup(name="Farms"),
+                load_clusters("farm_map", "farms", farms, "farm_id", "name"),
+                {f["farm_id"]: f for f in farms}, farm_popup, "green"
+            ),
+        ])
         
         # Farm details
         st.markdown('<h3 class="section-header">🏡 Farm & Producer Details</h3>', unsafe_allow_html=True)
@@ -604,7 +698,7 @@ def main():
                         <p><span class="info-label">🌱 Production Zones:</span><br><span class="info-value">{farm['total_paddocks']} active zones</span></p>
                         <p><span class="info-label">📏 Total Area:</span><br><span class="info-value">{farm['total_area_hectares']} hectares</span></p>
                         <p><span class="info-label">🏆 Certification:</span><br><span class="info-value">{farm['certification']}</span></p>
-                        <p><span class="info-label">📅 Last Sample Collection:</span><br><span class="info-value">{farm['last_sample_collection']}</span></p>
+                        <p><span class="info-label">📅 Last Sample Collection:</span><br><span class="info-value">{str(farm.get('last_sample_collection') or '')[:10] or 'Not recorded'}</span></p>
                     </div>
                 </div>
             </div>
@@ -657,33 +751,23 @@ def main():
             st.metric("🔄 Active Collections", active_batches, help="Samples currently being collected")
         
         with col3:
-            avg_quality = sum(h["quality_score"] for h in harvests) / len(harvests)
+            avg_quality = sum(h["quality_score"] for h in harvests) / max(len(harvests), 1)
             st.metric("⭐ Average Quality Score", f"{avg_quality:.1f}/10", help="Average quality rating of all collected samples")
         
         # Batch tracking map
         st.markdown('<h3 class="section-header">📍 Sample Collection Movement</h3>', unsafe_allow_html=True)
         
-        # Create tracking map
-        tracking_map = folium.Map(
-            location=[-25.2744, 133.7751],
-            zoom_start=5,
-            tiles='OpenStreetMap'
-        )
-        
-        # Add tracking points
-        for track in location_tracking:
-            folium.Marker(
-                [track["latitude"], track["longitude"]],
-                popup=f"""
-                <b>Batch {track['batch_id']}</b><br>
-                Location: {track['location_name']}<br>
-                Status: {track['status']}<br>
-                Time: {track['timestamp'][:16]}
-                """,
-                icon=folium.Icon(color='orange', icon='info-sign')
-            ).add_to(tracking_map)
-        
-        st_folium(tracking_map, width=800, height=600)
+        # Tracking points are clustered server-side; the mock points only stand in when the API is down
+        mock_tracking = get_mock_location_tracking()
+        # A bounded window by default: "all" rebuilds the clusters from every stored GPS point
+        tracking_window = st.selectbox("Tracking window", ["24h", "7d", "30d", "365d", "all"], index=0)
+        viewport_map("tracking_map", [
+            add_clusters(
+                folium.FeatureGroup(name="Tracking"),
+                load_clusters("tracking_map", "tracking", mock_tracking, "tracking_id", "batch_id", window=tracking_window),
+                {t["tracking_id"]: t for t in mock_tracking}, tracking_popup, "orange"
+            ),
+        ])
         
         # Batch details
         st.subheader("📋 Research Batch Details")
@@ -729,32 +813,10 @@ def main():
         # Geofence map
         st.subheader("🗺️ Laboratory Zone Map")
         
-        # Create geofence map
-        geofence_map = folium.Map(
-            location=[-25.2744, 133.7751],
-            zoom_start=5,
-            tiles='OpenStreetMap'
+        geofence_map_html = dashboard_data.map_html(
+            ("geofences", geofences_data.version), lambda: create_geofence_map(geofences)
         )
-        
-        # Add geofences
-        for geofence in geofences:
-            folium.Polygon(
-                locations=geofence["coordinates"],
-                popup=f"""
-                <b>{geofence['name']}</b><br>
-                Type: {geofence['type']}<br>
-                Status: {geofence['status']}<br>
-                Alerts: {'Enabled' if geofence['alerts_enabled'] else 'Disabled'}<br>
-                {geofence['description']}
-                """,
-                color='red',
-                weight=3,
-                fill=True,
-                fillColor='red',
-                fillOpacity=0.3
-            ).add_to(geofence_map)
-        
-        st_folium(geofence_map, width=800, height=600)
+        components.html(geofence_map_html, width=800, height=600)
         
         # Geofence details
         st.subheader("🔍 Laboratory Zone Details")
@@ -796,7 +858,7 @@ def main():
             st.metric("Total Weight (kg)", f"{total_weight:,}")
         
         with col4:
-            avg_quality = sum(h["quality_score"] for h in harvests) / len(harvests)
+            avg_quality = sum(h["quality_score"] for h in harvests) / max(len(harvests), 1)
             st.metric("Avg Quality Score", f"{avg_quality:.1f}")
         
         # Sample collection charts
@@ -819,10 +881,10 @@ def main():
         with col2:
             st.subheader("🧪 Research Samples by Australian Region")
             region_data = []
+            regions = {f["farm_id"]: f["region"] for f in farms}
             for harvest in harvests:
-                farm = next(f for f in farms if f["farm_id"] == harvest["farm_id"])
                 region_data.append({
-                    "Region": farm["region"],
+                    "Region": regions.get(harvest["farm_id"]) or "Unknown",
                     "Weight": harvest["quantity_kg"]
                 })
             
@@ -842,8 +904,8 @@ def main():
         
         weather_data = {
             "Date": [h["harvest_date"] for h in harvests],
-            "Temperature": [25, 22, 18, 32, 24],  # Mock temperatures
-            "Conditions": ["Sunny", "Partly cloudy", "Rainy", "Hot", "Mild"]
+            "Temperature": [[25, 22, 18, 32, 24][i % 5] for i in range(len(harvests))],  # Mock temperatures
+            "Conditions": [["Sunny", "Partly cloudy", "Rainy", "Hot", "Mild"][i % 5] for i in range(len(harvests))]
         }
         
         weather_df = pd.DataFrame(weather_data)
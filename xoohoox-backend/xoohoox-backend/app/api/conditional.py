@@ -0,0 +1,45 @@
+"""
+Conditional GETs for JSON reads.
+
+Successful GET responses with a JSON body get a weak ETag derived from the
+body. A request whose If-None-Match already holds that tag is answered with
+an empty 304, so polling clients (the Streamlit dashboards) skip the
+transfer and re-parse of data they already have. Streams such as the alert
+SSE feed are left alone.
+"""
+import hashlib
+from typing import Awaitable, Callable
+
+from fastapi import Request
+from starlette.responses import Response
+
+
+def etag_for(body: bytes) -> str:
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+async def conditional_get(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    response = await call_next(request)
+    if (
+        request.method not in ("GET", "HEAD")
+        or response.status_code != 200
+        or not response.headers.get("content-type", "").startswith("application/json")
+        or "etag" in response.headers
+    ):
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = etag_for(body)
+    if matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    headers = dict(response.headers)
+    headers["ETag"] = etag
+    return Response(content=body, status_code=200, headers=headers, background=response.background)
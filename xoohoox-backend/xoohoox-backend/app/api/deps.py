@@ -1,4 +1,4 @@
-from typing import Generator
+from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
@@ -39,11 +39,33 @@ def get_current_active_user(
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
-    if not crud.user.is_superuser(current_user):
+def superuser_from_token(db: Session, token: Optional[str]) -> models.User:
+    """
+    The active superuser a bearer token from /login/access-token was issued to.
+    Unlike the development get_current_user, the token is required and checked.
+    """
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+        token_data = schemas.TokenPayload(**payload)
+    except (jwt.JWTError, ValidationError):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    user = crud.user.get(db, id=token_data.sub) if token_data.sub is not None else None
+    if not user or not crud.user.is_active(user) or not crud.user.is_superuser(user):
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user 
\ No newline at end of file
+    return user
+
+def get_current_active_superuser(
+    db: Session = Depends(get_db), token: Optional[str] = Depends(oauth2_scheme)
+) -> models.User:
+    return superuser_from_token(db, token) 
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Sparse fieldsets for read endpoints.
+
+`?fields=batch_id,name,status` restricts both the SELECT (via
+`app.crud.base.load_only_fields`) and the response body (via a trimmed
+pydantic model derived from the endpoint's full response schema), so table
+views don't pay for large JSON columns.
+"""
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+
+FieldSet = Optional[Tuple[str, ...]]
+
+FIELDS_QUERY = Query(
+    None,
+    description="Comma separated list of fields to return, e.g. `fields=batch_id,name,status`",
+)
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> FieldSet:
+    """Validate a `fields=` value against a response schema"""
+    if not fields:
+        return None
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}",
+        )
+    return requested or None
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Build (and cache) a response model containing only `fields` of `schema`"""
+    definitions = {name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields}
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+def shape(obj: Any, schema: Type[BaseModel], fields: Tuple[str, ...]) -> dict:
+    """Serialize a single ORM object with the sparse model"""
+    return sparse_schema(schema, fields).model_validate(obj).model_dump(mode="json")
+
+
+def shape_many(objs: Iterable[Any], schema: Type[BaseModel], fields: Tuple[str, ...]) -> List[dict]:
+    """Serialize ORM objects with the sparse model"""
+    model = sparse_schema(schema, fields)
+    return [model.model_validate(obj).model_dump(mode="json") for obj in objs]
+
+
+def sparse_response(content: Any) -> JSONResponse:
+    """Return already-shaped content, bypassing the full response_model"""
+    return JSONResponse(content=content)
@@ -0,0 +1,233 @@
+"""
+Idempotency-Key support for POSTs.
+
+Field tablets on flaky connections retry POSTs whose response they never
+saw. A POST carrying an Idempotency-Key header is run once; the response is
+stored for IDEMPOTENCY_TTL_SECONDS and replayed, with Idempotent-Replayed:
+true, for every retry with the same key, without running the handler again.
+
+* The key is scoped to the caller's Authorization header, and bound to a
+  fingerprint of the request (method, path, query and body): reusing it for
+  a different request is answered with 422.
+* A retry arriving while the first request is still running waits up to
+  IDEMPOTENCY_WAIT_SECONDS for its response, then gets 409 with Retry-After.
+  The first request holds the key for at most IDEMPOTENCY_LOCK_SECONDS, in
+  case its worker dies.
+* 5xx and retryable 4xx responses (RETRYABLE_STATUSES: timeouts, conflicts,
+  a full ingest buffer) aren't stored, so a retry runs the request again.
+
+Keys live in this process (MemoryStore), or in Redis when
+IDEMPOTENCY_REDIS_URL is set (RedisStore), which every worker shares.
+
+This is plain ASGI middleware rather than an @app.middleware("http")
+function: it has to read the body to fingerprint it and still hand it to the
+route, which BaseHTTPMiddleware doesn't allow.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+HEADER = "idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+MAX_KEY_LENGTH = 255
+# Answers that say "try again later"; storing them would replay them for the whole TTL
+RETRYABLE_STATUSES = frozenset({408, 409, 425, 429})
+
+Record = Dict[str, Any]  # fingerprint, and once complete: status, headers, body
+
+
+class MemoryStore:
+    """Keys of this process"""
+
+    def __init__(self, maxsize: int = 10000):
+        self._cache = TTLCache(ttl=settings.IDEMPOTENCY_TTL_SECONDS, maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, record: Record, ttl: float) -> Optional[Record]:
+        """Store record unless key is taken; returns the record holding it, or None once reserved"""
+        with self._lock:
+            existing = self._cache.get(key)
+            if existing is None:
+                self._cache.set(key, record, ttl)
+            return existing
+
+    def save(self, key: str, record: Record, ttl: float) -> None:
+        self._cache.set(key, record, ttl)
+
+    def release(self, key: str) -> None:
+        self._cache.invalidate(key)
+
+
+class RedisStore:
+    """Keys shared by every worker"""
+
+    def __init__(self, url: str, prefix: str = "xoohoox:idempotency:"):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    @staticmethod
+    def _dump(record: Record) -> str:
+        if "body" in record:
+            record = {**record, "body": base64.b64encode(record["body"]).decode()}
+        return json.dumps(record)
+
+    @staticmethod
+    def _load(raw: Optional[bytes]) -> Optional[Record]:
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        if "body" in record:
+            record["body"] = base64.b64decode(record["body"])
+        return record
+
+    def reserve(self, key: str, record: Record, ttl: float) -> Optional[Record]:
+        if self.redis.set(self.prefix + key, self._dump(record), nx=True, px=int(ttl * 1000)):
+            return None
+        # Released in between: still taken as far as this caller can tell, so it retries
+        return self._load(self.redis.get(self.prefix + key)) or record
+
+    def save(self, key: str, record: Record, ttl: float) -> None:
+        self.redis.set(self.prefix + key, self._dump(record), px=int(ttl * 1000))
+
+    def release(self, key: str) -> None:
+        self.redis.delete(self.prefix + key)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = RedisStore(settings.IDEMPOTENCY_REDIS_URL) if settings.IDEMPOTENCY_REDIS_URL else MemoryStore()
+    return _store
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: Any = None,
+        ttl_seconds: Optional[float] = None,
+        lock_seconds: Optional[float] = None,
+        wait_seconds: Optional[float] = None,
+    ):
+        self.app = app
+        self.store = store
+        self.ttl = settings.IDEMPOTENCY_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.lock = settings.IDEMPOTENCY_LOCK_SECONDS if lock_seconds is None else lock_seconds
+        self.wait = settings.IDEMPOTENCY_WAIT_SECONDS if wait_seconds is None else wait_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        key = headers.get(HEADER)
+        if key is None:
+            return await self.app(scope, receive, send)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = JSONResponse({"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"}, 400)
+            return await response(scope, receive, send)
+
+        body = await _read_body(receive)
+        caller = hashlib.sha256(headers.get("authorization", "").encode()).hexdigest()[:16]
+        key = f"{caller}:{key}"
+        fingerprint = hashlib.sha256(
+            b"\n".join([scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body])
+        ).hexdigest()
+
+        store = self.store or get_store()
+        record = await self._reserve(store, key, fingerprint)
+        if record is not None:
+            if record.get("fingerprint") != fingerprint:
+                response = JSONResponse({"detail": "Idempotency-Key was already used for a different request"}, 422)
+            elif "status" not in record:
+                response = JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress"}, 409,
+                    headers={"Retry-After": "1"},
+                )
+            else:
+                return await self._replay(record, send)
+            return await response(scope, receive, send)
+
+        await self._run(scope, receive, send, store, key, fingerprint, body)
+
+    async def _reserve(self, store: Any, key: str, fingerprint: str) -> Optional[Record]:
+        """None once this request holds the key; otherwise the record of the request holding it,
+        after waiting for that one to complete"""
+        deadline = time.monotonic() + self.wait
+        while True:
+            record = await run_in_threadpool(store.reserve, key, {"fingerprint": fingerprint}, self.lock)
+            if record is None or "status" in record or record.get("fingerprint") != fingerprint:
+                return record
+            if time.monotonic() >= deadline:
+                return record
+            await asyncio.sleep(0.05)
+
+    async def _run(
+        self, scope: Scope, receive: Receive, send: Send, store: Any, key: str, fingerprint: str, body: bytes
+    ) -> None:
+        body_sent = False
+
+        async def receive_body() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response: Dict[str, Any] = {"status": None, "headers": [], "body": []}
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")] for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, capture)
+        except BaseException:
+            await run_in_threadpool(store.release, key)
+            raise
+        if response["status"] is None or response["status"] >= 500 or response["status"] in RETRYABLE_STATUSES:
+            await run_in_threadpool(store.release, key)
+            return
+        record = {
+            "fingerprint": fingerprint, "status": response["status"], "headers": response["headers"],
+            "body": b"".join(response["body"]),
+        }
+        await run_in_threadpool(store.save, key, record, self.ttl)
+
+    @staticmethod
+    async def _replay(record: Record, send: Send) -> None:
+        headers: List[Any] = [[name.encode("latin-1"), value.encode("latin-1")] for name, value in record["headers"]]
+        headers.append([REPLAYED_HEADER, b"true"])
+        await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": record["body"]})
@@ -0,0 +1,60 @@
+"""
+Server-sent event streams over live_events subscriptions.
+
+Every event is written with its id, so a browser EventSource that loses the
+connection reconnects with Last-Event-ID and resumes where it stopped. When
+that isn't possible the stream starts with a `reset` event, telling the
+client to reload its state. A subscriber that falls behind is disconnected
+and resumes the same way.
+"""
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.services import live_events
+
+KEEP_ALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 2000
+
+
+async def _events(
+    request: Request,
+    broker: live_events.Broker,
+    topics: Iterable[str],
+    filters: Dict[str, Any],
+    render: Callable[[Dict[str, Any]], Any],
+) -> AsyncIterator[str]:
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    subscription, resumed = broker.subscribe(topics, filters, last_event_id=last_event_id)
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        if not resumed:
+            yield "event: reset\ndata: {}\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await subscription.get(timeout=KEEP_ALIVE_SECONDS)
+            except live_events.SubscriberLagged:
+                return
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event.id}\nevent: {event.topic}\ndata: {json.dumps(render(event.data))}\n\n"
+    finally:
+        subscription.close()
+
+
+def event_stream(
+    request: Request,
+    broker: live_events.Broker,
+    topics: Iterable[str],
+    filters: Optional[Dict[str, Any]] = None,
+    render: Callable[[Dict[str, Any]], Any] = lambda data: data,
+) -> StreamingResponse:
+    """An SSE response with the events of topics whose data matches filters"""
+    return StreamingResponse(
+        _events(request, broker, list(topics), filters or {}, render),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -14,6 +14,13 @@ from app.api.v1.endpoints import (
     transformation,
     login,
     geolocation,
+    logistics,
+    traceability,
+    search,
+    live,
+    jobs,
+    webhooks,
+    sync,
 )
 
 api_router = APIRouter()
@@ -30,4 +37,11 @@ api_router.include_router(quality_control.router, prefix="/quality-control", tag
 api_router.include_router(upscales.router, prefix="/upscales", tags=["upscales"])
 api_router.include_router(transformation.router, prefix="/transformation", tags=["transformation"])
 api_router.include_router(geolocation.router, prefix="/geolocation", tags=["geolocation"])
+api_router.include_router(logistics.router, prefix="/logistics", tags=["logistics"])
+api_router.include_router(traceability.router, prefix="/trace", tags=["trace"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(live.router, prefix="/live", tags=["live"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
 api_router.include_router(login.router, prefix="/login", tags=["login"]) 
\ No newline at end of file
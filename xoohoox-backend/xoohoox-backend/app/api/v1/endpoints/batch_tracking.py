@@ -4,14 +4,17 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.api.fields import FIELDS_QUERY, parse_fields, shape, shape_many, sparse_response
 from app.crud import batch_tracking, quality_control, equipment_maintenance
-from app.models.enums import BatchStatus, JuiceType
+from app.models.enums import BatchStatus, FruitType, JuiceType
 from app.services.batch_number import BatchNumberGenerator
 from app.schemas.batch_tracking import (
     BatchTrackingCreate,
     BatchTrackingUpdate,
     BatchTrackingResponse,
     BatchTrackingList,
+    BatchTrackingFull,
+    BatchSearchResponse,
     StartProduction,
     CompleteProduction,
     QualityCheckResult,
@@ -69,11 +72,15 @@ def read_batches(
     status: Optional[BatchStatus] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    fields: Optional[str] = FIELDS_QUERY,
     current_user: str = Depends(deps.get_current_user),
 ) -> BatchTrackingList:
     """
     Retrieve batches.
+
+    Pass `fields` to select only some columns of each batch.
     """
+    selected = parse_fields(fields, BatchTrackingResponse)
     batches = batch_tracking.get_multi(
         db,
         skip=skip,
@@ -82,21 +89,86 @@ def read_batches(
         status=status,
         start_date=start_date,
         end_date=end_date,
+        fields=selected,
     )
     total = len(batches)  # In a real app, you'd want to get this from the database
+    if selected:
+        return sparse_response({"total": total, "items": shape_many(batches, BatchTrackingResponse, selected)})
     return BatchTrackingList(total=total, items=batches)
 
+@router.get("/search", response_model=BatchSearchResponse)
+def search_batches(
+    db: Session = Depends(deps.get_db),
+    q: Optional[str] = Query(None, description="Matches batch name or batch ID"),
+    status: Optional[BatchStatus] = None,
+    fruit_type: Optional[FruitType] = None,
+    process_type: Optional[str] = None,
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="Production month, YYYY-MM"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = FIELDS_QUERY,
+    current_user: str = Depends(deps.get_current_user),
+) -> BatchSearchResponse:
+    """
+    Search batches and return facet counts (status, fruit type, process type,
+    production month) for the same filters.
+    """
+    selected = parse_fields(fields, BatchTrackingResponse)
+    items, total, facets = batch_tracking.search(
+        db,
+        skip=skip,
+        limit=limit,
+        fields=selected,
+        q=q,
+        status=status,
+        fruit_type=fruit_type,
+        process_type=process_type,
+        month=month,
+    )
+    if selected:
+        return sparse_response({
+            "total": total,
+            "items": shape_many(items, BatchTrackingResponse, selected),
+            "facets": facets,
+        })
+    return BatchSearchResponse(total=total, items=items, facets=facets)
+
 @router.get("/{batch_id}", response_model=BatchTrackingResponse)
 def read_batch(
     *,
     db: Session = Depends(deps.get_db),
     batch_id: str,
+    fields: Optional[str] = FIELDS_QUERY,
     current_user: str = Depends(deps.get_current_user),
 ) -> BatchTrackingResponse:
     """
     Get batch by ID.
+
+    Pass `fields` to select only some columns.
     """
-    batch = batch_tracking.get_by_batch_id(db, batch_id=batch_id)
+    selected = parse_fields(fields, BatchTrackingResponse)
+    batch = batch_tracking.get_by_batch_id(db, batch_id=batch_id, fields=selected)
+    if not batch:
+        raise HTTPException(
+            status_code=404,
+            detail="Batch not found",
+        )
+    if selected:
+        return sparse_response(shape(batch, BatchTrackingResponse, selected))
+    return batch
+
+@router.get("/{batch_id}/full", response_model=BatchTrackingFull)
+def read_batch_full(
+    *,
+    db: Session = Depends(deps.get_db),
+    batch_id: str,
+    current_user: str = Depends(deps.get_current_user),
+) -> BatchTrackingFull:
+    """
+    Get a batch with its transformation stages (all result types), trials and
+    quality records in a single response.
+    """
+    batch = batch_tracking.get_full(db, batch_id=batch_id)
     if not batch:
         raise HTTPException(
             status_code=404,
@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
+from app.api.fields import FIELDS_QUERY, parse_fields, shape, shape_many, sparse_response
 from app.crud import fermentation_trial as crud
 from app.schemas.fermentation_trial import (
     FermentationTrialCreate,
@@ -19,12 +20,16 @@ router = APIRouter()
 @router.get("/{trial_id}", response_model=FermentationTrialInDB)
 def get_trial(
     trial_id: int,
+    fields: Optional[str] = FIELDS_QUERY,
     db: Session = Depends(get_db)
 ):
     """Get a specific fermentation trial by ID."""
-    db_trial = crud.get_trial(db, trial_id)
+    selected = parse_fields(fields, FermentationTrialInDB)
+    db_trial = crud.get_trial(db, trial_id, fields=selected)
     if not db_trial:
         raise HTTPException(status_code=404, detail="Trial not found")
+    if selected:
+        return sparse_response(shape(db_trial, FermentationTrialInDB, selected))
     return db_trial
 
 @router.get("/batch/{batch_id}", response_model=FermentationTrialList)
@@ -32,10 +37,17 @@ def get_batch_trials(
     batch_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    fields: Optional[str] = FIELDS_QUERY,
     db: Session = Depends(get_db)
 ):
     """Get all trials for a specific batch."""
-    trials = crud.get_trials_by_batch(db, batch_id, skip, limit)
+    selected = parse_fields(fields, FermentationTrialInDB)
+    trials = crud.get_trials_by_batch(db, batch_id, skip, limit, fields=selected)
+    if selected:
+        return sparse_response({
+            "trials": shape_many(trials, FermentationTrialInDB, selected),
+            "total": len(trials)
+        })
     return {
         "trials": trials,
         "total": len(trials)
@@ -1,271 +1,35 @@
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Query
+import math
+import msgpack
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-import json
 
 from app.api import deps
+from app.api.streaming import event_stream
+from app.api.v1.endpoints.live import get_broker
+from app.crud import geolocation as crud
 from app.schemas.geolocation import (
     Farm, FarmCreate, FarmUpdate, FarmWithDetails, FarmSummary,
     Paddock, PaddockCreate, PaddockUpdate, PaddockWithDetails,
     Geofence, GeofenceCreate, GeofenceUpdate,
     Harvest, HarvestCreate, HarvestUpdate, HarvestWithDetails,
     LocationTracking, LocationTrackingCreate, LocationTrackingUpdate,
-    GeofenceAlert, SampleTracking
+    GeofenceAlert, GeofenceAlertType, SampleTracking, BulkPointCheck, BulkPointCheckResult,
+    ClusterLayer, ClusterMap, NearbyKind, NearbyResult, Heatmap, HeatmapLayer, HeatmapWindow, GpsPoint, GpsIngestResult, Route, RouteFormat, SimplifyAlgorithm
 )
+from app.services import geohash, gps_ingest, live_events
+from app.services.geometry import point_in_polygon
+from app.services.track_simplify import encode_polyline
 
 router = APIRouter()
+router.add_event_handler("shutdown", gps_ingest.ingest_buffer.stop)
 
-# Mock data storage (in production, this would be in a database)
-MOCK_FARMS = [
-    {
-        "id": "farm_001",
-        "farm_id": "FARM_001",
-        "name": "Sunshine Citrus Farms",
-        "farmer_name": "John Smith",
-        "phone": "(03) 5023 1234",
-        "email": "john@sunshinecitrus.com.au",
-        "latitude": -34.2860,
-        "longitude": 142.2630,
-        "address": "123 Citrus Grove Rd, Mildura VIC 3500",
-        "region": "Victoria",
-        "total_paddocks": 8,
-        "total_area_hectares": 120,
-        "established": "2015",
-        "certification": "Organic",
-        "last_sample_collection": (datetime.utcnow() - timedelta(days=1)).isoformat(),
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "farm_002",
-        "farm_id": "FARM_002",
-        "name": "Golden Apple Orchards",
-        "farmer_name": "Sarah Johnson",
-        "phone": "(03) 6234 5678",
-        "email": "sarah@goldenapple.com.au",
-        "latitude": -43.0826,
-        "longitude": 147.1277,
-        "address": "456 Apple Valley Dr, Hobart TAS 7000",
-        "region": "Tasmania",
-        "total_paddocks": 12,
-        "total_area_hectares": 85,
-        "established": "2018",
-        "certification": "HACCP",
-        "last_sample_collection": (datetime.utcnow() - timedelta(days=2)).isoformat(),
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "farm_003",
-        "farm_id": "FARM_003",
-        "name": "Tropical Fruit Paradise",
-        "farmer_name": "Mike Wilson",
-        "phone": "(07) 4031 2345",
-        "email": "mike@tropicalfruit.com.au",
-        "latitude": -17.1191,
-        "longitude": 145.6786,
-        "address": "789 Mango Lane, Cairns QLD 4870",
-        "region": "Queensland",
-        "total_paddocks": 6,
-        "total_area_hectares": 65,
-        "established": "2020",
-        "certification": "GAP",
-        "last_sample_collection": (datetime.utcnow() - timedelta(days=3)).isoformat(),
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    }
-]
-
-MOCK_PADDOCKS = [
-    {
-        "id": "paddock_001",
-        "paddock_id": "PADDOCK_001",
-        "farm_id": "FARM_001",
-        "name": "Orange Grove A",
-        "fruit_type": "Orange",
-        "area_hectares": 15,
-        "latitude": -34.2860,
-        "longitude": 142.2630,
-        "planting_date": "2015-03-15T00:00:00",
-        "last_harvest": (datetime.utcnow() - timedelta(days=5)).isoformat(),
-        "yield_kg": 2500,
-        "soil_type": "Sandy Loam",
-        "irrigation": "Drip",
-        "status": "Active",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "paddock_002",
-        "paddock_id": "PADDOCK_002",
-        "farm_id": "FARM_001",
-        "name": "Lemon Grove B",
-        "fruit_type": "Lemon",
-        "area_hectares": 12,
-        "latitude": -34.2960,
-        "longitude": 142.2730,
-        "planting_date": "2016-08-20T00:00:00",
-        "last_harvest": (datetime.utcnow() - timedelta(days=3)).isoformat(),
-        "yield_kg": 1800,
-        "soil_type": "Clay Loam",
-        "irrigation": "Sprinkler",
-        "status": "Active",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "paddock_003",
-        "paddock_id": "PADDOCK_003",
-        "farm_id": "FARM_002",
-        "name": "Apple Orchard North",
-        "fruit_type": "Apple",
-        "area_hectares": 20,
-        "latitude": -43.0826,
-        "longitude": 147.1277,
-        "planting_date": "2018-04-10T00:00:00",
-        "last_harvest": (datetime.utcnow() - timedelta(days=7)).isoformat(),
-        "yield_kg": 3200,
-        "soil_type": "Volcanic",
-        "irrigation": "Drip",
-        "status": "Active",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    }
-]
+GPS_POINTS = TypeAdapter(List[GpsPoint])
 
-MOCK_GEOFENCES = [
-    {
-        "id": "geo_001",
-        "geofence_id": "GEO_001",
-        "farm_id": "FARM_001",
-        "name": "Sample Archive Zone",
-        "type": "archive",
-        "coordinates": [[-34.2860, 142.2630], [-34.2860, 142.2730], [-34.2960, 142.2730], [-34.2960, 142.2630]],
-        "radius_meters": 500,
-        "status": "active",
-        "alerts_enabled": True,
-        "description": "Laboratory sample archive storage area",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "geo_002",
-        "geofence_id": "GEO_002",
-        "farm_id": "FARM_002",
-        "name": "Laboratory Processing Zone",
-        "type": "processing",
-        "coordinates": [[-43.0826, 147.1277], [-43.0826, 147.1377], [-43.0926, 147.1377], [-43.0926, 147.1277]],
-        "radius_meters": 300,
-        "status": "active",
-        "alerts_enabled": True,
-        "description": "Sample processing and analysis area",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    }
-]
-
-MOCK_HARVESTS = [
-    {
-        "id": "harvest_001",
-        "harvest_id": "HARVEST_001",
-        "paddock_id": "PADDOCK_001",
-        "farm_id": "FARM_001",
-        "batch_id": "BATCH_001",
-        "fruit_type": "Orange",
-        "harvest_date": (datetime.utcnow() - timedelta(days=5)).isoformat(),
-        "quantity_kg": 2500,
-        "harvest_method": "mechanical",
-        "weather_conditions": "Sunny, 25°C",
-        "quality_score": 8.5,
-        "sample_collected": True,
-        "sample_id": "SAMPLE_001",
-        "notes": "Excellent quality oranges, ready for laboratory analysis",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "harvest_002",
-        "harvest_id": "HARVEST_002",
-        "paddock_id": "PADDOCK_002",
-        "farm_id": "FARM_001",
-        "batch_id": "BATCH_002",
-        "fruit_type": "Lemon",
-        "harvest_date": (datetime.utcnow() - timedelta(days=3)).isoformat(),
-        "quantity_kg": 1800,
-        "harvest_method": "manual",
-        "weather_conditions": "Partly cloudy, 22°C",
-        "quality_score": 8.2,
-        "sample_collected": True,
-        "sample_id": "SAMPLE_002",
-        "notes": "Good quality lemons, suitable for research samples",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "harvest_003",
-        "harvest_id": "HARVEST_003",
-        "paddock_id": "PADDOCK_003",
-        "farm_id": "FARM_002",
-        "batch_id": "BATCH_003",
-        "fruit_type": "Apple",
-        "harvest_date": (datetime.utcnow() - timedelta(days=7)).isoformat(),
-        "quantity_kg": 3200,
-        "harvest_method": "mechanical",
-        "weather_conditions": "Rainy, 18°C",
-        "quality_score": 7.8,
-        "sample_collected": True,
-        "sample_id": "SAMPLE_003",
-        "notes": "Apples collected in wet conditions, extra care needed",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    }
-]
-
-MOCK_LOCATION_TRACKING = [
-    {
-        "id": "track_001",
-        "tracking_id": "TRACK_001",
-        "batch_id": "BATCH_001",
-        "harvest_id": "HARVEST_001",
-        "latitude": -34.2860,
-        "longitude": 142.2630,
-        "timestamp": (datetime.utcnow() - timedelta(hours=2)).isoformat(),
-        "location_name": "Mildura Farm",
-        "status": "Sample collected",
-        "source": "GPS",
-        "geofence_id": "GEO_001",
-        "created_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "track_002",
-        "tracking_id": "TRACK_002",
-        "batch_id": "BATCH_001",
-        "harvest_id": "HARVEST_001",
-        "latitude": -36.7578,
-        "longitude": 144.2789,
-        "timestamp": (datetime.utcnow() - timedelta(hours=1)).isoformat(),
-        "location_name": "Bendigo Transit",
-        "status": "In transit to laboratory",
-        "source": "GPS",
-        "geofence_id": None,
-        "created_at": datetime.utcnow().isoformat()
-    },
-    {
-        "id": "track_003",
-        "tracking_id": "TRACK_003",
-        "batch_id": "BATCH_001",
-        "harvest_id": "HARVEST_001",
-        "latitude": -37.8136,
-        "longitude": 144.9631,
-        "timestamp": datetime.utcnow().isoformat(),
-        "location_name": "Melbourne Laboratory",
-        "status": "Delivered to laboratory",
-        "source": "GPS",
-        "geofence_id": "GEO_002",
-        "created_at": datetime.utcnow().isoformat()
-    }
-]
+def get_ingest_buffer() -> gps_ingest.IngestBuffer:
+    return gps_ingest.ingest_buffer
 
 @router.get("/farms/", response_model=List[Farm])
 def read_farms(
@@ -275,15 +39,12 @@ def read_farms(
     region: Optional[str] = Query(None, description="Filter by region")
 ):
     """Retrieve farms with optional region filtering"""
-    farms = MOCK_FARMS[skip:skip + limit]
-    if region:
-        farms = [farm for farm in farms if farm.get("region") == region]
-    return farms
+    return crud.farm.get_multi(db, skip=skip, limit=limit, region=region)
 
 @router.get("/farms/{farm_id}", response_model=Farm)
 def read_farm(farm_id: str, db: Session = Depends(deps.get_db)):
     """Get a specific farm by ID"""
-    farm = next((farm for farm in MOCK_FARMS if farm["farm_id"] == farm_id), None)
+    farm = crud.farm.get_by_farm_id(db, farm_id=farm_id)
     if not farm:
         raise HTTPException(status_code=404, detail="Farm not found")
     return farm
@@ -296,15 +57,12 @@ def read_paddocks(
     farm_id: Optional[str] = Query(None, description="Filter by farm ID")
 ):
     """Retrieve paddocks with optional farm filtering"""
-    paddocks = MOCK_PADDOCKS[skip:skip + limit]
-    if farm_id:
-        paddocks = [paddock for paddock in paddocks if paddock.get("farm_id") == farm_id]
-    return paddocks
+    return crud.paddock.get_multi(db, skip=skip, limit=limit, farm_id=farm_id)
 
 @router.get("/paddocks/{paddock_id}", response_model=Paddock)
 def read_paddock(paddock_id: str, db: Session = Depends(deps.get_db)):
     """Get a specific paddock by ID"""
-    paddock = next((paddock for paddock in MOCK_PADDOCKS if paddock["paddock_id"] == paddock_id), None)
+    paddock = crud.paddock.get_by_paddock_id(db, paddock_id=paddock_id)
     if not paddock:
         raise HTTPException(status_code=404, detail="Paddock not found")
     return paddock
@@ -318,17 +76,33 @@ def read_geofences(
     type: Optional[str] = Query(None, description="Filter by geofence type")
 ):
     """Retrieve geofences with optional filtering"""
-    geofences = MOCK_GEOFENCES[skip:skip + limit]
-    if farm_id:
-        geofences = [geo for geo in geofences if geo.get("farm_id") == farm_id]
-    if type:
-        geofences = [geo for geo in geofences if geo.get("type") == type]
-    return geofences
+    return crud.geofence.get_multi(db, skip=skip, limit=limit, farm_id=farm_id, geofence_type=type)
+
+@router.get("/geofences/containing", response_model=List[Geofence])
+def read_geofences_containing_point(
+    latitude: float = Query(..., ge=-90, le=90, description="Point latitude"),
+    longitude: float = Query(..., ge=-180, le=180, description="Point longitude"),
+    db: Session = Depends(deps.get_db)
+):
+    """Active geofences whose polygon contains the point"""
+    return crud.geofence.get_geofences_containing_point(db, latitude=latitude, longitude=longitude)
+
+@router.post("/geofences/check-points", response_model=BulkPointCheckResult)
+def check_points_in_geofences(payload: BulkPointCheck, db: Session = Depends(deps.get_db)):
+    """Test a batch of points against every active geofence"""
+    matches = crud.geofence.check_points(db, points=[(point.latitude, point.longitude) for point in payload.points])
+    return {
+        "points_checked": len(payload.points),
+        "geofences_checked": len(crud.geofence_index.snapshot(db).polygons),
+        "matches": {
+            payload.points[index].id or str(index): geofence_ids for index, geofence_ids in sorted(matches.items())
+        },
+    }
 
 @router.get("/geofences/{geofence_id}", response_model=Geofence)
 def read_geofence(geofence_id: str, db: Session = Depends(deps.get_db)):
     """Get a specific geofence by ID"""
-    geofence = next((geo for geo in MOCK_GEOFENCES if geo["geofence_id"] == geofence_id), None)
+    geofence = crud.geofence.get_by_geofence_id(db, geofence_id=geofence_id)
     if not geofence:
         raise HTTPException(status_code=404, detail="Geofence not found")
     return geofence
@@ -342,17 +116,12 @@ def read_harvests(
     batch_id: Optional[str] = Query(None, description="Filter by batch ID")
 ):
     """Retrieve harvests with optional filtering"""
-    harvests = MOCK_HARVESTS[skip:skip + limit]
-    if farm_id:
-        harvests = [harvest for harvest in harvests if harvest.get("farm_id") == farm_id]
-    if batch_id:
-        harvests = [harvest for harvest in harvests if harvest.get("batch_id") == batch_id]
-    return harvests
+    return crud.harvest.get_multi(db, skip=skip, limit=limit, farm_id=farm_id, batch_id=batch_id)
 
 @router.get("/harvests/{harvest_id}", response_model=Harvest)
 def read_harvest(harvest_id: str, db: Session = Depends(deps.get_db)):
     """Get a specific harvest by ID"""
-    harvest = next((harvest for harvest in MOCK_HARVESTS if harvest["harvest_id"] == harvest_id), None)
+    harvest = crud.harvest.get_by_harvest_id(db, harvest_id=harvest_id)
     if not harvest:
         raise HTTPException(status_code=404, detail="Harvest not found")
     return harvest
@@ -366,38 +135,178 @@ def read_location_tracking(
     harvest_id: Optional[str] = Query(None, description="Filter by harvest ID")
 ):
     """Retrieve location tracking data with optional filtering"""
-    tracking = MOCK_LOCATION_TRACKING[skip:skip + limit]
-    if batch_id:
-        tracking = [track for track in tracking if track.get("batch_id") == batch_id]
-    if harvest_id:
-        tracking = [track for track in tracking if track.get("harvest_id") == harvest_id]
-    return tracking
+    return crud.location_tracking.get_multi(db, skip=skip, limit=limit, batch_id=batch_id, harvest_id=harvest_id)
+
+@router.post("/location-tracking/ingest", response_model=GpsIngestResult, status_code=202)
+async def ingest_location_points(
+    request: Request,
+    buffer: gps_ingest.IngestBuffer = Depends(get_ingest_buffer)
+):
+    """
+    Queue a batch of GPS points for write-behind storage. The body is NDJSON
+    (one point per line) or, with Content-Type application/msgpack, a msgpack
+    stream of points or arrays of points.
+    """
+    body = await request.body()
+    try:
+        if "msgpack" in request.headers.get("content-type", ""):
+            unpacker = msgpack.Unpacker(raw=False)
+            unpacker.feed(body)
+            records, consumed = [], 0
+            for item in unpacker:
+                records.extend(item if isinstance(item, list) else [item])
+                consumed = unpacker.tell()
+            if consumed != len(body):
+                raise ValueError("truncated msgpack stream")
+            points = GPS_POINTS.validate_python(records)
+        else:
+            # Parse and validate the lines as one JSON array in pydantic-core
+            points = GPS_POINTS.validate_json(b"[" + b",".join(line for line in body.splitlines() if line.strip()) + b"]")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False, include_input=False))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed body: {e}")
+    try:
+        return buffer.offer([point.model_dump() for point in points])
+    except gps_ingest.BufferFull as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(buffer.flush_interval)))}
+        )
+
+@router.get("/location-tracking/ingest/stats")
+def read_ingest_stats(buffer: gps_ingest.IngestBuffer = Depends(get_ingest_buffer)):
+    """Throughput and backpressure counters of the GPS ingest buffer"""
+    return buffer.stats()
 
 @router.get("/location-tracking/{tracking_id}", response_model=LocationTracking)
 def read_location_tracking_item(tracking_id: str, db: Session = Depends(deps.get_db)):
     """Get a specific location tracking record by ID"""
-    tracking = next((track for track in MOCK_LOCATION_TRACKING if track["tracking_id"] == tracking_id), None)
+    tracking = crud.location_tracking.get_by_tracking_id(db, tracking_id=tracking_id)
     if not tracking:
         raise HTTPException(status_code=404, detail="Location tracking record not found")
     return tracking
 
+@router.get("/batches/{batch_id}/route", response_model=Route, response_model_exclude_none=True)
+def read_batch_route(
+    batch_id: str,
+    tolerance_m: Optional[float] = Query(None, gt=0, le=10000, description="Simplification tolerance in metres"),
+    algorithm: SimplifyAlgorithm = Query(SimplifyAlgorithm.DOUGLAS_PEUCKER, description="Simplification algorithm"),
+    format: RouteFormat = Query(RouteFormat.COLUMNAR, description="Coordinate arrays or an encoded polyline"),
+    db: Session = Depends(deps.get_db)
+):
+    """A batch's route in one compact payload, optionally simplified"""
+    route = crud.location_tracking.get_route(db, batch_id=batch_id, tolerance_m=tolerance_m, algorithm=algorithm.value)
+    if not route:
+        raise HTTPException(status_code=404, detail="Route not found")
+    if format == RouteFormat.POLYLINE:
+        route["polyline"] = encode_polyline(route.pop("latitudes"), route.pop("longitudes"))
+    return route
+
+def _alert_out(alert: Any) -> GeofenceAlert:
+    values = alert if isinstance(alert, dict) else {
+        column: getattr(alert, column)
+        for column in ("id", "geofence_id", "batch_id", "tracking_id", "alert_type", "timestamp", "latitude", "longitude", "message")
+    }
+    return GeofenceAlert(
+        **{key: value for key, value in values.items() if key not in ("latitude", "longitude")},
+        location={"latitude": values["latitude"], "longitude": values["longitude"]},
+    )
+
+@router.get("/alerts/", response_model=List[GeofenceAlert])
+def read_geofence_alerts(
+    db: Session = Depends(deps.get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    batch_id: Optional[str] = Query(None, description="Filter by batch"),
+    geofence_id: Optional[str] = Query(None, description="Filter by geofence"),
+    alert_type: Optional[GeofenceAlertType] = Query(None, description="Filter by alert type")
+):
+    """Geofence enter/exit/dwell alerts, newest first"""
+    alerts = crud.geofence_alert.get_multi(
+        db, skip=skip, limit=limit, batch_id=batch_id, geofence_id=geofence_id,
+        alert_type=alert_type.value if alert_type else None
+    )
+    return [_alert_out(alert) for alert in alerts]
+
+@router.get("/alerts/stream")
+async def stream_geofence_alerts(
+    request: Request,
+    batch_id: Optional[str] = Query(None, description="Only stream alerts for this batch"),
+    geofence_id: Optional[str] = Query(None, description="Only stream alerts for this geofence"),
+    broker: live_events.Broker = Depends(get_broker)
+):
+    """Server-sent events with geofence alerts as ingested points trigger them"""
+    filters = {key: value for key, value in (("batch_id", batch_id), ("geofence_id", geofence_id)) if value}
+    return event_stream(
+        request, broker, [live_events.GEOFENCE_ALERT], filters,
+        render=lambda alert: jsonable_encoder(_alert_out(alert))
+    )
+
+@router.get("/nearby/{kind}", response_model=List[NearbyResult])
+def read_nearby(
+    kind: NearbyKind,
+    latitude: float = Query(..., ge=-90, le=90, description="Point latitude"),
+    longitude: float = Query(..., ge=-180, le=180, description="Point longitude"),
+    k: int = Query(5, ge=1, le=100, description="Number of results"),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only return results within this distance"),
+    db: Session = Depends(deps.get_db)
+):
+    """Nearest farms, paddocks or active geofences to a point"""
+    _, key_column, lat_column, lng_column, _ = crud.NEARBY_RULES[kind.value]
+    return [
+        {
+            "kind": kind,
+            "key": getattr(obj, key_column),
+            "name": obj.name,
+            "latitude": getattr(obj, lat_column),
+            "longitude": getattr(obj, lng_column),
+            "distance_km": round(distance, 4),
+        }
+        for obj, distance in crud.find_nearby(
+            db, kind.value, latitude=latitude, longitude=longitude, k=k, radius_km=radius_km
+        )
+    ]
+
+@router.get("/heatmap", response_model=Heatmap, response_model_exclude_none=True)
+def read_heatmap(
+    layer: HeatmapLayer = Query(HeatmapLayer.HARVESTS, description="Harvest density or truck traffic"),
+    precision: int = Query(5, ge=1, le=geohash.STORED_PRECISION, description="Geohash length of the cells"),
+    window: HeatmapWindow = Query(HeatmapWindow.MONTH, description="Time window, counted back from now"),
+    prefix: Optional[str] = Query(
+        None, pattern="^[0-9b-hjkmnp-z]+$", max_length=geohash.STORED_PRECISION,
+        description="Only cells inside this geohash"
+    ),
+    db: Session = Depends(deps.get_db)
+):
+    """Counts per geohash cell for the dashboard heatmaps"""
+    cells = crud.get_heatmap(db, layer.value, precision=precision, window=window.value, prefix=prefix)
+    return {"layer": layer, "precision": precision, "window": window, "cells": cells}
+
+@router.get("/clusters", response_model=ClusterMap, response_model_exclude_none=True)
+def read_clusters(
+    layer: ClusterLayer = Query(..., description="What to cluster"),
+    zoom: int = Query(..., ge=0, le=22, description="Map zoom level; above 16 points are returned unclustered"),
+    south: Optional[float] = Query(None, ge=-90, le=90),
+    west: Optional[float] = Query(None, ge=-180, le=180, description="Greater than east across the antimeridian"),
+    north: Optional[float] = Query(None, ge=-90, le=90),
+    east: Optional[float] = Query(None, ge=-180, le=180),
+    window: HeatmapWindow = Query(HeatmapWindow.DAY, description="Tracking layer: time window, counted back from now"),
+    db: Session = Depends(deps.get_db)
+):
+    """Pre-aggregated map markers for one zoom level, limited to the viewport"""
+    bounds = (south, west, north, east)
+    if any(value is None for value in bounds) and any(value is not None for value in bounds):
+        raise HTTPException(status_code=400, detail="Give all of south, west, north and east, or none")
+    bbox = None if south is None else bounds
+    clusters = crud.get_clusters(db, layer.value, zoom=zoom, bbox=bbox, window=window.value)
+    return {"layer": layer, "zoom": zoom, "clusters": clusters, "total": sum(cluster["count"] for cluster in clusters)}
+
 @router.get("/dashboard/summary")
 def get_dashboard_summary(db: Session = Depends(deps.get_db)):
     """Get dashboard summary statistics"""
-    total_farms = len(MOCK_FARMS)
-    total_paddocks = len(MOCK_PADDOCKS)
-    total_harvests = len(MOCK_HARVESTS)
-    active_geofences = len([geo for geo in MOCK_GEOFENCES if geo.get("status") == "active"])
-    
-    recent_harvests = sorted(MOCK_HARVESTS, key=lambda x: x.get("harvest_date", ""), reverse=True)[:5]
-    
-    return {
-        "total_farms": total_farms,
-        "total_paddocks": total_paddocks,
-        "total_harvests": total_harvests,
-        "active_geofences": active_geofences,
-        "recent_harvests": recent_harvests
-    }
+    summary = crud.get_dashboard_summary(db)
+    summary["recent_harvests"] = [Harvest.model_validate(harvest) for harvest in summary["recent_harvests"]]
+    return summary
 
 @router.get("/geofences/{geofence_id}/check-point")
 def check_point_in_geofence(
@@ -407,34 +316,16 @@ def check_point_in_geofence(
     db: Session = Depends(deps.get_db)
 ):
     """Check if a point is inside a geofence"""
-    geofence = next((geo for geo in MOCK_GEOFENCES if geo["geofence_id"] == geofence_id), None)
+    geofence = crud.geofence.get_by_geofence_id(db, geofence_id=geofence_id)
     if not geofence:
         raise HTTPException(status_code=404, detail="Geofence not found")
     
-    # Simple point-in-polygon check (ray casting algorithm)
-    coordinates = geofence.get("coordinates", [])
-    if not coordinates:
+    if not geofence.coordinates:
         return {"inside": False, "message": "No coordinates defined for geofence"}
     
-    # Ray casting algorithm
-    n = len(coordinates)
-    inside = False
-    
-    p1x, p1y = coordinates[0]
-    for i in range(n + 1):
-        p2x, p2y = coordinates[i % n]
-        if longitude > min(p1y, p2y):
-            if longitude <= max(p1y, p2y):
-                if latitude <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (longitude - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                    if p1x == p2x or latitude <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
-    
     return {
-        "inside": inside,
+        "inside": point_in_polygon(latitude, longitude, geofence.coordinates),
         "geofence_id": geofence_id,
         "point": {"latitude": latitude, "longitude": longitude},
-        "geofence_name": geofence.get("name")
+        "geofence_name": geofence.name
     }
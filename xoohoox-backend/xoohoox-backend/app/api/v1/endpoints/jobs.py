@@ -0,0 +1,117 @@
+from pathlib import Path
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.core.config import settings
+from app.models.job import Job as JobModel
+from app.schemas.job import Job, JobCreate, JobState, JobTypeInfo
+from app.services import exports, gps_retention, jobs, route_tracks, sync  # noqa: F401 (the job types register on import)
+
+router = APIRouter()
+if settings.JOBS_RUN_IN_API:
+    router.add_event_handler("startup", jobs.runner.start)
+    router.add_event_handler("shutdown", jobs.runner.stop)
+
+
+def get_job_runner() -> jobs.JobRunner:
+    return jobs.runner
+
+
+def _get_job(db: Session, job_id: str) -> JobModel:
+    job = db.get(JobModel, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _check_privileged(db: Session, job_type: str, token: Optional[str]) -> None:
+    """Job types that delete data (GPS retention, tombstone pruning) take a superuser"""
+    kind = jobs.JOB_TYPES.get(job_type)
+    if kind is not None and kind.privileged:
+        deps.superuser_from_token(db, token)
+
+
+@router.get("/types", response_model=List[JobTypeInfo])
+def read_job_types(current_user = Depends(deps.get_current_user)):
+    """The job types that can be submitted"""
+    return [
+        JobTypeInfo(
+            name=kind.name, concurrency=kind.concurrency, max_attempts=kind.max_attempts,
+            backoff_seconds=kind.backoff_seconds, pool=kind.pool, privileged=kind.privileged,
+        )
+        for kind in jobs.JOB_TYPES.values()
+    ]
+
+
+@router.post("/", response_model=Job, status_code=202)
+def create_job(
+    job_in: JobCreate,
+    db: Session = Depends(deps.get_db),
+    runner: jobs.JobRunner = Depends(get_job_runner),
+    current_user = Depends(deps.get_current_user),
+    token: Optional[str] = Depends(deps.oauth2_scheme),
+):
+    """Queue a job; poll GET /jobs/{job_id} for its progress"""
+    _check_privileged(db, job_in.type, token)
+    try:
+        return runner.submit(db, job_in.type, job_in.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/", response_model=List[Job])
+def read_jobs(
+    db: Session = Depends(deps.get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    type: Optional[str] = Query(None, description="Filter by job type"),
+    state: Optional[JobState] = Query(None, description="Filter by state"),
+    current_user = Depends(deps.get_current_user),
+):
+    """Jobs, newest first"""
+    query = db.query(JobModel)
+    if type:
+        query = query.filter(JobModel.type == type)
+    if state:
+        query = query.filter(JobModel.state == state.value)
+    return query.order_by(JobModel.created_at.desc()).offset(skip).limit(limit).all()
+
+
+@router.get("/{job_id}", response_model=Job)
+def read_job(job_id: str, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_user)):
+    return _get_job(db, job_id)
+
+
+@router.post("/{job_id}/cancel", response_model=Job)
+def cancel_job(
+    job_id: str,
+    db: Session = Depends(deps.get_db),
+    runner: jobs.JobRunner = Depends(get_job_runner),
+    current_user = Depends(deps.get_current_user),
+    token: Optional[str] = Depends(deps.oauth2_scheme),
+):
+    """Cancel a queued job, or ask a running one to stop"""
+    job = _get_job(db, job_id)
+    _check_privileged(db, job.type, token)
+    try:
+        return runner.cancel(db, job)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{job_id}/result")
+def read_job_result(job_id: str, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_user)):
+    """The file a succeeded job wrote, or its result when it wrote none"""
+    job = _get_job(db, job_id)
+    if job.state != jobs.SUCCEEDED:
+        raise HTTPException(status_code=400, detail=f"Job is {job.state}")
+    result = job.result or {}
+    if "path" not in result:
+        return result
+    return FileResponse(
+        result["path"], media_type=result.get("media_type", "application/octet-stream"),
+        filename=f"{job.type}-{job.id}{Path(result['path']).suffix}",
+    )
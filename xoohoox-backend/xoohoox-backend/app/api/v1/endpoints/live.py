@@ -0,0 +1,86 @@
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request, WebSocket, WebSocketDisconnect
+
+from app.api.streaming import KEEP_ALIVE_SECONDS, event_stream
+from app.schemas.live import LiveSubscriptionChange, LiveTopic
+from app.services import live_events
+
+router = APIRouter()
+router.add_event_handler("shutdown", live_events.broker.stop)
+
+
+def get_broker() -> live_events.Broker:
+    return live_events.broker
+
+
+def _topics(topics: Optional[List[LiveTopic]]) -> List[str]:
+    return [topic.value for topic in topics] if topics else list(live_events.TOPICS)
+
+
+@router.get("/events")
+async def stream_live_events(
+    request: Request,
+    topics: Optional[List[LiveTopic]] = Query(None, description="Topics to receive (default: all)"),
+    batch_id: Optional[str] = Query(None, description="Only events of this batch"),
+    last_event_id: Optional[str] = Query(None, description="Resume after this event (for clients that can't send Last-Event-ID)"),
+    broker: live_events.Broker = Depends(get_broker),
+):
+    """
+    Server-sent events: batch status transitions, QC results, GPS points and
+    geofence alerts, each as an event named after its topic
+    """
+    return event_stream(request, broker, _topics(topics), {"batch_id": batch_id} if batch_id else {})
+
+
+@router.websocket("/ws")
+async def live_socket(
+    websocket: WebSocket,
+    topics: Optional[List[LiveTopic]] = Query(None),
+    batch_id: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Query(None),
+    broker: live_events.Broker = Depends(get_broker),
+):
+    """
+    The live feed over a WebSocket, as {"id", "topic", "data"} messages.
+    Clients change their topics by sending {"subscribe": [...]} or
+    {"unsubscribe": [...]}, answered with a "subscribed" message listing the
+    topics now received. A {"topic": "reset"} message means events were
+    missed and the client should reload its state.
+    """
+    await websocket.accept()
+    subscription, resumed = broker.subscribe(
+        _topics(topics), {"batch_id": batch_id} if batch_id else {}, last_event_id=last_event_id
+    )
+
+    async def send() -> None:
+        if not resumed:
+            await websocket.send_json({"topic": "reset"})
+        while True:
+            event = await subscription.get(timeout=KEEP_ALIVE_SECONDS)
+            if event is not None:
+                await websocket.send_json({"id": event.id, "topic": event.topic, "data": event.data})
+
+    async def receive() -> None:
+        while True:
+            change = LiveSubscriptionChange.model_validate(await websocket.receive_json())
+            subscription.update(
+                (subscription.topics | {topic.value for topic in change.subscribe})
+                - {topic.value for topic in change.unsubscribe}
+            )
+            await websocket.send_json({"topic": "subscribed", "data": {"topics": sorted(subscription.topics)}})
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        error = done.pop().exception()
+        if isinstance(error, live_events.SubscriberLagged):
+            await websocket.close(code=1013)  # try again later, resuming from the last id received
+        elif isinstance(error, ValueError):
+            await websocket.close(code=1003)
+        elif error is not None and not isinstance(error, WebSocketDisconnect):
+            raise error
+    finally:
+        subscription.close()
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+import math
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.core.config import settings
+from app.crud import geolocation as geo_crud
+from app.schemas.logistics import (
+    DeliveryEta, DeliveryStatus, RoutePlan, RoutePlanRequest, RoutingDepot, RoutingStop
+)
+from app.services import eta, vrp
+
+router = APIRouter()
+
+
+def get_eta_tracker() -> eta.EtaTracker:
+    return eta.tracker
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _minutes_after(start: datetime, value: Optional[datetime], default: float) -> float:
+    value = _naive_utc(value)
+    return default if value is None else (value - start).total_seconds() / 60
+
+
+@router.post("/routes/plan", response_model=RoutePlan)
+def plan_routes(payload: RoutePlanRequest, db: Session = Depends(deps.get_db)):
+    """
+    Plan sample-collection routes from the lab: every stop visited once within
+    its time window, no truck over capacity or past its shift, total distance
+    kept low. Without explicit stops, plans pickups of uncollected harvest
+    samples, one stop per paddock.
+    """
+    depot = payload.depot or RoutingDepot(latitude=settings.LAB_LATITUDE, longitude=settings.LAB_LONGITUDE)
+    start = _naive_utc(payload.start_time) or datetime.utcnow()
+    stops = payload.stops
+    if stops is None:
+        stops = [
+            RoutingStop(
+                id=paddock["paddock_id"], name=paddock["name"], latitude=paddock["latitude"],
+                longitude=paddock["longitude"], demand_kg=paddock["pending_samples"] * settings.ROUTING_SAMPLE_WEIGHT_KG,
+            )
+            for paddock in geo_crud.get_pending_sample_paddocks(db)
+        ]
+    by_id = {stop.id: stop for stop in stops}
+
+    plan = vrp.solve(
+        (depot.latitude, depot.longitude),
+        [
+            vrp.Stop(
+                id=stop.id, latitude=stop.latitude, longitude=stop.longitude, demand=stop.demand_kg,
+                service_minutes=stop.service_minutes, earliest=max(_minutes_after(start, stop.earliest, 0.0), 0.0),
+                latest=_minutes_after(start, stop.latest, math.inf),
+            )
+            for stop in stops
+        ],
+        [
+            vrp.Vehicle(
+                id=vehicle.id, capacity=vehicle.capacity_kg,
+                shift_minutes=vehicle.shift_hours * 60 if vehicle.shift_hours else math.inf,
+            )
+            for vehicle in payload.vehicles
+        ],
+        speed_kmh=payload.speed_kmh or settings.ROUTING_SPEED_KMH,
+        time_limit=payload.time_limit_seconds,
+    )
+    return {
+        "depot": depot,
+        "start_time": start,
+        "routes": [
+            {
+                "vehicle_id": route.vehicle.id,
+                "stops": [
+                    {
+                        "id": stop.id, "name": by_id[stop.id].name, "latitude": stop.latitude,
+                        "longitude": stop.longitude, "demand_kg": stop.demand,
+                        "arrival": start + timedelta(minutes=arrival),
+                    }
+                    for stop, arrival in zip(route.stops, route.arrivals)
+                ],
+                "load_kg": round(route.load, 3),
+                "distance_km": round(route.distance_km, 3),
+                "return_time": start + timedelta(minutes=route.end_minutes),
+            }
+            for route in plan.routes
+        ],
+        "unassigned": [by_id[stop.id] for stop in plan.unassigned],
+        "total_distance_km": round(plan.distance_km, 3),
+        "solve_ms": round(plan.solve_ms, 1),
+    }
+
+
+@router.get("/deliveries/eta", response_model=List[DeliveryEta])
+def read_delivery_etas(
+    status: Optional[DeliveryStatus] = None,
+    farm_id: Optional[str] = None,
+    db: Session = Depends(deps.get_db),
+    tracker: eta.EtaTracker = Depends(get_eta_tracker),
+):
+    """
+    Estimated arrival at the lab of every tracked batch, soonest first. Served
+    from memory and updated as GPS points are ingested, so cheap to poll.
+    """
+    estimates = [
+        estimate._asdict() for estimate in tracker.estimates(db)
+        if (status is None or estimate.status == status.value) and (farm_id is None or estimate.farm_id == farm_id)
+    ]
+    return sorted(estimates, key=lambda estimate: (estimate["eta"] is None, estimate["eta"] or estimate["last_seen"]))
+
+
+@router.get("/deliveries/{batch_id}/eta", response_model=DeliveryEta)
+def read_delivery_eta(
+    batch_id: str,
+    db: Session = Depends(deps.get_db),
+    tracker: eta.EtaTracker = Depends(get_eta_tracker),
+):
+    estimate = tracker.get(db, batch_id)
+    if estimate is None:
+        raise HTTPException(status_code=404, detail="Delivery not found")
+    return estimate._asdict()
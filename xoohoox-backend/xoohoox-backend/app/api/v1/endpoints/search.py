@@ -0,0 +1,40 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.crud import search as crud
+from app.models.enums import SearchEntityType
+from app.schemas.search import SearchResponse, SearchRebuildResponse
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, description="Words to search for, e.g. `sulphur`"),
+    entity_type: Optional[List[SearchEntityType]] = Query(None, description="Restrict to these record types"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(deps.get_db),
+    current_user: str = Depends(deps.get_current_user)
+):
+    """
+    Ranked full-text search over QC notes, batch issues, fermentation tasting
+    notes, evaluation comments and harvest notes.
+
+    Hits are ranked among the newest settings.SEARCH_RANK_CANDIDATES
+    matching records. A term common enough to match more than that ranks
+    only the newest ones; add words to reach older records.
+    """
+    results = crud.search(db, query=q, entity_types=entity_type, limit=limit)
+    batch_ids = list(dict.fromkeys(hit["batch_id"] for hit in results if hit["batch_id"]))
+    return {"query": q, "total": len(results), "results": results, "batch_ids": batch_ids}
+
+
+@router.post("/rebuild", response_model=SearchRebuildResponse)
+def rebuild_search_index(
+    db: Session = Depends(deps.get_db),
+    current_user: str = Depends(deps.get_current_user)
+):
+    """Rebuild the search index from the source tables"""
+    return {"documents": crud.rebuild_index(db)}
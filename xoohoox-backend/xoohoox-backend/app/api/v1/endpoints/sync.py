@@ -0,0 +1,35 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.core.config import settings
+from app.schemas.sync import SyncPage, SyncPush, SyncPushResult
+from app.services import sync
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SyncPage)
+def pull_changes(
+    db: Session = Depends(deps.get_db),
+    cursor: Optional[str] = Query(None, description="From the previous page or sync; omit for a full sync"),
+    limit: int = Query(settings.SYNC_PAGE_SIZE, ge=1, le=5000, description="Records per page"),
+    current_user = Depends(deps.get_current_user),
+):
+    """Farms, paddocks, batches, harvests and trials changed since cursor, then deletes"""
+    try:
+        page = sync.pull(db, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page._asdict()
+
+
+@router.post("/", response_model=SyncPushResult)
+def push_changes(
+    push: SyncPush,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_user),
+):
+    """Apply a batch of offline writes; each succeeds, conflicts or fails on its own"""
+    return {"results": sync.push(db, push.writes, push.strategy)}
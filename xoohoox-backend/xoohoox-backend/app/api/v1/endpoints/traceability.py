@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.crud import traceability as crud
+from app.models.enums import TraceNodeType
+from app.schemas.traceability import TraceResponse, TraceRebuildResponse
+
+router = APIRouter()
+
+
+@router.get("/{node_type}/{node_key}", response_model=TraceResponse)
+def trace_node(
+    node_type: TraceNodeType,
+    node_key: str,
+    direction: str = Query("forward", pattern="^(forward|backward)$"),
+    max_depth: int = Query(10, ge=1, le=50),
+    db: Session = Depends(deps.get_db)
+):
+    """
+    Trace a record through the supply chain.
+
+    `forward` returns everything derived from the node (e.g. all batches,
+    trials and QC results affected by a farm or paddock recall); `backward`
+    returns the provenance of the node (e.g. the harvests, paddocks and farm a
+    batch came from).
+    """
+    return crud.trace(db, node_type=node_type, node_key=node_key, direction=direction, max_depth=max_depth)
+
+
+@router.post("/rebuild", response_model=TraceRebuildResponse)
+def rebuild_trace_index(
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    """Rebuild the traceability index from the source tables"""
+    return {"links": crud.rebuild_index(db)}
@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.api.fields import FIELDS_QUERY, parse_fields, shape_many, sparse_response
 from app.crud import transformation as crud
 from app.schemas.transformation import (
     TransformationStageCreate,
@@ -36,14 +37,19 @@ def read_transformation_stages(
     batch_id: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    fields: Optional[str] = FIELDS_QUERY,
     current_user = Depends(deps.get_current_active_user)
 ):
+    selected = parse_fields(fields, TransformationStage)
     stages = crud.get_transformation_stages(
         db=db,
         batch_id=batch_id,
         skip=skip,
-        limit=limit
+        limit=limit,
+        fields=selected
     )
+    if selected:
+        return sparse_response(shape_many(stages, TransformationStage, selected))
     return stages
 
 @router.get("/stages/{stage_id}", response_model=TransformationStageWithResults)
@@ -0,0 +1,145 @@
+import secrets
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.core.config import settings
+from app.models.webhook import WebhookDelivery as WebhookDeliveryModel, WebhookEndpoint as WebhookEndpointModel
+from app.schemas.webhook import (
+    WebhookDelivery,
+    WebhookDeliveryState,
+    WebhookEndpoint,
+    WebhookEndpointCreate,
+    WebhookEndpointCreated,
+    WebhookEndpointStats,
+    WebhookEndpointUpdate,
+)
+from app.services import webhooks
+
+router = APIRouter()
+if settings.WEBHOOKS_DISPATCH_IN_API:
+    router.add_event_handler("startup", webhooks.dispatcher.start)
+    router.add_event_handler("shutdown", webhooks.dispatcher.stop)
+
+
+def get_dispatcher() -> webhooks.Dispatcher:
+    return webhooks.dispatcher
+
+
+def _get_endpoint(db: Session, endpoint_id: int) -> WebhookEndpointModel:
+    endpoint = db.get(WebhookEndpointModel, endpoint_id)
+    if not endpoint:
+        raise HTTPException(status_code=404, detail="Webhook endpoint not found")
+    return endpoint
+
+
+@router.post("/", response_model=WebhookEndpointCreated, status_code=201)
+def create_endpoint(
+    endpoint_in: WebhookEndpointCreate,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """Subscribe a URL to topics; the response carries the signing secret"""
+    data = endpoint_in.model_dump()
+    data["topics"] = [topic.value for topic in endpoint_in.topics]
+    data["secret"] = endpoint_in.secret or secrets.token_hex(32)
+    endpoint = WebhookEndpointModel(**data, active=True)
+    db.add(endpoint)
+    db.commit()
+    db.refresh(endpoint)
+    return endpoint
+
+
+@router.get("/", response_model=List[WebhookEndpoint])
+def read_endpoints(db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_user)):
+    return db.query(WebhookEndpointModel).order_by(WebhookEndpointModel.id).all()
+
+
+@router.get("/stats", response_model=List[WebhookEndpointStats])
+def read_stats(
+    db: Session = Depends(deps.get_db),
+    dispatcher: webhooks.Dispatcher = Depends(get_dispatcher),
+    current_user = Depends(deps.get_current_user),
+):
+    """Outbox backlog per endpoint, with this process's delivery counters"""
+    counts = webhooks.outbox_counts(db)
+    metrics = dispatcher.stats()
+    return [
+        WebhookEndpointStats(endpoint_id=endpoint_id, **counts.get(endpoint_id, {}), metrics=metrics.get(endpoint_id, {}))
+        for endpoint_id in sorted(set(counts) | set(metrics))
+    ]
+
+
+@router.get("/{endpoint_id}", response_model=WebhookEndpoint)
+def read_endpoint(endpoint_id: int, db: Session = Depends(deps.get_db), current_user = Depends(deps.get_current_user)):
+    return _get_endpoint(db, endpoint_id)
+
+
+@router.put("/{endpoint_id}", response_model=WebhookEndpoint)
+def update_endpoint(
+    endpoint_id: int,
+    endpoint_in: WebhookEndpointUpdate,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """Change an endpoint; a deactivated one keeps its pending deliveries until reactivated"""
+    endpoint = _get_endpoint(db, endpoint_id)
+    for field, value in endpoint_in.model_dump(exclude_unset=True).items():
+        if field == "topics":
+            value = [topic.value for topic in endpoint_in.topics]
+        setattr(endpoint, field, value)
+    db.commit()
+    db.refresh(endpoint)
+    return endpoint
+
+
+@router.delete("/{endpoint_id}", response_model=WebhookEndpoint)
+def delete_endpoint(
+    endpoint_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """Remove an endpoint and its deliveries"""
+    endpoint = _get_endpoint(db, endpoint_id)
+    db.execute(delete(WebhookDeliveryModel).where(WebhookDeliveryModel.endpoint_id == endpoint_id))
+    db.delete(endpoint)
+    db.commit()
+    return endpoint
+
+
+@router.get("/{endpoint_id}/deliveries", response_model=List[WebhookDelivery])
+def read_deliveries(
+    endpoint_id: int,
+    db: Session = Depends(deps.get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    state: Optional[WebhookDeliveryState] = Query(None, description="Filter by state"),
+    current_user = Depends(deps.get_current_user),
+):
+    """An endpoint's deliveries, newest first"""
+    _get_endpoint(db, endpoint_id)
+    query = db.query(WebhookDeliveryModel).filter(WebhookDeliveryModel.endpoint_id == endpoint_id)
+    if state:
+        query = query.filter(WebhookDeliveryModel.state == state.value)
+    return query.order_by(WebhookDeliveryModel.created_at.desc()).offset(skip).limit(limit).all()
+
+
+@router.post("/{endpoint_id}/redeliver")
+def redeliver(
+    endpoint_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_superuser),
+):
+    """Queue an endpoint's failed deliveries again, e.g. once the receiver is fixed"""
+    _get_endpoint(db, endpoint_id)
+    requeued = db.execute(
+        update(WebhookDeliveryModel)
+        .where(WebhookDeliveryModel.endpoint_id == endpoint_id, WebhookDeliveryModel.state == webhooks.FAILED)
+        .values(state=webhooks.PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return {"requeued": requeued}
@@ -26,6 +26,91 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
     ALGORITHM: str = "HS256"
 
+    # Caching
+    BATCH_FACET_CACHE_TTL_SECONDS: int = 30
+    GEOFENCE_INDEX_TTL_SECONDS: int = 300
+    HEATMAP_CACHE_TTL_SECONDS: int = 60
+    CLUSTER_CACHE_TTL_SECONDS: int = 60
+
+    # GPS ingestion (write-behind buffer)
+    GPS_INGEST_MAX_BUFFERED_POINTS: int = 200000
+    GPS_INGEST_FLUSH_SIZE: int = 5000
+    GPS_INGEST_FLUSH_INTERVAL_SECONDS: float = 1.0
+    GPS_INGEST_MAX_ATTEMPTS: int = 3  # flushes a point the database rejects gets before it is quarantined
+    GEOFENCE_DWELL_SECONDS: int = 900
+
+    # Change data capture: committed writes fed to consumers (app/db/cdc.py)
+    CDC_QUEUE_SIZE: int = 10000  # changes queued per consumer
+    CDC_PG_NOTIFY: bool = False  # also pg_notify changes, for the consumers of other processes
+    CDC_PG_CHANNEL: str = "xoohoox_cdc"
+
+    # Background jobs (app/services/jobs.py)
+    JOBS_RUN_IN_API: bool = True  # False when scripts/job_worker.py processes run the jobs instead
+    JOBS_MAX_WORKERS: int = 4
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0
+    JOBS_STALE_SECONDS: int = 300  # running jobs without a heartbeat for this long are retried
+    JOBS_RESULTS_DIR: str = "job_results"
+
+    # Delta sync for offline field tablets
+    SYNC_PAGE_SIZE: int = 500
+    SYNC_COMMIT_LAG_SECONDS: float = 5.0  # changes this recent wait for the next sync, so in-flight commits aren't skipped
+    SYNC_TOMBSTONE_DAYS: int = 90  # tablets that haven't synced for longer start over with a full sync
+    SYNC_MAX_WRITES: int = 500  # records per pushed batch
+
+    # Edge deployment: SQLite on a box at a remote farm (app/db/edge.py), replicated to central
+    EDGE_SQLITE_SYNCHRONOUS: str = "NORMAL"  # with WAL, a power cut may lose the last commits but can't corrupt the file
+    EDGE_SQLITE_CACHE_SIZE_KB: int = 65536  # page cache per connection
+    EDGE_SQLITE_MMAP_SIZE_BYTES: int = 268435456
+    EDGE_SQLITE_BUSY_TIMEOUT_MS: int = 5000  # a writer waits this long for the write lock
+    EDGE_SQLITE_POOL_SIZE: int = 8
+    EDGE_CENTRAL_DATABASE_URI: str = ""  # central PostgreSQL; writes are logged for replication only when set
+    EDGE_REPLICATION_BATCH_SIZE: int = 500  # logged changes shipped per central transaction
+    EDGE_REPLICATION_INTERVAL_SECONDS: float = 10.0
+    EDGE_REPLICATION_MAX_BACKOFF_SECONDS: float = 600.0  # while central is unreachable
+
+    # Idempotency-Key replays of retried POSTs
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # how long a response is replayed for
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0  # the longest a running request holds its key
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # a concurrent retry waits this long for the first's response
+    IDEMPOTENCY_REDIS_URL: str = ""  # share keys between workers through Redis; in-process when unset
+
+    # Outbound webhooks
+    WEBHOOKS_DISPATCH_IN_API: bool = True  # False when scripts/webhook_dispatcher.py processes deliver instead
+    WEBHOOKS_POLL_INTERVAL_SECONDS: float = 2.0
+    WEBHOOKS_MAX_CONNECTIONS: int = 20
+    WEBHOOKS_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOKS_MAX_ATTEMPTS: int = 10  # then the delivery is failed until redelivered
+    WEBHOOKS_BACKOFF_SECONDS: float = 15.0  # doubling after each failed attempt
+    WEBHOOKS_MAX_BACKOFF_SECONDS: float = 3600.0
+    WEBHOOKS_LEASE_SECONDS: float = 60.0  # claimed deliveries of a dispatcher that died are retried after this
+
+    # Live update feed (SSE/WebSocket)
+    LIVE_EVENTS_REPLAY_SIZE: int = 10000  # recent events kept for clients resuming with Last-Event-ID
+    LIVE_EVENTS_SUBSCRIBER_QUEUE_SIZE: int = 1000
+    LIVE_EVENTS_REDIS_URL: str = ""  # share events between workers through a Redis stream; in-process when unset
+
+    # Full-text search: hits are ranked among at most this many of the newest matches
+    SEARCH_RANK_CANDIDATES: int = 5000
+
+    # Route simplification: tolerance levels (whole metres) stored for completed trips
+    ROUTE_PRECOMPUTED_TOLERANCES_METERS: List[int] = [5, 25, 100]
+
+    # GPS retention: trips idle this long are downsampled and archived
+    GPS_RETENTION_DAYS: int = 90
+    GPS_RETENTION_TOLERANCE_METERS: float = 25.0
+    GPS_RETENTION_CHUNK_SIZE: int = 5000
+    GPS_ARCHIVE_DIR: str = "archive/location_tracking"
+
+    # Logistics: the lab is the depot of every collection route
+    LAB_LATITUDE: float = -35.2809
+    LAB_LONGITUDE: float = 149.1300
+    ROUTING_SPEED_KMH: float = 70.0
+    ROUTING_ROAD_FACTOR: float = 1.3  # road distance / great-circle distance
+    ROUTING_SAMPLE_WEIGHT_KG: float = 5.0
+    ROUTING_MATRIX_CACHE_TTL_SECONDS: int = 3600
+    ETA_ARRIVAL_RADIUS_METERS: float = 500.0  # a trip has arrived once within this of the lab
+    ETA_ACTIVE_HOURS: int = 24  # trips seen within this are loaded into the ETA table on startup
+
     class Config:
         case_sensitive = True
 
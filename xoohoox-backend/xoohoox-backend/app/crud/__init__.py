@@ -5,6 +5,8 @@ from .quality_control import quality_control
 from .equipment_maintenance import crud_equipment_maintenance
 from .maintenance_log import maintenance_log
 from .equipment import equipment
+from . import traceability  # registers the trace_links flush listener
+from . import search  # registers the search_documents flush listener
 
 __all__ = [
     "CRUDBase",
@@ -13,5 +15,7 @@ __all__ = [
     "quality_control",
     "crud_equipment_maintenance",
     "maintenance_log",
-    "equipment"
+    "equipment",
+    "traceability",
+    "search"
 ]
@@ -1,8 +1,9 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
 import logging
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy.exc import SQLAlchemyError
 from app.db.database import Base
 
@@ -12,6 +13,14 @@ ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+def load_only_fields(model: Type[Any], fields: Optional[Sequence[str]]) -> List[Any]:
+    """Query options restricting the SELECT to the mapped columns in `fields`"""
+    if not fields:
+        return []
+    columns = inspect(model).column_attrs
+    selected = [columns[name].class_attribute for name in fields if name in columns]
+    return [load_only(*selected)] if selected else []
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         """
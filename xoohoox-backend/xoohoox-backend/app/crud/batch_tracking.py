@@ -1,9 +1,16 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Tuple
 from datetime import datetime
-from sqlalchemy.orm import Session
+from enum import Enum
+from sqlalchemy import select, func, case, literal, null, or_, tuple_, type_coerce, union_all
+from sqlalchemy.orm import Session, selectinload
 
-from app.crud.base import CRUDBase
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.crud.base import CRUDBase, load_only_fields
+from app.crud.transformation import STAGE_RESULT_RELATIONSHIPS
+from app.db import cdc
 from app.models.batch_tracking import BatchTracking
+from app.models.fermentation_trial import FermentationTrial
 from app.models.enums import BatchStatus, QualityGrade
 from app.schemas.batch_tracking import (
     BatchTrackingCreate,
@@ -15,9 +22,41 @@ from app.schemas.batch_tracking import (
     TakeCorrectiveAction,
 )
 
+BATCH_FACETS = ("status", "fruit_type", "process_type", "month")
+
+# Facet counts keyed on the search filters; short TTL so the list UI can poll,
+# and dropped as soon as a batch write commits
+facet_cache = TTLCache(ttl=settings.BATCH_FACET_CACHE_TTL_SECONDS)
+cdc.register("batch_facets", lambda changes: facet_cache.clear(), entities=[BatchTracking.__tablename__])
+
 class CRUDBatchTracking(CRUDBase[BatchTracking, BatchTrackingCreate, BatchTrackingUpdate]):
-    def get_by_batch_id(self, db: Session, *, batch_id: str) -> Optional[BatchTracking]:
-        return db.query(BatchTracking).filter(BatchTracking.batch_id == batch_id).first()
+    def get_by_batch_id(
+        self, db: Session, *, batch_id: str, fields: Optional[Sequence[str]] = None
+    ) -> Optional[BatchTracking]:
+        return (
+            db.query(BatchTracking)
+            .options(*load_only_fields(BatchTracking, fields))
+            .filter(BatchTracking.batch_id == batch_id)
+            .first()
+        )
+
+    def get_full(self, db: Session, *, batch_id: str) -> Optional[BatchTracking]:
+        """
+        Load a batch with its transformation stages (and every result type),
+        trials and quality records. Each collection is fetched with one
+        selectinload query, so the query count does not grow with the batch.
+        """
+        stages = selectinload(BatchTracking.transformation_stages)
+        return (
+            db.query(BatchTracking)
+            .filter(BatchTracking.batch_id == batch_id)
+            .options(
+                *[stages.selectinload(relationship) for relationship in STAGE_RESULT_RELATIONSHIPS],
+                selectinload(BatchTracking.trials).selectinload(FermentationTrial.upscale_runs),
+                selectinload(BatchTracking.quality_records),
+            )
+            .first()
+        )
     
     def get_multi(
         self,
@@ -29,8 +68,9 @@ class CRUDBatchTracking(CRUDBase[BatchTracking, BatchTrackingCreate, BatchTracki
         status: Optional[BatchStatus] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
     ) -> List[BatchTracking]:
-        query = db.query(BatchTracking)
+        query = db.query(BatchTracking).options(*load_only_fields(BatchTracking, fields))
         
         if juice_type:
             query = query.filter(BatchTracking.juice_type == juice_type)
@@ -43,6 +83,120 @@ class CRUDBatchTracking(CRUDBase[BatchTracking, BatchTrackingCreate, BatchTracki
         
         return query.offset(skip).limit(limit).all()
     
+    def _month(self, db: Session):
+        """Production month (YYYY-MM), falling back to the planned start date"""
+        produced = func.coalesce(BatchTracking.production_date, BatchTracking.start_date)
+        if db.get_bind().dialect.name == "postgresql":
+            return func.to_char(produced, "YYYY-MM")
+        return func.strftime("%Y-%m", produced)
+
+    def search_filters(self, db: Session, filters: Dict[str, Any]) -> List[Any]:
+        """WHERE clauses of the batch search filters (q, status, fruit_type, process_type, month)"""
+        clauses = []
+        if filters.get("q"):
+            pattern = f"%{filters['q']}%"
+            clauses.append(or_(BatchTracking.name.ilike(pattern), BatchTracking.batch_id.ilike(pattern)))
+        if filters.get("status"):
+            clauses.append(BatchTracking.status == filters["status"])
+        if filters.get("fruit_type"):
+            clauses.append(BatchTracking.fruit_type == filters["fruit_type"])
+        if filters.get("process_type"):
+            clauses.append(BatchTracking.process_type == filters["process_type"])
+        if filters.get("month"):
+            clauses.append(self._month(db) == filters["month"])
+        return clauses
+
+    def _facet_query(self, db: Session, clauses: List[Any]):
+        """
+        One statement returning a row per facet value plus a grand total row.
+
+        PostgreSQL uses GROUPING SETS; other dialects get the equivalent
+        UNION ALL of GROUP BYs so the result shape is identical.
+        """
+        columns = {
+            "status": BatchTracking.status,
+            "fruit_type": BatchTracking.fruit_type,
+            "process_type": BatchTracking.process_type,
+            "month": self._month(db),
+        }
+        if db.get_bind().dialect.name == "postgresql":
+            facet = case(
+                *[(func.grouping(column) == 0, name) for name, column in columns.items()],
+                else_="total",
+            )
+            return (
+                select(facet.label("facet"), *[column.label(name) for name, column in columns.items()], func.count().label("count"))
+                .select_from(BatchTracking)
+                .where(*clauses)
+                .group_by(func.grouping_sets(*[tuple_(column) for column in columns.values()], tuple_()))
+            )
+
+        def grouped(name: Optional[str]):
+            selected = [
+                (column if name == other else type_coerce(null(), column.type)).label(other)
+                for other, column in columns.items()
+            ]
+            stmt = (
+                select(literal(name or "total").label("facet"), *selected, func.count().label("count"))
+                .select_from(BatchTracking)
+                .where(*clauses)
+            )
+            return stmt.group_by(columns[name]) if name else stmt
+
+        return union_all(*[grouped(name) for name in columns], grouped(None))
+
+    def facet_counts(self, db: Session, **filters: Any) -> Tuple[int, Dict[str, Dict[str, int]]]:
+        """Total and per-facet counts for the filtered batches (cached briefly)"""
+        key = tuple(sorted((name, str(value)) for name, value in filters.items() if value is not None))
+
+        def compute() -> Tuple[int, Dict[str, Dict[str, int]]]:
+            total = 0
+            facets: Dict[str, Dict[str, int]] = {name: {} for name in BATCH_FACETS}
+            for row in db.execute(self._facet_query(db, self.search_filters(db, filters))):
+                if row.facet == "total":
+                    total = row.count
+                    continue
+                value = getattr(row, row.facet)
+                if isinstance(value, Enum):
+                    value = value.value
+                if value is not None:
+                    facets[row.facet][str(value)] = row.count
+            return total, facets
+
+        return facet_cache.get_or_set(key, compute)
+
+    def search(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        **filters: Any,
+    ) -> Tuple[List[BatchTracking], int, Dict[str, Dict[str, int]]]:
+        """
+        Filtered page of batches, the exact number of matches and the facet
+        counts. The total comes with the page (a window count), not from the
+        facet cache, so it can't lag behind the items.
+        """
+        clauses = self.search_filters(db, filters)
+        rows = (
+            db.query(BatchTracking, func.count().over().label("total"))
+            .options(*load_only_fields(BatchTracking, fields))
+            .filter(*clauses)
+            .order_by(BatchTracking.start_date.desc(), BatchTracking.id.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        if rows:
+            total = rows[0].total
+        else:
+            # Past the last page: the window count has no row to ride on
+            total = db.query(func.count(BatchTracking.id)).filter(*clauses).scalar() if skip else 0
+        _, facets = self.facet_counts(db, **filters)
+        return [batch for batch, _ in rows], total, facets
+
     def start_production(
         self,
         db: Session,
@@ -124,8 +278,8 @@ class CRUDBatchTracking(CRUDBase[BatchTracking, BatchTrackingCreate, BatchTracki
         if not batch:
             return None
         
-        current_issues = batch.issues or []
-        current_issues.append(data.issue)
+        current_issues = list(batch.issues or [])
+        current_issues.append({**data.model_dump(), "reported_at": datetime.utcnow().isoformat()})
         
         update_data = {
             "issues": current_issues,
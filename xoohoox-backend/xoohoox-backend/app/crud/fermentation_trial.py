@@ -1,6 +1,7 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
+from app.crud.base import load_only_fields
 from app.models.fermentation_trial import FermentationTrial, PathTaken
 from app.schemas.fermentation_trial import (
     FermentationTrialCreate,
@@ -9,8 +10,13 @@ from app.schemas.fermentation_trial import (
     UpscaleEventCreate
 )
 
-def get_trial(db: Session, trial_id: int) -> Optional[FermentationTrial]:
-    return db.query(FermentationTrial).filter(FermentationTrial.id == trial_id).first()
+def get_trial(db: Session, trial_id: int, fields: Optional[Sequence[str]] = None) -> Optional[FermentationTrial]:
+    return (
+        db.query(FermentationTrial)
+        .options(*load_only_fields(FermentationTrial, fields))
+        .filter(FermentationTrial.id == trial_id)
+        .first()
+    )
 
 def get_trial_by_trial_id(db: Session, trial_id: str) -> Optional[FermentationTrial]:
     return db.query(FermentationTrial).filter(FermentationTrial.trial_id == trial_id).first()
@@ -19,10 +25,12 @@ def get_trials_by_batch(
     db: Session, 
     batch_id: int, 
     skip: int = 0, 
-    limit: int = 100
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None
 ) -> List[FermentationTrial]:
     return (
         db.query(FermentationTrial)
+        .options(*load_only_fields(FermentationTrial, fields))
         .filter(FermentationTrial.batch_id == batch_id)
         .order_by(desc(FermentationTrial.created_at))
         .offset(skip)
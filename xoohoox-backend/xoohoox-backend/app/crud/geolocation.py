@@ -1,22 +1,295 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, NamedTuple, Sequence, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from datetime import datetime, timedelta
-import math
+from sqlalchemy import and_, or_, func, select, event
+from sqlalchemy.engine import Connection
+from datetime import datetime, timedelta, timezone
+import threading
+import time
 import uuid
 
+import numpy as np
+
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.crud.base import CRUDBase
-from app.models.geolocation import Farm, Paddock, Geofence, Harvest, LocationTracking
+from app.db import cdc
+from app.models.geolocation import Farm, Paddock, Geofence, GeofenceAlert, Harvest, LocationTracking, SimplifiedTrack
+from app.services import geohash
+from app.services.geofence_matcher import CompiledPolygon, compile_polygon, match_points
+from app.services.clustering import BBox, ClusterIndex
+from app.services.geometry import haversine_km, point_in_polygon
+from app.services.nearest import NearestIndex
+from app.services.spatial_index import RTree
+from app.services.track_simplify import (
+    DOUGLAS_PEUCKER, Track, decode_polyline, encode_polyline, simplify, track_length_km
+)
 from app.schemas.geolocation import (
     FarmCreate, FarmUpdate,
     PaddockCreate, PaddockUpdate,
     GeofenceCreate, GeofenceUpdate,
     HarvestCreate, HarvestUpdate,
-    LocationTrackingCreate, LocationTrackingUpdate
+    LocationTrackingCreate, LocationTrackingUpdate,
+    GeofenceAlert as GeofenceAlertSchema
 )
 
+# LocationTracking.status values (lowercased) that mark the end of a trip
+COMPLETED_TRIP_STATUSES = {"delivered", "completed"}
+
+HEATMAP_WINDOWS = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "365d": timedelta(days=365),
+    "all": None,
+}
+
+# Heatmap cells keyed on (layer, precision, window, prefix); relative windows
+# mean a short TTL, and harvest cells are also dropped once harvest or paddock
+# writes commit (GPS points arrive through the ingest buffer, outside the ORM)
+heatmap_cache = TTLCache(ttl=settings.HEATMAP_CACHE_TTL_SECONDS, maxsize=256)
+cdc.register("harvest_heatmaps", lambda changes: heatmap_cache.clear(), entities=[Harvest.__tablename__, Paddock.__tablename__])
+
+# layer -> (key column, label column, latitude column, longitude column, time column)
+CLUSTER_LAYERS = {
+    "farms": (Farm.farm_id, Farm.name, Farm.latitude, Farm.longitude, None),
+    "paddocks": (Paddock.paddock_id, Paddock.name, Paddock.latitude, Paddock.longitude, None),
+    "geofences": (Geofence.geofence_id, Geofence.name, Geofence.centroid_lat, Geofence.centroid_lng, None),
+    "tracking": (
+        LocationTracking.tracking_id, LocationTracking.batch_id, LocationTracking.latitude,
+        LocationTracking.longitude, LocationTracking.timestamp,
+    ),
+}
+CLUSTERED_MODELS = {Farm: "farms", Paddock: "paddocks", Geofence: "geofences"}
+
+# ClusterSnapshot per (layer, window): built once, dropped when a flush touches
+# the layer's model; tracking points arrive through the ingest buffer, so that
+# layer relies on the TTL
+cluster_cache = TTLCache(ttl=settings.CLUSTER_CACHE_TTL_SECONDS, maxsize=32)
+
+
+class ClusterSnapshot(NamedTuple):
+    index: ClusterIndex
+    ids: List[str]
+    labels: List[Optional[str]]
+
+
+class GeofenceSnapshot(NamedTuple):
+    tree: RTree
+    polygons: List[CompiledPolygon]
+    alerting: frozenset  # ids of the geofences with alerts_enabled
+
+
+class GeofenceIndex:
+    """
+    Process-wide R-tree and compiled polygon arrays for the active geofences.
+
+    Built lazily from the bbox columns on first use, dropped whenever a flush
+    touches a Geofence (see invalidate_geofence_index) and rebuilt after
+    GEOFENCE_INDEX_TTL_SECONDS to pick up writes from other processes.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: Optional[GeofenceSnapshot] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    def snapshot(self, db: Union[Session, Connection]) -> GeofenceSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._built_at < self.ttl:
+            return snapshot
+        with self._lock:
+            rows = db.execute(
+                select(
+                    Geofence.geofence_id, Geofence.coordinates, Geofence.alerts_enabled,
+                    Geofence.min_lat, Geofence.min_lng, Geofence.max_lat, Geofence.max_lng,
+                ).where(Geofence.status == "active", Geofence.min_lat.isnot(None))
+                .order_by(Geofence.geofence_id)
+            ).all()
+            snapshot = GeofenceSnapshot(
+                tree=RTree(
+                    ((row.min_lat, row.min_lng, row.max_lat, row.max_lng), (row.geofence_id, row.coordinates))
+                    for row in rows
+                ),
+                polygons=[compile_polygon(row.geofence_id, row.coordinates) for row in rows],
+                alerting=frozenset(row.geofence_id for row in rows if row.alerts_enabled is not False),
+            )
+            self._snapshot, self._built_at = snapshot, time.monotonic()
+        return snapshot
+
+    def tree(self, db: Session) -> RTree:
+        return self.snapshot(db).tree
+
+    def containing(self, db: Session, *, latitude: float, longitude: float) -> List[str]:
+        """Ids of active geofences whose polygon contains the point"""
+        return [
+            geofence_id
+            for geofence_id, polygon in self.tree(db).query_point(latitude, longitude)
+            if point_in_polygon(latitude, longitude, polygon)
+        ]
+
+    def match_points(self, db: Union[Session, Connection], *, latitudes: Sequence[float], longitudes: Sequence[float]) -> Dict[int, List[str]]:
+        """Point index -> ids of the active geofences containing it, vectorized over the points"""
+        return match_points(latitudes, longitudes, self.snapshot(db).polygons)
+
+
+geofence_index = GeofenceIndex(ttl=settings.GEOFENCE_INDEX_TTL_SECONDS)
+
+
+@event.listens_for(Session, "after_flush")
+def track_geofence_changes(session: Session, flush_context: Any) -> None:
+    """Note geofence writes; the index is dropped only once they are committed"""
+    if any(isinstance(obj, Geofence) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["geofences_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_geofence_index(session: Session) -> None:
+    # Dropped after commit, so a concurrent rebuild can't cache writes that may still roll back
+    if session.info.pop("geofences_changed", False):
+        geofence_index.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_geofence_changes(session: Session) -> None:
+    session.info.pop("geofences_changed", None)
+
+
+# kind -> (model, key column, latitude column, longitude column, radius column in metres)
+NEARBY_RULES = {
+    "farms": (Farm, "farm_id", "latitude", "longitude", None),
+    "paddocks": (Paddock, "paddock_id", "latitude", "longitude", None),
+    "geofences": (Geofence, "geofence_id", "centroid_lat", "centroid_lng", "bounding_radius_meters"),
+}
+NEARBY_KINDS = {model: kind for kind, (model, *_) in NEARBY_RULES.items()}
+
+
+def _nearby_entry(obj: Any) -> Optional[tuple]:
+    """(key, latitude, longitude, radius_km) of an object, or None when it can't be located"""
+    _, key_column, lat_column, lng_column, radius_column = NEARBY_RULES[NEARBY_KINDS[type(obj)]]
+    latitude, longitude = getattr(obj, lat_column), getattr(obj, lng_column)
+    if latitude is None or longitude is None or (isinstance(obj, Geofence) and obj.status != "active"):
+        return None
+    radius = getattr(obj, radius_column) if radius_column else None
+    return getattr(obj, key_column), latitude, longitude, (radius or 0.0) / 1000
+
+
+class NearbyIndexes:
+    """
+    One NearestIndex per kind in NEARBY_RULES, built lazily and then kept
+    current from committed flushes (see track_nearby_changes) instead of being
+    rebuilt. Rebuilt from scratch after GEOFENCE_INDEX_TTL_SECONDS.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._indexes: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._indexes = {}
+
+    def index(self, db: Session, kind: str) -> NearestIndex:
+        entry = self._indexes.get(kind)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        model, key_column, lat_column, lng_column, radius_column = NEARBY_RULES[kind]
+        table = model.__table__
+        columns = [table.c[key_column], table.c[lat_column], table.c[lng_column]]
+        if radius_column:
+            columns.append(table.c[radius_column])
+        query = select(*columns).where(table.c[lat_column].isnot(None), table.c[lng_column].isnot(None))
+        if model is Geofence:
+            query = query.where(table.c.status == "active")
+        with self._lock:
+            index = NearestIndex(
+                (row[0], row[1], row[2], ((row[3] or 0.0) / 1000) if radius_column else 0.0)
+                for row in db.execute(query)
+            )
+            self._indexes[kind] = (index, time.monotonic())
+        return index
+
+    def apply(self, changes: List[tuple]) -> None:
+        for kind, key, entry in changes:
+            built = self._indexes.get(kind)
+            if built is None:
+                continue
+            if entry is None:
+                built[0].remove(key)
+            else:
+                built[0].upsert(*entry)
+
+
+nearby_index = NearbyIndexes(ttl=settings.GEOFENCE_INDEX_TTL_SECONDS)
+
+
+@event.listens_for(Session, "after_flush")
+def track_nearby_changes(session: Session, flush_context: Any) -> None:
+    """Collect located-object changes; they reach the indexes only once committed"""
+    changes = []
+    for obj in (*session.new, *session.dirty):
+        if type(obj) in NEARBY_KINDS:
+            key = getattr(obj, NEARBY_RULES[NEARBY_KINDS[type(obj)]][1])
+            changes.append((NEARBY_KINDS[type(obj)], key, _nearby_entry(obj)))
+    for obj in session.deleted:
+        if type(obj) in NEARBY_KINDS:
+            changes.append((NEARBY_KINDS[type(obj)], getattr(obj, NEARBY_RULES[NEARBY_KINDS[type(obj)]][1]), None))
+    if changes:
+        session.info.setdefault("nearby_changes", []).extend(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def apply_nearby_changes(session: Session) -> None:
+    changes = session.info.pop("nearby_changes", None)
+    if changes:
+        nearby_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_nearby_changes(session: Session) -> None:
+    session.info.pop("nearby_changes", None)
+
+
+def find_nearby(
+    db: Session,
+    kind: str,
+    *,
+    latitude: float,
+    longitude: float,
+    k: Optional[int] = 5,
+    radius_km: Optional[float] = None
+) -> List[tuple]:
+    """
+    (object, distance_km) pairs nearest first: the k nearest, or everything
+    within radius_km (capped at k when given). Geofence distances are to the
+    edge of their bounding circle.
+    """
+    index = nearby_index.index(db, kind)
+    if radius_km is not None:
+        hits = index.within(latitude, longitude, radius_km)
+        hits = hits[:k] if k is not None else hits
+    else:
+        hits = index.nearest(latitude, longitude, k or 5)
+    if not hits:
+        return []
+    model, key_column = NEARBY_RULES[kind][:2]
+    column = getattr(model, key_column)
+    objects = {getattr(obj, key_column): obj for obj in db.query(model).filter(column.in_([key for key, _ in hits]))}
+    return [(objects[key], distance) for key, distance in hits if key in objects]
+
 
 class CRUDFarm(CRUDBase[Farm, FarmCreate, FarmUpdate]):
+    def get_multi(
+        self, db: Session, *, skip: int = 0, limit: int = 100, region: Optional[str] = None
+    ) -> List[Farm]:
+        query = db.query(Farm)
+        if region:
+            query = query.filter(Farm.region == region)
+        return query.order_by(Farm.farm_id).offset(skip).limit(limit).all()
+
     def get_by_farm_id(self, db: Session, *, farm_id: str) -> Optional[Farm]:
         return db.query(Farm).filter(Farm.farm_id == farm_id).first()
     
@@ -57,6 +330,14 @@ class CRUDFarm(CRUDBase[Farm, FarmCreate, FarmUpdate]):
 
 
 class CRUDPaddock(CRUDBase[Paddock, PaddockCreate, PaddockUpdate]):
+    def get_multi(
+        self, db: Session, *, skip: int = 0, limit: int = 100, farm_id: Optional[str] = None
+    ) -> List[Paddock]:
+        query = db.query(Paddock)
+        if farm_id:
+            query = query.filter(Paddock.farm_id == farm_id)
+        return query.order_by(Paddock.paddock_id).offset(skip).limit(limit).all()
+
     def get_by_paddock_id(self, db: Session, *, paddock_id: str) -> Optional[Paddock]:
         return db.query(Paddock).filter(Paddock.paddock_id == paddock_id).first()
     
@@ -71,6 +352,22 @@ class CRUDPaddock(CRUDBase[Paddock, PaddockCreate, PaddockUpdate]):
 
 
 class CRUDGeofence(CRUDBase[Geofence, GeofenceCreate, GeofenceUpdate]):
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        farm_id: Optional[str] = None,
+        geofence_type: Optional[str] = None
+    ) -> List[Geofence]:
+        query = db.query(Geofence)
+        if farm_id:
+            query = query.filter(Geofence.farm_id == farm_id)
+        if geofence_type:
+            query = query.filter(Geofence.type == geofence_type)
+        return query.order_by(Geofence.geofence_id).offset(skip).limit(limit).all()
+
     def get_by_geofence_id(self, db: Session, *, geofence_id: str) -> Optional[Geofence]:
         return db.query(Geofence).filter(Geofence.geofence_id == geofence_id).first()
     
@@ -88,47 +385,47 @@ class CRUDGeofence(CRUDBase[Geofence, GeofenceCreate, GeofenceUpdate]):
         geofence = self.get_by_geofence_id(db, geofence_id=geofence_id)
         if not geofence or not geofence.coordinates:
             return False
-        
-        # Ray casting algorithm for point-in-polygon
-        point = (latitude, longitude)
-        polygon = geofence.coordinates
-        
-        n = len(polygon)
-        inside = False
-        
-        p1x, p1y = polygon[0]
-        for i in range(n + 1):
-            p2x, p2y = polygon[i % n]
-            if longitude > min(p1y, p2y):
-                if longitude <= max(p1y, p2y):
-                    if latitude <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (longitude - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or latitude <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        
-        return inside
-    
+        return point_in_polygon(latitude, longitude, geofence.coordinates)
+
+    def get_geofences_containing_point(self, db: Session, *, latitude: float, longitude: float) -> List[Geofence]:
+        """Active geofences containing a point, found through the R-tree rather than a scan"""
+        geofence_ids = geofence_index.containing(db, latitude=latitude, longitude=longitude)
+        if not geofence_ids:
+            return []
+        return db.query(Geofence).filter(Geofence.geofence_id.in_(geofence_ids)).order_by(Geofence.geofence_id).all()
+
+    def check_points(self, db: Session, *, points: Sequence[Sequence[float]]) -> Dict[int, List[str]]:
+        """Test many (latitude, longitude) points against every active geofence at once"""
+        if not points:
+            return {}
+        latitudes, longitudes = zip(*points)
+        return geofence_index.match_points(db, latitudes=latitudes, longitudes=longitudes)
+
     def get_geofences_near_point(self, db: Session, *, latitude: float, longitude: float, radius_km: float = 10) -> List[Geofence]:
-        """Get geofences within a certain radius of a point"""
-        geofences = self.get_active_geofences(db)
-        nearby_geofences = []
-        
-        for geofence in geofences:
-            if geofence.coordinates:
-                # Calculate distance to geofence center (simplified)
-                center_lat = sum(coord[0] for coord in geofence.coordinates) / len(geofence.coordinates)
-                center_lng = sum(coord[1] for coord in geofence.coordinates) / len(geofence.coordinates)
-                
-                distance = self.calculate_distance(latitude, longitude, center_lat, center_lng)
-                if distance <= radius_km:
-                    nearby_geofences.append(geofence)
-        
-        return nearby_geofences
+        """Get active geofences whose bounding circle lies within radius_km of a point, nearest first"""
+        return [
+            geofence
+            for geofence, _ in find_nearby(db, "geofences", latitude=latitude, longitude=longitude, k=None, radius_km=radius_km)
+        ]
 
 
 class CRUDHarvest(CRUDBase[Harvest, HarvestCreate, HarvestUpdate]):
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        farm_id: Optional[str] = None,
+        batch_id: Optional[str] = None
+    ) -> List[Harvest]:
+        query = db.query(Harvest)
+        if farm_id:
+            query = query.filter(Harvest.farm_id == farm_id)
+        if batch_id:
+            query = query.filter(Harvest.batch_id == batch_id)
+        return query.order_by(Harvest.harvest_date.desc(), Harvest.harvest_id).offset(skip).limit(limit).all()
+
     def get_by_harvest_id(self, db: Session, *, harvest_id: str) -> Optional[Harvest]:
         return db.query(Harvest).filter(Harvest.harvest_id == harvest_id).first()
     
@@ -153,6 +450,22 @@ class CRUDHarvest(CRUDBase[Harvest, HarvestCreate, HarvestUpdate]):
 
 
 class CRUDLocationTracking(CRUDBase[LocationTracking, LocationTrackingCreate, LocationTrackingUpdate]):
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        batch_id: Optional[str] = None,
+        harvest_id: Optional[str] = None
+    ) -> List[LocationTracking]:
+        query = db.query(LocationTracking)
+        if batch_id:
+            query = query.filter(LocationTracking.batch_id == batch_id)
+        if harvest_id:
+            query = query.filter(LocationTracking.harvest_id == harvest_id)
+        return query.order_by(LocationTracking.timestamp, LocationTracking.tracking_id).offset(skip).limit(limit).all()
+
     def get_by_tracking_id(self, db: Session, *, tracking_id: str) -> Optional[LocationTracking]:
         return db.query(LocationTracking).filter(LocationTracking.tracking_id == tracking_id).first()
     
@@ -190,38 +503,280 @@ class CRUDLocationTracking(CRUDBase[LocationTracking, LocationTrackingCreate, Lo
     
     def calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """Calculate distance between two points using Haversine formula"""
-        R = 6371  # Earth's radius in kilometers
-        
-        lat1_rad = math.radians(lat1)
-        lng1_rad = math.radians(lng1)
-        lat2_rad = math.radians(lat2)
-        lng2_rad = math.radians(lng2)
-        
-        dlat = lat2_rad - lat1_rad
-        dlng = lng2_rad - lng1_rad
-        
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        return distance
+        return haversine_km(lat1, lng1, lat2, lng2)
     
     def get_route_history(self, db: Session, *, batch_id: str) -> List[Dict[str, Any]]:
         """Get complete route history for a batch"""
-        tracking_entries = self.get_by_batch_id(db, batch_id=batch_id)
-        route_history = []
-        
-        for entry in tracking_entries:
-            route_history.append({
-                "timestamp": entry.timestamp,
-                "latitude": entry.latitude,
-                "longitude": entry.longitude,
-                "location_name": entry.location_name,
-                "status": entry.status,
-                "source": entry.source
-            })
-        
-        return route_history
+        rows = db.execute(
+            select(
+                LocationTracking.timestamp, LocationTracking.latitude, LocationTracking.longitude,
+                LocationTracking.location_name, LocationTracking.status, LocationTracking.source
+            ).where(LocationTracking.batch_id == batch_id).order_by(LocationTracking.timestamp)
+        )
+        return [dict(row) for row in rows.mappings()]
+
+    def get_track(self, db: Session, *, batch_id: str) -> Track:
+        """A batch's raw track as columns, without loading ORM objects"""
+        rows = db.execute(
+            select(LocationTracking.latitude, LocationTracking.longitude, LocationTracking.timestamp)
+            .where(LocationTracking.batch_id == batch_id)
+            .order_by(LocationTracking.timestamp)
+        ).all()
+        return Track(
+            np.fromiter((row[0] for row in rows), dtype=np.float64, count=len(rows)),
+            np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows)),
+            np.fromiter((_epoch_seconds(row[2]) for row in rows), dtype=np.int64, count=len(rows)),
+        )
+
+    def get_route(
+        self,
+        db: Session,
+        *,
+        batch_id: str,
+        tolerance_m: Optional[float] = None,
+        algorithm: str = DOUGLAS_PEUCKER
+    ) -> Optional[Dict[str, Any]]:
+        """
+        A batch's route as columns, simplified when tolerance_m is given.
+        Completed trips at one of ROUTE_PRECOMPUTED_TOLERANCES_METERS are served
+        from simplified_tracks while those are up to date; otherwise the raw
+        track is simplified here. Nothing is written: the stored versions are
+        built by the simplify_route job (app/services/route_tracks.py).
+        """
+        source_points, first_timestamp, last_timestamp = db.execute(
+            select(func.count(), func.min(LocationTracking.timestamp), func.max(LocationTracking.timestamp))
+            .where(LocationTracking.batch_id == batch_id)
+        ).one()
+        if not source_points:
+            return None
+        last_status = db.execute(
+            select(LocationTracking.status)
+            .where(LocationTracking.batch_id == batch_id)
+            .order_by(LocationTracking.timestamp.desc())
+            .limit(1)
+        ).scalar()
+        completed = (last_status or "").strip().lower() in COMPLETED_TRIP_STATUSES
+        stored = None
+        route = {
+            "batch_id": batch_id,
+            "completed": completed,
+            "algorithm": algorithm if tolerance_m is not None else None,
+            "tolerance_meters": tolerance_m,
+            "source_points": source_points,
+            "started_at": first_timestamp,
+            "ended_at": last_timestamp,
+        }
+
+        # Stored levels are whole metres, matched as integers rather than by float equality
+        level = int(tolerance_m) if tolerance_m is not None and float(tolerance_m).is_integer() else None
+        if completed and level in settings.ROUTE_PRECOMPUTED_TOLERANCES_METERS:
+            stored = db.query(SimplifiedTrack).filter(
+                SimplifiedTrack.batch_id == batch_id,
+                SimplifiedTrack.algorithm == algorithm,
+                SimplifiedTrack.tolerance_meters == level
+            ).first()
+            if stored is not None and (stored.source_points, stored.source_last_timestamp) != (source_points, last_timestamp):
+                stored = None  # built before the latest points arrived
+        if stored is not None:
+            coordinates = decode_polyline(stored.polyline)
+            return {
+                **route,
+                "point_count": stored.point_count,
+                "distance_km": stored.distance_km,
+                "latitudes": [lat for lat, _ in coordinates],
+                "longitudes": [lng for _, lng in coordinates],
+                "timestamps": stored.timestamps,
+            }
+
+        track = self.get_track(db, batch_id=batch_id)
+        distance_km = track_length_km(track)
+        if tolerance_m is not None:
+            track = simplify(track, tolerance_m, algorithm)
+        return {
+            **route,
+            "point_count": len(track.latitudes),
+            "distance_km": distance_km,
+            "latitudes": track.latitudes.tolist(),
+            "longitudes": track.longitudes.tolist(),
+            "timestamps": track.timestamps.tolist(),
+        }
+
+    def store_simplified_tracks(
+        self, db: Session, *, batch_id: str, algorithm: str = DOUGLAS_PEUCKER
+    ) -> Dict[int, SimplifiedTrack]:
+        """
+        Simplify a batch's track at every precomputed tolerance from one read,
+        replacing stored versions (the simplify_route job, once a trip completes)
+        """
+        source_points, last_timestamp = db.execute(
+            select(func.count(), func.max(LocationTracking.timestamp)).where(LocationTracking.batch_id == batch_id)
+        ).one()
+        track = self.get_track(db, batch_id=batch_id)
+        distance_km = track_length_km(track)
+        db.query(SimplifiedTrack).filter(
+            SimplifiedTrack.batch_id == batch_id, SimplifiedTrack.algorithm == algorithm
+        ).delete()
+        stored = {}
+        for tolerance in settings.ROUTE_PRECOMPUTED_TOLERANCES_METERS:
+            simplified = simplify(track, tolerance, algorithm)
+            stored[tolerance] = SimplifiedTrack(
+                batch_id=batch_id,
+                algorithm=algorithm,
+                tolerance_meters=tolerance,
+                polyline=encode_polyline(simplified.latitudes, simplified.longitudes),
+                timestamps=simplified.timestamps.tolist(),
+                point_count=len(simplified.latitudes),
+                distance_km=distance_km,
+                source_points=source_points,
+                source_last_timestamp=last_timestamp,
+            )
+        db.add_all(stored.values())
+        db.commit()
+        return stored
+
+
+def _epoch_seconds(timestamp: datetime) -> int:
+    return int(timestamp.replace(tzinfo=timezone.utc).timestamp())
+
+
+class CRUDGeofenceAlert(CRUDBase[GeofenceAlert, GeofenceAlertSchema, GeofenceAlertSchema]):
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        batch_id: Optional[str] = None,
+        geofence_id: Optional[str] = None,
+        alert_type: Optional[str] = None
+    ) -> List[GeofenceAlert]:
+        query = db.query(GeofenceAlert)
+        if batch_id:
+            query = query.filter(GeofenceAlert.batch_id == batch_id)
+        if geofence_id:
+            query = query.filter(GeofenceAlert.geofence_id == geofence_id)
+        if alert_type:
+            query = query.filter(GeofenceAlert.alert_type == alert_type)
+        return query.order_by(GeofenceAlert.timestamp.desc(), GeofenceAlert.id.desc()).offset(skip).limit(limit).all()
+
+
+def get_heatmap(
+    db: Session, layer: str, *, precision: int, window: str, prefix: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Counts per geohash cell at the given precision, aggregated in SQL over the
+    stored geohash columns: harvests (and kg) by paddock, or GPS points (and
+    distinct batches) for traffic. prefix limits the map to one enclosing cell.
+    """
+    def compute() -> List[Dict[str, Any]]:
+        if layer == "harvests":
+            geohash_column, time_column = Paddock.geohash, Harvest.harvest_date
+            cell = func.substr(geohash_column, 1, precision).label("cell")
+            query = (
+                select(cell, func.count(Harvest.id).label("count"), func.sum(Harvest.quantity_kg).label("quantity_kg"))
+                .join(Paddock, Harvest.paddock_id == Paddock.paddock_id)
+            )
+        else:
+            geohash_column, time_column = LocationTracking.geohash, LocationTracking.timestamp
+            cell = func.substr(geohash_column, 1, precision).label("cell")
+            query = select(
+                cell, func.count().label("count"), func.count(func.distinct(LocationTracking.batch_id)).label("batches")
+            )
+        query = query.where(geohash_column.isnot(None))
+        if HEATMAP_WINDOWS[window] is not None:
+            query = query.where(time_column >= datetime.utcnow() - HEATMAP_WINDOWS[window])
+        if prefix:
+            query = query.where(geohash_column >= prefix, geohash_column < geohash.prefix_upper_bound(prefix))
+
+        cells = []
+        for row in db.execute(query.group_by(cell).order_by(cell)).mappings():
+            min_lat, min_lng, max_lat, max_lng = geohash.bounds(row["cell"])
+            cells.append({**row, "latitude": (min_lat + max_lat) / 2, "longitude": (min_lng + max_lng) / 2})
+        return cells
+
+    return heatmap_cache.get_or_set((layer, precision, window, prefix), compute)
+
+
+@event.listens_for(Session, "after_flush")
+def track_cluster_changes(session: Session, flush_context: Any) -> None:
+    """Note the layers a flush touched; their snapshots are dropped only once it commits"""
+    layers = {CLUSTERED_MODELS.get(type(obj)) for obj in (*session.new, *session.dirty, *session.deleted)} - {None}
+    if layers:
+        session.info.setdefault("cluster_layers_changed", set()).update(layers)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_cluster_indexes(session: Session) -> None:
+    for layer in session.info.pop("cluster_layers_changed", ()):
+        cluster_cache.invalidate((layer, None))
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_cluster_changes(session: Session) -> None:
+    session.info.pop("cluster_layers_changed", None)
+
+
+def get_clusters(
+    db: Session, layer: str, *, zoom: int, bbox: Optional[BBox] = None, window: str = "24h"
+) -> List[Dict[str, Any]]:
+    """
+    Clusters of a layer's located rows at a zoom level, inside bbox. The
+    tracking layer covers the GPS points of the time window; "all" reads the
+    whole table on every rebuild, so it has to be asked for.
+    """
+    key_column, label_column, latitude_column, longitude_column, time_column = CLUSTER_LAYERS[layer]
+    window = window if time_column is not None else None
+
+    def build() -> ClusterSnapshot:
+        query = select(key_column, label_column, latitude_column, longitude_column).where(
+            latitude_column.isnot(None), longitude_column.isnot(None)
+        )
+        if window is not None and HEATMAP_WINDOWS[window] is not None:
+            query = query.where(time_column >= datetime.utcnow() - HEATMAP_WINDOWS[window])
+        rows = db.execute(query).all()
+        return ClusterSnapshot(
+            ClusterIndex([row[2] for row in rows], [row[3] for row in rows]),
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+        )
+
+    snapshot = cluster_cache.get_or_set((layer, window), build)
+    return [
+        {
+            "latitude": cluster.latitude,
+            "longitude": cluster.longitude,
+            "count": cluster.count,
+            "id": snapshot.ids[cluster.index] if cluster.index is not None else None,
+            "label": snapshot.labels[cluster.index] if cluster.index is not None else None,
+        }
+        for cluster in snapshot.index.clusters(zoom, bbox)
+    ]
+
+
+def get_pending_sample_paddocks(db: Session) -> List[Dict[str, Any]]:
+    """Paddocks with harvests whose samples haven't been collected yet, with a count of them"""
+    rows = db.execute(
+        select(
+            Paddock.paddock_id, Paddock.name, Paddock.latitude, Paddock.longitude,
+            func.count(Harvest.id).label("pending_samples")
+        )
+        .join(Harvest, Harvest.paddock_id == Paddock.paddock_id)
+        .where(Harvest.sample_collected.isnot(True), Paddock.latitude.isnot(None), Paddock.longitude.isnot(None))
+        .group_by(Paddock.paddock_id, Paddock.name, Paddock.latitude, Paddock.longitude)
+        .order_by(Paddock.paddock_id)
+    )
+    return [dict(row) for row in rows.mappings()]
+
+
+def get_dashboard_summary(db: Session, *, recent: int = 5) -> Dict[str, Any]:
+    """Headline counts for the geolocation dashboard"""
+    return {
+        "total_farms": db.query(func.count(Farm.id)).scalar(),
+        "total_paddocks": db.query(func.count(Paddock.id)).scalar(),
+        "total_harvests": db.query(func.count(Harvest.id)).scalar(),
+        "active_geofences": db.query(func.count(Geofence.id)).filter(Geofence.status == "active").scalar(),
+        "recent_harvests": db.query(Harvest).order_by(Harvest.harvest_date.desc()).limit(recent).all(),
+    }
 
 
 # Create CRUD instances
@@ -230,4 +785,5 @@ paddock = CRUDPaddock(Paddock)
 geofence = CRUDGeofence(Geofence)
 harvest = CRUDHarvest(Harvest)
 location_tracking = CRUDLocationTracking(LocationTracking)
+geofence_alert = CRUDGeofenceAlert(GeofenceAlert)
 
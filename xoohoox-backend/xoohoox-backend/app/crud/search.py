@@ -0,0 +1,266 @@
+from typing import List, Optional, Dict, Any, Iterable, Sequence
+import logging
+from sqlalchemy import event, select, delete, insert, and_, text, inspect, null
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.db.tables import has_table
+from app.core.config import settings
+from app.models.enums import SearchEntityType
+from app.models.search import SearchDocument
+from app.models.batch_tracking import BatchTracking
+from app.models.quality_control import QualityControl
+from app.models.transformation import TransformationStage, FermentationResults
+from app.models.evaluation import Evaluation
+from app.models.geolocation import Harvest
+
+logger = logging.getLogger(__name__)
+
+# model -> (entity type, key column, batch column, text columns)
+# A batch column of None means the batch is resolved through the stage
+# (FermentationResults) or is not known (Evaluation samples).
+SEARCH_RULES = {
+    BatchTracking: (SearchEntityType.BATCH, "batch_id", "batch_id", ("name", "issues")),
+    QualityControl: (SearchEntityType.QUALITY_CONTROL, "test_id", "batch_id", ("test_name", "notes", "corrective_actions")),
+    FermentationResults: (SearchEntityType.FERMENTATION_RESULTS, "id", None, ("aroma_notes", "flavor_notes", "notes")),
+    Evaluation: (SearchEntityType.EVALUATION, "id", None, ("comments",)),
+    Harvest: (SearchEntityType.HARVEST, "harvest_id", "batch_id", ("notes",)),
+}
+
+REBUILD_CHUNK_SIZE = 5000
+
+
+def _flatten(value: Any) -> Iterable[str]:
+    """Yield the text leaves of a column value (JSON columns included)"""
+    if value is None:
+        return
+    if isinstance(value, str):
+        if value.strip():
+            yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _flatten(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _flatten(item)
+
+
+def document_content(values: Dict[str, Any], columns: Sequence[str]) -> str:
+    return "\n".join(part for column in columns for part in _flatten(values.get(column)))
+
+
+def _stage_batches(connection: Connection, stage_ids: Iterable[int]) -> Dict[int, str]:
+    """Map transformation stage ids to their batch_tracking.batch_id"""
+    ids = {stage_id for stage_id in stage_ids if stage_id is not None}
+    if not ids:
+        return {}
+    stages, batches = TransformationStage.__table__, BatchTracking.__table__
+    rows = connection.execute(
+        select(stages.c.id, batches.c.batch_id)
+        .join(batches, batches.c.id == stages.c.batch_id)
+        .where(stages.c.id.in_(ids))
+    )
+    return {row.id: row.batch_id for row in rows}
+
+
+def _documents(model: type, records: List[Dict[str, Any]], connection: Connection) -> List[Dict[str, Any]]:
+    entity_type, key_column, batch_column, text_columns = SEARCH_RULES[model]
+    if model is FermentationResults:
+        stage_batches = _stage_batches(connection, (record.get("stage_id") for record in records))
+    documents = []
+    for record in records:
+        content = document_content(record, text_columns)
+        if not content or record.get(key_column) is None:
+            continue
+        if batch_column:
+            batch_id = record.get(batch_column)
+        elif model is FermentationResults:
+            batch_id = stage_batches.get(record.get("stage_id"))
+        else:
+            batch_id = None
+        documents.append({
+            "entity_type": entity_type.value,
+            "entity_key": str(record[key_column]),
+            "batch_id": batch_id,
+            "content": content,
+        })
+    return documents
+
+
+def _columns(model: type) -> List[str]:
+    """Columns needed to build the document of a record"""
+    _, key_column, batch_column, text_columns = SEARCH_RULES[model]
+    columns = [key_column, *text_columns]
+    if batch_column:
+        columns.append(batch_column)
+    elif model is FermentationResults:
+        columns.append("stage_id")
+    return list(dict.fromkeys(columns))
+
+
+def _record(obj: Any) -> Dict[str, Any]:
+    return {column: getattr(obj, column, None) for column in _columns(type(obj))}
+
+
+def _text_modified(obj: Any) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in _columns(type(obj)))
+
+
+def _keys(obj: Any, key_column: str) -> List[str]:
+    """obj's key, and the one it was filed under before the flush if it was renamed"""
+    history = inspect(obj).attrs[key_column].history
+    return [str(key) for key in (*history.deleted, getattr(obj, key_column)) if key is not None]
+
+
+def _remove(connection: Connection, entity_type: SearchEntityType, keys: List[str]) -> None:
+    if keys:
+        table = SearchDocument.__table__
+        connection.execute(
+            delete(table).where(table.c.entity_type == entity_type.value, table.c.entity_key.in_(keys))
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def maintain_search_documents(session: Session, flush_context: Any) -> None:
+    """Keep search_documents in step with every flush of an indexed model"""
+    changed: Dict[type, List[Any]] = {}
+    for obj in session.new:
+        if type(obj) in SEARCH_RULES:
+            changed.setdefault(type(obj), []).append(obj)
+    for obj in session.dirty:
+        if type(obj) in SEARCH_RULES and _text_modified(obj):
+            changed.setdefault(type(obj), []).append(obj)
+    deleted: Dict[type, List[Any]] = {}
+    for obj in session.deleted:
+        if type(obj) in SEARCH_RULES:
+            deleted.setdefault(type(obj), []).append(obj)
+    if not (changed or deleted):
+        return
+
+    connection = session.connection()
+    if not has_table(connection, SearchDocument.__table__):
+        return
+    for model, objs in list(changed.items()) + list(deleted.items()):
+        entity_type, key_column, _, _ = SEARCH_RULES[model]
+        _remove(connection, entity_type, sorted({key for obj in objs for key in _keys(obj, key_column)}))
+    for model, objs in changed.items():
+        documents = _documents(model, [_record(obj) for obj in objs], connection)
+        if documents:
+            connection.execute(insert(SearchDocument.__table__), documents)
+
+
+def _track_old_key(model: type) -> None:
+    # active_history loads the old key when a new one is set on an expired
+    # record, so maintain_search_documents can remove the document under it
+    @event.listens_for(getattr(model, SEARCH_RULES[model][1]), "set", active_history=True)
+    def key_set(target: Any, value: Any, old_value: Any, initiator: Any) -> None:
+        pass
+
+
+for _model in SEARCH_RULES:
+    _track_old_key(_model)
+
+
+def rebuild_index(db: Session) -> int:
+    """Rebuild search_documents from the source tables"""
+    connection = db.connection()
+    connection.execute(delete(SearchDocument.__table__))
+
+    total = 0
+    for model in SEARCH_RULES:
+        table = model.__table__
+        result = connection.execution_options(yield_per=REBUILD_CHUNK_SIZE).execute(
+            select(*[table.c[column] for column in _columns(model)])
+        )
+        for chunk in result.partitions():
+            documents = _documents(model, [dict(row._mapping) for row in chunk], connection)
+            if documents:
+                connection.execute(insert(SearchDocument.__table__), documents)
+                total += len(documents)
+
+    db.commit()
+    logger.info(f"Rebuilt search index with {total} documents")
+    return total
+
+
+def _fts5_query(query: str) -> str:
+    """Quote each term so user input can't inject FTS5 syntax; terms are ANDed"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def search(
+    db: Session,
+    *,
+    query: str,
+    entity_types: Optional[Sequence[SearchEntityType]] = None,
+    limit: int = 50
+) -> List[Dict[str, Any]]:
+    """
+    Ranked full-text search; higher rank is a better match. Only the newest
+    SEARCH_RANK_CANDIDATES matches are ranked: scoring every document a
+    common term matches costs far more than the search itself.
+    """
+    if not query.split():
+        return []
+    types = [entity_type.value for entity_type in entity_types or []]
+    params: Dict[str, Any] = {"limit": limit, "candidates": settings.SEARCH_RANK_CANDIDATES}
+    type_filter = ""
+    if types:
+        type_filter = "AND d.entity_type IN (" + ", ".join(f":type_{i}" for i in range(len(types))) + ")"
+        params.update({f"type_{i}": value for i, value in enumerate(types)})
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        params["query"] = query
+        sql = f"""
+            WITH candidates AS (
+                SELECT d.id
+                FROM search_documents d, websearch_to_tsquery('english', :query) q
+                WHERE d.search_vector @@ q {type_filter}
+                ORDER BY d.id DESC
+                LIMIT :candidates
+            )
+            SELECT d.entity_type, d.entity_key, d.batch_id,
+                   ts_rank_cd(d.search_vector, q) AS rank,
+                   ts_headline('english', d.content, q, 'MaxFragments=1, MaxWords=20, MinWords=5') AS snippet
+            FROM candidates c
+            JOIN search_documents d ON d.id = c.id, websearch_to_tsquery('english', :query) q
+            ORDER BY rank DESC
+            LIMIT :limit
+        """
+    elif dialect == "sqlite":
+        params["query"] = _fts5_query(query)
+        # bm25() can only be computed in the MATCH query itself, so the candidates are
+        # bounded by a rowid range, which FTS5 applies while reading the doclists
+        sql = f"""
+            SELECT d.entity_type, d.entity_key, d.batch_id,
+                   -bm25(search_documents_fts) AS rank,
+                   snippet(search_documents_fts, 0, '[', ']', '...', 12) AS snippet
+            FROM search_documents_fts
+            JOIN search_documents d ON d.id = search_documents_fts.rowid
+            WHERE search_documents_fts MATCH :query {type_filter}
+              AND search_documents_fts.rowid >= (
+                  SELECT coalesce(min(rowid), 0) FROM (
+                      SELECT search_documents_fts.rowid
+                      FROM search_documents_fts
+                      {"JOIN search_documents d ON d.id = search_documents_fts.rowid" if types else ""}
+                      WHERE search_documents_fts MATCH :query {type_filter}
+                      ORDER BY search_documents_fts.rowid DESC
+                      LIMIT :candidates
+                  )
+              )
+            ORDER BY bm25(search_documents_fts)
+            LIMIT :limit
+        """
+    else:
+        # No full-text index available: unranked substring scan
+        table = SearchDocument.__table__
+        stmt = select(
+            table.c.entity_type, table.c.entity_key, table.c.batch_id, null().label("rank"), table.c.content.label("snippet")
+        ).where(and_(*[table.c.content.ilike(f"%{term}%") for term in query.split()])).limit(limit)
+        if types:
+            stmt = stmt.where(table.c.entity_type.in_(types))
+        return [dict(row._mapping) for row in db.execute(stmt)]
+
+    return [dict(row._mapping) for row in db.execute(text(sql), params)]
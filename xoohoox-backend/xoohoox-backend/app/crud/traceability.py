@@ -0,0 +1,250 @@
+from typing import List, Optional, Dict, Any, Tuple
+import logging
+from sqlalchemy import event, select, delete, insert, and_, or_, literal, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.enums import TraceNodeType
+from app.db.bulk import insert_ignoring_conflicts
+from app.db.tables import has_table
+from app.models.traceability import TraceLink
+from app.models.geolocation import Paddock, Harvest, LocationTracking
+from app.models.fermentation_trial import FermentationTrial
+from app.models.upscale import UpscaleRun
+from app.models.quality_control import QualityControl
+
+logger = logging.getLogger(__name__)
+
+# model -> (node type, key column, [(parent type, parent key column)], [(child type, child key column)])
+# Links are derived purely from a record's own columns, so they can be
+# maintained at flush time without loading anything else.
+TRACE_RULES = {
+    Paddock: (TraceNodeType.PADDOCK, "paddock_id", [(TraceNodeType.FARM, "farm_id")], []),
+    Harvest: (TraceNodeType.HARVEST, "harvest_id", [(TraceNodeType.PADDOCK, "paddock_id")], [(TraceNodeType.BATCH, "batch_id")]),
+    LocationTracking: (TraceNodeType.LOCATION_TRACKING, "tracking_id", [(TraceNodeType.HARVEST, "harvest_id")], []),
+    FermentationTrial: (TraceNodeType.TRIAL, "id", [(TraceNodeType.BATCH, "batch_id")], []),
+    UpscaleRun: (TraceNodeType.UPSCALE, "upscale_id", [(TraceNodeType.TRIAL, "trial_id")], []),
+    QualityControl: (TraceNodeType.QUALITY_CONTROL, "test_id", [(TraceNodeType.BATCH, "batch_id")], []),
+}
+
+REBUILD_CHUNK_SIZE = 5000
+
+
+def _link(parent_type: TraceNodeType, parent_key: Any, child_type: TraceNodeType, child_key: Any) -> Optional[Dict[str, str]]:
+    if parent_key is None or child_key is None:
+        return None
+    return {
+        "parent_type": parent_type.value,
+        "parent_key": str(parent_key),
+        "child_type": child_type.value,
+        "child_key": str(child_key),
+    }
+
+
+def links_for_values(model: type, values: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Build the trace links for a record given its column values"""
+    node_type, key_attr, parents, children = TRACE_RULES[model]
+    key = values.get(key_attr)
+    links = [_link(parent_type, values.get(attr), node_type, key) for parent_type, attr in parents]
+    links += [_link(node_type, key, child_type, values.get(attr)) for child_type, attr in children]
+    return [link for link in links if link]
+
+
+def links_for(obj: Any) -> List[Dict[str, str]]:
+    """Build the trace links for a mapped object"""
+    model = type(obj)
+    _, key_attr, parents, children = TRACE_RULES[model]
+    attrs = [key_attr] + [attr for _, attr in parents] + [attr for _, attr in children]
+    return links_for_values(model, {attr: getattr(obj, attr, None) for attr in attrs})
+
+
+def _keys_modified(obj: Any) -> bool:
+    _, key_attr, parents, children = TRACE_RULES[type(obj)]
+    state = inspect(obj)
+    attrs = [key_attr] + [attr for _, attr in parents] + [attr for _, attr in children]
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+def _insert_links(connection: Connection, rows: List[Dict[str, str]]) -> None:
+    """Insert links, skipping edges that already exist"""
+    if not rows:
+        return
+    table = TraceLink.__table__
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        stmt = pg_insert(table).on_conflict_do_nothing(constraint="uq_trace_links_edge")
+    elif connection.dialect.name == "sqlite":
+        stmt = insert(table).prefix_with("OR IGNORE")
+    else:
+        stmt = insert(table)
+    connection.execute(stmt, rows)
+
+
+def index_rows(connection: Connection, model: type, rows: List[Dict[str, Any]]) -> None:
+    """Insert the trace links of rows written outside the ORM, which bypasses the flush listener"""
+    if not has_table(connection, TraceLink.__table__):
+        return
+    insert_ignoring_conflicts(
+        connection,
+        TraceLink.__table__,
+        [link for row in rows for link in links_for_values(model, row)],
+        ["parent_type", "parent_key", "child_type", "child_key"],
+    )
+
+
+def unindex_keys(connection: Connection, model: type, keys: List[Any]) -> None:
+    """Remove the links of rows deleted outside the ORM"""
+    if not keys:
+        return
+    node_type = TRACE_RULES[model][0]
+    keys = [str(key) for key in keys]
+    table = TraceLink.__table__
+    connection.execute(
+        delete(table).where(
+            or_(
+                and_(table.c.parent_type == node_type.value, table.c.parent_key.in_(keys)),
+                and_(table.c.child_type == node_type.value, table.c.child_key.in_(keys)),
+            )
+        )
+    )
+
+
+def _unlink(connection: Connection, obj: Any) -> None:
+    """
+    Remove the links obj's own columns produced, under its key before the
+    flush: its parent edges and the child edges it names (e.g. harvest ->
+    batch). Edges that other records own, such as a harvest's location
+    points, stay: they come from those records' columns.
+    """
+    node_type, key_attr, parents, children = TRACE_RULES[type(obj)]
+    history = inspect(obj).attrs[key_attr].history
+    keys = {str(key) for key in (*history.deleted, getattr(obj, key_attr, None)) if key is not None}
+    if not keys:
+        return
+    table = TraceLink.__table__
+    connection.execute(
+        delete(table).where(
+            or_(
+                and_(
+                    table.c.child_type == node_type.value, table.c.child_key.in_(keys),
+                    table.c.parent_type.in_([parent_type.value for parent_type, _ in parents]),
+                ),
+                and_(
+                    table.c.parent_type == node_type.value, table.c.parent_key.in_(keys),
+                    table.c.child_type.in_([child_type.value for child_type, _ in children]),
+                ),
+            )
+        )
+    )
+
+
+def _track_old_key(model: type) -> None:
+    # active_history loads the old key when a new one is set on an expired
+    # record, so _unlink can find the links filed under it
+    @event.listens_for(getattr(model, TRACE_RULES[model][1]), "set", active_history=True)
+    def key_set(target: Any, value: Any, old_value: Any, initiator: Any) -> None:
+        pass
+
+
+for _model in TRACE_RULES:
+    _track_old_key(_model)
+
+
+@event.listens_for(Session, "after_flush")
+def maintain_trace_links(session: Session, flush_context: Any) -> None:
+    """Keep trace_links in step with every flush of a traced model"""
+    new = [obj for obj in session.new if type(obj) in TRACE_RULES]
+    dirty = [obj for obj in session.dirty if type(obj) in TRACE_RULES and _keys_modified(obj)]
+    deleted = [obj for obj in session.deleted if type(obj) in TRACE_RULES]
+    if not (new or dirty or deleted):
+        return
+
+    connection = session.connection()
+    if not has_table(connection, TraceLink.__table__):
+        return
+    for obj in dirty + deleted:
+        _unlink(connection, obj)
+    _insert_links(connection, [link for obj in new + dirty for link in links_for(obj)])
+
+
+def rebuild_index(db: Session) -> int:
+    """Rebuild trace_links from the source tables (backfill / repair)"""
+    connection = db.connection()
+    connection.execute(delete(TraceLink.__table__))
+
+    total = 0
+    for model, (_, key_attr, parents, children) in TRACE_RULES.items():
+        table = model.__table__
+        attrs = [key_attr] + [attr for _, attr in parents] + [attr for _, attr in children]
+        result = connection.execution_options(yield_per=REBUILD_CHUNK_SIZE).execute(
+            select(*[table.c[attr] for attr in attrs])
+        )
+        for chunk in result.partitions():
+            rows = [link for row in chunk for link in links_for_values(model, dict(row._mapping))]
+            _insert_links(connection, rows)
+            total += len(rows)
+
+    db.commit()
+    logger.info(f"Rebuilt traceability index with {total} links")
+    return total
+
+
+def trace(
+    db: Session,
+    *,
+    node_type: TraceNodeType,
+    node_key: str,
+    direction: str = "forward",
+    max_depth: int = 10
+) -> Dict[str, Any]:
+    """Walk the traceability graph from a node.
+
+    forward follows parent -> child links (recall: everything derived from the
+    node); backward follows child -> parent links (provenance).
+    """
+    links = TraceLink.__table__
+    step = links.alias("step")
+    if direction == "forward":
+        def source(t): return t.c.parent_type, t.c.parent_key
+        def target(t): return t.c.child_type, t.c.child_key
+    else:
+        def source(t): return t.c.child_type, t.c.child_key
+        def target(t): return t.c.parent_type, t.c.parent_key
+
+    seed_type, seed_key = source(links)
+    walk = (
+        select(links.c.parent_type, links.c.parent_key, links.c.child_type, links.c.child_key, literal(1).label("depth"))
+        .where(seed_type == node_type.value, seed_key == node_key)
+        .cte("trace_walk", recursive=True)
+    )
+    walk_type, walk_key = target(walk)
+    step_type, step_key = source(step)
+    walk = walk.union(
+        select(step.c.parent_type, step.c.parent_key, step.c.child_type, step.c.child_key, walk.c.depth + 1)
+        .where(step_type == walk_type, step_key == walk_key, walk.c.depth < max_depth)
+    )
+
+    nodes: Dict[Tuple[str, str], int] = {}
+    edges = set()
+    for row in db.execute(select(walk)).all():
+        edges.add((row.parent_type, row.parent_key, row.child_type, row.child_key))
+        reached = (row.child_type, row.child_key) if direction == "forward" else (row.parent_type, row.parent_key)
+        nodes[reached] = min(row.depth, nodes.get(reached, row.depth))
+
+    counts: Dict[str, int] = {}
+    for reached_type, _ in nodes:
+        counts[reached_type] = counts.get(reached_type, 0) + 1
+
+    return {
+        "root": {"type": node_type.value, "key": node_key, "depth": 0},
+        "direction": direction,
+        "nodes": [
+            {"type": t, "key": k, "depth": depth}
+            for (t, k), depth in sorted(nodes.items(), key=lambda item: (item[1], item[0]))
+        ],
+        "edges": [
+            {"parent_type": pt, "parent_key": pk, "child_type": ct, "child_key": ck}
+            for pt, pk, ct, ck in sorted(edges)
+        ],
+        "counts": counts,
+    }
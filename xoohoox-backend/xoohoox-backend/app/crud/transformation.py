@@ -1,7 +1,9 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Sequence
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import select
 
+from app.crud.base import load_only_fields
+
 from app.models.transformation import (
     TransformationStage,
     JuicingResults,
@@ -16,6 +18,19 @@ from app.schemas.transformation import (
     FermentationResultsUpdate
 )
 
+# Per-stage result relationships, eager loaded together wherever a stage is
+# returned with its results
+STAGE_RESULT_RELATIONSHIPS = (
+    TransformationStage.juicing_results,
+    TransformationStage.chemistry_results,
+    TransformationStage.heat_activation_results,
+    TransformationStage.fermentation_results,
+    TransformationStage.vinegar_results,
+    TransformationStage.distillation_results,
+    TransformationStage.stage2_results,
+    TransformationStage.fruit_performance,
+)
+
 # Transformation Stage CRUD operations
 def create_transformation_stage(
     db: Session,
@@ -39,9 +54,10 @@ def get_transformation_stages(
     db: Session,
     batch_id: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None
 ) -> List[TransformationStage]:
-    query = db.query(TransformationStage)
+    query = db.query(TransformationStage).options(*load_only_fields(TransformationStage, fields))
     if batch_id:
         query = query.filter(TransformationStage.batch_id == batch_id)
     return query.offset(skip).limit(limit).all()
@@ -167,6 +183,6 @@ def get_transformation_stage_with_results(
     return db.query(TransformationStage).filter(
         TransformationStage.id == stage_id
     ).options(
-        db.joinedload(TransformationStage.juicing_results),
-        db.joinedload(TransformationStage.fermentation_results)
-    ).first() 
\ No newline at end of file
+        *[selectinload(relationship) for relationship in STAGE_RESULT_RELATIONSHIPS],
+        selectinload(TransformationStage.upscale_stages)
+    ).first()
@@ -18,4 +18,10 @@ from app.models.transformation import TransformationStage, JuicingResults, Ferme
 from app.models.juicing_input_log import JuicingInputLog
 from app.models.inventory_management import InventoryManagement
 from app.models.quality_control import QualityControl
-from app.models.fermentation_trial import FermentationTrial 
\ No newline at end of file
+from app.models.fermentation_trial import FermentationTrial 
+from app.models.traceability import TraceLink
+from app.models.search import SearchDocument
+from app.models.job import Job
+from app.models.webhook import WebhookEndpoint, WebhookDelivery
+from app.models.sync import SyncTombstone
+from app.models.replication import ReplicationLogEntry
@@ -0,0 +1,72 @@
+"""
+Driver-level bulk inserts for high-volume append paths (GPS ingest).
+
+SQLAlchemy's executemany builds a parameter dict per row, which dominates the
+cost at tens of thousands of rows per second. These helpers turn the rows into
+tuples once, apply the column types' bind processors, and hand them to the
+driver directly: psycopg2's execute_values on PostgreSQL, and a plain
+executemany on SQLite. Rows whose conflict columns already exist are skipped.
+"""
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import Table, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+PAGE_SIZE = 1000
+
+
+def insert_ignoring_conflicts(
+    connection: Connection, table: Table, rows: List[Dict[str, Any]], conflict_columns: Sequence[str]
+) -> None:
+    """
+    Insert rows (dicts with the same keys, named after columns), skipping rows
+    that hit a unique conflict on conflict_columns (any conflict when empty)
+    """
+    if not rows:
+        return
+    dialect = connection.dialect
+    if dialect.name not in ("postgresql", "sqlite"):
+        connection.execute(insert(table), rows)
+        return
+
+    # Python-side column defaults (e.g. created_at) are evaluated once per call
+    fixed = {}
+    for column in table.columns:
+        if column.name not in rows[0] and column.default is not None:
+            if column.default.is_scalar:
+                fixed[column.name] = column.default.arg
+            elif column.default.is_callable:
+                fixed[column.name] = column.default.arg(None)
+    columns = [column for column in table.columns if column.name in rows[0] or column.name in fixed]
+    names = [column.name for column in columns]
+    processors = [column.type.dialect_impl(dialect).bind_processor(dialect) for column in columns]
+    # Built column by column so each bind processor runs in one tight loop
+    column_values = []
+    for name, processor in zip(names, processors):
+        values = [row[name] for row in rows] if name in rows[0] else [fixed[name]] * len(rows)
+        if processor is not None:
+            values = [processor(value) if value is not None else None for value in values]
+        column_values.append(values)
+    values = list(zip(*column_values))
+
+    column_list = ", ".join(dialect.identifier_preparer.quote(name) for name in names)
+    table_name = dialect.identifier_preparer.format_table(table)
+    cursor = connection.connection.cursor()
+    statement = None
+    try:
+        if dialect.name == "postgresql":
+            from psycopg2.extras import execute_values
+            conflict = ", ".join(dialect.identifier_preparer.quote(name) for name in conflict_columns)
+            target = f"({conflict}) " if conflict else ""
+            statement = f"INSERT INTO {table_name} ({column_list}) VALUES %s ON CONFLICT {target}DO NOTHING"
+            execute_values(cursor, statement, values, page_size=PAGE_SIZE)
+        else:
+            placeholders = ", ".join("?" for _ in names)
+            statement = f"INSERT OR IGNORE INTO {table_name} ({column_list}) VALUES ({placeholders})"
+            cursor.executemany(statement, values)
+    except dialect.dbapi.Error as e:
+        # The same exception classes (IntegrityError, OperationalError, ...) as statements SQLAlchemy executes
+        raise DBAPIError.instance(statement, None, e, dialect.dbapi.Error, dialect=dialect) from e
+    finally:
+        cursor.close()
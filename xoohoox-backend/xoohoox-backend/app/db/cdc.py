@@ -0,0 +1,310 @@
+"""
+Change data capture: every committed ORM write as a typed Change, for cache
+invalidation and downstream consumers.
+
+after_flush records a Change per inserted, updated (with the columns that
+changed) and deleted row; after_commit hands the transaction's changes to
+the registered consumers and after_rollback drops them. Consumers therefore
+see committed writes only, wherever they were made: CRUDBase, the
+function-style crud modules, scripts.
+
+Each consumer has a bounded queue and a worker thread, and is called with
+lists of changes in commit order. When its queue is full a consumer either
+drops changes (overflow="drop") or makes the committing thread wait up to
+block_seconds for room (overflow="block", backpressure on writers). Drops
+and waits are counted in stats().
+
+With CDC_PG_NOTIFY on PostgreSQL, the changes are also sent with pg_notify
+inside the writing transaction (so only once it commits), and listen() feeds
+those of other processes to this process's consumers, e.g. to invalidate
+every worker's caches.
+
+Core statements, such as the GPS ingest bulk inserts, bypass the ORM and
+aren't captured; their writers can add changes with record().
+"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+NOTIFY_PAYLOAD_BYTES = 7000  # PostgreSQL's limit is 8000
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"  # tells this process's notifications from others'
+
+
+class Change(NamedTuple):
+    entity: str  # table name
+    operation: str  # insert, update or delete
+    id: Any  # primary key value; a tuple for composite keys
+    columns: Tuple[str, ...]  # the changed columns; every column for inserts and deletes
+
+
+class Consumer:
+    def __init__(
+        self,
+        name: str,
+        callback: Callable[[List[Change]], None],
+        *,
+        entities: Optional[Iterable[str]] = None,
+        queue_size: int = 10000,
+        overflow: str = "drop",
+        block_seconds: float = 1.0,
+        batch_size: int = 500,
+    ):
+        if overflow not in ("drop", "block"):
+            raise ValueError("overflow must be 'drop' or 'block'")
+        self.name = name
+        self.callback = callback
+        self.entities: Optional[Set[str]] = set(entities) if entities is not None else None
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self.batch_size = batch_size
+        self.queue: "queue.Queue[Change]" = queue.Queue(maxsize=queue_size)
+        self._counters = dict.fromkeys(("received", "delivered", "dropped", "blocked", "batches", "errors"), 0)
+        self._blocked_seconds = 0.0
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f"cdc-{name}", daemon=True)
+        self._thread.start()
+
+    def offer(self, changes: List[Change]) -> None:
+        changes = [change for change in changes if self.entities is None or change.entity in self.entities]
+        dropped = blocked = 0
+        waited = 0.0
+        for change in changes:
+            try:
+                self.queue.put_nowait(change)
+                continue
+            except queue.Full:
+                if self.overflow == "drop":
+                    dropped += 1
+                    continue
+            blocked += 1
+            started = time.perf_counter()
+            try:
+                self.queue.put(change, timeout=self.block_seconds)
+            except queue.Full:
+                dropped += 1
+            waited += time.perf_counter() - started
+        with self._lock:
+            self._counters["received"] += len(changes)
+            self._counters["dropped"] += dropped
+            self._counters["blocked"] += blocked
+            self._blocked_seconds += waited
+        if dropped:
+            logger.warning(f"CDC consumer {self.name} is behind; dropped {dropped} changes")
+
+    def _run(self) -> None:
+        while not self._stopping:
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.callback(batch)
+                with self._lock:
+                    self._counters["delivered"] += len(batch)
+                    self._counters["batches"] += 1
+            except Exception:
+                logger.exception(f"CDC consumer {self.name} failed on {len(batch)} changes")
+                with self._lock:
+                    self._counters["errors"] += len(batch)
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued change has been handed to the callback"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                done = self._counters["delivered"] + self._counters["dropped"] + self._counters["errors"] >= self._counters["received"]
+            if done and self.queue.empty():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "queued": self.queue.qsize(),
+                "capacity": self.queue.maxsize,
+                "blocked_seconds": round(self._blocked_seconds, 3),
+            }
+
+
+_consumers: Dict[str, Consumer] = {}
+_consumers_lock = threading.Lock()
+
+
+def register(name: str, callback: Callable[[List[Change]], None], **options: Any) -> Consumer:
+    """
+    Call callback with lists of committed changes, on a thread of its own.
+    Options: entities (table names, default all), queue_size, overflow
+    ("drop" or "block"), block_seconds, batch_size.
+    """
+    options.setdefault("queue_size", settings.CDC_QUEUE_SIZE)
+    consumer = Consumer(name, callback, **options)
+    with _consumers_lock:
+        previous = _consumers.pop(name, None)
+        _consumers[name] = consumer
+    if previous is not None:
+        previous.stop()
+    return consumer
+
+
+def unregister(name: str) -> None:
+    with _consumers_lock:
+        consumer = _consumers.pop(name, None)
+    if consumer is not None:
+        consumer.stop()
+
+
+def dispatch(changes: List[Change]) -> None:
+    for consumer in list(_consumers.values()):
+        consumer.offer(changes)
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: consumer.stats() for name, consumer in list(_consumers.items())}
+
+
+def record(session: Session, changes: Iterable[Change]) -> None:
+    """Add changes made outside the ORM; dispatched with the session's next commit"""
+    session.info.setdefault("cdc_changes", []).extend(changes)
+
+
+def _changes(session: Session) -> List[Change]:
+    changes = []
+    for operation, objs in ((INSERT, session.new), (UPDATE, session.dirty), (DELETE, session.deleted)):
+        for obj in objs:
+            state = inspect(obj)
+            mapper = state.mapper
+            if operation == UPDATE:
+                columns = tuple(
+                    attr.columns[0].name for attr in mapper.column_attrs if state.attrs[attr.key].history.has_changes()
+                )
+                if not columns:
+                    continue
+            else:
+                columns = tuple(attr.columns[0].name for attr in mapper.column_attrs)
+            key = mapper.primary_key_from_instance(obj)
+            changes.append(Change(mapper.local_table.name, operation, key[0] if len(key) == 1 else tuple(key), columns))
+    return changes
+
+
+def _notify(session: Session, changes: List[Change]) -> None:
+    """pg_notify the changes from the writing transaction, split to fit the payload limit"""
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        return
+    rows = [json.dumps(list(change), default=str) for change in changes]
+    chunk: List[str] = []
+    size = 0
+    for row in rows + [None]:
+        if row is None or (chunk and size + len(row) > NOTIFY_PAYLOAD_BYTES):
+            payload = f'{{"origin": "{ORIGIN}", "changes": [{",".join(chunk)}]}}'
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": settings.CDC_PG_CHANNEL, "payload": payload})
+            chunk, size = [], 0
+        if row is not None:
+            chunk.append(row)
+            size += len(row) + 1
+
+
+@event.listens_for(Session, "after_flush")
+def capture_changes(session: Session, flush_context: Any) -> None:
+    if not (_consumers or settings.CDC_PG_NOTIFY):
+        return
+    changes = _changes(session)
+    if changes:
+        session.info.setdefault("cdc_changes", []).extend(changes)
+        if settings.CDC_PG_NOTIFY:
+            _notify(session, changes)
+
+
+@event.listens_for(Session, "after_commit")
+def dispatch_changes(session: Session) -> None:
+    changes = session.info.pop("cdc_changes", None)
+    if changes:
+        dispatch(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_changes(session: Session) -> None:
+    session.info.pop("cdc_changes", None)
+
+
+class Listener:
+    """Dispatches the changes other processes pg_notify to this process's consumers"""
+
+    def __init__(self, dsn: str, channel: str, poll_seconds: float = 5.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.poll_seconds = poll_seconds
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="cdc-listen", daemon=True)
+
+    def start(self) -> "Listener":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        import psycopg2
+
+        while not self._stopping:
+            connection = None
+            try:
+                connection = psycopg2.connect(self.dsn)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                while not self._stopping:
+                    if select.select([connection], [], [], self.poll_seconds) == ([], [], []):
+                        continue
+                    connection.poll()
+                    changes = []
+                    while connection.notifies:
+                        message = json.loads(connection.notifies.pop(0).payload)
+                        if message["origin"] != ORIGIN:
+                            changes.extend(
+                                Change(entity, operation, tuple(key) if isinstance(key, list) else key, tuple(columns))
+                                for entity, operation, key, columns in message["changes"]
+                            )
+                    if changes:
+                        dispatch(changes)
+            except Exception:
+                logger.exception("CDC listener lost its connection; reconnecting")
+                time.sleep(1)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def stop(self) -> None:
+        self._stopping = True
+
+
+def listen(dsn: Optional[str] = None) -> Listener:
+    """Start feeding other processes' notified changes to this process's consumers"""
+    return Listener(dsn or settings.SQLALCHEMY_DATABASE_URI, settings.CDC_PG_CHANNEL).start()
@@ -3,6 +3,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.edge import sqlite_engine
 from app.models.base import Base
 
 # Configure logging
@@ -14,11 +15,8 @@ SQLALCHEMY_DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
 # Create database engine
 try:
     if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-        # SQLite configuration
-        engine = create_engine(
-            SQLALCHEMY_DATABASE_URL,
-            connect_args={"check_same_thread": False}
-        )
+        # SQLite configuration: the edge profile (WAL, tuned pragmas, small pool)
+        engine = sqlite_engine(SQLALCHEMY_DATABASE_URL)
     else:
         # PostgreSQL configuration
         engine = create_engine(
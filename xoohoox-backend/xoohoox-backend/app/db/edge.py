@@ -0,0 +1,90 @@
+"""
+Edge deployment profile: the backend on a small box at a remote farm, with
+an SQLite file as its database and replication.py shipping its writes to the
+central PostgreSQL.
+
+sqlite_engine() tunes each connection for that box:
+
+* journal_mode=WAL: readers don't block the writer nor it them, and a
+  commit appends to the WAL instead of rewriting pages in place;
+* synchronous (EDGE_SQLITE_SYNCHRONOUS, NORMAL by default): with WAL, a
+  commit is durable against a crash of the process, and a power cut can only
+  lose the last commits, never corrupt the file. The replication log is in
+  the same file, so what is lost is lost consistently;
+* cache_size and mmap_size: page cache per connection, and reads served
+  from the memory-mapped file rather than copied through it;
+* busy_timeout: a second writer waits for the lock instead of failing with
+  "database is locked";
+* journal_size_limit: the WAL is truncated back after checkpoints, so it
+  doesn't keep the space of its largest burst on a small disk.
+
+SQLite has one writer at a time, so the pool is kept small
+(EDGE_SQLITE_POOL_SIZE, no overflow): more connections only add lock waits,
+while requests waiting for a pooled connection queue fairly. The driver's
+transaction handling is left as is: it begins a transaction at the first
+write, so a request that reads before it writes doesn't hold a read snapshot
+that SQLite would refuse to upgrade to a write once another writer commits.
+
+In-memory databases (tests) get the same pragmas but no WAL or memory map,
+which they can't use.
+"""
+from typing import Any, List
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+
+def pragmas(in_memory: bool = False) -> List[str]:
+    """PRAGMA statements run on every new connection"""
+    synchronous = settings.EDGE_SQLITE_SYNCHRONOUS.upper()
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"EDGE_SQLITE_SYNCHRONOUS must be one of {', '.join(SYNCHRONOUS_LEVELS)}")
+    statements = [
+        f"synchronous={synchronous}",
+        f"cache_size=-{settings.EDGE_SQLITE_CACHE_SIZE_KB}",  # negative: in KiB rather than pages
+        f"busy_timeout={settings.EDGE_SQLITE_BUSY_TIMEOUT_MS}",
+        "temp_store=MEMORY",
+    ]
+    if not in_memory:
+        statements = [
+            "journal_mode=WAL",
+            *statements,
+            f"mmap_size={settings.EDGE_SQLITE_MMAP_SIZE_BYTES}",
+            f"journal_size_limit={JOURNAL_SIZE_LIMIT}",
+        ]
+    return statements
+
+
+def _in_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or database.startswith("file::memory:")
+
+
+def sqlite_engine(url: str, **options: Any) -> Engine:
+    """Engine for an SQLite database with the edge profile's pragmas and pooling"""
+    in_memory = _in_memory(url)
+    options.setdefault("connect_args", {"check_same_thread": False})
+    if in_memory:
+        options.setdefault("poolclass", StaticPool)
+    else:
+        options.setdefault("pool_size", settings.EDGE_SQLITE_POOL_SIZE)
+        options.setdefault("max_overflow", 0)
+    engine = create_engine(url, **options)
+    statements = pragmas(in_memory)
+
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(f"PRAGMA {statement}")
+        finally:
+            cursor.close()
+
+    return engine
@@ -0,0 +1,357 @@
+"""
+Replication of an edge box's writes to the central PostgreSQL.
+
+On the edge (EDGE_CENTRAL_DATABASE_URI set), every write to a replicated
+table is logged in replication_log in the writing transaction itself: an
+after_flush listener logs ORM writes, and log_rows() the Core bulk inserts
+of GPS ingest. The log commits or rolls back with the write, and survives
+restarts and weeks without a link, which the in-memory CDC consumers
+(app/db/cdc.py) don't.
+
+A Replicator ships the log in seq order, EDGE_REPLICATION_BATCH_SIZE entries
+per central transaction, and deletes what central has committed:
+
+* rows are matched on their natural key (farm_id, batch_id, test_id, ...),
+  not their id, as integer ids are assigned separately on each side; central
+  assigns its own. References to users go by email, and an entry naming a
+  user central doesn't have is parked. Writes go through central's ORM, so its flush listeners
+  (traceability links, search index, webhooks, sync tombstones) see them,
+  and updated_at is stamped by central, so tablets syncing from central get
+  rows that arrive late;
+* GPS points are append-only and arrive by the thousand: those central
+  doesn't have are written with one bulk insert;
+* a batch is applied once or not at all, and shipping it again after a
+  crash between the two commits is harmless: upserts of the same values and
+  deletes of missing rows change nothing;
+* an entry central rejects (a constraint or a value it won't take) is
+  parked as failed, with the error, rather than stop everything behind it;
+  retry_failed() queues them again once fixed. Connection errors stop the
+  batch, and the replicator retries with backoff.
+
+Edge and central writing the same record is resolved by arrival: an edge
+write shipped later overwrites central's.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import String, delete, event, func, insert, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import traceability
+from app.db.bulk import insert_ignoring_conflicts
+from app.db.tables import has_table
+from app.models.batch_tracking import BatchTracking
+from app.models.fermentation_trial import FermentationTrial
+from app.models.geolocation import Farm, Harvest, LocationTracking, Paddock
+from app.models.quality_control import QualityControl
+from app.models.replication import ReplicationLogEntry
+from app.models.user import User
+from app.services.sync import from_json, json_value
+
+logger = logging.getLogger(__name__)
+
+UPSERT = "upsert"
+DELETE = "delete"
+REPLICATING = "replicating"  # session.info flag of the replicator's central sessions: not logged again
+
+PARKED_ERRORS = (IntegrityError, DataError, ValueError, LookupError)
+
+
+class Replicated(NamedTuple):
+    model: Any
+    key: str  # natural key, the same on edge and central
+    bulk: bool = False  # append-only: new rows are shipped with one bulk insert
+    local: Tuple[str, ...] = ()  # integer references to tables that aren't replicated: not shipped
+    # Integer references to tables that aren't replicated but exist on both sides, such as users:
+    # (column, model, natural key), shipped as the referenced row's natural key
+    references: Tuple[Tuple[str, Any, str], ...] = ()
+
+
+# Parents before children
+REPLICATED: Tuple[Replicated, ...] = (
+    Replicated(Farm, "farm_id"),
+    Replicated(Paddock, "paddock_id"),
+    Replicated(Harvest, "harvest_id"),
+    Replicated(BatchTracking, "batch_id"),
+    Replicated(FermentationTrial, "trial_id"),
+    Replicated(QualityControl, "test_id", local=("juicing_input_id",), references=(("tester_id", User, "email"),)),
+    Replicated(LocationTracking, "tracking_id", bulk=True),
+)
+BY_MODEL = {replicated.model: replicated for replicated in REPLICATED}
+BY_TABLE = {replicated.model.__tablename__: replicated for replicated in REPLICATED}
+ORDER = {replicated.model: position for position, replicated in enumerate(REPLICATED)}
+
+
+def enabled() -> bool:
+    return bool(settings.EDGE_CENTRAL_DATABASE_URI)
+
+
+def _columns(model: Any) -> Dict[str, Any]:
+    return {prop.key: prop.columns[0] for prop in inspect(model).column_attrs}
+
+
+def _image(connection: Connection, replicated: Replicated, values: Dict[str, Any]) -> Dict[str, Any]:
+    row = {key: json_value(value) for key, value in values.items() if key not in replicated.local}
+    for column, model, key in replicated.references:
+        if row.get(column) is not None:
+            row[column] = connection.scalar(select(getattr(model, key)).where(model.id == row[column]))
+    return row
+
+
+def _entries(session: Session) -> List[Dict[str, Any]]:
+    upserts, deletes = [], []
+    for obj in (*session.new, *session.dirty):
+        replicated = BY_MODEL.get(type(obj))
+        if replicated is None:
+            continue
+        state = inspect(obj)
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        key = getattr(obj, replicated.key)
+        previous = state.attrs[replicated.key].history.deleted
+        if previous and previous[0] is not None and previous[0] != key:
+            deletes.append((replicated, str(previous[0])))  # natural key changed: the old one is gone
+        row = _image(session.connection(), replicated, {name: getattr(obj, name) for name in _columns(replicated.model)})
+        upserts.append((replicated, str(key), row))
+    for obj in session.deleted:
+        replicated = BY_MODEL.get(type(obj))
+        if replicated is not None:
+            deletes.append((replicated, str(getattr(obj, replicated.key))))
+
+    upserts.sort(key=lambda entry: ORDER[entry[0].model])
+    deletes.sort(key=lambda entry: -ORDER[entry[0].model])
+    now = datetime.utcnow()
+    return [
+        *({"entity": r.model.__tablename__, "operation": UPSERT, "key": key, "row": row, "created_at": now}
+          for r, key, row in upserts),
+        *({"entity": r.model.__tablename__, "operation": DELETE, "key": key, "row": None, "created_at": now}
+          for r, key in deletes),
+    ]
+
+
+@event.listens_for(Session, "after_flush")
+def log_writes(session: Session, flush_context: Any) -> None:
+    if not enabled() or session.info.get(REPLICATING):
+        return
+    entries = _entries(session)
+    if entries and has_table(session.connection(), ReplicationLogEntry.__table__):
+        session.connection().execute(insert(ReplicationLogEntry), entries)
+
+
+def log_rows(connection: Connection, model: Any, rows: Sequence[Dict[str, Any]]) -> None:
+    """Log rows written with a Core insert (dicts of column values) in the same transaction"""
+    if not enabled() or not rows or not has_table(connection, ReplicationLogEntry.__table__):
+        return
+    replicated = BY_MODEL[model]
+    now = datetime.utcnow()
+    insert_ignoring_conflicts(connection, ReplicationLogEntry.__table__, [
+        {"entity": model.__tablename__, "operation": UPSERT, "key": str(row[replicated.key]),
+         "row": _image(connection, replicated, row), "created_at": now}
+        for row in rows
+    ], ["seq"])
+
+
+def backlog(db: Session) -> Dict[str, Any]:
+    """Entries waiting to be shipped and parked as failed, and the age of the oldest waiting"""
+    waiting = ReplicationLogEntry.failed_at.is_(None)
+    pending, oldest = db.execute(select(func.count(), func.min(ReplicationLogEntry.created_at)).where(waiting)).one()
+    failed = db.scalar(select(func.count()).select_from(ReplicationLogEntry).where(~waiting))
+    return {
+        "pending": pending, "failed": failed,
+        "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None,
+    }
+
+
+def retry_failed(db: Session) -> int:
+    """Queue parked entries again, e.g. once central has the row they referenced"""
+    requeued = db.execute(
+        update(ReplicationLogEntry).where(ReplicationLogEntry.failed_at.is_not(None))
+        .values(failed_at=None, error=None)
+    ).rowcount
+    db.commit()
+    return requeued
+
+
+def _values(central: Session, replicated: Replicated, row: Dict[str, Any]) -> Dict[str, Any]:
+    columns = _columns(replicated.model)
+    values = {name: from_json(columns[name], value) for name, value in row.items() if name in columns}
+    for column, model, key in replicated.references:
+        if values.get(column) is not None:
+            natural_key = values[column]
+            values[column] = central.scalar(select(model.id).where(getattr(model, key) == natural_key))
+            if values[column] is None:
+                raise LookupError(f"No {model.__tablename__} row with {key} {natural_key!r} on central")
+    values.pop("updated_at", None)  # stamped by central
+    if not isinstance(inspect(replicated.model).primary_key[0].type, String):
+        values.pop("id", None)  # assigned by central
+    return values
+
+
+class Replicator:
+    def __init__(
+        self,
+        edge_session_factory: Callable[[], Session],
+        central_session_factory: Callable[[], Session],
+        *,
+        batch_size: Optional[int] = None,
+        interval: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+    ):
+        self.edge_session_factory = edge_session_factory
+        self.central_session_factory = central_session_factory
+        self.batch_size = batch_size or settings.EDGE_REPLICATION_BATCH_SIZE
+        self.interval = settings.EDGE_REPLICATION_INTERVAL_SECONDS if interval is None else interval
+        self.max_backoff = settings.EDGE_REPLICATION_MAX_BACKOFF_SECONDS if max_backoff is None else max_backoff
+        self._counters = dict.fromkeys(("shipped", "batches", "parked", "errors"), 0)
+        self._ship_seconds = 0.0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def ship_batch(self) -> int:
+        """Ship the next batch of the log; returns the number of entries it held"""
+        with self.edge_session_factory() as edge:
+            entries = edge.scalars(
+                select(ReplicationLogEntry).where(ReplicationLogEntry.failed_at.is_(None))
+                .order_by(ReplicationLogEntry.seq).limit(self.batch_size)
+            ).all()
+            if not entries:
+                return 0
+            started = time.perf_counter()
+            parked = self._apply_batch(entries)
+            now = datetime.utcnow()
+            for entry in entries:
+                if entry.seq in parked:
+                    entry.failed_at, entry.error = now, parked[entry.seq]
+            shipped = [entry.seq for entry in entries if entry.seq not in parked]
+            if shipped:
+                edge.execute(delete(ReplicationLogEntry).where(ReplicationLogEntry.seq.in_(shipped)))
+            edge.commit()
+        with self._lock:
+            self._counters["shipped"] += len(shipped)
+            self._counters["parked"] += len(parked)
+            self._counters["batches"] += 1
+            self._ship_seconds += time.perf_counter() - started
+        for seq, error in parked.items():
+            logger.warning(f"Replication entry {seq} rejected by central, parked: {error}")
+        return len(entries)
+
+    def ship_all(self) -> int:
+        """Ship until the log is empty; returns the number of entries shipped or parked"""
+        total = 0
+        while not self._stopping.is_set():
+            count = self.ship_batch()
+            if not count:
+                break
+            total += count
+        return total
+
+    def _apply_batch(self, entries: List[ReplicationLogEntry]) -> Dict[int, str]:
+        """Apply entries to central in one transaction; returns the errors of the entries parked"""
+        central = self.central_session_factory()
+        central.info[REPLICATING] = True
+        try:
+            try:
+                self._apply(central, entries)
+                central.commit()
+                return {}
+            except PARKED_ERRORS:
+                central.rollback()
+            # One entry at a time, to find the ones central rejects
+            parked = {}
+            for entry in entries:
+                try:
+                    with central.begin_nested():
+                        self._apply(central, [entry])
+                except PARKED_ERRORS as e:
+                    parked[entry.seq] = str(e).splitlines()[0]
+            central.commit()
+            return parked
+        except Exception:
+            central.rollback()
+            raise
+        finally:
+            central.close()
+
+    def _apply(self, central: Session, entries: List[ReplicationLogEntry]) -> None:
+        existing: Dict[Tuple[str, str], Any] = {}
+        keys: Dict[str, set] = {}
+        for entry in entries:
+            keys.setdefault(entry.entity, set()).add(entry.key)
+        for entity, entity_keys in keys.items():
+            replicated = BY_TABLE[entity]
+            column = getattr(replicated.model, replicated.key)
+            for obj in central.scalars(select(replicated.model).where(column.in_(entity_keys))):
+                existing[(entity, getattr(obj, replicated.key))] = obj
+
+        appended: List[ReplicationLogEntry] = []
+        for entry in entries:
+            replicated = BY_TABLE[entry.entity]
+            current = existing.get((entry.entity, entry.key))
+            if entry.operation == UPSERT and replicated.bulk and current is None:
+                appended.append(entry)
+                continue
+            self._append(central, appended)
+            appended = []
+            if entry.operation == DELETE:
+                if current is not None:
+                    central.delete(current)
+                    del existing[(entry.entity, entry.key)]
+            else:
+                values = _values(central, replicated, entry.row)
+                if current is None:
+                    current = replicated.model(**values)
+                    central.add(current)
+                    existing[(entry.entity, entry.key)] = current
+                else:
+                    values.pop("id", None)
+                    for name, value in values.items():
+                        setattr(current, name, value)
+            central.flush()
+        self._append(central, appended)
+
+    @staticmethod
+    def _append(central: Session, entries: List[ReplicationLogEntry]) -> None:
+        """Bulk-insert new rows of an append-only table, skipping those central already has"""
+        groups: Dict[Tuple[Any, frozenset], Dict[str, Dict[str, Any]]] = {}
+        for entry in entries:
+            replicated = BY_TABLE[entry.entity]
+            values = _values(central, replicated, entry.row)
+            # One insert per set of columns: rows logged by the ORM and by log_rows() may differ
+            groups.setdefault((replicated.model, frozenset(values)), {})[entry.key] = values
+        connection = central.connection() if groups else None
+        for (model, _), rows in groups.items():
+            values = list(rows.values())
+            insert_ignoring_conflicts(connection, model.__table__, values, [BY_MODEL[model].key])
+            traceability.index_rows(connection, model, values)
+
+    def run(self) -> None:
+        """Ship every EDGE_REPLICATION_INTERVAL_SECONDS until stop(), backing off while central is unreachable"""
+        backoff = self.interval
+        while not self._stopping.is_set():
+            try:
+                self.ship_all()
+                backoff = self.interval
+            except Exception:
+                logger.exception(f"Replication to central failed; retrying in {backoff:.0f}s")
+                with self._lock:
+                    self._counters["errors"] += 1
+                self._stopping.wait(backoff)
+                backoff = min(max(backoff, 1.0) * 2, self.max_backoff)
+                continue
+            self._stopping.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries_per_second": round(self._counters["shipped"] / self._ship_seconds) if self._ship_seconds else 0,
+            }
@@ -0,0 +1,45 @@
+"""
+Whether a database has a table, for the flush listeners that maintain one
+subsystem's table on writes to other subsystems' models: the search index,
+trace links, sync tombstones, the replication log and the webhook outbox.
+
+Those listeners are registered on every Session, so they also fire for
+databases holding only part of the schema (a test fixture creating the
+tables it exercises, a tool on a reduced database). A listener whose table
+isn't there skips its work, logged once per database, rather than fail a
+write that has nothing to do with it.
+
+Tables found are remembered per engine. A missing table is looked up again
+at each write, so one created later is picked up.
+"""
+import logging
+import threading
+import weakref
+from typing import Set
+
+from sqlalchemy import Table, inspect
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+_found: "weakref.WeakKeyDictionary[Engine, Set[str]]" = weakref.WeakKeyDictionary()
+_reported: "weakref.WeakKeyDictionary[Engine, Set[str]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def has_table(connection: Connection, table: Table) -> bool:
+    engine = connection.engine
+    with _lock:
+        if table.name in _found.get(engine, ()):
+            return True
+    if inspect(connection).has_table(table.name, schema=table.schema):
+        with _lock:
+            _found.setdefault(engine, set()).add(table.name)
+        return True
+    with _lock:
+        reported = _reported.setdefault(engine, set())
+        first = table.name not in reported
+        reported.add(table.name)
+    if first:
+        logger.warning(f"No {table.name} table in {engine.url!r}: writes there are skipped")
+    return False
@@ -3,12 +3,16 @@ import time
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException
 from app.db.database import engine, Base
 from app.core.logging import setup_logging
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.api.conditional import conditional_get
+from app.api.idempotency import IdempotencyMiddleware
+from app.db import cdc
 
 # Set up logging
 loggers = setup_logging()
@@ -29,6 +33,9 @@ try:
     )
     logger.debug("FastAPI app created")
 
+    # Retried POSTs with an Idempotency-Key get the first response back
+    app.add_middleware(IdempotencyMiddleware)
+
     # Set up CORS middleware with hardcoded values
     origins = [
         "http://localhost:5173",
@@ -48,6 +55,9 @@ try:
     app.include_router(api_router, prefix=settings.API_V1_STR)
     logger.debug("API router registered")
 
+    # ETags and 304s for JSON reads
+    app.middleware("http")(conditional_get)
+
     # Request logging middleware
     @app.middleware("http")
     async def log_requests(request: Request, call_next):
@@ -66,7 +76,7 @@ try:
         logger.error(f"Validation error: {exc.errors()}")
         return JSONResponse(
             status_code=422,
-            content={"detail": exc.errors()}
+            content={"detail": jsonable_encoder(exc.errors())}
         )
 
     @app.exception_handler(HTTPException)
@@ -74,7 +84,8 @@ try:
         logger.error(f"HTTP error: {exc.detail}")
         return JSONResponse(
             status_code=exc.status_code,
-            content={"detail": exc.detail}
+            content={"detail": exc.detail},
+            headers=getattr(exc, "headers", None)
         )
 
     @app.exception_handler(Exception)
@@ -93,6 +104,15 @@ try:
     def health_check():
         return {"status": "ok"}
 
+    @app.get("/health/cdc")
+    def cdc_stats():
+        """Queue depth, drops and waits of each change data capture consumer"""
+        return cdc.stats()
+
+    if settings.CDC_PG_NOTIFY:
+        # Changes committed by other workers reach this worker's consumers too
+        app.add_event_handler("startup", cdc.listen)
+
     @app.get("/api/v1/mock/batches")
     def mock_batches():
         """Mock batches endpoint for frontend testing"""
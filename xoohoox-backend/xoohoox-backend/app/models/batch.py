@@ -23,7 +23,7 @@ class Batch(BaseModel):
     fermentation_logs = relationship("FermentationLog", back_populates="batch")
     evaluations = relationship("Evaluation", back_populates="batch")
     yeast_strain = relationship("YeastStrain", back_populates="batch")
-    trials = relationship("FermentationTrial", back_populates="batch")
+    # trials = relationship("FermentationTrial", back_populates="batch")  # Commented out - no foreign key
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
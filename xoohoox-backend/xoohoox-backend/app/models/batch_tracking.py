@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Enum as SQLEnum, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index, Enum as SQLEnum, JSON
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel
@@ -22,6 +22,7 @@ class BatchTracking(BaseModel):
     # Additional metadata
     quality_checks = Column(JSON, nullable=True, default=list)
     maintenance_records = Column(JSON, nullable=True, default=list)
+    issues = Column(JSON, nullable=True, default=list)
     environmental_impact = Column(JSON, nullable=True)
     processing_start_date = Column(DateTime, nullable=True)
     processing_end_date = Column(DateTime, nullable=True)
@@ -35,5 +36,9 @@ class BatchTracking(BaseModel):
     quality_records = relationship("QualityControl", back_populates="batch")  # Added for QualityControl relationship
     trials = relationship("FermentationTrial", back_populates="batch")  # Added for FermentationTrial relationship
 
+    __table_args__ = (
+        Index("ix_batch_tracking_updated_at", "updated_at", "id"),  # delta sync
+    )
+
     def __repr__(self):
         return f"<Batch {self.batch_id} ({self.name})>" 
\ No newline at end of file
@@ -155,4 +155,21 @@ class LogType(str, Enum):
     INSPECTION = "inspection"
     CALIBRATION = "calibration"
     CLEANING = "cleaning"
-    OTHER = "other" 
\ No newline at end of file
+    OTHER = "other" 
+
+class TraceNodeType(str, Enum):
+    FARM = "farm"
+    PADDOCK = "paddock"
+    HARVEST = "harvest"
+    LOCATION_TRACKING = "location_tracking"
+    BATCH = "batch"
+    TRIAL = "trial"
+    UPSCALE = "upscale"
+    QUALITY_CONTROL = "quality_control"
+
+class SearchEntityType(str, Enum):
+    BATCH = "batch"
+    QUALITY_CONTROL = "quality_control"
+    FERMENTATION_RESULTS = "fermentation_results"
+    EVALUATION = "evaluation"
+    HARVEST = "harvest"
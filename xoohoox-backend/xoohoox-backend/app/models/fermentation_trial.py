@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List
-from sqlalchemy import Column, String, Float, Integer, ForeignKey, DateTime, JSON, Enum as SQLEnum
+from sqlalchemy import Column, String, Float, Integer, ForeignKey, DateTime, JSON, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
 import enum
@@ -49,6 +49,10 @@ class FermentationTrial(BaseModel):
     batch = relationship("BatchTracking", back_populates="trials")  # Fixed: Batch -> BatchTracking
     upscale_runs = relationship("UpscaleRun", back_populates="trial")
 
+    __table_args__ = (
+        Index("ix_fermentation_trials_updated_at", "updated_at", "id"),  # delta sync
+    )
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if not self.trial_id and self.batch_id:
@@ -66,9 +70,9 @@ class FermentationTrial(BaseModel):
             "abv": abv,
             "notes": notes
         }
-        if not isinstance(self.daily_readings, list):
-            self.daily_readings = []
-        self.daily_readings.append(reading)
+        # A new list, so the change is flushed (and updated_at bumped) for sync
+        previous = self.daily_readings if isinstance(self.daily_readings, list) else []
+        self.daily_readings = [*previous, reading]
         self.current_abv = abv
         
         # Check if ABV threshold is reached
@@ -83,9 +87,8 @@ class FermentationTrial(BaseModel):
             "volume": volume,
             "notes": notes
         }
-        if not isinstance(self.upscale_history, list):
-            self.upscale_history = []
-        self.upscale_history.append(upscale)
+        previous = self.upscale_history if isinstance(self.upscale_history, list) else []
+        self.upscale_history = [*previous, upscale]
 
     def set_path(self, path: PathTaken):
         """Set the path taken for this trial."""
@@ -1,8 +1,18 @@
-from sqlalchemy import Column, String, Float, DateTime, Boolean, Text, ForeignKey, Integer
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Float, DateTime, Boolean, Text, ForeignKey, Integer, JSON, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 from app.db.base_class import Base
+from app.services import geohash
+from app.services.geometry import bounding_radius_km, polygon_bbox, polygon_centroid
+
+
+def _geohash_after_set(obj, key, value):
+    """Validator body keeping obj.geohash in step with its latitude/longitude"""
+    latitude = value if key == "latitude" else obj.latitude
+    longitude = value if key == "longitude" else obj.longitude
+    obj.geohash = geohash.encode(latitude, longitude) if latitude is not None and longitude is not None else None
+    return value
 
 
 class Farm(Base):
@@ -32,6 +42,10 @@ class Farm(Base):
     geofences = relationship("Geofence", back_populates="farm", cascade="all, delete-orphan")
     harvests = relationship("Harvest", back_populates="farm", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_farms_updated_at", "updated_at", "id"),  # delta sync
+    )
+
 
 class Paddock(Base):
     """Paddock model for storing paddock information"""
@@ -45,6 +59,7 @@ class Paddock(Base):
     area_hectares = Column(Float, nullable=False)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
+    geohash = Column(String(geohash.STORED_PRECISION), nullable=True, index=True)  # kept in step by _set_geohash
     planting_date = Column(DateTime, nullable=True)
     last_harvest = Column(DateTime, nullable=True)
     yield_kg = Column(Float, default=0.0)
@@ -58,6 +73,14 @@ class Paddock(Base):
     farm = relationship("Farm", back_populates="paddocks")
     harvests = relationship("Harvest", back_populates="paddock", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_paddocks_updated_at", "updated_at", "id"),  # delta sync
+    )
+
+    @validates("latitude", "longitude")
+    def _set_geohash(self, key, value):
+        return _geohash_after_set(self, key, value)
+
 
 class Geofence(Base):
     """Geofence model for storing geofence information"""
@@ -68,7 +91,16 @@ class Geofence(Base):
     farm_id = Column(String, ForeignKey("farms.farm_id"), nullable=False)
     name = Column(String, nullable=False)
     type = Column(String, nullable=False)  # archive, processing, quality, etc.
-    coordinates = Column(JSONB, nullable=True)  # Store as array of [lat, lng] pairs
+    coordinates = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)  # Store as array of [lat, lng] pairs
+    # Bounding box, centroid and bounding circle of coordinates, kept in step by
+    # _set_extent; used by the geofence spatial and nearest-neighbour indexes
+    min_lat = Column(Float, nullable=True)
+    min_lng = Column(Float, nullable=True)
+    max_lat = Column(Float, nullable=True)
+    max_lng = Column(Float, nullable=True)
+    centroid_lat = Column(Float, nullable=True)
+    centroid_lng = Column(Float, nullable=True)
+    bounding_radius_meters = Column(Float, nullable=True)
     radius_meters = Column(Float, default=0.0)
     status = Column(String, default="active")
     alerts_enabled = Column(Boolean, default=True)
@@ -79,6 +111,18 @@ class Geofence(Base):
     # Relationships
     farm = relationship("Farm", back_populates="geofences")
 
+    __table_args__ = (
+        Index("ix_geofences_bbox", "min_lat", "max_lat", "min_lng", "max_lng"),
+    )
+
+    @validates("coordinates")
+    def _set_extent(self, key, coordinates):
+        self.min_lat, self.min_lng, self.max_lat, self.max_lng = polygon_bbox(coordinates) or (None, None, None, None)
+        centroid = polygon_centroid(coordinates)
+        self.centroid_lat, self.centroid_lng = centroid or (None, None)
+        self.bounding_radius_meters = bounding_radius_km(centroid, coordinates) * 1000 if centroid else None
+        return coordinates
+
 
 class Harvest(Base):
     """Harvest model for storing harvest information"""
@@ -106,6 +150,10 @@ class Harvest(Base):
     farm = relationship("Farm", back_populates="harvests")
     location_tracking = relationship("LocationTracking", back_populates="harvest", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_harvests_updated_at", "updated_at", "id"),  # delta sync
+    )
+
 
 class LocationTracking(Base):
     """Location tracking model for storing GPS tracking data"""
@@ -117,6 +165,7 @@ class LocationTracking(Base):
     harvest_id = Column(String, ForeignKey("harvests.harvest_id"), nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    geohash = Column(String(geohash.STORED_PRECISION), nullable=True)  # kept in step by _set_geohash
     timestamp = Column(DateTime, nullable=False)
     location_name = Column(String, nullable=True)
     status = Column(String, nullable=True)  # Sample collected, In transit, Delivered, etc.
@@ -128,3 +177,99 @@ class LocationTracking(Base):
     harvest = relationship("Harvest", back_populates="location_tracking")
     geofence = relationship("Geofence")
 
+    __table_args__ = (
+        Index("ix_location_tracking_batch_time", "batch_id", "timestamp"),
+        Index("ix_location_tracking_geohash_time", "geohash", "timestamp"),
+    )
+
+    @validates("latitude", "longitude")
+    def _set_geohash(self, key, value):
+        return _geohash_after_set(self, key, value)
+
+
+
+class GeofenceAlert(Base):
+    """Geofence enter/exit/dwell event detected from GPS tracking"""
+    __tablename__ = "geofence_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    geofence_id = Column(String, ForeignKey("geofences.geofence_id"), nullable=False)
+    batch_id = Column(String, nullable=False)
+    tracking_id = Column(String, nullable=True)  # point that triggered the alert
+    alert_type = Column(String, nullable=False)  # enter, exit, dwell
+    timestamp = Column(DateTime, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_geofence_alerts_batch_time", "batch_id", "timestamp"),
+        Index("ix_geofence_alerts_geofence_time", "geofence_id", "timestamp"),
+        UniqueConstraint("batch_id", "geofence_id", "alert_type", "timestamp", name="uq_geofence_alerts_event"),
+    )
+
+
+class SimplifiedTrack(Base):
+    """Precomputed simplified route of a completed trip, as an encoded polyline"""
+    __tablename__ = "simplified_tracks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String, nullable=False)
+    algorithm = Column(String, nullable=False)
+    tolerance_meters = Column(Integer, nullable=False)  # one of ROUTE_PRECOMPUTED_TOLERANCES_METERS
+    polyline = Column(Text, nullable=False)
+    timestamps = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)  # epoch seconds per vertex
+    point_count = Column(Integer, nullable=False)
+    distance_km = Column(Float, nullable=False)
+    # Row count and newest point of the raw track when this was computed
+    source_points = Column(Integer, nullable=False)
+    source_last_timestamp = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("batch_id", "algorithm", "tolerance_meters", name="uq_simplified_tracks_batch_tolerance"),
+    )
+
+
+class LocationTrackingQuarantine(Base):
+    """GPS point the database kept rejecting at ingest, set aside so the points behind it flow"""
+    __tablename__ = "location_tracking_quarantine"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tracking_id = Column(String, nullable=False, index=True)
+    batch_id = Column(String, nullable=True)
+    point = Column(JSON, nullable=False)  # as offered, timestamps in ISO format
+    error = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LocationTrackingArchive(Base):
+    """Compressed NDJSON file holding the raw points of a downsampled trip"""
+    __tablename__ = "location_tracking_archives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String, nullable=False, index=True)
+    path = Column(String, nullable=False)
+    first_timestamp = Column(DateTime, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+    points_archived = Column(Integer, nullable=False)
+    points_kept = Column(Integer, nullable=False)  # rows left in location_tracking
+    bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)  # once the archived rows not kept are deleted; resumed until then
+
+
+class DeliveryLeg(Base):
+    """Completed trip from a farm to the lab, as learned from its GPS track"""
+    __tablename__ = "delivery_legs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String, unique=True, nullable=False)
+    farm_id = Column(String, nullable=True, index=True)  # of the batch's harvest
+    departed_at = Column(DateTime, nullable=False)
+    arrived_at = Column(DateTime, nullable=False)
+    distance_km = Column(Float, nullable=False)  # great-circle, departure point to the lab
+    duration_minutes = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Float, DateTime, Boolean, Text, Integer, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+from app.db.base_class import Base
+
+
+class Job(Base):
+    """A unit of background work and its progress (see app/services/jobs.py)"""
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    type = Column(String, nullable=False, index=True)
+    state = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    params = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False, default=dict)
+    progress = Column(Float, nullable=False, default=0.0)  # 0 to 1
+    message = Column(String, nullable=True)
+    result = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)  # small report, or a pointer to a file
+    error = Column(Text, nullable=True)  # of the latest failed attempt
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # retries wait out their backoff
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    worker = Column(String, nullable=True)  # runner holding the job while running
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_state_run_after", "state", "run_after"),
+    )
@@ -1,5 +1,4 @@
 from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Enum, ForeignKey
-from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
 from app.models.enums import ProcessStatus
 
@@ -26,5 +25,5 @@ class JuicingInputLog(BaseModel):
     process_status = Column(Enum(ProcessStatus), default=ProcessStatus.STARTED, nullable=False)
     
     # Relationships
-    batch = relationship("BatchTracking", back_populates="juicing_logs", lazy="joined")
-    quality_checks = relationship("QualityControl", back_populates="juicing_input", lazy="joined", foreign_keys="QualityControl.juicing_input_id") 
\ No newline at end of file
+    # batch = relationship("BatchTracking", back_populates="juicing_logs", lazy="joined")  # Temporarily commented out - BatchTracking has no juicing_logs
+    # quality_checks = relationship("QualityControl", back_populates="juicing_input", lazy="joined", foreign_keys="QualityControl.juicing_input_id")  # Temporarily commented out - QualityControl.juicing_input not ready
\ No newline at end of file
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, Integer, JSON, Index
+from datetime import datetime
+from app.db.base_class import Base
+
+
+class ReplicationLogEntry(Base):
+    """A committed edge write still to be shipped to central (see app/db/replication.py)"""
+    __tablename__ = "replication_log"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)  # commit order; shipped in this order
+    entity = Column(String, nullable=False)  # table name
+    operation = Column(String, nullable=False)  # upsert or delete
+    key = Column(String, nullable=False)  # natural key of the row
+    row = Column(JSON, nullable=True)  # the row's columns as JSON, for upserts
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    failed_at = Column(DateTime, nullable=True)  # set when central rejected the entry; skipped until retried
+    error = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_replication_log_failed_at_seq", "failed_at", "seq"),
+    )
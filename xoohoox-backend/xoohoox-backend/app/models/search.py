@@ -0,0 +1,54 @@
+from sqlalchemy import Column, String, Integer, Text, DateTime, Index, UniqueConstraint, DDL, event
+from datetime import datetime
+from app.db.base_class import Base
+
+
+class SearchDocument(Base):
+    """Denormalized free text of a searchable record (one row per record).
+
+    The full-text index lives outside the ORM: a generated tsvector column with
+    a GIN index on PostgreSQL, and an external-content FTS5 table kept in sync
+    by triggers on SQLite. Both are created with the table below.
+    """
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String, nullable=False)
+    entity_key = Column(String, nullable=False)
+    batch_id = Column(String, nullable=True, index=True)
+    content = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_key", name="uq_search_documents_entity"),
+        Index("ix_search_documents_entity_type", "entity_type"),
+    )
+
+
+# PostgreSQL: generated tsvector + GIN index
+for statement in (
+    "ALTER TABLE search_documents ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+    "CREATE INDEX ix_search_documents_vector ON search_documents USING GIN (search_vector)",
+):
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+# SQLite: FTS5 external-content table mirrored by triggers
+for statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents_fts USING fts5("
+    "content, content='search_documents', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO search_documents_fts(rowid, content) VALUES (new.id, new.content); END",
+):
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+event.listen(
+    SearchDocument.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS search_documents_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Integer, Index
+from datetime import datetime
+from app.db.base_class import Base
+
+
+class SyncTombstone(Base):
+    """A deleted record field tablets still have to drop (see app/services/sync.py)"""
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # sync entity name: farms, paddocks, harvests, batches, trials
+    key = Column(String, nullable=False)  # natural key of the deleted record
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_sync_tombstones_deleted_at", "deleted_at", "id"),
+        Index("ix_sync_tombstones_entity_key", "entity", "key"),
+    )
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index, UniqueConstraint
+from datetime import datetime
+from app.db.base_class import Base
+
+
+class TraceLink(Base):
+    """Directed edge in the farm-to-product traceability graph.
+
+    Nodes are addressed by (type, key) where key is the natural identifier of
+    the record (farm_id, paddock_id, harvest_id, batch_id, ...), so links can
+    span tables that have no foreign keys between them.
+    """
+    __tablename__ = "trace_links"
+
+    id = Column(Integer, primary_key=True, index=True)
+    parent_type = Column(String, nullable=False)
+    parent_key = Column(String, nullable=False)
+    child_type = Column(String, nullable=False)
+    child_key = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("parent_type", "parent_key", "child_type", "child_key", name="uq_trace_links_edge"),
+        Index("ix_trace_links_parent", "parent_type", "parent_key"),
+        Index("ix_trace_links_child", "child_type", "child_key"),
+    )
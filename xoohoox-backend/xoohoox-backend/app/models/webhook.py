@@ -0,0 +1,39 @@
+from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer, JSON, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+from app.db.base_class import Base
+
+
+class WebhookEndpoint(Base):
+    """A partner URL notified of batch and QC events (see app/services/webhooks.py)"""
+    __tablename__ = "webhook_endpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    secret = Column(String, nullable=False)  # HMAC key signing each POST
+    topics = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False, default=list)
+    batch_size = Column(Integer, nullable=False, default=50)  # events per POST
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class WebhookDelivery(Base):
+    """Outbox row: one event owed to one endpoint, written in the transaction that caused it"""
+    __tablename__ = "webhook_deliveries"
+
+    id = Column(String, primary_key=True)  # also the event id receivers deduplicate on
+    endpoint_id = Column(Integer, ForeignKey("webhook_endpoints.id", ondelete="CASCADE"), nullable=False, index=True)
+    topic = Column(String, nullable=False)
+    payload = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
+    state = Column(String, nullable=False, default="pending")  # pending, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # retries wait out their backoff
+    claimed_by = Column(String, nullable=True)  # dispatcher round holding the row until next_attempt_at
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    delivered_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_webhook_deliveries_state_next_attempt_at", "state", "next_attempt_at"),
+    )
@@ -1,8 +1,19 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic import BaseModel, Field, field_validator
 
-from app.models.enums import BatchStatus, FruitType, JuiceType, ProcessStatus
+from app.models.enums import BatchStatus, FruitType, JuiceType, ProcessStatus, QualityCheckType, TestResult
+from app.schemas.transformation import (
+    TransformationStage,
+    JuicingResults,
+    ChemistryResults,
+    HeatActivationResults,
+    FermentationResults,
+    VinegarResults,
+    DistillationResults,
+    Stage2Results,
+    FruitPerformance,
+)
 
 class BatchBase(BaseModel):
     batch_id: Optional[str] = None
@@ -45,6 +56,7 @@ class BatchTrackingInDB(BatchBase):
 class BatchTrackingResponse(BatchTrackingInDB):
     quality_checks: List[dict] = []
     maintenance_records: List[dict] = []
+    issues: Optional[List[dict]] = None
     environmental_impact: Optional[dict] = None
     processing_start_date: Optional[datetime] = None
     processing_end_date: Optional[datetime] = None
@@ -60,6 +72,77 @@ class BatchTrackingList(BaseModel):
     total: int
     items: List[BatchTrackingResponse]
 
+class BatchSearchResponse(BaseModel):
+    total: int
+    items: List[BatchTrackingResponse]
+    facets: Dict[str, Dict[str, int]] = Field(
+        ..., description="Counts per status, fruit_type, process_type and month for the filtered batches"
+    )
+
+# Aggregate batch detail (/batches/{batch_id}/full)
+class BatchStageDetail(TransformationStage):
+    juicing_results: Optional[JuicingResults] = None
+    chemistry_results: Optional[ChemistryResults] = None
+    heat_activation_results: Optional[HeatActivationResults] = None
+    fermentation_results: Optional[FermentationResults] = None
+    vinegar_results: Optional[VinegarResults] = None
+    distillation_results: Optional[DistillationResults] = None
+    stage2_results: Optional[Stage2Results] = None
+    fruit_performance: Optional[FruitPerformance] = None
+
+    class Config:
+        from_attributes = True
+
+class BatchUpscaleSummary(BaseModel):
+    id: int
+    upscale_id: Optional[str] = None
+    stage: Optional[str] = None
+    volume: Optional[float] = None
+    yield_amount: Optional[float] = None
+    abv_result: Optional[float] = None
+    status: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class BatchTrialSummary(BaseModel):
+    id: int
+    trial_id: Optional[str] = None
+    yeast_strain: Optional[str] = None
+    juice_variant: Optional[str] = None
+    initial_volume: Optional[float] = None
+    current_abv: Optional[float] = None
+    status: Optional[str] = None
+    path_taken: Optional[str] = None
+    upscale_runs: List[BatchUpscaleSummary] = []
+
+    class Config:
+        from_attributes = True
+
+class BatchQualityRecord(BaseModel):
+    id: int
+    test_id: str
+    test_type: QualityCheckType
+    test_date: datetime
+    test_name: str
+    test_method: str
+    actual_value: Optional[float] = None
+    unit_of_measure: str
+    result: TestResult
+    retest_required: Optional[bool] = None
+    notes: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class BatchTrackingFull(BatchTrackingResponse):
+    transformation_stages: List[BatchStageDetail] = []
+    trials: List[BatchTrialSummary] = []
+    quality_records: List[BatchQualityRecord] = []
+
+    class Config:
+        from_attributes = True
+
 class StartProduction(BaseModel):
     operator: str
     equipment_id: str
@@ -1,6 +1,6 @@
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime, timezone
 from enum import Enum
 
 
@@ -19,6 +19,48 @@ class TrackingSource(str, Enum):
     SENSOR = "Sensor"
 
 
+class GeofenceAlertType(str, Enum):
+    ENTER = "enter"
+    EXIT = "exit"
+    DWELL = "dwell"
+
+
+class SimplifyAlgorithm(str, Enum):
+    DOUGLAS_PEUCKER = "douglas-peucker"
+    VISVALINGAM = "visvalingam"
+
+
+class RouteFormat(str, Enum):
+    COLUMNAR = "columnar"
+    POLYLINE = "polyline"
+
+
+class HeatmapLayer(str, Enum):
+    HARVESTS = "harvests"  # harvest density by paddock location
+    TRAFFIC = "traffic"  # GPS points of batches in transit
+
+
+class HeatmapWindow(str, Enum):
+    DAY = "24h"
+    WEEK = "7d"
+    MONTH = "30d"
+    YEAR = "365d"
+    ALL = "all"
+
+
+class ClusterLayer(str, Enum):
+    FARMS = "farms"
+    PADDOCKS = "paddocks"
+    GEOFENCES = "geofences"
+    TRACKING = "tracking"  # GPS points in the time window
+
+
+class NearbyKind(str, Enum):
+    FARMS = "farms"
+    PADDOCKS = "paddocks"
+    GEOFENCES = "geofences"
+
+
 class HarvestMethod(str, Enum):
     MECHANICAL = "mechanical"
     MANUAL = "manual"
@@ -186,6 +228,7 @@ class LocationTrackingUpdate(BaseModel):
 # Response schemas
 class Farm(FarmBase):
     id: str
+    last_sample_collection: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -195,6 +238,7 @@ class Farm(FarmBase):
 
 class Paddock(PaddockBase):
     id: str
+    geohash: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -222,6 +266,7 @@ class Harvest(HarvestBase):
 
 class LocationTracking(LocationTrackingBase):
     id: str
+    geohash: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -248,14 +293,115 @@ class HarvestWithDetails(Harvest):
 
 # Geolocation-specific schemas
 class GeofenceAlert(BaseModel):
+    id: Optional[int] = None
     geofence_id: str
     batch_id: str
-    alert_type: str  # "enter", "exit"
+    tracking_id: Optional[str] = None
+    alert_type: GeofenceAlertType
     timestamp: datetime
     location: Dict[str, float]  # {"latitude": float, "longitude": float}
     message: str
 
 
+class GeoPoint(BaseModel):
+    id: Optional[str] = Field(None, description="Caller's identifier for the point; defaults to its index")
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+
+class BulkPointCheck(BaseModel):
+    points: List[GeoPoint] = Field(..., max_length=100000)
+
+
+class BulkPointCheckResult(BaseModel):
+    points_checked: int
+    geofences_checked: int
+    matches: Dict[str, List[str]]  # point id -> geofence ids, only for points inside at least one geofence
+
+
+class NearbyResult(BaseModel):
+    kind: NearbyKind
+    key: str
+    name: str
+    latitude: float  # centroid for geofences
+    longitude: float
+    distance_km: float
+
+
+class GpsPoint(BaseModel):
+    """One point of a GPS ingest upload; the tracking_id is derived server-side"""
+    batch_id: str
+    harvest_id: str
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    timestamp: datetime
+    location_name: Optional[str] = None
+    status: Optional[str] = None
+    source: str = "GPS"
+
+    @field_validator("timestamp")
+    @classmethod
+    def naive_utc(cls, value: datetime) -> datetime:
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class GpsIngestResult(BaseModel):
+    accepted: int
+    duplicates: int
+    buffered: int
+
+
+class Route(BaseModel):
+    batch_id: str
+    completed: bool  # last point has a delivered/completed status
+    algorithm: Optional[SimplifyAlgorithm] = None
+    tolerance_meters: Optional[float] = None
+    source_points: int
+    point_count: int
+    distance_km: float  # along the raw track
+    started_at: datetime
+    ended_at: datetime
+    # Columnar format
+    latitudes: Optional[List[float]] = None
+    longitudes: Optional[List[float]] = None
+    # Polyline format: Google encoded polyline, precision 5
+    polyline: Optional[str] = None
+    timestamps: List[int]  # epoch seconds per point
+
+
+class HeatmapCell(BaseModel):
+    cell: str  # geohash prefix
+    latitude: float  # cell centre
+    longitude: float
+    count: int
+    quantity_kg: Optional[float] = None  # harvests layer
+    batches: Optional[int] = None  # traffic layer: distinct batches seen
+
+
+class Heatmap(BaseModel):
+    layer: HeatmapLayer
+    precision: int
+    window: HeatmapWindow
+    cells: List[HeatmapCell]
+
+
+class MapCluster(BaseModel):
+    latitude: float  # centroid of the clustered points
+    longitude: float
+    count: int
+    id: Optional[str] = None  # farm_id, paddock_id, geofence_id or tracking_id of a single point
+    label: Optional[str] = None  # its name, or batch_id for tracking
+
+
+class ClusterMap(BaseModel):
+    layer: ClusterLayer
+    zoom: int
+    clusters: List[MapCluster]
+    total: int  # points in the returned clusters
+
+
 class SampleTracking(BaseModel):
     batch_id: str
     sample_id: str
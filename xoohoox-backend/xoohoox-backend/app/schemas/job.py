@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+from datetime import datetime
+from enum import Enum
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobCreate(BaseModel):
+    type: str = Field(..., description="A registered job type, see /jobs/types")
+    params: Dict[str, Any] = {}
+
+
+class JobTypeInfo(BaseModel):
+    name: str
+    concurrency: int
+    max_attempts: int
+    backoff_seconds: float
+    pool: str
+    privileged: bool  # submitting or cancelling takes a superuser
+
+
+class Job(BaseModel):
+    id: str
+    type: str
+    state: JobState
+    params: Dict[str, Any]
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    cancel_requested: bool
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
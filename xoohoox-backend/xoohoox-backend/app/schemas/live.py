@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List
+from enum import Enum
+
+
+class LiveTopic(str, Enum):
+    BATCH_STATUS = "batch_status"
+    QUALITY_CONTROL = "quality_control"
+    GPS_POINT = "gps_point"
+    GEOFENCE_ALERT = "geofence_alert"
+
+
+class LiveSubscriptionChange(BaseModel):
+    """Sent by WebSocket clients to change their topics"""
+    subscribe: List[LiveTopic] = []
+    unsubscribe: List[LiveTopic] = []
@@ -0,0 +1,99 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+
+
+class RoutingDepot(BaseModel):
+    name: str = "Laboratory"
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+
+class RoutingStop(BaseModel):
+    id: str
+    name: Optional[str] = None
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    demand_kg: float = Field(0, ge=0)
+    service_minutes: float = Field(10, ge=0)
+    earliest: Optional[datetime] = Field(None, description="Don't arrive before")
+    latest: Optional[datetime] = Field(None, description="Arrive by")
+
+
+class RoutingVehicle(BaseModel):
+    id: str
+    capacity_kg: float = Field(..., gt=0)
+    shift_hours: Optional[float] = Field(None, gt=0, description="Back at the depot within this many hours")
+
+
+class RoutePlanRequest(BaseModel):
+    vehicles: List[RoutingVehicle] = Field(..., min_length=1, max_length=100)
+    stops: Optional[List[RoutingStop]] = Field(
+        None, max_length=1000, description="Defaults to one stop per paddock with uncollected harvest samples"
+    )
+    depot: Optional[RoutingDepot] = Field(None, description="Defaults to the lab")
+    start_time: Optional[datetime] = Field(None, description="Departure from the depot; defaults to now")
+    speed_kmh: Optional[float] = Field(None, gt=0, le=150, description="Average road speed")
+    time_limit_seconds: float = Field(0.8, gt=0, le=10)
+
+    @model_validator(mode="after")
+    def unique_ids(self):
+        for name, items in (("vehicle", self.vehicles), ("stop", self.stops or [])):
+            ids = [item.id for item in items]
+            if len(ids) != len(set(ids)):
+                raise ValueError(f"Duplicate {name} ids")
+        return self
+
+
+class PlannedStop(BaseModel):
+    id: str
+    name: Optional[str] = None
+    latitude: float
+    longitude: float
+    demand_kg: float
+    arrival: datetime
+
+
+class VehicleRoute(BaseModel):
+    vehicle_id: str
+    stops: List[PlannedStop]
+    load_kg: float
+    distance_km: float
+    return_time: datetime
+
+
+class RoutePlan(BaseModel):
+    depot: RoutingDepot
+    start_time: datetime
+    routes: List[VehicleRoute]
+    unassigned: List[RoutingStop]
+    total_distance_km: float
+    solve_ms: float
+
+
+class DeliveryStatus(str, Enum):
+    WAITING = "waiting"  # not yet left the lab
+    IN_TRANSIT = "in_transit"
+    DELIVERED = "delivered"
+
+
+class EtaBasis(str, Enum):
+    FARM = "farm"  # legs from the batch's farm
+    FLEET = "fleet"  # legs from any farm
+    DEFAULT = "default"  # no legs yet: ROUTING_SPEED_KMH and ROUTING_ROAD_FACTOR
+
+
+class DeliveryEta(BaseModel):
+    batch_id: str
+    farm_id: Optional[str] = None
+    status: DeliveryStatus
+    latitude: float
+    longitude: float
+    last_seen: datetime
+    departed_at: Optional[datetime] = None
+    remaining_km: float
+    eta: Optional[datetime] = None
+    progress: float = Field(..., ge=0, le=1)
+    basis: Optional[EtaBasis] = None
+    legs: int = Field(0, description="Completed legs behind the pace used")
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from app.models.enums import SearchEntityType
+
+
+class SearchHit(BaseModel):
+    entity_type: SearchEntityType
+    entity_key: str
+    batch_id: Optional[str] = None
+    rank: Optional[float] = Field(None, description="Relevance, higher is better")
+    snippet: Optional[str] = None
+
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    results: List[SearchHit]
+    batch_ids: List[str] = Field(..., description="Distinct batches of the results, best match first")
+
+
+class SearchRebuildResponse(BaseModel):
+    documents: int
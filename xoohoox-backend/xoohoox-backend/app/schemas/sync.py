@@ -0,0 +1,67 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from enum import Enum
+
+from app.core.config import settings
+
+
+class SyncEntityName(str, Enum):
+    FARMS = "farms"
+    PADDOCKS = "paddocks"
+    BATCHES = "batches"
+    HARVESTS = "harvests"
+    TRIALS = "trials"
+
+
+class SyncOperation(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+
+class ConflictStrategy(str, Enum):
+    SERVER_WINS = "server_wins"
+    CLIENT_WINS = "client_wins"
+    MERGE = "merge"
+
+
+class SyncEntityChanges(BaseModel):
+    columns: List[str]
+    rows: List[List[Any]]
+
+
+class SyncPage(BaseModel):
+    changes: Dict[str, SyncEntityChanges] = {}
+    deleted: Dict[str, List[str]] = Field({}, description="Natural keys of deleted records, per entity")
+    cursor: str = Field(..., description="Pass back as cursor: for the next page, or the next sync once has_more is false")
+    has_more: bool
+    reset: bool = Field(False, description="The cursor was too old: this is a full sync, drop the local copy first")
+
+
+class SyncWrite(BaseModel):
+    entity: SyncEntityName
+    op: SyncOperation = SyncOperation.UPSERT
+    key: str = Field(..., description="Natural key: farm_id, paddock_id, batch_id, harvest_id or trial_id")
+    data: Dict[str, Any] = {}
+    base_updated_at: Optional[datetime] = Field(None, description="updated_at of the version the edit started from")
+    base: Optional[Dict[str, Any]] = Field(None, description="Field values the edit started from, for merge")
+    strategy: Optional[ConflictStrategy] = None
+
+
+class SyncPush(BaseModel):
+    strategy: ConflictStrategy = ConflictStrategy.SERVER_WINS
+    writes: List[SyncWrite] = Field(..., max_length=settings.SYNC_MAX_WRITES)
+
+
+class SyncWriteResult(BaseModel):
+    index: int
+    entity: str
+    key: str
+    status: str  # created, updated, merged, deleted, unchanged, conflict, error
+    record: Optional[Dict[str, Any]] = None  # the server's version after the write
+    conflicts: List[str] = []
+    error: Optional[str] = None
+
+
+class SyncPushResult(BaseModel):
+    results: List[SyncWriteResult]
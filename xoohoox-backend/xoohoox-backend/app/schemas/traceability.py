@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import List, Dict
+from app.models.enums import TraceNodeType
+
+
+class TraceNode(BaseModel):
+    type: TraceNodeType
+    key: str
+    depth: int = Field(..., description="Number of links from the root node")
+
+
+class TraceEdge(BaseModel):
+    parent_type: TraceNodeType
+    parent_key: str
+    child_type: TraceNodeType
+    child_key: str
+
+
+class TraceResponse(BaseModel):
+    root: TraceNode
+    direction: str
+    nodes: List[TraceNode]
+    edges: List[TraceEdge]
+    counts: Dict[str, int] = Field(..., description="Number of reached nodes per node type")
+
+
+class TraceRebuildResponse(BaseModel):
+    links: int
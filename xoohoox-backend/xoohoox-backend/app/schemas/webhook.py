@@ -0,0 +1,73 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from enum import Enum
+
+
+class WebhookTopic(str, Enum):
+    BATCH_STATUS = "batch_status"
+    QUALITY_CONTROL = "quality_control"
+    QUALITY_CONTROL_FAILED = "quality_control_failed"
+
+
+class WebhookDeliveryState(str, Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+
+class WebhookEndpointBase(BaseModel):
+    name: str
+    url: str = Field(..., pattern=r"^https?://")
+    topics: List[WebhookTopic] = Field(..., min_length=1)
+    batch_size: int = Field(50, ge=1, le=1000, description="Events per POST")
+
+
+class WebhookEndpointCreate(WebhookEndpointBase):
+    secret: Optional[str] = Field(None, min_length=16, description="Generated when not given")
+
+
+class WebhookEndpointUpdate(BaseModel):
+    name: Optional[str] = None
+    url: Optional[str] = Field(None, pattern=r"^https?://")
+    topics: Optional[List[WebhookTopic]] = Field(None, min_length=1)
+    batch_size: Optional[int] = Field(None, ge=1, le=1000)
+    active: Optional[bool] = None
+
+
+class WebhookEndpoint(WebhookEndpointBase):
+    id: int
+    active: bool
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class WebhookEndpointCreated(WebhookEndpoint):
+    """Returned once, on creation: the secret isn't readable afterwards"""
+    secret: str
+
+
+class WebhookDelivery(BaseModel):
+    id: str
+    endpoint_id: int
+    topic: str
+    payload: Dict[str, Any]
+    state: WebhookDeliveryState
+    attempts: int
+    next_attempt_at: datetime
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class WebhookEndpointStats(BaseModel):
+    endpoint_id: int
+    pending: int = 0
+    delivered: int = 0
+    failed: int = 0
+    metrics: Dict[str, float] = Field({}, description="This process's dispatcher counters")
@@ -0,0 +1,98 @@
+"""
+Hierarchical grid clustering of map points, per zoom level.
+
+Points are projected to Web Mercator once. At zoom z the world is a grid of
+2^z * CELLS_PER_TILE cells a side (a cell is 64 px at 256 px tiles), and a
+cluster is every point in a cell, placed at their centroid. The grid at z is
+exactly the grid at z + 1 with cells merged two by two, so ClusterIndex
+builds MAX_ZOOM from the points and every coarser level from the level below
+it, in O(points) overall. A query is then a bbox filter over one level.
+
+Above MAX_ZOOM the points themselves are returned.
+"""
+import math
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAX_ZOOM = 16
+CELLS_PER_TILE = 4
+MAX_LATITUDE = 85.05112878
+
+# south, west, north, east in degrees; west > east crosses the antimeridian
+BBox = Tuple[float, float, float, float]
+
+
+class Level(NamedTuple):
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    counts: np.ndarray
+    members: np.ndarray  # index of one point of the cluster, for singletons
+
+
+class Cluster(NamedTuple):
+    latitude: float
+    longitude: float
+    count: int
+    index: Optional[int]  # of the point, when the cluster holds exactly one
+
+
+def _mercator(latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Unit-square Web Mercator coordinates, y growing southward"""
+    sin = np.sin(np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE)))
+    x = (longitudes + 180.0) / 360.0
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return np.clip(x, 0.0, 1.0 - 1e-12), np.clip(y, 0.0, 1.0 - 1e-12)
+
+
+def _unmercator(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    latitudes = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * y))))
+    return latitudes, x * 360.0 - 180.0
+
+
+class ClusterIndex:
+    def __init__(self, latitudes: Sequence[float], longitudes: Sequence[float], max_zoom: int = MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.levels: List[Level] = [None] * (max_zoom + 1)
+
+        x, y = _mercator(self.latitudes, self.longitudes)
+        side = (2 ** max_zoom) * CELLS_PER_TILE
+        cells_x, cells_y = (x * side).astype(np.int64), (y * side).astype(np.int64)
+        counts = np.ones(len(x), dtype=np.int64)
+        members = np.arange(len(x), dtype=np.int64)
+        for zoom in range(max_zoom, -1, -1):
+            keys = cells_x * side + cells_y
+            unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            total = np.bincount(inverse, weights=counts).astype(np.int64)
+            x = np.bincount(inverse, weights=x * counts) / total
+            y = np.bincount(inverse, weights=y * counts) / total
+            counts, members = total, members[first]
+            latitudes, longitudes = _unmercator(x, y)
+            self.levels[zoom] = Level(latitudes, longitudes, counts, members)
+            cells_x, cells_y, side = unique // side // 2, unique % side // 2, side // 2
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def clusters(self, zoom: int, bbox: Optional[BBox] = None) -> List[Cluster]:
+        if zoom > self.max_zoom:
+            level = Level(self.latitudes, self.longitudes, np.ones(len(self), dtype=np.int64), np.arange(len(self)))
+        else:
+            level = self.levels[max(zoom, 0)]
+        mask = np.ones(len(level.counts), dtype=bool)
+        if bbox is not None:
+            south, west, north, east = bbox
+            mask = (level.latitudes >= south) & (level.latitudes <= north)
+            if west <= east:
+                mask &= (level.longitudes >= west) & (level.longitudes <= east)
+            else:
+                mask &= (level.longitudes >= west) | (level.longitudes <= east)
+        return [
+            Cluster(latitude, longitude, count, member if count == 1 else None)
+            for latitude, longitude, count, member in zip(
+                level.latitudes[mask].tolist(), level.longitudes[mask].tolist(),
+                level.counts[mask].tolist(), level.members[mask].tolist(),
+            )
+        ]
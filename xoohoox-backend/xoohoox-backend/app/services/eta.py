@@ -0,0 +1,303 @@
+"""
+Arrival-time estimates for batches on their way to the lab.
+
+EtaTracker is an IngestBuffer stage. It keeps one Trip per batch in memory and
+advances it point by point as GPS points are ingested, never by rereading the
+batch's history:
+
+* a trip departs at its first point further than ETA_ARRIVAL_RADIUS_METERS
+  from the lab, and arrives at its first later point back within it (or
+  carrying a delivered/completed status);
+* each arrival is stored as a DeliveryLeg and folded into the pace (minutes
+  per great-circle kilometre) learned for the batch's farm and for the fleet;
+* the estimate is the latest point's time plus the remaining great-circle
+  distance at the farm's pace once it has legs, else the fleet's, else
+  ROUTING_SPEED_KMH slowed by ROUTING_ROAD_FACTOR.
+
+Estimates are recomputed for the batches in each flush (and for every trip
+when a new leg is learned) and held in a table that estimates() reads
+without touching the database. Paces are loaded from delivery_legs on first
+use. Trips not held in memory are seeded from their first and latest stored
+points: for the batches of a flush as they come in, and on startup for those
+seen within ETA_ACTIVE_HOURS.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.geolocation import COMPLETED_TRIP_STATUSES
+from app.db.bulk import insert_ignoring_conflicts
+from app.models.geolocation import DeliveryLeg, Harvest, LocationTracking
+from app.services.geometry import haversine_km
+
+MAX_TRACKED_BATCHES = 100000
+
+WAITING = "waiting"  # not yet left the lab's radius
+IN_TRANSIT = "in_transit"
+DELIVERED = "delivered"
+
+
+class Trip(NamedTuple):
+    batch_id: str
+    farm_id: Optional[str]
+    latitude: float
+    longitude: float
+    last_seen: datetime
+    departed_at: Optional[datetime] = None
+    departure_km: float = 0.0  # from the lab, at departure
+    arrived_at: Optional[datetime] = None
+
+
+class Pace(NamedTuple):
+    legs: int
+    minutes: float
+    km: float
+
+    def add(self, minutes: float, km: float) -> "Pace":
+        return Pace(self.legs + 1, self.minutes + minutes, self.km + km)
+
+
+class Estimate(NamedTuple):
+    batch_id: str
+    farm_id: Optional[str]
+    status: str
+    latitude: float
+    longitude: float
+    last_seen: datetime
+    departed_at: Optional[datetime]
+    remaining_km: float
+    eta: Optional[datetime]
+    progress: float
+    basis: Optional[str]  # farm, fleet or default
+    legs: int  # legs behind the pace used
+
+
+# Keyed on farm_id; the None key holds the whole fleet
+Paces = Dict[Optional[str], Pace]
+
+
+class EtaTracker:
+    def __init__(self, lab: Tuple[float, float], arrival_radius_m: float, speed_kmh: float, road_factor: float):
+        self.lab = lab
+        self.arrival_radius_km = arrival_radius_m / 1000
+        self.default_minutes_per_km = 60 * road_factor / speed_kmh
+        self._trips: "OrderedDict[str, Trip]" = OrderedDict()
+        self._estimates: Dict[str, Estimate] = {}
+        self._paces: Optional[Paces] = None
+        self._warmed = False
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._trips.clear()
+            self._estimates.clear()
+            self._paces = None
+            self._warmed = False
+
+    def advance(self, trip: Optional[Trip], point: Dict[str, Any], farm_id: Optional[str]) -> Tuple[Trip, Optional[Dict[str, Any]]]:
+        """The trip after one more point, and the leg it completes if any"""
+        timestamp = point["timestamp"]
+        if trip is None:
+            trip = Trip(point["batch_id"], farm_id, point["latitude"], point["longitude"], timestamp)
+        else:
+            trip = trip._replace(latitude=point["latitude"], longitude=point["longitude"], last_seen=timestamp)
+        if trip.arrived_at is not None:
+            return trip, None
+        distance = haversine_km(point["latitude"], point["longitude"], *self.lab)
+        if trip.departed_at is None:
+            if distance > self.arrival_radius_km:
+                trip = trip._replace(departed_at=timestamp, departure_km=distance)
+            return trip, None
+        if distance > self.arrival_radius_km and (point.get("status") or "").lower() not in COMPLETED_TRIP_STATUSES:
+            return trip, None
+        trip = trip._replace(arrived_at=timestamp)
+        return trip, {
+            "batch_id": trip.batch_id,
+            "farm_id": trip.farm_id,
+            "departed_at": trip.departed_at,
+            "arrived_at": timestamp,
+            "distance_km": trip.departure_km,
+            "duration_minutes": (timestamp - trip.departed_at).total_seconds() / 60,
+        }
+
+    def estimate(self, trip: Trip, paces: Paces) -> Estimate:
+        fields = {
+            "batch_id": trip.batch_id, "farm_id": trip.farm_id, "latitude": trip.latitude,
+            "longitude": trip.longitude, "last_seen": trip.last_seen, "departed_at": trip.departed_at,
+        }
+        if trip.arrived_at is not None:
+            return Estimate(
+                **fields, status=DELIVERED, remaining_km=0.0, eta=trip.arrived_at, progress=1.0, basis=None, legs=0
+            )
+        remaining = haversine_km(trip.latitude, trip.longitude, *self.lab)
+        if trip.departed_at is None:
+            return Estimate(**fields, status=WAITING, remaining_km=remaining, eta=None, progress=0.0, basis=None, legs=0)
+
+        pace = paces.get(trip.farm_id) if trip.farm_id is not None else None
+        basis = "farm"
+        if pace is None or not pace.km:
+            pace, basis = paces.get(None), "fleet"
+        if pace is None or not pace.km:
+            minutes_per_km, basis, legs = self.default_minutes_per_km, "default", 0
+        else:
+            minutes_per_km, legs = pace.minutes / pace.km, pace.legs
+        progress = 1 - remaining / trip.departure_km if trip.departure_km else 0.0
+        return Estimate(
+            **fields, status=IN_TRANSIT, remaining_km=remaining,
+            eta=trip.last_seen + timedelta(minutes=remaining * minutes_per_km),
+            progress=min(max(progress, 0.0), 1.0), basis=basis, legs=legs,
+        )
+
+    @staticmethod
+    def _load_paces(connection: Connection) -> Paces:
+        table = DeliveryLeg.__table__
+        paces: Paces = {}
+        fleet = Pace(0, 0.0, 0.0)
+        for farm_id, legs, minutes, km in connection.execute(
+            select(table.c.farm_id, func.count(), func.sum(table.c.duration_minutes), func.sum(table.c.distance_km))
+            .group_by(table.c.farm_id)
+        ):
+            if farm_id is not None:
+                paces[farm_id] = Pace(legs, minutes, km)
+            fleet = Pace(fleet.legs + legs, fleet.minutes + minutes, fleet.km + km)
+        paces[None] = fleet
+        return paces
+
+    @staticmethod
+    def _farm_ids(connection: Connection, harvest_ids: Iterable[str]) -> Dict[str, str]:
+        harvest_ids = list(set(harvest_ids))
+        if not harvest_ids:
+            return {}
+        table = Harvest.__table__
+        return dict(connection.execute(
+            select(table.c.harvest_id, table.c.farm_id).where(table.c.harvest_id.in_(harvest_ids))
+        ).all())
+
+    def _load_trips(
+        self, connection: Connection, batch_ids: Optional[Iterable[str]] = None, since: Optional[datetime] = None
+    ) -> Dict[str, Trip]:
+        """Trips rebuilt from each batch's first and latest stored points"""
+        table = LocationTracking.__table__
+        spans = select(
+            table.c.batch_id, func.min(table.c.timestamp).label("first"), func.max(table.c.timestamp).label("last")
+        ).group_by(table.c.batch_id)
+        if batch_ids is not None:
+            batch_ids = list(batch_ids)
+            if not batch_ids:
+                return {}
+            spans = spans.where(table.c.batch_id.in_(batch_ids))
+        if since is not None:
+            spans = spans.having(func.max(table.c.timestamp) >= since)
+        spans = spans.subquery()
+        ends: Dict[str, List[Dict[str, Any]]] = {}
+        for row in connection.execute(
+            select(table.c.batch_id, table.c.harvest_id, table.c.latitude, table.c.longitude, table.c.timestamp, table.c.status)
+            .join(spans, and_(
+                table.c.batch_id == spans.c.batch_id,
+                or_(table.c.timestamp == spans.c.first, table.c.timestamp == spans.c.last),
+            ))
+            .order_by(table.c.batch_id, table.c.timestamp)
+        ).mappings():
+            ends.setdefault(row["batch_id"], []).append(dict(row))
+        if not ends:
+            return {}
+
+        farm_ids = self._farm_ids(connection, [points[0]["harvest_id"] for points in ends.values()])
+        legs = DeliveryLeg.__table__
+        arrived = {
+            row.batch_id: row for row in connection.execute(
+                select(legs.c.batch_id, legs.c.departed_at, legs.c.arrived_at, legs.c.distance_km)
+                .where(legs.c.batch_id.in_(list(ends)))
+            )
+        }
+        trips = {}
+        for batch_id, points in ends.items():
+            trip = None
+            for point in (points[0], points[-1]) if len(points) > 1 else points:
+                trip, _ = self.advance(trip, point, farm_ids.get(point["harvest_id"]))
+            leg = arrived.get(batch_id)
+            if leg is not None:
+                trip = trip._replace(departed_at=leg.departed_at, departure_km=leg.distance_km, arrived_at=leg.arrived_at)
+            trips[batch_id] = trip
+        return trips
+
+    def __call__(self, connection: Connection, points: List[Dict[str, Any]]) -> Optional[Callable[[], None]]:
+        if not points:
+            return None
+        touched = {point["batch_id"] for point in points}
+        with self._lock:
+            paces = self._paces
+            trips = {batch_id: self._trips[batch_id] for batch_id in touched if batch_id in self._trips}
+        paces = dict(paces) if paces is not None else self._load_paces(connection)
+        trips.update(self._load_trips(connection, touched - set(trips)))
+        farm_ids = self._farm_ids(connection, [point["harvest_id"] for point in points if point["batch_id"] not in trips])
+
+        legs = []
+        for point in points:
+            trip, leg = self.advance(trips.get(point["batch_id"]), point, farm_ids.get(point["harvest_id"]))
+            trips[point["batch_id"]] = trip
+            if leg is not None:
+                legs.append(leg)
+                for key in {leg["farm_id"], None}:
+                    paces[key] = paces.get(key, Pace(0, 0.0, 0.0)).add(leg["duration_minutes"], leg["distance_km"])
+        insert_ignoring_conflicts(connection, DeliveryLeg.__table__, legs, ["batch_id"])
+
+        def committed() -> None:
+            with self._lock:
+                self._paces = paces
+                self._keep(trips.values())
+                # A new leg moves the pace of other trips from the same farm (or the fleet)
+                for trip in (self._trips.values() if legs else trips.values()):
+                    self._estimates[trip.batch_id] = self.estimate(trip, paces)
+
+        return committed
+
+    def _keep(self, trips: Iterable[Trip]) -> None:
+        for trip in trips:
+            self._trips[trip.batch_id] = trip
+            self._trips.move_to_end(trip.batch_id)
+        while len(self._trips) > MAX_TRACKED_BATCHES:
+            batch_id, _ = self._trips.popitem(last=False)
+            self._estimates.pop(batch_id, None)
+
+    def warm(self, db: Session, since: Optional[datetime] = None) -> None:
+        """Load paces and the trips of batches seen since (default ETA_ACTIVE_HOURS ago)"""
+        connection = db.connection()
+        paces = self._load_paces(connection)
+        trips = self._load_trips(
+            connection, since=since or datetime.utcnow() - timedelta(hours=settings.ETA_ACTIVE_HOURS)
+        )
+        with self._lock:
+            if self._paces is None:
+                self._paces = paces
+            self._keep(trip for batch_id, trip in trips.items() if batch_id not in self._trips)
+            for trip in self._trips.values():
+                self._estimates[trip.batch_id] = self.estimate(trip, self._paces)
+            self._warmed = True
+
+    def estimates(self, db: Session) -> List[Estimate]:
+        """Current estimates of every tracked batch; only the first call reads the database"""
+        if not self._warmed:
+            self.warm(db)
+        with self._lock:
+            return list(self._estimates.values())
+
+    def get(self, db: Session, batch_id: str) -> Optional[Estimate]:
+        if not self._warmed:
+            self.warm(db)
+        with self._lock:
+            return self._estimates.get(batch_id)
+
+
+tracker = EtaTracker(
+    (settings.LAB_LATITUDE, settings.LAB_LONGITUDE),
+    arrival_radius_m=settings.ETA_ARRIVAL_RADIUS_METERS,
+    speed_kmh=settings.ROUTING_SPEED_KMH,
+    road_factor=settings.ROUTING_ROAD_FACTOR,
+)
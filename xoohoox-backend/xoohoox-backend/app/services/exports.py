@@ -0,0 +1,53 @@
+"""
+Export jobs: data sets written to files under the job's result directory,
+streamed from the database so their size doesn't matter.
+"""
+import csv
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select
+
+from app.crud.batch_tracking import batch_tracking
+from app.models.batch_tracking import BatchTracking
+from app.services import jobs
+
+BATCH_EXPORT_COLUMNS = (
+    "batch_id", "name", "fruit_type", "process_type", "grower_id", "status", "stage", "progress",
+    "start_date", "end_date", "production_date", "final_product_quantity",
+)
+PROGRESS_EVERY = 1000
+
+
+@jobs.job_type("batch_export", concurrency=2)
+def export_batches(
+    context: jobs.JobContext,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    fruit_type: Optional[str] = None,
+    process_type: Optional[str] = None,
+    month: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Batches matching the batch search filters, as CSV"""
+    path = context.result_dir() / "batches.csv"
+    with context.session() as db:
+        clauses = batch_tracking.search_filters(
+            db, {"q": q, "status": status, "fruit_type": fruit_type, "process_type": process_type, "month": month}
+        )
+        total = db.scalar(select(func.count()).select_from(BatchTracking).where(*clauses))
+        rows = db.execute(
+            select(*[getattr(BatchTracking, column) for column in BATCH_EXPORT_COLUMNS])
+            .where(*clauses)
+            .order_by(BatchTracking.start_date, BatchTracking.id)
+            .execution_options(yield_per=PROGRESS_EVERY)
+        )
+        written = 0
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(BATCH_EXPORT_COLUMNS)
+            for row in rows:
+                writer.writerow([value.value if isinstance(value, Enum) else value for value in row])
+                written += 1
+                if written % PROGRESS_EVERY == 0:
+                    context.progress(written / total, f"{written} of {total} batches")
+    return {"path": str(path), "media_type": "text/csv", "rows": written}
@@ -0,0 +1,148 @@
+"""
+Geofence enter/exit/dwell detection over the GPS ingest stream.
+
+GeofenceEventDetector is an IngestBuffer stage. For each flush it matches all
+in-order points against the active geofences in one vectorized call, walks
+each batch's points in time order against that batch's last-known fences
+(kept in memory) and:
+
+* sets geofence_id on every point (first containing fence, by id);
+* emits an enter alert when a batch appears in a fence, exit when it leaves,
+  and dwell once it has stayed GEOFENCE_DWELL_SECONDS;
+* bulk-inserts the alerts of fences with alerts_enabled, skipping those
+  already stored, so replayed points don't repeat them.
+
+State for a batch the detector hasn't seen (e.g. after a restart) is seeded
+from its stored alerts rather than its track history. The new state is only
+kept, and the alerts only published to the live feed, once the flush commits.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.crud.geolocation import geofence_index
+from app.db.bulk import insert_ignoring_conflicts
+from app.models.geolocation import GeofenceAlert
+from app.services import live_events
+
+MAX_TRACKED_BATCHES = 100000
+# An alert is stored once per event, however often its points are replayed
+ALERT_KEY = ("batch_id", "geofence_id", "alert_type", "timestamp")
+
+# geofence_id -> (entered at, dwell alert sent)
+FenceState = Dict[str, Tuple[datetime, bool]]
+
+
+class GeofenceEventDetector:
+    def __init__(self, dwell_seconds: float):
+        self.dwell = timedelta(seconds=dwell_seconds)
+        self._state: "OrderedDict[str, FenceState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state.clear()
+
+    def _load_state(self, connection: Connection, batch_ids: Iterable[str]) -> Dict[str, FenceState]:
+        """Replay the stored alerts of batches not held in memory"""
+        states: Dict[str, FenceState] = {batch_id: {} for batch_id in batch_ids}
+        if not states:
+            return states
+        table = GeofenceAlert.__table__
+        rows = connection.execute(
+            select(table.c.batch_id, table.c.geofence_id, table.c.alert_type, table.c.timestamp)
+            .where(table.c.batch_id.in_(list(states)))
+            .order_by(table.c.timestamp, table.c.id)
+        )
+        for row in rows:
+            fences = states[row.batch_id]
+            if row.alert_type == "enter":
+                fences[row.geofence_id] = (row.timestamp, False)
+            elif row.alert_type == "dwell" and row.geofence_id in fences:
+                fences[row.geofence_id] = (fences[row.geofence_id][0], True)
+            elif row.alert_type == "exit":
+                fences.pop(row.geofence_id, None)
+        return states
+
+    def __call__(self, connection: Connection, points: List[Dict[str, Any]]) -> Optional[Callable[[], None]]:
+        if not points:
+            return None
+        snapshot = geofence_index.snapshot(connection)
+        matches = geofence_index.match_points(
+            connection,
+            latitudes=[point["latitude"] for point in points],
+            longitudes=[point["longitude"] for point in points],
+        )
+
+        with self._lock:
+            touched = {point["batch_id"] for point in points}
+            states = {batch_id: dict(self._state[batch_id]) for batch_id in touched if batch_id in self._state}
+        states.update(self._load_state(connection, touched - set(states)))
+
+        alerts = []
+        for index, point in enumerate(points):
+            inside = matches.get(index, [])
+            point["geofence_id"] = inside[0] if inside else None
+            fences = states[point["batch_id"]]
+            timestamp = point["timestamp"]
+            for geofence_id in [fence for fence in fences if fence not in inside]:
+                del fences[geofence_id]
+                alerts.append(self._alert(point, geofence_id, "exit"))
+            for geofence_id in inside:
+                if geofence_id not in fences:
+                    fences[geofence_id] = (timestamp, False)
+                    alerts.append(self._alert(point, geofence_id, "enter"))
+                elif not fences[geofence_id][1] and timestamp - fences[geofence_id][0] >= self.dwell:
+                    fences[geofence_id] = (fences[geofence_id][0], True)
+                    alerts.append(self._alert(point, geofence_id, "dwell"))
+
+        alerts = [alert for alert in alerts if alert["geofence_id"] in snapshot.alerting]
+        alerts = self._unrecorded(connection, alerts)
+        insert_ignoring_conflicts(connection, GeofenceAlert.__table__, alerts, ALERT_KEY)
+
+        def committed() -> None:
+            with self._lock:
+                for batch_id, fences in states.items():
+                    self._state[batch_id] = fences
+                    self._state.move_to_end(batch_id)
+                while len(self._state) > MAX_TRACKED_BATCHES:
+                    self._state.popitem(last=False)
+            live_events.broker.publish([(live_events.GEOFENCE_ALERT, live_events.jsonable(alert)) for alert in alerts])
+
+        return committed
+
+    @staticmethod
+    def _unrecorded(connection: Connection, alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop alerts already stored (replayed points), so they aren't published again"""
+        if not alerts:
+            return alerts
+        table = GeofenceAlert.__table__
+        timestamps = [alert["timestamp"] for alert in alerts]
+        stored = set(connection.execute(
+            select(*(table.c[name] for name in ALERT_KEY))
+            .where(table.c.batch_id.in_({alert["batch_id"] for alert in alerts}))
+            .where(table.c.timestamp.between(min(timestamps), max(timestamps)))
+        ).tuples())
+        return [alert for alert in alerts if tuple(alert[name] for name in ALERT_KEY) not in stored]
+
+    @staticmethod
+    def _alert(point: Dict[str, Any], geofence_id: str, alert_type: str) -> Dict[str, Any]:
+        verb = {"enter": "entered", "exit": "left", "dwell": "is dwelling in"}[alert_type]
+        return {
+            "geofence_id": geofence_id,
+            "batch_id": point["batch_id"],
+            "tracking_id": point.get("tracking_id"),
+            "alert_type": alert_type,
+            "timestamp": point["timestamp"],
+            "latitude": point["latitude"],
+            "longitude": point["longitude"],
+            "message": f"Batch {point['batch_id']} {verb} geofence {geofence_id}",
+        }
+
+
+detector = GeofenceEventDetector(dwell_seconds=settings.GEOFENCE_DWELL_SECONDS)
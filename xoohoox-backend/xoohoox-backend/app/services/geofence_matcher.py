@@ -0,0 +1,67 @@
+"""
+Vectorized point-in-polygon matching of many points against many geofences.
+
+Polygons are compiled once into NumPy vertex arrays with their bounding box.
+Points are sorted by latitude so each polygon only ray-casts the points
+inside its bounding box (a binary search on latitude, then a longitude mask).
+The ray cast itself loops over polygon edges and is vectorized over points.
+It uses the same boundary convention as geometry.point_in_polygon.
+"""
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from app.services.geometry import BBox, polygon_bbox
+
+
+class CompiledPolygon(NamedTuple):
+    geofence_id: str
+    bbox: BBox
+    lats: np.ndarray
+    lngs: np.ndarray
+
+
+def compile_polygon(geofence_id: str, coordinates: Sequence[Sequence[float]]) -> CompiledPolygon:
+    vertices = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    return CompiledPolygon(geofence_id, polygon_bbox(coordinates), vertices[:, 0].copy(), vertices[:, 1].copy())
+
+
+def points_in_polygon(lats: np.ndarray, lngs: np.ndarray, polygon: CompiledPolygon) -> np.ndarray:
+    """Boolean mask of the points inside polygon"""
+    inside = np.zeros(len(lats), dtype=bool)
+    if len(polygon.lats) < 3:
+        return inside
+    next_lats, next_lngs = np.roll(polygon.lats, -1), np.roll(polygon.lngs, -1)
+    for x1, y1, x2, y2 in zip(polygon.lats, polygon.lngs, next_lats, next_lngs):
+        # Edges whose longitude span (min, max] holds the point
+        crossing = np.nonzero((lngs > min(y1, y2)) & (lngs <= max(y1, y2)))[0]
+        if not len(crossing):
+            continue
+        xinters = (lngs[crossing] - y1) * (x2 - x1) / (y2 - y1) + x1
+        inside[crossing[lats[crossing] <= xinters]] ^= True
+    return inside
+
+
+def match_points(
+    lats: Sequence[float], lngs: Sequence[float], polygons: Sequence[CompiledPolygon]
+) -> Dict[int, List[str]]:
+    """Map each point index to the ids of the polygons containing it (points in none are omitted)"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    order = np.argsort(lats, kind="stable")
+    sorted_lats = lats[order]
+
+    matches: Dict[int, List[str]] = {}
+    for polygon in polygons:
+        min_lat, min_lng, max_lat, max_lng = polygon.bbox
+        start = np.searchsorted(sorted_lats, min_lat, side="left")
+        stop = np.searchsorted(sorted_lats, max_lat, side="right")
+        candidates = order[start:stop]
+        candidate_lngs = lngs[candidates]
+        candidates = candidates[(candidate_lngs >= min_lng) & (candidate_lngs <= max_lng)]
+        if not len(candidates):
+            continue
+        hits = candidates[points_in_polygon(lats[candidates], lngs[candidates], polygon)]
+        for index in hits.tolist():
+            matches.setdefault(index, []).append(polygon.geofence_id)
+    return matches
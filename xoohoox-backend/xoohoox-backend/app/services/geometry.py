@@ -0,0 +1,79 @@
+"""
+Planar geometry helpers for geofence polygons.
+
+Polygons are lists of [lat, lng] vertices (the format stored in
+geofences.coordinates); the closing vertex may be omitted. Bounding boxes are
+(min_lat, min_lng, max_lat, max_lng) tuples.
+"""
+import math
+from typing import Optional, Sequence, Tuple
+
+BBox = Tuple[float, float, float, float]
+
+
+def polygon_bbox(polygon: Optional[Sequence[Sequence[float]]]) -> Optional[BBox]:
+    """Bounding box of a polygon, or None when it has no vertices"""
+    if not polygon:
+        return None
+    lats = [vertex[0] for vertex in polygon]
+    lngs = [vertex[1] for vertex in polygon]
+    return min(lats), min(lngs), max(lats), max(lngs)
+
+
+def point_in_polygon(latitude: float, longitude: float, polygon: Sequence[Sequence[float]]) -> bool:
+    """Ray casting point-in-polygon test"""
+    n = len(polygon)
+    if n < 3:
+        return False
+    inside = False
+
+    p1x, p1y = polygon[0]
+    for i in range(n + 1):
+        p2x, p2y = polygon[i % n]
+        if longitude > min(p1y, p2y):
+            if longitude <= max(p1y, p2y):
+                if latitude <= max(p1x, p2x):
+                    if p1y != p2y:
+                        xinters = (longitude - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                    if p1x == p2x or latitude <= xinters:
+                        inside = not inside
+        p1x, p1y = p2x, p2y
+
+    return inside
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def polygon_centroid(polygon: Optional[Sequence[Sequence[float]]]) -> Optional[Tuple[float, float]]:
+    """Area centroid of a polygon (vertex mean for degenerate ones), or None when empty"""
+    if not polygon:
+        return None
+    # Shoelace formula relative to the first vertex to keep the products small
+    origin_lat, origin_lng = polygon[0][0], polygon[0][1]
+    area = lat_sum = lng_sum = 0.0
+    n = len(polygon)
+    for i in range(n):
+        x1, y1 = polygon[i][0] - origin_lat, polygon[i][1] - origin_lng
+        x2, y2 = polygon[(i + 1) % n][0] - origin_lat, polygon[(i + 1) % n][1] - origin_lng
+        cross = x1 * y2 - x2 * y1
+        area += cross
+        lat_sum += (x1 + x2) * cross
+        lng_sum += (y1 + y2) * cross
+    if abs(area) < 1e-18:
+        return sum(v[0] for v in polygon) / n, sum(v[1] for v in polygon) / n
+    return origin_lat + lat_sum / (3 * area), origin_lng + lng_sum / (3 * area)
+
+
+def bounding_radius_km(centre: Tuple[float, float], polygon: Sequence[Sequence[float]]) -> float:
+    """Radius of the circle around centre that holds every vertex"""
+    return max(haversine_km(centre[0], centre[1], vertex[0], vertex[1]) for vertex in polygon)
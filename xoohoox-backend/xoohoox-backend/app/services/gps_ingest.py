@@ -0,0 +1,294 @@
+"""
+Write-behind ingestion of GPS points into location_tracking.
+
+Requests hand validated points to IngestBuffer.offer(), which only queues
+them. A background thread flushes the queue once it reaches flush_size
+points or flush_interval seconds, each flush in a single transaction:
+
+* points are deduplicated on a tracking_id derived from (batch_id,
+  timestamp), in the queue and against stored rows (conflicting inserts are
+  skipped), so re-sent uploads are harmless;
+* points are ordered per batch, and points older than the newest already
+  flushed for their batch are stored but counted as late;
+* the in-order points are handed to the registered stages, e.g. geofence
+  event detection, arrival-time estimates, route simplification of
+  completed trips and the live feed. A stage is
+  called with the connection and the points before they are written, so it
+  may fill in columns such as geofence_id, and may return a callback to run
+  once the flush has committed;
+* rows are written with one driver-level bulk insert, with their geohash
+  cells and trace links, and logged for replication on an edge box.
+
+The queue is bounded: offer() raises BufferFull rather than grow past
+max_points, which the API reports as 429 so clients back off.
+
+A flush the database rejects (a constraint or a value it won't take) is
+split in halves, and those again, until the points it rejects are found;
+the others are written. A rejected point is requeued, and after
+max_attempts flushes moved to location_tracking_quarantine with the error,
+so one bad point can't stall the queue. Any other failure, such as a lost
+connection, requeues the whole flush.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import traceability
+from app.db import replication
+from app.db.bulk import insert_ignoring_conflicts
+from app.models.geolocation import LocationTracking, LocationTrackingQuarantine
+from app.services import eta, geofence_events, geohash, live_events, route_tracks
+
+logger = logging.getLogger(__name__)
+
+Stage = Callable[[Connection, List[Dict[str, Any]]], Optional[Callable[[], None]]]
+
+# Newest flushed timestamp per batch, kept for this many batches
+MAX_TRACKED_BATCHES = 100000
+
+# Failures caused by the points themselves rather than the database being unavailable
+REJECTED = (IntegrityError, DataError)
+
+
+class BufferFull(Exception):
+    pass
+
+
+def tracking_id_for(batch_id: str, timestamp: datetime) -> str:
+    digest = hashlib.sha1(f"{batch_id}|{timestamp.isoformat()}".encode()).hexdigest()
+    return f"TRACK_{digest[:16].upper()}"
+
+
+class IngestBuffer:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        max_points: int = 200000,
+        flush_size: int = 5000,
+        flush_interval: float = 1.0,
+        max_attempts: int = 3,
+        stages: Sequence[Stage] = (),
+    ):
+        self.session_factory = session_factory
+        self.max_points = max_points
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.stages: List[Stage] = list(stages)
+
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._in_flight = 0
+        self._latest: "OrderedDict[str, datetime]" = OrderedDict()
+        self._attempts: Dict[str, int] = {}  # failed flushes per rejected tracking_id
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self._counters = dict.fromkeys(
+            ("received", "accepted", "duplicates", "late", "rejected", "written", "flushes", "flush_errors",
+             "point_errors", "quarantined"), 0
+        )
+        self._flush_seconds = 0.0
+        self._last_flush_ms = 0.0
+
+    def offer(self, points: Sequence[Dict[str, Any]]) -> Dict[str, int]:
+        """Queue points (dicts of location_tracking columns); raises BufferFull when out of room"""
+        with self._lock:
+            self._counters["received"] += len(points)
+            if len(self._pending) + self._in_flight + len(points) > self.max_points:
+                self._counters["rejected"] += len(points)
+                raise BufferFull(f"Ingest buffer full ({len(self._pending) + self._in_flight} points queued)")
+            accepted = 0
+            for point in points:
+                tracking_id = tracking_id_for(point["batch_id"], point["timestamp"])
+                if tracking_id in self._pending:
+                    continue
+                self._pending[tracking_id] = {"geofence_id": None, **point, "id": tracking_id, "tracking_id": tracking_id}
+                accepted += 1
+            self._counters["accepted"] += accepted
+            self._counters["duplicates"] += len(points) - accepted
+            buffered = len(self._pending)
+        self._ensure_started()
+        if buffered >= self.flush_size:
+            self._wake.set()
+        return {"accepted": accepted, "duplicates": len(points) - accepted, "buffered": buffered}
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of points written"""
+        with self._flush_lock:
+            with self._lock:
+                points = list(self._pending.values())
+                self._pending = OrderedDict()
+                self._in_flight = len(points)
+            if not points:
+                return 0
+            started = time.perf_counter()
+            try:
+                late, rejected = self._write_isolating(points)
+                requeue = self._reject(rejected)
+            except Exception:
+                logger.exception(f"GPS ingest flush of {len(points)} points failed; requeueing")
+                with self._lock:
+                    self._counters["flush_errors"] += 1
+                    requeued = OrderedDict((point["tracking_id"], point) for point in points)
+                    requeued.update(self._pending)
+                    self._pending = requeued
+                    self._in_flight = 0
+                return 0
+            elapsed = time.perf_counter() - started
+            written = len(points) - len(rejected)
+            with self._lock:
+                if requeue:
+                    requeued = OrderedDict((point["tracking_id"], point) for point in requeue)
+                    requeued.update(self._pending)
+                    self._pending = requeued
+                self._in_flight = 0
+                self._counters["late"] += late
+                self._counters["written"] += written
+                self._counters["point_errors"] += len(rejected)
+                self._counters["quarantined"] += len(rejected) - len(requeue)
+                self._counters["flushes"] += 1
+                self._flush_seconds += elapsed
+                self._last_flush_ms = elapsed * 1000
+            return written
+
+    def _write_isolating(self, points: List[Dict[str, Any]]) -> Tuple[int, List[Tuple[Dict[str, Any], Exception]]]:
+        """
+        Write points, halving a flush the database rejects until the points it
+        rejects are isolated; returns the late count and the rejected points
+        with their errors
+        """
+        try:
+            return self._write(points), []
+        except REJECTED as e:
+            if len(points) == 1:
+                return 0, [(points[0], e)]
+        middle = len(points) // 2
+        late, rejected = self._write_isolating(points[:middle])
+        more_late, more_rejected = self._write_isolating(points[middle:])
+        return late + more_late, rejected + more_rejected
+
+    def _reject(self, rejected: List[Tuple[Dict[str, Any], Exception]]) -> List[Dict[str, Any]]:
+        """Quarantine the rejected points out of attempts; returns those to requeue"""
+        requeue, quarantine = [], []
+        for point, error in rejected:
+            attempts = self._attempts.get(point["tracking_id"], 0) + 1
+            if attempts < self.max_attempts:
+                self._attempts[point["tracking_id"]] = attempts
+                requeue.append(point)
+                continue
+            self._attempts.pop(point["tracking_id"], None)
+            quarantine.append({
+                "tracking_id": point["tracking_id"], "batch_id": point.get("batch_id"),
+                "point": {key: value.isoformat() if isinstance(value, datetime) else value for key, value in point.items()},
+                "error": str(getattr(error, "orig", error)).splitlines()[0], "attempts": attempts,
+            })
+        if quarantine:
+            session = self.session_factory()
+            try:
+                session.execute(insert(LocationTrackingQuarantine), quarantine)
+                session.commit()
+            finally:
+                session.close()
+            logger.warning(f"GPS ingest quarantined {len(quarantine)} points the database keeps rejecting")
+        return requeue
+
+    def _write(self, points: List[Dict[str, Any]]) -> int:
+        points.sort(key=lambda point: (point["batch_id"], point["timestamp"]))
+        in_order = []
+        for point in points:
+            latest = self._latest.get(point["batch_id"])
+            if latest is None or point["timestamp"] > latest:
+                in_order.append(point)
+
+        cells = geohash.encode_many([point["latitude"] for point in points], [point["longitude"] for point in points])
+        for point, cell in zip(points, cells):
+            point["geohash"] = cell
+
+        session = self.session_factory()
+        try:
+            connection = session.connection()
+            on_commit = [stage(connection, in_order) for stage in self.stages]
+            insert_ignoring_conflicts(connection, LocationTracking.__table__, points, ["tracking_id"])
+            traceability.index_rows(connection, LocationTracking, points)
+            replication.log_rows(connection, LocationTracking, points)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        for callback in on_commit:
+            if callback is not None:
+                callback()
+
+        if self._attempts:
+            for point in points:
+                self._attempts.pop(point["tracking_id"], None)
+        for point in in_order:
+            self._latest[point["batch_id"]] = point["timestamp"]
+            self._latest.move_to_end(point["batch_id"])
+        while len(self._latest) > MAX_TRACKED_BATCHES:
+            self._latest.popitem(last=False)
+        return len(points) - len(in_order)
+
+    def _ensure_started(self) -> None:
+        if self._thread is None and not self._stopping and self.flush_interval:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="gps-ingest-flush", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write whatever is still queued"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._stopping = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "buffered": len(self._pending) + self._in_flight,
+                "capacity": self.max_points,
+                "last_flush_ms": round(self._last_flush_ms, 2),
+                "flush_points_per_second": round(self._counters["written"] / self._flush_seconds) if self._flush_seconds else 0,
+            }
+
+
+def _default_session() -> Session:
+    from app.db.database import SessionLocal
+    return SessionLocal()
+
+
+ingest_buffer = IngestBuffer(
+    _default_session,
+    max_points=settings.GPS_INGEST_MAX_BUFFERED_POINTS,
+    flush_size=settings.GPS_INGEST_FLUSH_SIZE,
+    flush_interval=settings.GPS_INGEST_FLUSH_INTERVAL_SECONDS,
+    max_attempts=settings.GPS_INGEST_MAX_ATTEMPTS,
+    stages=[geofence_events.detector, eta.tracker, route_tracks.complete_trips, live_events.publish_points],
+)
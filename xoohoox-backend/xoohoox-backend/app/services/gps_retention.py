@@ -0,0 +1,240 @@
+"""
+Retention for location_tracking: downsample old trips and archive raw points.
+
+A trip (a batch's track) is due once its newest point is older than
+GPS_RETENTION_DAYS. Each due trip is handled on its own:
+
+1. all of its raw rows are written to a gzipped NDJSON file under
+   GPS_ARCHIVE_DIR, named after its location_tracking_archives row and
+   never overwritten;
+2. the rows kept are the Douglas-Peucker simplification of the track at
+   GPS_RETENTION_TOLERANCE_METERS, plus both sides of every geofence_id or
+   status change, so geofence transitions and status history survive;
+3. the other rows, and their trace links, are deleted GPS_RETENTION_CHUNK_SIZE
+   at a time, each chunk in its own short transaction. The archive row is
+   completed once they are all gone; a run that stopped part way is
+   resumed by the next from the archive file, before new trips are taken.
+
+A trip is due again only if points arrive after it was archived. Space
+reclaimed is measured where the database reports it (SQLite pages in use,
+PostgreSQL relation size; the latter only shrinks after VACUUM), alongside
+the uncompressed size of the rows removed.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import traceability
+from app.models.geolocation import LocationTracking, LocationTrackingArchive
+from app.services import jobs
+from app.services.track_simplify import Track, douglas_peucker, project_metres
+
+logger = logging.getLogger(__name__)
+
+
+def retained_indices(
+    track: Track, geofence_ids: Sequence[Optional[str]], statuses: Sequence[Optional[str]], tolerance_m: float
+) -> np.ndarray:
+    """Sorted indices of the points a downsampled track keeps"""
+    n = len(track.latitudes)
+    keep = np.zeros(n, dtype=bool)
+    if n:
+        x, y = project_metres(track)
+        keep[douglas_peucker(x, y, tolerance_m)] = True
+    for values in (geofence_ids, statuses):
+        changed = np.array([values[i] != values[i - 1] for i in range(1, n)], dtype=bool)
+        keep[1:] |= changed
+        keep[:-1] |= changed
+    return np.flatnonzero(keep)
+
+
+def _used_bytes(db: Session) -> Optional[int]:
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        page_size, page_count, free = (
+            db.execute(text(f"PRAGMA {pragma}")).scalar() for pragma in ("page_size", "page_count", "freelist_count")
+        )
+        return page_size * (page_count - free)
+    if dialect == "postgresql":
+        return db.execute(text("SELECT pg_total_relation_size('location_tracking')")).scalar()
+    return None
+
+
+def due_batches(db: Session, cutoff: datetime) -> List[str]:
+    """Batches idle since before cutoff with points not yet through retention"""
+    table = LocationTracking.__table__
+    counts = dict(db.execute(
+        select(table.c.batch_id, func.count())
+        .group_by(table.c.batch_id)
+        .having(func.max(table.c.timestamp) < cutoff)
+    ).all())
+    if not counts:
+        return []
+    kept: Dict[str, int] = {}
+    for batch_id, points_kept in db.execute(
+        select(LocationTrackingArchive.batch_id, LocationTrackingArchive.points_kept)
+        .where(LocationTrackingArchive.batch_id.in_(list(counts)))
+        .order_by(LocationTrackingArchive.id)
+    ):
+        kept[batch_id] = points_kept
+    return sorted(batch_id for batch_id, points in counts.items() if points > kept.get(batch_id, 0))
+
+
+def _archive_path(archive_dir: Path, batch_id: str, first: datetime, last: datetime, archive_id: int) -> Path:
+    safe_batch = re.sub(r"[^A-Za-z0-9_.-]", "_", batch_id)
+    return archive_dir / safe_batch / f"{first:%Y%m%dT%H%M%S}-{last:%Y%m%dT%H%M%S}-{archive_id}.ndjson.gz"
+
+
+def _write_archive(path: Path, rows: List[Dict[str, Any]]) -> int:
+    """Write rows as gzipped NDJSON, atomically and only if path doesn't exist; returns the uncompressed size"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    raw_bytes = 0
+    with gzip.open(temporary, "wb") as archive:
+        for row in rows:
+            line = (json.dumps(row, default=lambda value: value.isoformat()) + "\n").encode()
+            raw_bytes += len(line)
+            archive.write(line)
+    try:
+        os.link(temporary, path)  # unlike os.replace, fails if path exists
+    finally:
+        os.remove(temporary)
+    return raw_bytes
+
+
+def _read_archive(path: str) -> List[Dict[str, Any]]:
+    with gzip.open(path, "rt") as lines:
+        rows = [json.loads(line) for line in lines]
+    for row in rows:
+        row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+    return rows
+
+
+def _removed_rows(rows: List[Dict[str, Any]], tolerance_m: float) -> List[Dict[str, Any]]:
+    """The rows of a trip (in timestamp order) its downsampled track doesn't keep"""
+    track = Track(
+        np.array([row["latitude"] for row in rows], dtype=np.float64),
+        np.array([row["longitude"] for row in rows], dtype=np.float64),
+        np.arange(len(rows), dtype=np.int64),
+    )
+    keep = set(retained_indices(
+        track, [row["geofence_id"] for row in rows], [row["status"] for row in rows], tolerance_m
+    ).tolist())
+    return [row for index, row in enumerate(rows) if index not in keep]
+
+
+def _delete_rows(db: Session, rows: List[Dict[str, Any]], chunk_size: int) -> int:
+    """Delete rows and their trace links, a chunk per transaction; rows already gone are skipped"""
+    table = LocationTracking.__table__
+    deleted = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        connection = db.connection()
+        traceability.unindex_keys(connection, LocationTracking, [row["tracking_id"] for row in chunk])
+        deleted += connection.execute(delete(table).where(table.c.id.in_([row["id"] for row in chunk]))).rowcount
+        db.commit()
+    return deleted
+
+
+def resume_incomplete(db: Session, *, tolerance_m: float, chunk_size: int) -> int:
+    """Finish archives whose deletes were interrupted; returns the points deleted"""
+    deleted = 0
+    for archive in db.scalars(
+        select(LocationTrackingArchive).where(LocationTrackingArchive.completed_at.is_(None))
+        .order_by(LocationTrackingArchive.id)
+    ).all():
+        # The archive holds the trip as it was, so the same rows come out of the simplification
+        deleted += _delete_rows(db, _removed_rows(_read_archive(archive.path), tolerance_m), chunk_size)
+        archive.completed_at = datetime.utcnow()
+        db.commit()
+        logger.info(f"GPS retention: resumed archive {archive.id} of batch {archive.batch_id}")
+    return deleted
+
+
+def run_retention(
+    db: Session,
+    *,
+    older_than_days: int = settings.GPS_RETENTION_DAYS,
+    tolerance_m: float = settings.GPS_RETENTION_TOLERANCE_METERS,
+    chunk_size: int = settings.GPS_RETENTION_CHUNK_SIZE,
+    archive_dir: str = settings.GPS_ARCHIVE_DIR,
+    now: Optional[datetime] = None,
+    dry_run: bool = False,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Dict[str, Any]:
+    """Downsample and archive every due trip; returns what was (or would be) done"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    table = LocationTracking.__table__
+    report = dict.fromkeys(
+        ("batches", "points_archived", "points_deleted", "points_kept", "archive_files", "archive_bytes", "raw_bytes_deleted"), 0
+    )
+    used_before = None if dry_run else _used_bytes(db)
+
+    if not dry_run:
+        report["points_deleted"] += resume_incomplete(db, tolerance_m=tolerance_m, chunk_size=chunk_size)
+
+    batch_ids = due_batches(db, cutoff)
+    for done, batch_id in enumerate(batch_ids):
+        if progress is not None:
+            progress(done / len(batch_ids), f"{done} of {len(batch_ids)} trips")
+        rows = [dict(row) for row in db.execute(
+            select(table).where(table.c.batch_id == batch_id).order_by(table.c.timestamp, table.c.tracking_id)
+        ).mappings()]
+        removed = _removed_rows(rows, tolerance_m)
+        kept = len(rows) - len(removed)
+        report["batches"] += 1
+        report["points_archived"] += len(rows)
+        report["points_kept"] += kept
+        if dry_run:
+            report["points_deleted"] += len(removed)
+            continue
+
+        archive = LocationTrackingArchive(
+            batch_id=batch_id, path="", first_timestamp=rows[0]["timestamp"], last_timestamp=rows[-1]["timestamp"],
+            points_archived=len(rows), points_kept=kept, bytes=0,
+        )
+        db.add(archive)
+        db.flush()
+        path = _archive_path(Path(archive_dir), batch_id, rows[0]["timestamp"], rows[-1]["timestamp"], archive.id)
+        try:
+            raw_bytes = _write_archive(path, rows)
+        except Exception:
+            db.rollback()
+            raise
+        archive.path, archive.bytes = str(path), path.stat().st_size
+        db.commit()
+        report["archive_files"] += 1
+        report["archive_bytes"] += archive.bytes
+        report["raw_bytes_deleted"] += round(raw_bytes * len(removed) / len(rows))
+
+        report["points_deleted"] += _delete_rows(db, removed, chunk_size)
+        archive.completed_at = datetime.utcnow()
+        db.commit()
+        logger.info(f"GPS retention: batch {batch_id} kept {kept} of {len(rows)} points, archived to {path}")
+
+    used_after = None if dry_run else _used_bytes(db)
+    report["reclaimed_bytes"] = used_before - used_after if used_before is not None and used_after is not None else None
+    return report
+
+
+@jobs.job_type("gps_retention", max_attempts=2, backoff_seconds=300, privileged=True)
+def retention_job(
+    context: jobs.JobContext,
+    older_than_days: int = settings.GPS_RETENTION_DAYS,
+    tolerance_m: float = settings.GPS_RETENTION_TOLERANCE_METERS,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    with context.session() as db:
+        return run_retention(
+            db, older_than_days=older_than_days, tolerance_m=tolerance_m, dry_run=dry_run, progress=context.progress
+        )
@@ -0,0 +1,374 @@
+"""
+Background jobs: heavy work (exports, retention, fits, reports) taken off the
+request path.
+
+A job type is a function registered with @job_type, called as
+handler(context, **params) and returning a JSON-ready result: a small report,
+or a pointer to a file it wrote under context.result_dir(). Jobs live in the
+jobs table, so their state, progress and result survive restarts and are
+visible to every process.
+
+JobRunner polls the table for due jobs and claims each with a conditional
+UPDATE, so any number of runners (the API processes, or scripts/job_worker.py
+when JOBS_RUN_IN_API is off) can share it. Per job type:
+
+* concurrency caps the jobs of the type running at once, across runners:
+  the claim only succeeds while fewer are running, counted in the same
+  UPDATE (under a per-type advisory lock on PostgreSQL, whose statements
+  read a snapshot that wouldn't see another runner's concurrent claim);
+* a failed attempt is retried after backoff_seconds, doubling each time, up
+  to max_attempts; JobError fails the job at once;
+* privileged=True (jobs that delete data) takes a superuser to submit or
+  cancel through the API;
+* pool="process" runs the handler in a worker process (CPU-bound work that
+  would otherwise hold the GIL), pool="thread" in the runner's threads.
+
+Runners keep the heartbeat of their running jobs fresh; a job whose
+heartbeat is older than JOBS_STALE_SECONDS (its runner died) counts as a
+failed attempt. Cancelling a running job takes effect at its next
+context.progress() call.
+"""
+import inspect
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobError(Exception):
+    """A failure retrying won't fix"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobType(NamedTuple):
+    name: str
+    handler: Callable[..., Any]
+    concurrency: int
+    max_attempts: int
+    backoff_seconds: float
+    pool: str
+    privileged: bool = False
+
+
+JOB_TYPES: Dict[str, JobType] = {}
+
+
+def job_type(
+    name: str,
+    *,
+    concurrency: int = 1,
+    max_attempts: int = 3,
+    backoff_seconds: float = 30.0,
+    pool: str = "thread",
+    privileged: bool = False,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Register a handler(context, **params) as the job type name"""
+    if pool not in ("thread", "process"):
+        raise ValueError("pool must be 'thread' or 'process'")
+
+    def register(handler: Callable[..., Any]) -> Callable[..., Any]:
+        JOB_TYPES[name] = JobType(name, handler, concurrency, max_attempts, backoff_seconds, pool, privileged)
+        return handler
+    return register
+
+
+def _checked(name: str, params: Dict[str, Any]) -> JobType:
+    kind = JOB_TYPES.get(name)
+    if kind is None:
+        raise ValueError(f"Unknown job type {name}")
+    try:
+        inspect.signature(kind.handler).bind(None, **params)
+    except TypeError as e:
+        raise ValueError(f"Invalid params for {name}: {e}")
+    return kind
+
+
+def enqueue(connection: Connection, name: str, params: Dict[str, Any], *, run_after: Optional[datetime] = None) -> str:
+    """
+    Queue a job inside the caller's transaction (e.g. an ingest flush), so it
+    exists only if that commits; runners pick it up at their next poll
+    """
+    kind = _checked(name, params)
+    job_id = uuid.uuid4().hex
+    connection.execute(insert(Job).values(
+        id=job_id, type=name, state=QUEUED, params=params, progress=0.0, attempts=0,
+        max_attempts=kind.max_attempts, run_after=run_after or datetime.utcnow(), cancel_requested=False,
+    ))
+    return job_id
+
+
+def _default_session() -> Session:
+    from app.db.database import SessionLocal
+    return SessionLocal()
+
+
+class JobContext:
+    """What a handler gets besides its params"""
+
+    def __init__(self, job_id: str, session_factory: Callable[[], Session], results_dir: str):
+        self.job_id = job_id
+        self.session_factory = session_factory
+        self.results_dir = results_dir
+
+    def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """Record progress; raises JobCancelled once the job has been cancelled"""
+        with self.session_factory() as db:
+            db.execute(
+                update(Job).where(Job.id == self.job_id).values(
+                    progress=min(max(fraction, 0.0), 1.0), message=message, heartbeat_at=datetime.utcnow()
+                )
+            )
+            cancelled = db.execute(select(Job.cancel_requested).where(Job.id == self.job_id)).scalar()
+            db.commit()
+        if cancelled:
+            raise JobCancelled()
+
+    def session(self) -> Session:
+        return self.session_factory()
+
+    def result_dir(self) -> Path:
+        path = Path(self.results_dir) / self.job_id
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+
+def _run_in_process(name: str, job_id: str, params: Dict[str, Any], results_dir: str) -> Any:
+    """Entry point of process-pool jobs; the child opens its own sessions"""
+    return JOB_TYPES[name].handler(JobContext(job_id, _default_session, results_dir), **params)
+
+
+class JobRunner:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        max_workers: int = 4,
+        poll_interval: float = 1.0,
+        stale_seconds: float = 300,
+        results_dir: str = "job_results",
+    ):
+        self.session_factory = session_factory
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.stale = timedelta(seconds=stale_seconds)
+        self.results_dir = results_dir
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+        self._threads = ThreadPoolExecutor(max_workers, thread_name_prefix="job")
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._running: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def submit(self, db: Session, name: str, params: Dict[str, Any], *, run_after: Optional[datetime] = None) -> Job:
+        """Queue a job; raises ValueError for an unknown type or params its handler doesn't take"""
+        kind = _checked(name, params)
+        job = Job(
+            id=uuid.uuid4().hex, type=name, state=QUEUED, params=params, progress=0.0, attempts=0,
+            max_attempts=kind.max_attempts, run_after=run_after or datetime.utcnow(), cancel_requested=False,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._wake.set()
+        return job
+
+    def cancel(self, db: Session, job: Job) -> Job:
+        """Cancel a queued job now, or ask a running one to stop"""
+        # Conditional on the stored state, so a job a runner claims (or finishes) meanwhile isn't overwritten
+        cancelled = db.execute(
+            update(Job).where(Job.id == job.id, Job.state == QUEUED).values(state=CANCELLED, finished_at=datetime.utcnow())
+        ).rowcount
+        if not cancelled:
+            requested = db.execute(
+                update(Job).where(Job.id == job.id, Job.state == RUNNING).values(cancel_requested=True)
+            ).rowcount
+            if not requested:
+                db.rollback()
+                db.refresh(job)
+                raise ValueError(f"Job is already {job.state}")
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def poll(self) -> int:
+        """Retry stale jobs and start due ones up to the limits; returns the number started"""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            with self._lock:
+                mine = list(self._running)
+            if mine:
+                db.execute(update(Job).where(Job.id.in_(mine), Job.state == RUNNING).values(heartbeat_at=now))
+            for job in db.scalars(select(Job).where(Job.state == RUNNING, Job.heartbeat_at < now - self.stale)):
+                if job.id not in mine:
+                    self._failed(job, "Worker stopped responding", now)
+            db.commit()
+
+            started = 0
+            for kind in list(JOB_TYPES.values()):
+                while True:
+                    with self._lock:
+                        if len(self._running) >= self.max_workers:
+                            return started
+                    claimed = self._claim(db, kind, now)
+                    if claimed is None:
+                        break
+                    self._start(kind, claimed.id, claimed.params or {})
+                    started += 1
+            return started
+
+    def _claim(self, db: Session, kind: JobType, now: datetime) -> Optional[Any]:
+        """Claim the next due job of a type (its id and params) if the type has a free slot, in one transaction"""
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"jobs:{kind.name}"))))
+        running = select(func.count()).select_from(Job).where(Job.type == kind.name, Job.state == RUNNING)
+        due = (
+            select(Job.id).where(Job.type == kind.name, Job.state == QUEUED, Job.run_after <= now)
+            .order_by(Job.run_after, Job.created_at).limit(1)
+        )
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == due.scalar_subquery(), Job.state == QUEUED, running.scalar_subquery() < kind.concurrency)
+            .values(
+                state=RUNNING, worker=self.worker_id, attempts=Job.attempts + 1,
+                started_at=now, heartbeat_at=now, progress=0.0, message=None,
+            )
+            .returning(Job.id, Job.params)
+            .execution_options(synchronize_session=False)
+        ).first()
+        db.commit()
+        return claimed
+
+    def _start(self, kind: JobType, job_id: str, params: Dict[str, Any]) -> None:
+        if kind.pool == "process":
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(self.max_workers)
+            future = self._processes.submit(_run_in_process, kind.name, job_id, params, self.results_dir)
+        else:
+            context = JobContext(job_id, self.session_factory, self.results_dir)
+            future = self._threads.submit(kind.handler, context, **params)
+        with self._lock:
+            self._running[job_id] = future
+        future.add_done_callback(lambda done: self._finish(job_id, done))
+
+    def _finish(self, job_id: str, future: Future) -> None:
+        now = datetime.utcnow()
+        try:
+            with self.session_factory() as db:
+                job = db.get(Job, job_id)
+                error = future.exception()
+                if error is None:
+                    job.state, job.result, job.progress, job.error = SUCCEEDED, future.result(), 1.0, None
+                    job.finished_at = now
+                elif isinstance(error, JobCancelled):
+                    job.state, job.finished_at = CANCELLED, now
+                else:
+                    text = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+                    self._failed(job, text, now, retry=not isinstance(error, JobError))
+                    logger.warning(f"Job {job_id} ({job.type}) attempt {job.attempts} failed: {error}")
+                job.worker = None
+                db.commit()
+        except Exception:
+            logger.exception(f"Recording the outcome of job {job_id} failed")
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+            self._wake.set()
+
+    @staticmethod
+    def _failed(job: Job, error: str, now: datetime, retry: bool = True) -> None:
+        job.error = error
+        job.worker = None
+        kind = JOB_TYPES.get(job.type)
+        if retry and kind is not None and job.attempts < job.max_attempts and not job.cancel_requested:
+            job.state = QUEUED
+            job.run_after = now + timedelta(seconds=kind.backoff_seconds * 2 ** (job.attempts - 1))
+        else:
+            job.state, job.finished_at = (CANCELLED if job.cancel_requested else FAILED), now
+
+    def run_pending(self, timeout: Optional[float] = None) -> int:
+        """Run the due jobs, including those held back by the limits, and wait for them
+        (scripts, tests); returns the number run"""
+        total = 0
+        while True:
+            started = self.poll()
+            with self._lock:
+                futures = list(self._running.values())
+            for future in futures:
+                try:
+                    future.result(timeout=timeout)
+                except Exception:
+                    pass  # recorded on the job
+            while True:
+                with self._lock:
+                    if not self._running:
+                        break
+                time.sleep(0.01)
+            total += started
+            if not started and not futures:
+                return total
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="job-runner", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Polling for jobs failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def stop(self) -> None:
+        """Stop polling; running jobs finish, and are retried elsewhere if this process exits first"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = list(self._running)
+        return {"worker": self.worker_id, "running": running, "capacity": self.max_workers}
+
+
+runner = JobRunner(
+    _default_session,
+    max_workers=settings.JOBS_MAX_WORKERS,
+    poll_interval=settings.JOBS_POLL_INTERVAL_SECONDS,
+    stale_seconds=settings.JOBS_STALE_SECONDS,
+    results_dir=settings.JOBS_RESULTS_DIR,
+)
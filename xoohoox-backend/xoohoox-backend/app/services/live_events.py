@@ -0,0 +1,362 @@
+"""
+Live update feed: batch status transitions, QC results, GPS points and
+geofence alerts pushed to SSE and WebSocket clients.
+
+Publishers hand events to the Broker only once their transaction commits
+(ORM changes through the after_commit hook below, GPS points and alerts from
+their ingest stages). The broker passes them to its backend, which gives each
+event an id of the form "<ms>-<seq>" and delivers it to the broker of every
+worker:
+
+* LocalBackend is the in-process stand-in, for a single worker;
+* RedisBackend (LIVE_EVENTS_REDIS_URL) appends to one Redis stream that every
+  worker reads, so each worker's subscribers see every worker's events.
+
+Each worker's broker fans an event out to its subscribers with one
+call_soon_threadsafe per event loop, and within the loop only visits the
+subscriptions of the event's topic (and batch, for subscriptions filtered on
+one). A subscriber whose queue fills up is dropped; it reconnects with its
+Last-Event-ID and is replayed what it missed from the broker's log of recent
+events, or told to reset when that is older than the log.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.batch_tracking import BatchTracking
+from app.models.quality_control import QualityControl
+
+logger = logging.getLogger(__name__)
+
+BATCH_STATUS = "batch_status"
+QUALITY_CONTROL = "quality_control"
+GPS_POINT = "gps_point"
+GEOFENCE_ALERT = "geofence_alert"
+TOPICS = (BATCH_STATUS, QUALITY_CONTROL, GPS_POINT, GEOFENCE_ALERT)
+
+Message = Tuple[str, Dict[str, Any]]  # topic, JSON-ready data
+Position = Tuple[int, int]
+
+
+class Event(NamedTuple):
+    id: str
+    topic: str
+    data: Dict[str, Any]
+    position: Position
+
+
+class SubscriberLagged(Exception):
+    """The subscriber fell too far behind; it should reconnect and resume"""
+
+
+def parse_id(event_id: Optional[str]) -> Optional[Position]:
+    try:
+        ms, seq = event_id.split("-")
+        return int(ms), int(seq)
+    except (AttributeError, ValueError):
+        return None
+
+
+def jsonable(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else getattr(value, "value", value)
+        for key, value in row.items()
+    }
+
+
+class LocalBackend:
+    """Delivers events straight back to this process's broker"""
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[List[Event]], None]] = None
+        self._last: Position = (0, 0)
+        self._lock = threading.Lock()
+
+    def start(self, deliver: Callable[[List[Event]], None]) -> Position:
+        self._deliver = deliver
+        return (int(time.time() * 1000), -1)
+
+    def publish(self, messages: List[Message]) -> None:
+        with self._lock:
+            events = []
+            for topic, data in messages:
+                ms = int(time.time() * 1000)
+                self._last = (ms, 0) if ms > self._last[0] else (self._last[0], self._last[1] + 1)
+                events.append(Event(f"{self._last[0]}-{self._last[1]}", topic, data, self._last))
+            self._deliver(events)
+
+    def stop(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """One Redis stream shared by every worker, read by a thread per worker"""
+
+    def __init__(self, url: str, stream: str = "xoohoox:live", maxlen: int = 10000, block_ms: int = 1000):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.stream = stream
+        self.maxlen = maxlen
+        self.block_ms = block_ms
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start(self, deliver: Callable[[List[Event]], None]) -> Position:
+        try:
+            last_id = self.redis.xinfo_stream(self.stream)["last-generated-id"].decode()
+        except Exception:  # no stream yet
+            last_id = "0-0"
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, args=(deliver, last_id), name="live-events-redis", daemon=True)
+        self._thread.start()
+        return parse_id(last_id)
+
+    def _run(self, deliver: Callable[[List[Event]], None], last_id: str) -> None:
+        while not self._stopping:
+            try:
+                response = self.redis.xread({self.stream: last_id}, count=1000, block=self.block_ms)
+            except Exception:
+                logger.exception("Reading live events from Redis failed; retrying")
+                time.sleep(1)
+                continue
+            for _, entries in response or ():
+                events = []
+                for entry_id, fields in entries:
+                    last_id = entry_id.decode()
+                    events.append(Event(last_id, fields[b"topic"].decode(), json.loads(fields[b"data"]), parse_id(last_id)))
+                deliver(events)
+
+    def publish(self, messages: List[Message]) -> None:
+        pipeline = self.redis.pipeline(transaction=False)
+        for topic, data in messages:
+            pipeline.xadd(self.stream, {"topic": topic, "data": json.dumps(data)}, maxlen=self.maxlen, approximate=True)
+        pipeline.execute()
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class Subscription:
+    """Events of some topics, optionally only those whose data matches filters"""
+
+    def __init__(self, broker: "Broker", topics: Iterable[str], filters: Dict[str, Any], queue_size: int):
+        self.broker = broker
+        self.topics: Set[str] = set(topics)
+        self.filters = filters
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.backlog: Deque[Event] = deque()
+        self.seen: Position = (0, -1)
+        self.lagging = False
+
+    @property
+    def keys(self) -> List[Tuple[str, Any]]:
+        return [(topic, self.filters.get("batch_id")) for topic in self.topics]
+
+    def matches(self, event: Event) -> bool:
+        return event.topic in self.topics and all(event.data.get(key) == value for key, value in self.filters.items())
+
+    def offer(self, event: Event) -> None:
+        """Queue an event; called on the subscriber's loop"""
+        if self.lagging or event.position <= self.seen or not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+            self.seen = event.position
+        except asyncio.QueueFull:
+            self.lagging = True
+            logger.warning("Dropping a live event subscriber that fell behind")
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """The next event, or None after timeout seconds without one"""
+        if self.backlog:
+            return self.backlog.popleft()
+        if self.lagging and self.queue.empty():
+            raise SubscriberLagged()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def update(self, topics: Iterable[str]) -> None:
+        self.broker._unregister(self)
+        self.topics = set(topics)
+        self.broker._register(self)
+
+    def close(self) -> None:
+        self.broker._unregister(self)
+
+
+class Broker:
+    def __init__(self, backend: Any, replay_size: int = 10000, queue_size: int = 1000):
+        self.backend = backend
+        self.replay_size = replay_size
+        self.queue_size = queue_size
+        self._log: Deque[Event] = deque()
+        self._floor: Optional[Position] = None  # events after this one are all in the log
+        # loop -> (topic, batch_id or None) -> subscriptions; each inner dict only used on its loop
+        self._loops: Dict[asyncio.AbstractEventLoop, Dict[Tuple[str, Any], Set[Subscription]]] = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._floor is None:
+            with self._start_lock:
+                if self._floor is None:
+                    self._floor = self.backend.start(self._deliver)
+
+    def publish(self, messages: List[Message]) -> None:
+        """Publish (topic, JSON-ready data) pairs; call only once their changes are committed"""
+        if not messages:
+            return
+        self._ensure_started()
+        try:
+            self.backend.publish(messages)
+        except Exception:
+            logger.exception(f"Publishing {len(messages)} live events failed")
+
+    def subscribe(
+        self, topics: Iterable[str], filters: Optional[Dict[str, Any]] = None, last_event_id: Optional[str] = None
+    ) -> Tuple[Subscription, bool]:
+        """
+        Subscribe from the caller's event loop. With last_event_id the events
+        since then are replayed first; the flag returned is False when they
+        can't be (the id is unknown or older than the log), and the client
+        should reload its state instead.
+        """
+        self._ensure_started()
+        subscription = Subscription(self, topics, filters or {}, self.queue_size)
+        resumed = last_event_id is None
+        with self._lock:
+            self._register(subscription)
+            after = parse_id(last_event_id)
+            if after is not None and after >= self._floor:
+                subscription.backlog.extend(event for event in self._log if event.position > after and subscription.matches(event))
+                resumed = True
+            if self._log:
+                subscription.seen = self._log[-1].position
+        return subscription, resumed
+
+    def _register(self, subscription: Subscription) -> None:
+        index = self._loops.setdefault(subscription.loop, {})
+        for key in subscription.keys:
+            index.setdefault(key, set()).add(subscription)
+
+    def _unregister(self, subscription: Subscription) -> None:
+        index = self._loops.get(subscription.loop, {})
+        for key in subscription.keys:
+            subscribers = index.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del index[key]
+
+    def _deliver(self, events: List[Event]) -> None:
+        """Log events and hand them to every loop with subscribers; called from the backend"""
+        with self._lock:
+            for item in events:
+                if len(self._log) >= self.replay_size:
+                    self._floor = self._log.popleft().position
+                self._log.append(item)
+            loops = [loop for loop, index in self._loops.items() if index]
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, loop, events)
+            except RuntimeError:  # loop closed
+                with self._lock:
+                    self._loops.pop(loop, None)
+
+    def _fan_out(self, loop: asyncio.AbstractEventLoop, events: List[Event]) -> None:
+        index = self._loops.get(loop)
+        if not index:
+            return
+        for item in events:
+            for key in ((item.topic, None), (item.topic, item.data.get("batch_id"))):
+                for subscription in list(index.get(key, ())):
+                    subscription.offer(item)
+
+    def stop(self) -> None:
+        if self._floor is not None:
+            self.backend.stop()
+
+
+def _backend() -> Any:
+    if settings.LIVE_EVENTS_REDIS_URL:
+        return RedisBackend(settings.LIVE_EVENTS_REDIS_URL, maxlen=settings.LIVE_EVENTS_REPLAY_SIZE)
+    return LocalBackend()
+
+
+broker = Broker(
+    _backend(),
+    replay_size=settings.LIVE_EVENTS_REPLAY_SIZE,
+    queue_size=settings.LIVE_EVENTS_SUBSCRIBER_QUEUE_SIZE,
+)
+
+
+def publish_points(connection: Connection, points: List[Dict[str, Any]]) -> Optional[Callable[[], None]]:
+    """IngestBuffer stage publishing each in-order point once its flush commits"""
+    if not points:
+        return None
+    fields = ("tracking_id", "batch_id", "harvest_id", "latitude", "longitude", "timestamp", "status", "geofence_id")
+    return lambda: broker.publish([(GPS_POINT, jsonable({field: point.get(field) for field in fields})) for point in points])
+
+
+def orm_messages(session: Session) -> List[Message]:
+    """The batch status transitions and QC results of the session's pending flush"""
+    messages = []
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, BatchTracking):
+            history = inspect(obj).attrs.status.history
+            if obj in session.new or history.has_changes():
+                messages.append((BATCH_STATUS, jsonable({
+                    "batch_id": obj.batch_id,
+                    "status": obj.status,
+                    "previous_status": history.deleted[0] if history.deleted else None,
+                    "stage": obj.stage,
+                })))
+        elif isinstance(obj, QualityControl):
+            if obj in session.new or inspect(obj).attrs.result.history.has_changes():
+                messages.append((QUALITY_CONTROL, jsonable({
+                    "test_id": obj.test_id,
+                    "batch_id": obj.batch_id,
+                    "test_name": obj.test_name,
+                    "test_type": obj.test_type,
+                    "result": obj.result,
+                    "actual_value": obj.actual_value,
+                    "unit_of_measure": obj.unit_of_measure,
+                })))
+    return messages
+
+
+@event.listens_for(Session, "after_flush")
+def collect_live_events(session: Session, flush_context: Any) -> None:
+    """Published once committed"""
+    messages = orm_messages(session)
+    if messages:
+        session.info.setdefault("live_events", []).extend(messages)
+
+
+@event.listens_for(Session, "after_commit")
+def publish_live_events(session: Session) -> None:
+    messages = session.info.pop("live_events", None)
+    if messages:
+        broker.publish(messages)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_live_events(session: Session) -> None:
+    session.info.pop("live_events", None)
@@ -0,0 +1,187 @@
+"""
+Haversine nearest-neighbour search for farms, paddocks and geofences.
+
+Points are mapped onto the unit sphere and held in a KD-tree. There the
+straight-line (chord) distance grows with the great-circle distance, so
+tree pruning is exact. Every item may carry a radius (a geofence's
+bounding circle). Distances are measured to the edge of that circle,
+never below zero.
+
+Writes do not rebuild the tree. Inserts and updates go to a small buffer
+that is scanned with NumPy, and deletes are masked out. The tree is
+rebuilt once the buffer and mask exceed `rebuild_threshold`.
+"""
+import heapq
+import math
+import threading
+from typing import Dict, Hashable, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.services.geometry import EARTH_RADIUS_KM
+
+LEAF_SIZE = 16
+
+
+def _unit_vectors(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    lat_rad, lng_rad = np.radians(lats), np.radians(lngs)
+    cos_lat = np.cos(lat_rad)
+    return np.column_stack((cos_lat * np.cos(lng_rad), cos_lat * np.sin(lng_rad), np.sin(lat_rad)))
+
+
+def _chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+
+
+def _km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(km / (2 * EARTH_RADIUS_KM), math.pi / 2))
+
+
+def haversine_matrix(
+    lats1: Sequence[float], lngs1: Sequence[float], lats2: Sequence[float], lngs2: Sequence[float]
+) -> np.ndarray:
+    """(len(lats1), len(lats2)) matrix of great-circle distances in kilometres"""
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    lng1 = np.radians(np.asarray(lngs1, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    lng2 = np.radians(np.asarray(lngs2, dtype=np.float64))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class _KDTree:
+    """Static KD-tree over 3-D unit vectors; leaves hold arrays of row positions"""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.root = self._build(np.arange(len(vectors))) if len(vectors) else None
+
+    def _build(self, positions: np.ndarray):
+        if len(positions) <= LEAF_SIZE:
+            return positions
+        points = self.vectors[positions]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        ordered = positions[np.argsort(points[:, axis], kind="stable")]
+        middle = len(ordered) // 2
+        split = float(self.vectors[ordered[middle], axis])
+        return axis, split, self._build(ordered[:middle]), self._build(ordered[middle:])
+
+    def search(self, target: np.ndarray, visit, bound) -> None:
+        """Depth-first search calling visit(leaf) for every subtree bound() (a chord length) can't rule out"""
+        stack = [(self.root, 0.0)] if self.root is not None else []
+        while stack:
+            node, gap = stack.pop()
+            if gap > bound():
+                continue
+            if isinstance(node, np.ndarray):
+                visit(node)
+                continue
+            axis, split, left, right = node
+            difference = target[axis] - split
+            near, far = (left, right) if difference < 0 else (right, left)
+            stack.append((far, max(gap, abs(difference))))
+            stack.append((near, gap))
+
+
+class NearestIndex:
+    def __init__(self, items: Iterable[Tuple[Hashable, float, float, float]] = (), rebuild_threshold: int = 256):
+        """items are (key, latitude, longitude, radius_km)"""
+        self.rebuild_threshold = rebuild_threshold
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, Tuple[float, float, float]] = {}
+        self._build({key: (lat, lng, radius) for key, lat, lng, radius in items})
+
+    def _build(self, items: Dict[Hashable, Tuple[float, float, float]]) -> None:
+        self._keys: List[Hashable] = list(items)
+        values = np.asarray(list(items.values()), dtype=np.float64).reshape(-1, 3)
+        self._lats, self._lngs, self._radii = values[:, 0], values[:, 1], values[:, 2]
+        self._vectors = _unit_vectors(self._lats, self._lngs)
+        self._max_radius = float(self._radii.max()) if len(self._radii) else 0.0
+        self._positions = {key: position for position, key in enumerate(self._keys)}
+        self._removed: Set[int] = set()
+        self._tree = _KDTree(self._vectors)
+
+    def _items(self) -> Dict[Hashable, Tuple[float, float, float]]:
+        items = {
+            key: (float(self._lats[position]), float(self._lngs[position]), float(self._radii[position]))
+            for key, position in self._positions.items()
+            if position not in self._removed
+        }
+        items.update(self._pending)
+        return items
+
+    def __len__(self) -> int:
+        return len(self._positions) - len(self._removed) + len(self._pending)
+
+    def upsert(self, key: Hashable, latitude: float, longitude: float, radius_km: float = 0.0) -> None:
+        with self._lock:
+            if key in self._positions:
+                self._removed.add(self._positions[key])
+            self._pending[key] = (latitude, longitude, radius_km)
+            self._maybe_rebuild()
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._positions:
+                self._removed.add(self._positions[key])
+            self._pending.pop(key, None)
+            self._maybe_rebuild()
+
+    def _maybe_rebuild(self) -> None:
+        if len(self._pending) + len(self._removed) > self.rebuild_threshold:
+            items = self._items()
+            self._pending = {}
+            self._build(items)
+
+    def _candidates(self, latitude: float, longitude: float, visit, bound) -> None:
+        """Feed visit(keys, distances_km) from the tree, then from the pending buffer"""
+        target = _unit_vectors(np.array([latitude]), np.array([longitude]))[0]
+
+        def visit_leaf(positions: np.ndarray) -> None:
+            if self._removed:
+                positions = np.array([p for p in positions.tolist() if p not in self._removed], dtype=np.int64)
+                if not len(positions):
+                    return
+            chords = np.linalg.norm(self._vectors[positions] - target, axis=1)
+            distances = np.maximum(_chord_to_km(chords) - self._radii[positions], 0.0)
+            visit([self._keys[p] for p in positions.tolist()], distances)
+
+        self._tree.search(target, visit_leaf, bound)
+        if self._pending:
+            keys = list(self._pending)
+            values = np.asarray(list(self._pending.values()), dtype=np.float64)
+            centres = haversine_matrix([latitude], [longitude], values[:, 0], values[:, 1])[0]
+            visit(keys, np.maximum(centres - values[:, 2], 0.0))
+
+    def nearest(self, latitude: float, longitude: float, k: int = 5) -> List[Tuple[Hashable, float]]:
+        """The k items closest to the point as (key, distance_km), nearest first"""
+        best: List[Tuple[float, int, Hashable]] = []  # max-heap on distance via negation
+        counter = iter(range(1 << 62))
+
+        def visit(keys: List[Hashable], distances: np.ndarray) -> None:
+            for key, distance in zip(keys, distances.tolist()):
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, next(counter), key))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, next(counter), key))
+
+        def bound() -> float:
+            if len(best) < k:
+                return math.inf
+            return _km_to_chord(-best[0][0] + self._max_radius)
+
+        with self._lock:
+            self._candidates(latitude, longitude, visit, bound)
+        return [(key, -negated) for negated, _, key in sorted(best, key=lambda entry: (-entry[0], entry[1]))]
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[Hashable, float]]:
+        """Items within radius_km of the point as (key, distance_km), nearest first"""
+        found: List[Tuple[Hashable, float]] = []
+
+        def visit(keys: List[Hashable], distances: np.ndarray) -> None:
+            found.extend((key, distance) for key, distance in zip(keys, distances.tolist()) if distance <= radius_km)
+
+        with self._lock:
+            chord = _km_to_chord(radius_km + self._max_radius)
+            self._candidates(latitude, longitude, visit, lambda: chord)
+        return sorted(found, key=lambda item: item[1])
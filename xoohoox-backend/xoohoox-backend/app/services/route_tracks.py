@@ -0,0 +1,47 @@
+"""
+Simplified routes of completed trips, stored ahead of the route endpoint.
+
+complete_trips is an IngestBuffer stage. When a flush delivers a batch (a
+point with a delivered/completed status), or adds points to a batch whose
+routes are already stored, it queues a simplify_route job for the batch in
+the flush's own transaction. The job simplifies the batch's track at every
+ROUTE_PRECOMPUTED_TOLERANCES_METERS level, with each algorithm, and replaces
+the stored versions; GET /batches/{batch_id}/route only reads them, and
+simplifies the raw track itself while they are missing or stale.
+"""
+from typing import Any, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from app.crud.geolocation import COMPLETED_TRIP_STATUSES, location_tracking
+from app.models.geolocation import SimplifiedTrack
+from app.services import jobs
+from app.services.track_simplify import DOUGLAS_PEUCKER, VISVALINGAM
+
+SIMPLIFY_ROUTE = "simplify_route"
+
+
+def complete_trips(connection: Connection, points: List[Dict[str, Any]]) -> None:
+    """Queue the routes of the flush's completed trips for simplification"""
+    batch_ids = {
+        point["batch_id"] for point in points
+        if (point.get("status") or "").strip().lower() in COMPLETED_TRIP_STATUSES
+    }
+    others = {point["batch_id"] for point in points} - batch_ids
+    if others:
+        batch_ids.update(connection.execute(
+            select(SimplifiedTrack.batch_id).where(SimplifiedTrack.batch_id.in_(others)).distinct()
+        ).scalars())
+    for batch_id in sorted(batch_ids):
+        jobs.enqueue(connection, SIMPLIFY_ROUTE, {"batch_id": batch_id})
+
+
+@jobs.job_type(SIMPLIFY_ROUTE)
+def simplify_route_job(context: jobs.JobContext, batch_id: str) -> Dict[str, Any]:
+    with context.session() as db:
+        stored = {
+            algorithm: sorted(location_tracking.store_simplified_tracks(db, batch_id=batch_id, algorithm=algorithm))
+            for algorithm in (DOUGLAS_PEUCKER, VISVALINGAM)
+        }
+    return {"batch_id": batch_id, "tolerances_meters": stored}
@@ -0,0 +1,79 @@
+"""
+Static R-tree over bounding boxes, bulk loaded with Sort-Tile-Recursive
+packing. Point and window queries visit O(log n) nodes for well-separated
+boxes, which is what geofence lookups need: geofences change rarely, so the
+tree is rebuilt rather than updated in place.
+"""
+import math
+from typing import Any, Iterable, List, Sequence, Tuple
+
+from app.services.geometry import BBox
+
+
+class _Node:
+    __slots__ = ("bbox", "children", "leaf")
+
+    def __init__(self, children: List[Tuple[BBox, Any]], leaf: bool):
+        self.children = children
+        self.leaf = leaf
+        self.bbox = _union(bbox for bbox, _ in children)
+
+
+def _union(boxes: Iterable[BBox]) -> BBox:
+    min_x, min_y, max_x, max_y = math.inf, math.inf, -math.inf, -math.inf
+    for box in boxes:
+        min_x, min_y = min(min_x, box[0]), min(min_y, box[1])
+        max_x, max_y = max(max_x, box[2]), max(max_y, box[3])
+    return min_x, min_y, max_x, max_y
+
+
+def _intersects(a: BBox, b: BBox) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _pack(entries: Sequence[Tuple[BBox, Any]], capacity: int, leaf: bool) -> List[_Node]:
+    """One STR level: sort by x into vertical slices, then by y within each slice"""
+    slices = math.ceil(math.sqrt(math.ceil(len(entries) / capacity)))
+    per_slice = slices * capacity
+    by_x = sorted(entries, key=lambda entry: entry[0][0] + entry[0][2])
+    nodes = []
+    for start in range(0, len(by_x), per_slice):
+        by_y = sorted(by_x[start:start + per_slice], key=lambda entry: entry[0][1] + entry[0][3])
+        for offset in range(0, len(by_y), capacity):
+            nodes.append(_Node(by_y[offset:offset + capacity], leaf))
+    return nodes
+
+
+class RTree:
+    def __init__(self, items: Iterable[Tuple[BBox, Any]], node_capacity: int = 16):
+        entries = [(tuple(bbox), value) for bbox, value in items]
+        self.size = len(entries)
+        self._root = None
+        if entries:
+            level = _pack(entries, node_capacity, leaf=True)
+            while len(level) > 1:
+                level = _pack([(node.bbox, node) for node in level], node_capacity, leaf=False)
+            self._root = level[0]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def query(self, bbox: BBox) -> List[Any]:
+        """Values whose bounding box intersects bbox"""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            for child_bbox, child in node.children:
+                if _intersects(child_bbox, bbox):
+                    if node.leaf:
+                        found.append(child)
+                    else:
+                        stack.append(child)
+        return found
+
+    def query_point(self, x: float, y: float) -> List[Any]:
+        """Values whose bounding box contains the point"""
+        return self.query((x, y, x, y))
@@ -0,0 +1,300 @@
+"""
+Delta sync for field tablets that work offline in paddocks without coverage.
+
+Pull: a tablet asks for everything changed since its cursor and gets it in
+pages: the farms, paddocks, harvests, batches and trials whose updated_at
+falls in the sync's window, then the keys of those deleted in it. Rows are
+read by keyset on the (updated_at, id) indexes and sent compactly, the
+column names once per entity. The last page's cursor is the tablet's
+watermark for its next sync.
+
+* The window ends SYNC_COMMIT_LAG_SECONDS before the sync started, so a
+  change whose updated_at was stamped before a slow commit isn't skipped:
+  it is still inside the next window.
+* Deletes leave a tombstone (mapper after_delete hooks below), skipped
+  once the key has been recreated. Tombstones are kept SYNC_TOMBSTONE_DAYS;
+  a tablet whose watermark is older gets a full sync, flagged reset.
+
+Push: a tablet sends its offline writes in one batch. Records are matched on
+their natural key (farm_id, harvest_id, batch_id, ...) and each is applied
+in its own savepoint, so one bad record doesn't fail the rest. A record the
+server changed after base_updated_at (the version the tablet edited) is a
+conflict, resolved per record:
+
+* server_wins: nothing is applied; the server's record comes back;
+* client_wins: the tablet's values are applied anyway;
+* merge: fields the server hasn't changed since base (the tablet's
+  original values) are applied; those both sides changed keep the
+  server's value and are listed.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import DateTime, String, delete, event, insert, inspect, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.tables import has_table
+from app.models.batch_tracking import BatchTracking
+from app.models.fermentation_trial import FermentationTrial
+from app.models.geolocation import Farm, Harvest, Paddock
+from app.models.sync import SyncTombstone
+from app.services import jobs
+
+
+class SyncEntity(NamedTuple):
+    name: str
+    model: Any
+    key: str  # natural key tablets identify records by
+
+
+# In pull order: parents before children
+ENTITIES: Tuple[SyncEntity, ...] = (
+    SyncEntity("farms", Farm, "farm_id"),
+    SyncEntity("paddocks", Paddock, "paddock_id"),
+    SyncEntity("batches", BatchTracking, "batch_id"),
+    SyncEntity("harvests", Harvest, "harvest_id"),
+    SyncEntity("trials", FermentationTrial, "trial_id"),
+)
+BY_NAME = {entity.name: entity for entity in ENTITIES}
+TOMBSTONES = len(ENTITIES)  # cursor position of the deletes, after the entities
+SERVER_MANAGED = ("id", "created_at", "updated_at")
+
+CREATED = "created"
+UPDATED = "updated"
+MERGED = "merged"
+DELETED = "deleted"
+UNCHANGED = "unchanged"
+CONFLICT = "conflict"
+ERROR = "error"
+
+SERVER_WINS = "server_wins"
+CLIENT_WINS = "client_wins"
+MERGE = "merge"
+
+_MISSING = object()
+
+
+class Page(NamedTuple):
+    changes: Dict[str, Dict[str, Any]]  # entity name -> {"columns": [...], "rows": [[...], ...]}
+    deleted: Dict[str, List[str]]  # entity name -> natural keys
+    cursor: str
+    has_more: bool
+    reset: bool
+
+
+def _columns(entity: SyncEntity) -> Dict[str, Any]:
+    return {prop.key: prop.columns[0] for prop in inspect(entity.model).column_attrs}
+
+
+def json_value(value: Any) -> Any:
+    """JSON form of a column value"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return getattr(value, "value", value)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def from_json(column: Any, value: Any) -> Any:
+    """A JSON value as the column's Python type"""
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime) and isinstance(value, str):
+        return _naive_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    enum_class = getattr(column.type, "enum_class", None)
+    if enum_class is not None:
+        return enum_class(value)
+    return value
+
+
+def record(entity: SyncEntity, obj: Any) -> Dict[str, Any]:
+    return {key: json_value(getattr(obj, key)) for key in _columns(entity)}
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Raises ValueError for a cursor this server didn't hand out"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(position, dict) or not {"since", "until", "entity", "after"} <= set(position):
+            raise ValueError
+        return position
+    except (ValueError, TypeError):
+        raise ValueError("Invalid sync cursor")
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def pull(db: Session, cursor: Optional[str] = None, limit: int = 500) -> Page:
+    """The next page of changes after cursor (None: a full sync)"""
+    now = datetime.utcnow()
+    position = decode_cursor(cursor) if cursor else {"since": None, "until": None, "entity": 0, "after": None}
+    reset = False
+    if position["until"] is None:
+        # First page of a sync: fix its window
+        since = _parse(position["since"])
+        if since is not None and since < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+            since, reset = None, True
+        until = now - timedelta(seconds=settings.SYNC_COMMIT_LAG_SECONDS)
+        position = {"since": json_value(since), "until": json_value(until), "entity": 0, "after": None}
+    since, until = _parse(position["since"]), _parse(position["until"])
+    index, after = position["entity"], position["after"]
+
+    changes: Dict[str, Dict[str, Any]] = {}
+    deleted: Dict[str, List[str]] = {}
+    remaining = limit
+    while index <= TOMBSTONES and remaining > 0:
+        if index < TOMBSTONES:
+            entity = ENTITIES[index]
+            columns = _columns(entity)
+            stamp, ident = entity.model.updated_at, entity.model.id
+            query = select(*columns.values())
+        else:
+            stamp, ident = SyncTombstone.deleted_at, SyncTombstone.id
+            query = select(SyncTombstone.entity, SyncTombstone.key, SyncTombstone.deleted_at, SyncTombstone.id)
+        query = query.where(stamp <= until)
+        if since is not None:
+            query = query.where(stamp > since)
+        if after is not None:
+            query = query.where(tuple_(stamp, ident) > tuple_(_parse(after[0]), after[1]))
+        rows = db.execute(query.order_by(stamp, ident).limit(remaining + 1)).all()
+        more = len(rows) > remaining
+        rows = rows[:remaining]
+        remaining -= len(rows)
+
+        if index < TOMBSTONES and rows:
+            changes[entity.name] = {"columns": list(columns), "rows": [[json_value(value) for value in row] for row in rows]}
+            last = rows[-1]._mapping
+            last_position = [json_value(last[columns["updated_at"]]), last[columns["id"]]]
+        elif rows:
+            for name, key, _, _ in rows:
+                deleted.setdefault(name, []).append(key)
+            last_position = [json_value(rows[-1].deleted_at), rows[-1].id]
+        if more:
+            after = last_position
+        else:
+            index, after = index + 1, None
+
+    for name, keys in list(deleted.items()):
+        # A key deleted and then recreated isn't gone; its new row is in this sync or a later one
+        entity = BY_NAME[name]
+        column = getattr(entity.model, entity.key)
+        recreated = set(db.scalars(select(column).where(column.in_(keys))))
+        deleted[name] = [key for key in keys if key not in recreated]
+        if not deleted[name]:
+            del deleted[name]
+
+    has_more = index <= TOMBSTONES
+    if has_more:
+        next_position = {**position, "entity": index, "after": after}
+    else:
+        next_position = {"since": position["until"], "until": None, "entity": 0, "after": None}
+    return Page(changes, deleted, encode_cursor(next_position), has_more, reset)
+
+
+def _changed_since(current: Any, base_updated_at: Optional[datetime]) -> bool:
+    if base_updated_at is None or current.updated_at is None:
+        return True  # the tablet hasn't seen this record
+    return current.updated_at > _naive_utc(base_updated_at)
+
+
+def _apply(db: Session, entity: SyncEntity, write: Any, strategy: str) -> Dict[str, Any]:
+    model = entity.model
+    columns = _columns(entity)
+    current = db.execute(select(model).where(getattr(model, entity.key) == write.key)).scalar_one_or_none()
+
+    if write.op == "delete":
+        if current is None:
+            return {"status": UNCHANGED}
+        if _changed_since(current, write.base_updated_at) and strategy != CLIENT_WINS:
+            return {"status": CONFLICT, "record": record(entity, current)}
+        db.delete(current)
+        db.flush()
+        return {"status": DELETED}
+
+    unknown = sorted(set(write.data) - set(columns) | set(write.data) & {*SERVER_MANAGED, entity.key})
+    if unknown:
+        raise ValueError(f"Fields not writable for {entity.name}: {', '.join(unknown)}")
+    data = {field: from_json(columns[field], value) for field, value in write.data.items()}
+
+    if current is None:
+        values = {entity.key: write.key, **data}
+        primary_key = inspect(model).primary_key[0]
+        if isinstance(primary_key.type, String):
+            values["id"] = uuid.uuid4().hex
+        current = model(**values)
+        db.add(current)
+        db.flush()
+        return {"status": CREATED, "record": record(entity, current)}
+
+    changed = [field for field, value in write.data.items() if json_value(getattr(current, field)) != value]
+    if not changed:
+        return {"status": UNCHANGED, "record": record(entity, current)}
+    clashes: List[str] = []
+    if _changed_since(current, write.base_updated_at):
+        if strategy == SERVER_WINS:
+            return {"status": CONFLICT, "record": record(entity, current), "conflicts": changed}
+        if strategy == MERGE:
+            base = write.base or {}
+            clashes = [field for field in changed if json_value(getattr(current, field)) != base.get(field, _MISSING)]
+            changed = [field for field in changed if field not in clashes]
+    for field in changed:
+        setattr(current, field, data[field])
+    db.flush()
+    status = MERGED if clashes else UPDATED if changed else UNCHANGED
+    return {"status": status, "record": record(entity, current), "conflicts": clashes}
+
+
+def push(db: Session, writes: List[Any], strategy: str = SERVER_WINS) -> List[Dict[str, Any]]:
+    """Apply a tablet's offline writes in order, each in its own savepoint; one result per write"""
+    results = []
+    for index, write in enumerate(writes):
+        entity = BY_NAME[write.entity]
+        try:
+            with db.begin_nested():
+                result = _apply(db, entity, write, write.strategy or strategy)
+        except (ValueError, LookupError, SQLAlchemyError) as e:
+            result = {"status": ERROR, "error": str(e).splitlines()[0]}
+        results.append({"index": index, "entity": entity.name, "key": write.key, **result})
+    db.commit()
+    return results
+
+
+def prune_tombstones(db: Session) -> int:
+    """Drop tombstones every tablet has either synced or will be reset past"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    removed = db.execute(delete(SyncTombstone).where(SyncTombstone.deleted_at < cutoff)).rowcount
+    db.commit()
+    return removed
+
+
+@jobs.job_type("sync_tombstone_prune", max_attempts=2, privileged=True)
+def prune_tombstones_job(context: jobs.JobContext) -> Dict[str, int]:
+    with context.session() as db:
+        return {"removed": prune_tombstones(db)}
+
+
+def _track_deletes(entity: SyncEntity) -> None:
+    @event.listens_for(entity.model, "after_delete")
+    def add_tombstone(mapper: Any, connection: Any, target: Any) -> None:
+        if not has_table(connection, SyncTombstone.__table__):
+            return
+        connection.execute(
+            insert(SyncTombstone).values(entity=entity.name, key=str(getattr(target, entity.key)), deleted_at=datetime.utcnow())
+        )
+
+
+for _entity in ENTITIES:
+    _track_deletes(_entity)
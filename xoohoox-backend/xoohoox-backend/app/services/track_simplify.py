@@ -0,0 +1,161 @@
+"""
+Simplification and compact encoding of GPS tracks.
+
+Tracks are held as NumPy columns (Track) rather than one object per point.
+Simplification runs on a local equirectangular projection in metres, centred
+on the track's mean latitude. That is accurate to far less than any useful
+tolerance over the distances a single trip covers.
+
+* douglas_peucker keeps every point further than tolerance_m from the
+  simplified line;
+* visvalingam drops points whose effective triangle area is below
+  tolerance_m², i.e. it removes small wiggles first and keeps the overall
+  shape, which tends to look better at low zoom.
+
+The first and last points are always kept.
+"""
+import heapq
+import math
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from app.services.geometry import EARTH_RADIUS_KM
+
+METRES_PER_DEGREE = EARTH_RADIUS_KM * 1000 * math.pi / 180
+
+DOUGLAS_PEUCKER = "douglas-peucker"
+VISVALINGAM = "visvalingam"
+
+
+class Track(NamedTuple):
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    timestamps: np.ndarray  # epoch seconds
+
+
+def project_metres(track: Track) -> Tuple[np.ndarray, np.ndarray]:
+    scale = math.cos(math.radians(float(track.latitudes.mean())))
+    return track.longitudes * METRES_PER_DEGREE * scale, track.latitudes * METRES_PER_DEGREE
+
+
+def _segment_distances(px: np.ndarray, py: np.ndarray, x1: float, y1: float, x2: float, y2: float) -> np.ndarray:
+    dx, dy = x2 - x1, y2 - y1
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return np.hypot(px - x1, py - y1)
+    t = np.clip(((px - x1) * dx + (py - y1) * dy) / length2, 0.0, 1.0)
+    return np.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+
+
+def douglas_peucker(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    """Indices of the points kept by Douglas-Peucker"""
+    n = len(x)
+    if n < 3:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(x[start + 1:end], y[start + 1:end], x[start], y[start], x[end], y[end])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def visvalingam(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    """Indices of the points kept by Visvalingam-Whyatt"""
+    n = len(x)
+    if n < 3:
+        return np.arange(n)
+    threshold = tolerance * tolerance
+    xs, ys = x.tolist(), y.tolist()
+    previous = list(range(-1, n - 1))
+    following = list(range(1, n + 1))
+    removed = [False] * n
+
+    def area(i: int) -> float:
+        a, b = previous[i], following[i]
+        return abs((xs[a] - xs[i]) * (ys[b] - ys[i]) - (xs[b] - xs[i]) * (ys[a] - ys[i])) / 2
+
+    areas = [math.inf] + [area(i) for i in range(1, n - 1)] + [math.inf]
+    heap = [(areas[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    while heap:
+        smallest, i = heapq.heappop(heap)
+        if removed[i] or smallest != areas[i]:
+            continue
+        if smallest >= threshold:
+            break
+        removed[i] = True
+        a, b = previous[i], following[i]
+        following[a], previous[b] = b, a
+        for neighbour in (a, b):
+            if 0 < neighbour < n - 1:
+                # Never below the point just removed, so removal order stays monotonic
+                areas[neighbour] = max(area(neighbour), smallest)
+                heapq.heappush(heap, (areas[neighbour], neighbour))
+    return np.flatnonzero(~np.asarray(removed))
+
+
+def simplify(track: Track, tolerance_m: float, algorithm: str = DOUGLAS_PEUCKER) -> Track:
+    if len(track.latitudes) < 3:
+        return track
+    x, y = project_metres(track)
+    if algorithm == VISVALINGAM:
+        kept = visvalingam(x, y, tolerance_m)
+    elif algorithm == DOUGLAS_PEUCKER:
+        kept = douglas_peucker(x, y, tolerance_m)
+    else:
+        raise ValueError(f"Unknown simplification algorithm: {algorithm}")
+    return Track(track.latitudes[kept], track.longitudes[kept], track.timestamps[kept])
+
+
+def track_length_km(track: Track) -> float:
+    """Great-circle length along the track"""
+    if len(track.latitudes) < 2:
+        return 0.0
+    lat, lng = np.radians(track.latitudes), np.radians(track.longitudes)
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2
+    return float((2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).sum())
+
+
+def encode_polyline(latitudes: Sequence[float], longitudes: Sequence[float], precision: int = 5) -> str:
+    """Google encoded polyline of the points"""
+    if not len(latitudes):
+        return ""
+    factor = 10 ** precision
+    values = np.column_stack((
+        np.round(np.asarray(latitudes, dtype=np.float64) * factor),
+        np.round(np.asarray(longitudes, dtype=np.float64) * factor),
+    )).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    chunks = []
+    for value in np.where(deltas < 0, ~(deltas << 1), deltas << 1).tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    values = []
+    value = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1F) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    factor = 10 ** precision
+    coordinates = np.cumsum(np.asarray(values, dtype=np.int64).reshape(-1, 2), axis=0) / factor
+    return [(lat, lng) for lat, lng in coordinates.tolist()]
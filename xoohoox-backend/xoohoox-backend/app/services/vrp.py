@@ -0,0 +1,340 @@
+"""
+Capacitated vehicle routing with time windows for sample-collection trucks.
+
+Every route starts and ends at the depot (the lab). Stops carry a demand, a
+service time and an optional [earliest, latest] arrival window, all in
+minutes from the plan start; trucks carry a capacity and a shift length.
+Distances are haversine scaled by a road factor (a stand-in for road
+distance); travel time is distance over an average speed.
+
+The solver is a heuristic, aiming for good plans for a few hundred stops in
+well under a second:
+
+1. Clarke-Wright savings builds routes against the largest truck;
+2. routes are handed to trucks first-fit decreasing by load; stops on routes
+   no truck can take are then inserted wherever they fit most cheaply;
+3. local search (2-opt within routes, relocating stops between routes)
+   shortens the plan until nothing improves or the time limit is reached.
+
+Stops no truck can serve are reported as unassigned.
+"""
+import math
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.nearest import haversine_matrix
+
+EPSILON = 1e-9
+
+# Road-distance matrices keyed on the rounded coordinates they cover
+matrix_cache = TTLCache(ttl=settings.ROUTING_MATRIX_CACHE_TTL_SECONDS, maxsize=64)
+
+
+class Stop(NamedTuple):
+    id: str
+    latitude: float
+    longitude: float
+    demand: float = 0.0
+    service_minutes: float = 0.0
+    earliest: float = 0.0
+    latest: float = math.inf
+
+
+class Vehicle(NamedTuple):
+    id: str
+    capacity: float
+    shift_minutes: float = math.inf
+
+
+class PlannedRoute(NamedTuple):
+    vehicle: Vehicle
+    stops: List[Stop]
+    arrivals: List[float]  # minutes from plan start, per stop
+    load: float
+    distance_km: float
+    end_minutes: float  # back at the depot
+
+
+class Plan(NamedTuple):
+    routes: List[PlannedRoute]
+    unassigned: List[Stop]
+    distance_km: float
+    solve_ms: float
+
+
+def distance_matrix(points: Sequence[Tuple[float, float]], road_factor: float = settings.ROUTING_ROAD_FACTOR) -> np.ndarray:
+    """Road-distance stand-in (km) between every pair of (lat, lng) points"""
+    key = (road_factor, tuple((round(lat, 6), round(lng, 6)) for lat, lng in points))
+
+    def compute() -> np.ndarray:
+        lats = [lat for lat, _ in points]
+        lngs = [lng for _, lng in points]
+        matrix = haversine_matrix(lats, lngs, lats, lngs) * road_factor
+        matrix.setflags(write=False)
+        return matrix
+
+    return matrix_cache.get_or_set(key, compute)
+
+
+class _Problem:
+    """Node 0 is the depot, node i the (i-1)th stop"""
+
+    def __init__(self, depot: Tuple[float, float], stops: Sequence[Stop], speed_kmh: float, road_factor: float):
+        self.stops = list(stops)
+        self.distance = distance_matrix([depot] + [(stop.latitude, stop.longitude) for stop in stops], road_factor)
+        self.minutes = (self.distance * (60.0 / speed_kmh)).tolist()
+        self.km = self.distance.tolist()
+        self.demand = [0.0] + [stop.demand for stop in stops]
+        self.service = [0.0] + [stop.service_minutes for stop in stops]
+        self.earliest = [0.0] + [stop.earliest for stop in stops]
+        self.latest = [math.inf] + [stop.latest for stop in stops]
+
+    def schedule(self, route: Sequence[int], shift: float = math.inf) -> Optional[Tuple[List[float], float]]:
+        """Arrival times and depot return time, or None if a window or the shift is broken"""
+        arrivals = []
+        now, previous = 0.0, 0
+        for node in route:
+            now = max(now + self.minutes[previous][node], self.earliest[node])
+            if now > self.latest[node] + EPSILON:
+                return None
+            arrivals.append(now)
+            now += self.service[node]
+            previous = node
+        now += self.minutes[previous][0]
+        if now > shift + EPSILON:
+            return None
+        return arrivals, now
+
+    def load(self, route: Sequence[int]) -> float:
+        return sum(self.demand[node] for node in route)
+
+    def length(self, route: Sequence[int]) -> float:
+        km, previous = 0.0, 0
+        for node in route:
+            km += self.km[previous][node]
+            previous = node
+        return km + self.km[previous][0]
+
+
+def _savings_routes(problem: _Problem, nodes: List[int], capacity: float, shift: float) -> List[List[int]]:
+    routes: Dict[int, List[int]] = {node: [node] for node in nodes}
+    route_of = {node: node for node in nodes}
+    loads = {node: problem.demand[node] for node in nodes}
+    if len(nodes) < 2:
+        return list(routes.values())
+
+    index = np.asarray(nodes)
+    distance = problem.distance
+    savings = distance[0, index][:, None] + distance[0, index][None, :] - distance[np.ix_(index, index)]
+    rows, cols = np.triu_indices(len(nodes), k=1)
+    values = savings[rows, cols]
+    order = np.argsort(-values, kind="stable")
+    order = order[values[order] > 0]
+
+    for a, b in zip(index[rows[order]].tolist(), index[cols[order]].tolist()):
+        route_a, route_b = route_of[a], route_of[b]
+        if route_a == route_b or loads[route_a] + loads[route_b] > capacity + EPSILON:
+            continue
+        first, second = routes[route_a], routes[route_b]
+        if first[-1] == a and second[0] == b:
+            merged = first + second
+        elif first[0] == a and second[-1] == b:
+            merged = second + first
+        elif first[-1] == a and second[-1] == b and problem.schedule(second[::-1], shift) is not None:
+            merged = first + second[::-1]
+        elif first[0] == a and second[0] == b and problem.schedule(first[::-1], shift) is not None:
+            merged = first[::-1] + second
+        else:
+            continue
+        if problem.schedule(merged, shift) is None:
+            continue
+        routes[route_a] = merged
+        loads[route_a] += loads.pop(route_b)
+        del routes[route_b]
+        for node in second:
+            route_of[node] = route_a
+    return list(routes.values())
+
+
+class _Fleet:
+    """
+    Routes under construction, one per truck, with each route's load and
+    timing slack: service start times forward and latest feasible start times
+    backward, so inserting a stop is checked in constant time.
+    """
+
+    def __init__(self, problem: _Problem, routes: List[List[int]], vehicles: List[Vehicle]):
+        self.problem = problem
+        self.routes = routes
+        self.vehicles = vehicles
+        self.loads = [0.0] * len(routes)
+        self.starts: List[List[float]] = [[] for _ in routes]
+        self.latest: List[List[float]] = [[] for _ in routes]
+        for r in range(len(routes)):
+            self.refresh(r)
+
+    def refresh(self, r: int) -> None:
+        problem, route = self.problem, self.routes[r]
+        path = [0] + route + [0]
+        starts = [0.0]
+        for previous, node in zip(path, path[1:-1]):
+            starts.append(max(starts[-1] + problem.service[previous] + problem.minutes[previous][node], problem.earliest[node]))
+        latest = [0.0] * len(path)
+        latest[-1] = self.vehicles[r].shift_minutes
+        for i in range(len(path) - 2, 0, -1):
+            node = path[i]
+            latest[i] = min(problem.latest[node], latest[i + 1] - problem.service[node] - problem.minutes[node][path[i + 1]])
+        self.loads[r] = problem.load(route)
+        self.starts[r], self.latest[r] = starts, latest
+
+    def insertion(self, node: int, skip: int = -1) -> Optional[Tuple[float, int, int]]:
+        """Cheapest feasible (added km, route index, position) for node, ignoring route skip"""
+        problem = self.problem
+        km, minutes = problem.km, problem.minutes
+        service, earliest, latest_window = problem.service, problem.earliest[node], problem.latest[node]
+        best = None
+        for r, route in enumerate(self.routes):
+            if r == skip or self.loads[r] + problem.demand[node] > self.vehicles[r].capacity + EPSILON:
+                continue
+            path = [0] + route + [0]
+            starts, latest = self.starts[r], self.latest[r]
+            for position in range(len(path) - 1):
+                before, after = path[position], path[position + 1]
+                cost = km[before][node] + km[node][after] - km[before][after]
+                if best is not None and cost >= best[0]:
+                    continue
+                arrival = max(starts[position] + service[before] + minutes[before][node], earliest)
+                if arrival > latest_window + EPSILON:
+                    continue
+                if arrival + service[node] + minutes[node][after] > latest[position + 1] + EPSILON:
+                    continue
+                best = (cost, r, position)
+        return best
+
+    def insert(self, node: int, r: int, position: int) -> None:
+        self.routes[r].insert(position, node)
+        self.refresh(r)
+
+    def two_opt(self, r: int) -> bool:
+        """Apply the first improving, feasible segment reversal of route r"""
+        problem, route = self.problem, self.routes[r]
+        km = problem.km
+        path = [0] + route + [0]
+        for i in range(1, len(path) - 2):
+            for j in range(i + 1, len(path) - 1):
+                delta = km[path[i - 1]][path[j]] + km[path[i]][path[j + 1]] - km[path[i - 1]][path[i]] - km[path[j]][path[j + 1]]
+                if delta < -EPSILON:
+                    candidate = path[1:i] + path[i:j + 1][::-1] + path[j + 1:-1]
+                    if problem.schedule(candidate, self.vehicles[r].shift_minutes) is not None:
+                        route[:] = candidate
+                        self.refresh(r)
+                        return True
+        return False
+
+    def relocate(self, deadline: float) -> bool:
+        """One sweep moving each stop to a cheaper feasible place on another route"""
+        km = self.problem.km
+        moved = False
+        for r, route in enumerate(self.routes):
+            position = 0
+            while position < len(route) and time.perf_counter() < deadline:
+                node = route[position]
+                before = route[position - 1] if position else 0
+                after = route[position + 1] if position + 1 < len(route) else 0
+                # Distances obey the triangle inequality, so removing a stop never breaks a window
+                removal_gain = km[before][node] + km[node][after] - km[before][after]
+                insertion = self.insertion(node, skip=r)
+                if insertion is None or insertion[0] >= removal_gain - EPSILON:
+                    position += 1
+                    continue
+                del route[position]
+                self.refresh(r)
+                self.insert(node, insertion[1], insertion[2])
+                moved = True
+        return moved
+
+
+def solve(
+    depot: Tuple[float, float],
+    stops: Sequence[Stop],
+    vehicles: Sequence[Vehicle],
+    *,
+    speed_kmh: float = settings.ROUTING_SPEED_KMH,
+    road_factor: float = settings.ROUTING_ROAD_FACTOR,
+    time_limit: float = 0.8,
+) -> Plan:
+    started = time.perf_counter()
+    deadline = started + time_limit
+    problem = _Problem(depot, stops, speed_kmh, road_factor)
+    largest = max(vehicle.capacity for vehicle in vehicles) if vehicles else 0.0
+    longest = max(vehicle.shift_minutes for vehicle in vehicles) if vehicles else 0.0
+
+    servable, unassigned = [], []
+    for node in range(1, len(problem.stops) + 1):
+        fits = problem.demand[node] <= largest + EPSILON and problem.schedule([node], longest) is not None
+        (servable if fits else unassigned).append(node)
+
+    # Largest routes go to the smallest truck that takes them
+    candidates = sorted(_savings_routes(problem, servable, largest, longest), key=problem.load, reverse=True)
+    fleet = sorted(vehicles, key=lambda vehicle: (vehicle.capacity, vehicle.shift_minutes))
+    routes: List[List[int]] = []
+    assigned: List[Vehicle] = []
+    leftovers: List[int] = []
+    for route in candidates:
+        for vehicle in fleet:
+            if problem.load(route) <= vehicle.capacity + EPSILON and problem.schedule(route, vehicle.shift_minutes) is not None:
+                fleet.remove(vehicle)
+                routes.append(route)
+                assigned.append(vehicle)
+                break
+        else:
+            leftovers.extend(route)
+    # Idle trucks get empty routes so leftover stops can be placed on them
+    routes.extend([] for _ in fleet)
+    assigned.extend(fleet)
+    state = _Fleet(problem, routes, assigned)
+    for node in sorted(leftovers, key=lambda node: -problem.demand[node]):
+        insertion = state.insertion(node)
+        if insertion is None:
+            unassigned.append(node)
+        else:
+            state.insert(node, insertion[1], insertion[2])
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for r in range(len(routes)):
+            while time.perf_counter() < deadline and state.two_opt(r):
+                improved = True
+        improved = state.relocate(deadline) or improved
+        # Shorter routes may now have room for stops that didn't fit
+        for node in list(unassigned):
+            insertion = state.insertion(node)
+            if insertion is not None:
+                unassigned.remove(node)
+                state.insert(node, insertion[1], insertion[2])
+                improved = True
+
+    planned = []
+    for route, vehicle, load in zip(routes, assigned, state.loads):
+        if not route:
+            continue
+        arrivals, end = problem.schedule(route, vehicle.shift_minutes)
+        planned.append(PlannedRoute(
+            vehicle=vehicle,
+            stops=[problem.stops[node - 1] for node in route],
+            arrivals=arrivals,
+            load=load,
+            distance_km=problem.length(route),
+            end_minutes=end,
+        ))
+    return Plan(
+        routes=planned,
+        unassigned=[problem.stops[node - 1] for node in sorted(unassigned)],
+        distance_km=sum(route.distance_km for route in planned),
+        solve_ms=(time.perf_counter() - started) * 1000,
+    )
@@ -0,0 +1,331 @@
+"""
+Outbound webhooks: partners (the distillery, growers) are POSTed the batch
+status transitions and QC results they subscribe to.
+
+Delivery goes through an outbox. The after_flush hook below writes one
+webhook_deliveries row per event and subscribed endpoint on the flush's own
+connection, so a delivery exists exactly when the change that caused it
+commits, and survives restarts until it is delivered.
+
+The Dispatcher drains the outbox in rounds, from the API processes or
+scripts/webhook_dispatcher.py when WEBHOOKS_DISPATCH_IN_API is off:
+
+* due rows are claimed with a conditional UPDATE that leases them for
+  WEBHOOKS_LEASE_SECONDS, so several dispatchers can share the outbox;
+* each endpoint's events go out in POSTs of up to its batch_size, all
+  endpoints concurrently over one pooled httpx.AsyncClient;
+* a failed POST is retried after WEBHOOKS_BACKOFF_SECONDS, doubling each
+  attempt (or the receiver's Retry-After, if longer), until
+  WEBHOOKS_MAX_ATTEMPTS fails it.
+
+Each POST body is {"events": [{"id", "topic", "occurred_at", "data"}, ...]}
+and is signed with the endpoint's secret: X-Xoohoox-Signature is
+"sha256=" + HMAC-SHA256(secret, "<X-Xoohoox-Timestamp>." + body). Receivers
+check it with verify_signature() and deduplicate on the event ids, since an
+event can arrive more than once (a lost response is retried).
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.tables import has_table
+from app.models.webhook import WebhookDelivery, WebhookEndpoint
+from app.services import live_events
+
+logger = logging.getLogger(__name__)
+
+BATCH_STATUS = live_events.BATCH_STATUS
+QUALITY_CONTROL = live_events.QUALITY_CONTROL
+QUALITY_CONTROL_FAILED = "quality_control_failed"
+TOPICS = (BATCH_STATUS, QUALITY_CONTROL, QUALITY_CONTROL_FAILED)
+
+PENDING = "pending"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+SIGNATURE_HEADER = "X-Xoohoox-Signature"
+TIMESTAMP_HEADER = "X-Xoohoox-Timestamp"
+EVENT_IDS_HEADER = "X-Xoohoox-Events"
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(
+    secret: str, body: bytes, timestamp: str, signature: str, tolerance_seconds: float = 300
+) -> bool:
+    """Whether a POST was signed with secret, within tolerance_seconds of now"""
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance_seconds:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), signature)
+
+
+def _webhook_events(session: Session) -> List[live_events.Message]:
+    events = []
+    for topic, data in live_events.orm_messages(session):
+        events.append((topic, data))
+        if topic == QUALITY_CONTROL and data["result"] == "fail":
+            events.append((QUALITY_CONTROL_FAILED, data))
+    return events
+
+
+@event.listens_for(Session, "after_flush")
+def enqueue_deliveries(session: Session, flush_context: Any) -> None:
+    """Outbox rows for the flush's events, committed or rolled back with it"""
+    events = _webhook_events(session)
+    if not events:
+        return
+    connection = session.connection()
+    if not has_table(connection, WebhookEndpoint.__table__):
+        return
+    endpoints = connection.execute(
+        select(WebhookEndpoint.id, WebhookEndpoint.topics).where(WebhookEndpoint.active.is_(True))
+    ).all()
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": uuid.uuid4().hex, "endpoint_id": endpoint_id, "topic": topic,
+            "payload": {"topic": topic, "occurred_at": now.isoformat(), "data": data},
+            "state": PENDING, "attempts": 0, "next_attempt_at": now, "created_at": now,
+        }
+        for topic, data in events
+        for endpoint_id, topics in endpoints
+        if topic in topics
+    ]
+    if rows:
+        connection.execute(insert(WebhookDelivery), rows)
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        max_connections: int = 20,
+        timeout_seconds: float = 10.0,
+        poll_interval: float = 2.0,
+        max_attempts: int = 10,
+        backoff_seconds: float = 15.0,
+        max_backoff_seconds: float = 3600.0,
+        lease_seconds: float = 60.0,
+        claim_limit: int = 1000,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.session_factory = session_factory
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.lease = timedelta(seconds=lease_seconds)
+        self.claim_limit = claim_limit
+        self.transport = transport  # httpx.MockTransport or ASGITransport in tests
+
+        self._metrics: Dict[int, Dict[str, float]] = defaultdict(lambda: {
+            "posts": 0, "delivered": 0, "failed_posts": 0, "failed": 0, "last_status": 0, "last_latency_ms": 0.0,
+        })
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=self.timeout_seconds,
+            limits=httpx.Limits(max_connections=self.max_connections),
+            transport=self.transport,
+        )
+
+    def _claim(self) -> List[Dict[str, Any]]:
+        """Lease the due deliveries of active endpoints to this round"""
+        now = datetime.utcnow()
+        claim = uuid.uuid4().hex
+        with self.session_factory() as db:
+            due = select(WebhookDelivery.id).join(WebhookEndpoint).where(
+                WebhookDelivery.state == PENDING,
+                WebhookDelivery.next_attempt_at <= now,
+                WebhookEndpoint.active.is_(True),
+            ).order_by(WebhookDelivery.created_at).limit(self.claim_limit)
+            ids = db.scalars(due).all()
+            if not ids:
+                return []
+            db.execute(
+                update(WebhookDelivery)
+                .where(WebhookDelivery.id.in_(ids), WebhookDelivery.state == PENDING, WebhookDelivery.next_attempt_at <= now)
+                .values(claimed_by=claim, next_attempt_at=now + self.lease)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            rows = db.execute(
+                select(
+                    WebhookDelivery.id, WebhookDelivery.endpoint_id, WebhookDelivery.payload, WebhookDelivery.attempts,
+                    WebhookEndpoint.url, WebhookEndpoint.secret, WebhookEndpoint.batch_size,
+                )
+                .join(WebhookEndpoint)
+                .where(WebhookDelivery.claimed_by == claim)
+                .order_by(WebhookDelivery.created_at, WebhookDelivery.id)
+            ).all()
+        return [row._asdict() for row in rows]
+
+    async def _post(self, client: httpx.AsyncClient, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        endpoint = rows[0]
+        body = json.dumps({"events": [{"id": row["id"], **row["payload"]} for row in rows]}).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            TIMESTAMP_HEADER: timestamp,
+            SIGNATURE_HEADER: sign(endpoint["secret"], timestamp, body),
+            EVENT_IDS_HEADER: ",".join(row["id"] for row in rows),
+        }
+        started = time.perf_counter()
+        outcome: Dict[str, Any] = {"rows": rows, "status": 0, "error": None, "retry_after": 0.0}
+        try:
+            response = await client.post(endpoint["url"], content=body, headers=headers)
+            outcome["status"] = response.status_code
+            if not response.is_success:
+                outcome["error"] = f"HTTP {response.status_code}: {response.text[:200]}"
+                try:
+                    outcome["retry_after"] = float(response.headers.get("Retry-After", 0))
+                except ValueError:
+                    pass
+        except httpx.HTTPError as e:
+            outcome["error"] = f"{type(e).__name__}: {e}"
+        outcome["latency_ms"] = (time.perf_counter() - started) * 1000
+        return outcome
+
+    def _record(self, outcomes: List[Dict[str, Any]]) -> int:
+        now = datetime.utcnow()
+        delivered = 0
+        with self.session_factory() as db:
+            for outcome in outcomes:
+                rows = outcome["rows"]
+                ids = [row["id"] for row in rows]
+                claimed = update(WebhookDelivery).where(WebhookDelivery.id.in_(ids)).execution_options(synchronize_session=False)
+                if outcome["error"] is None:
+                    db.execute(claimed.values(
+                        state=DELIVERED, attempts=WebhookDelivery.attempts + 1, delivered_at=now,
+                        claimed_by=None, last_error=None,
+                    ))
+                    delivered += len(rows)
+                else:
+                    # A POST's rows were all due together, so they share the attempt count
+                    attempts = max(row["attempts"] for row in rows) + 1
+                    backoff = min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+                    retry = attempts < self.max_attempts
+                    db.execute(claimed.values(
+                        state=PENDING if retry else FAILED, attempts=attempts, claimed_by=None,
+                        last_error=outcome["error"],
+                        next_attempt_at=now + timedelta(seconds=max(backoff, outcome["retry_after"])),
+                    ))
+                    logger.warning(
+                        f"Webhook POST to {rows[0]['url']} failed (attempt {attempts}, {len(rows)} events): {outcome['error']}"
+                    )
+                with self._lock:
+                    metrics = self._metrics[rows[0]["endpoint_id"]]
+                    metrics["posts"] += 1
+                    metrics["last_status"] = outcome["status"]
+                    metrics["last_latency_ms"] = round(outcome["latency_ms"], 1)
+                    if outcome["error"] is None:
+                        metrics["delivered"] += len(rows)
+                    else:
+                        metrics["failed_posts"] += 1
+                        if not retry:
+                            metrics["failed"] += len(rows)
+            db.commit()
+        return delivered
+
+    async def deliver_pending(self, client: Optional[httpx.AsyncClient] = None) -> int:
+        """One round: POST the due deliveries, batched per endpoint; returns the number of events delivered"""
+        rows = self._claim()
+        if not rows:
+            return 0
+        batches = []
+        by_endpoint: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_endpoint[row["endpoint_id"]].append(row)
+        for endpoint_rows in by_endpoint.values():
+            size = max(endpoint_rows[0]["batch_size"], 1)
+            batches.extend(endpoint_rows[i:i + size] for i in range(0, len(endpoint_rows), size))
+
+        if client is None:
+            async with self.client() as client:
+                outcomes = await asyncio.gather(*(self._post(client, batch) for batch in batches))
+        else:
+            outcomes = await asyncio.gather(*(self._post(client, batch) for batch in batches))
+        return self._record(outcomes)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="webhooks", daemon=True)
+            self._thread.start()
+
+    async def _run(self) -> None:
+        async with self.client() as client:
+            while not self._stopping.is_set():
+                try:
+                    busy = await self.deliver_pending(client)
+                except Exception:
+                    logger.exception("Delivering webhooks failed")
+                    busy = 0
+                if not busy:
+                    await asyncio.get_running_loop().run_in_executor(None, self._stopping.wait, self.poll_interval)
+
+    def stop(self) -> None:
+        """Stop after the current round; rows it had claimed are retried once their lease expires"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """Per endpoint id, this process's delivery counters since it started"""
+        with self._lock:
+            return {endpoint_id: dict(metrics) for endpoint_id, metrics in self._metrics.items()}
+
+
+def outbox_counts(db: Session) -> Dict[int, Dict[str, int]]:
+    """Per endpoint id, the number of deliveries in each state"""
+    counts: Dict[int, Dict[str, int]] = defaultdict(lambda: {PENDING: 0, DELIVERED: 0, FAILED: 0})
+    for endpoint_id, state, count in db.execute(
+        select(WebhookDelivery.endpoint_id, WebhookDelivery.state, func.count()).group_by(
+            WebhookDelivery.endpoint_id, WebhookDelivery.state
+        )
+    ):
+        counts[endpoint_id][state] = count
+    return dict(counts)
+
+
+def _default_session() -> Session:
+    from app.db.database import SessionLocal
+    return SessionLocal()
+
+
+dispatcher = Dispatcher(
+    _default_session,
+    max_connections=settings.WEBHOOKS_MAX_CONNECTIONS,
+    timeout_seconds=settings.WEBHOOKS_TIMEOUT_SECONDS,
+    poll_interval=settings.WEBHOOKS_POLL_INTERVAL_SECONDS,
+    max_attempts=settings.WEBHOOKS_MAX_ATTEMPTS,
+    backoff_seconds=settings.WEBHOOKS_BACKOFF_SECONDS,
+    max_backoff_seconds=settings.WEBHOOKS_MAX_BACKOFF_SECONDS,
+    lease_seconds=settings.WEBHOOKS_LEASE_SECONDS,
+)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Fill in paddocks.geohash and location_tracking.geohash for rows written before
+the columns existed. New rows get theirs on write.
+
+Usage: python scripts/backfill_geohash.py [chunk_size]   (default 10000)
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import bindparam, select, update
+
+from app.db.database import SessionLocal
+from app.models.geolocation import LocationTracking, Paddock
+from app.services import geohash
+
+
+def backfill(model, chunk_size: int) -> int:
+    table = model.__table__
+    filled = 0
+    with SessionLocal() as db:
+        while True:
+            rows = db.execute(
+                select(table.c.id, table.c.latitude, table.c.longitude)
+                .where(table.c.geohash.is_(None), table.c.latitude.isnot(None), table.c.longitude.isnot(None))
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                return filled
+            cells = geohash.encode_many([row.latitude for row in rows], [row.longitude for row in rows])
+            db.execute(
+                update(table).where(table.c.id == bindparam("row_id")).values(geohash=bindparam("cell")),
+                [{"row_id": row.id, "cell": cell} for row, cell in zip(rows, cells)],
+            )
+            db.commit()
+            filled += len(rows)
+
+
+if __name__ == "__main__":
+    chunk_size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for model in (Paddock, LocationTracking):
+        print(f"{model.__tablename__}: {backfill(model, chunk_size)} rows")
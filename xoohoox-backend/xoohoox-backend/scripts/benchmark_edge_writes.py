@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Measure write throughput of the edge box's SQLite database: the plain SQLite
+engine against the edge profile (app/db/edge.py), then with the replication
+log on, and how fast the log ships to central.
+
+* commits: small ORM transactions (one batch each, as API requests write
+  them) from 4 threads;
+* GPS ingest: write-behind flushes of 5000 points (app/services/gps_ingest.py);
+* shipping: replication log entries applied to central per second.
+
+Usage: python scripts/benchmark_edge_writes.py [transactions] [points] [central_database_url]
+       (defaults: 2000 transactions, 100000 points, SQLite file in /tmp as central)
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db import base as db_base
+from app.db import replication
+from app.db.edge import sqlite_engine
+from app.models.base import Base as ModelsBase
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType
+from app.services.gps_ingest import IngestBuffer
+
+THREADS = 4
+FLUSH_SIZE = 5000
+
+
+def fresh_database(path: str, profile: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    url = f"sqlite:///{path}"
+    engine = sqlite_engine(url) if profile == "edge" else create_engine(url, connect_args={"check_same_thread": False})
+    ModelsBase.metadata.create_all(bind=engine)
+    for table in db_base.Base.metadata.sorted_tables:
+        table.create(bind=engine, checkfirst=True)
+    return engine
+
+
+def commits(engine, count: int) -> tuple:
+    """Transactions per second, and how many failed on the write lock"""
+    factory = sessionmaker(bind=engine)
+    failed = []
+
+    def writer(offset: int) -> None:
+        for number in range(offset, count, THREADS):
+            with factory() as db:
+                db.add(BatchTracking(batch_id=f"240301-AP-JC-{number:05d}", name=f"Batch {number}",
+                                     fruit_type=FruitType.APPLE, process_type="JC",
+                                     start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1)))
+                try:
+                    db.commit()
+                except OperationalError:
+                    failed.append(number)
+
+    threads = [threading.Thread(target=writer, args=(offset,)) for offset in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return count / (time.perf_counter() - start), len(failed)
+
+
+def ingest(engine, count: int) -> float:
+    """GPS points written per second"""
+    buffer = IngestBuffer(sessionmaker(bind=engine), max_points=count, flush_size=FLUSH_SIZE, flush_interval=0)
+    start_time = datetime(2024, 3, 1, 6)
+    points = [
+        {"batch_id": f"B-{n % 200:04d}", "harvest_id": f"H-{n % 200:04d}", "latitude": -37.8 + n * 1e-6,
+         "longitude": 145.0 + n * 1e-6, "timestamp": start_time + timedelta(seconds=5 * (n // 200))}
+        for n in range(count)
+    ]
+    start = time.perf_counter()
+    for offset in range(0, count, FLUSH_SIZE):
+        buffer.offer(points[offset:offset + FLUSH_SIZE])
+        buffer.flush()
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    central_url = sys.argv[3] if len(sys.argv) > 3 else None
+
+    print(f"{transactions} transactions from {THREADS} threads, {points} GPS points in flushes of {FLUSH_SIZE}")
+    print(f"{'profile':<22} {'commits/s':>10} {'lock errors':>12} {'points/s':>10}")
+    for label, profile, logged in (("sqlite default", "default", False), ("edge", "edge", False),
+                                   ("edge + replication log", "edge", True)):
+        settings.EDGE_CENTRAL_DATABASE_URI = "postgresql://central" if logged else ""
+        engine = fresh_database(f"/tmp/benchmark_edge_{profile}.db", profile)
+        per_second, failed = commits(engine, transactions)
+        points_per_second = ingest(engine, points)
+        print(f"{label:<22} {per_second:>10,.0f} {failed:>12} {points_per_second:>10,.0f}")
+        if not logged:
+            engine.dispose()
+
+    central = (create_engine(central_url) if central_url else fresh_database("/tmp/benchmark_edge_central.db", "edge"))
+    if central_url:
+        for table in (BatchTracking.__table__, replication.LocationTracking.__table__, db_base.TraceLink.__table__):
+            table.create(bind=central, checkfirst=True)
+    replicator = replication.Replicator(sessionmaker(bind=engine), sessionmaker(bind=central))
+    start = time.perf_counter()
+    shipped = replicator.ship_all()
+    elapsed = time.perf_counter() - start
+    print(f"shipped {shipped} log entries to central ({central.dialect.name}) in {elapsed:.2f}s "
+          f"-> {shipped / elapsed:,.0f} entries/s, {replicator.stats()['batches']} batches")
+
+
+if __name__ == "__main__":
+    main()
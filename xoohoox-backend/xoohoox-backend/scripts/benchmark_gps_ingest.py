@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Measure end-to-end GPS ingest throughput on one worker: NDJSON uploads through
+POST /geolocation/location-tracking/ingest (parse + validate + queue) and the
+write-behind flushes into location_tracking.
+
+Usage: python scripts/benchmark_gps_ingest.py [points] [points_per_upload] [database_url]
+       (defaults: 200000 points, 2000 per upload, SQLite file in /tmp)
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1.endpoints import geolocation as endpoints
+from app.db import base as db_base
+from app.main import app
+from app.core.config import settings
+from app.models.geolocation import LocationTracking
+from app.services.gps_ingest import IngestBuffer
+
+TRUCKS = 200
+
+
+def uploads(count: int, per_upload: int):
+    rng = random.Random(1)
+    start = datetime(2024, 3, 1, 6)
+    positions = {truck: (rng.uniform(-38, -34), rng.uniform(141, 146)) for truck in range(TRUCKS)}
+    lines = []
+    for number in range(count):
+        truck = number % TRUCKS
+        lat, lng = positions[truck]
+        lat, lng = lat + rng.uniform(-0.001, 0.001), lng + rng.uniform(-0.001, 0.001)
+        positions[truck] = (lat, lng)
+        lines.append(json.dumps({
+            "batch_id": f"B-{truck:04d}", "harvest_id": f"H-{truck:04d}", "latitude": lat, "longitude": lng,
+            "timestamp": (start + timedelta(seconds=5 * (number // TRUCKS))).isoformat(),
+        }))
+        if len(lines) == per_upload:
+            yield "\n".join(lines)
+            lines = []
+    if lines:
+        yield "\n".join(lines)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    per_upload = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    url = sys.argv[3] if len(sys.argv) > 3 else "sqlite:////tmp/benchmark_gps_ingest.db"
+
+    engine = create_engine(url)
+    for table in (LocationTracking.__table__, db_base.TraceLink.__table__):
+        table.drop(bind=engine, checkfirst=True)
+        table.create(bind=engine)
+    buffer = IngestBuffer(sessionmaker(bind=engine), max_points=200_000, flush_size=5000, flush_interval=0.5)
+    app.dependency_overrides[endpoints.get_ingest_buffer] = lambda: buffer
+    client = TestClient(app)
+    endpoint = f"{settings.API_V1_STR}/geolocation/location-tracking/ingest"
+
+    bodies = list(uploads(count, per_upload))
+    throttled = 0
+    start = time.perf_counter()
+    for body in bodies:
+        while client.post(endpoint, content=body).status_code == 429:
+            throttled += 1
+            time.sleep(0.05)
+    accepted_at = time.perf_counter() - start
+    buffer.stop()
+    elapsed = time.perf_counter() - start
+
+    with engine.connect() as connection:
+        stored = connection.execute(select(func.count()).select_from(LocationTracking.__table__)).scalar()
+    stats = buffer.stats()
+    print(f"{count} points in {len(bodies)} uploads ({engine.dialect.name}), {throttled} uploads throttled")
+    print(f"accepted in {accepted_at:.2f}s, stored {stored} in {elapsed:.2f}s -> {count / elapsed:,.0f} points/s end to end")
+    print(f"{stats['flushes']} flushes, {stats['flush_points_per_second']:,} points/s while flushing, last flush {stats['last_flush_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
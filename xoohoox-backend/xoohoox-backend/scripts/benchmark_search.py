@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Measure full-text search latency over a large synthetic notes corpus.
+
+Seeds search_documents directly (the FTS index is maintained by the table's
+triggers on SQLite / generated column on PostgreSQL) and times a few typical
+queries through app.crud.search.
+
+Usage: python scripts/benchmark_search.py [documents] [database_url]
+       (defaults: 1000000 documents, in-memory SQLite)
+"""
+import random
+import sys
+import time
+from pathlib import Path
+from statistics import median
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.crud import search as crud
+from app.models.enums import SearchEntityType
+from app.models.search import SearchDocument
+
+WORDS = (
+    "apple pear grape cider perry must juice press racking lees yeast nutrient ferment stuck slow "
+    "vigorous clean crisp green tart sweet dry oak vanilla floral citrus bruising wet morning "
+    "sediment haze clear bright aeration temperature gravity brix acid tannin body finish"
+).split()
+RARE = ["sulphur", "acetic", "mousy", "brett"]
+QUERIES = ["sulphur", "sulphur racking", "mousy finish", "apple", "acetic haze"]
+CHUNK = 20000
+
+
+def note(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 30))
+    if rng.random() < 0.01:
+        words.insert(rng.randrange(len(words)), rng.choice(RARE))
+    return " ".join(words)
+
+
+def seed(engine, count: int) -> None:
+    rng = random.Random(42)
+    types = [entity_type.value for entity_type in SearchEntityType]
+    with engine.begin() as connection:
+        for start in range(0, count, CHUNK):
+            connection.execute(insert(SearchDocument.__table__), [
+                {
+                    "entity_type": types[number % len(types)],
+                    "entity_key": str(number),
+                    "batch_id": f"B-{number // 20:06d}",
+                    "content": note(rng),
+                }
+                for number in range(start, min(start + CHUNK, count))
+            ])
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    url = sys.argv[2] if len(sys.argv) > 2 else "sqlite://"
+
+    engine = create_engine(url)
+    SearchDocument.__table__.drop(bind=engine, checkfirst=True)
+    SearchDocument.__table__.create(bind=engine)
+
+    start = time.perf_counter()
+    seed(engine, count)
+    print(f"seeded {count} documents in {time.perf_counter() - start:.1f}s ({engine.dialect.name})")
+
+    session = sessionmaker(bind=engine)()
+    print(f"{'query':<20} {'hits':>6} {'median ms':>10} {'max ms':>8}")
+    for query in QUERIES:
+        timings = []
+        for _ in range(10):
+            begin = time.perf_counter()
+            hits = crud.search(session, query=query, limit=50)
+            timings.append((time.perf_counter() - begin) * 1000)
+        print(f"{query:<20} {len(hits):>6} {median(timings):>10.2f} {max(timings):>8.2f}")
+
+    begin = time.perf_counter()
+    hits = crud.search(session, query="sulphur", entity_types=[SearchEntityType.QUALITY_CONTROL], limit=50)
+    print(f"{'sulphur (qc only)':<20} {len(hits):>6} {(time.perf_counter() - begin) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
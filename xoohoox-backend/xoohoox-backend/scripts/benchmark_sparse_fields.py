@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Measure payload size and latency of GET /batches/ with and without `fields=`.
+
+Runs against an in-memory SQLite database seeded with batches carrying
+realistic JSON blobs (quality_checks, ingredients, environmental_impact).
+
+Usage: python scripts/benchmark_sparse_fields.py [batches] [repeats]
+"""
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import deps
+from app.core.config import settings
+from app.db import base as _registered_models  # noqa: F401  (registers every model)
+from app.main import app
+from app.models.base import Base
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType
+from app.models.search import SearchDocument
+from app.models.traceability import TraceLink
+
+FIELD_SETS = [
+    None,
+    "batch_id,name,status,stage,progress",
+    "batch_id,status",
+]
+
+
+def seed(session, count: int) -> None:
+    for number in range(count):
+        session.add(BatchTracking(
+            batch_id=f"240301-AP-JC-{number:05d}",
+            name=f"Batch {number}",
+            fruit_type=FruitType.APPLE,
+            process_type="JC",
+            start_date=datetime(2024, 3, 1),
+            end_date=datetime(2024, 4, 1),
+            quality_checks=[{"test_type": "ph", "result": "pass", "value": 3.4, "notes": "routine"}] * 20,
+            maintenance_records=[{"equipment_id": "PRESS-1", "action": "clean"}] * 10,
+            environmental_impact={"water_l": 1200, "energy_kwh": 85, "waste_kg": 40},
+            ingredients=[{"name": "apple", "variety": "Pink Lady", "kg": 250}] * 30,
+        ))
+    session.commit()
+
+
+def measure(client: TestClient, limit: int, fields, repeats: int):
+    params = {"limit": limit}
+    if fields:
+        params["fields"] = fields
+    timings = []
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = client.get(f"{settings.API_V1_STR}/batches/", params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+        size = len(response.content)
+    return size, median(timings)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    for index_table in (SearchDocument.__table__, TraceLink.__table__):
+        index_table.create(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    seed(session, count)
+
+    app.dependency_overrides[deps.get_db] = lambda: session
+    client = TestClient(app)
+
+    print(f"{'fields':<40} {'bytes':>10} {'median ms':>10}")
+    baseline = None
+    for fields in FIELD_SETS:
+        session.expire_all()
+        size, latency = measure(client, count, fields, repeats)
+        baseline = baseline or size
+        label = fields or "(all)"
+        print(f"{label:<40} {size:>10} {latency:>10.2f}  ({size / baseline:.1%} of full payload)")
+
+
+if __name__ == "__main__":
+    main()
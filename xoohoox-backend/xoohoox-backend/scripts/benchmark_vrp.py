@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Measure the collection-route solver on random stops around the lab: solve time,
+distance against one out-and-back trip per stop, and stops left unassigned.
+
+Usage: python scripts/benchmark_vrp.py [stops] [trucks] [time_limit_seconds]
+       (defaults: 200 stops, 14 trucks of 500 kg on 10 hour shifts, 0.8 s)
+"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.vrp import Stop, Vehicle, distance_matrix, solve
+
+if __name__ == "__main__":
+    stop_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    truck_count = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+    time_limit = float(sys.argv[3]) if len(sys.argv) > 3 else 0.8
+
+    rng = random.Random(42)
+    depot = (settings.LAB_LATITUDE, settings.LAB_LONGITUDE)
+    stops = [
+        Stop(f"S{n}", depot[0] + rng.uniform(-1.5, 1.5), depot[1] + rng.uniform(-1.5, 1.5), rng.uniform(5, 40), 5)
+        for n in range(stop_count)
+    ]
+    vehicles = [Vehicle(f"T{n}", 500, 600) for n in range(truck_count)]
+
+    for run in range(3):
+        plan = solve(depot, stops, vehicles, time_limit=time_limit)
+        print(
+            f"run {run + 1}: {plan.solve_ms:.0f} ms, {len(plan.routes)} routes, "
+            f"{plan.distance_km:.0f} km, {len(plan.unassigned)} unassigned"
+        )
+    matrix = distance_matrix([depot] + [(stop.latitude, stop.longitude) for stop in stops])
+    print(f"one trip per stop: {2 * matrix[0, 1:].sum():.0f} km")
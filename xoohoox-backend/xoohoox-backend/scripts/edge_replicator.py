@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Ship an edge box's logged writes to the central PostgreSQL (see app/db/replication.py).
+Run it next to the API on the edge box, with EDGE_CENTRAL_DATABASE_URI set there too.
+With --once, ship what is logged now and exit; --status prints the backlog;
+--retry-failed queues the entries central rejected again.
+
+Usage: python scripts/edge_replicator.py [--once | --status | --retry-failed]
+"""
+import argparse
+import logging
+import signal
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db import replication
+from app.db.database import SessionLocal
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--once", action="store_true", help="Ship what is logged now, then exit")
+    mode.add_argument("--status", action="store_true", help="Print the backlog and exit")
+    mode.add_argument("--retry-failed", action="store_true", help="Queue the entries central rejected again")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with SessionLocal() as db:
+        if args.status:
+            print(replication.backlog(db))
+            sys.exit(0)
+        if args.retry_failed:
+            print(f"replication: {replication.retry_failed(db)} entries queued again")
+            sys.exit(0)
+    if not settings.EDGE_CENTRAL_DATABASE_URI:
+        sys.exit("EDGE_CENTRAL_DATABASE_URI is not set")
+
+    central = create_engine(settings.EDGE_CENTRAL_DATABASE_URI, pool_pre_ping=True, pool_size=1)
+    replicator = replication.Replicator(SessionLocal, sessionmaker(autocommit=False, autoflush=False, bind=central))
+    if args.once:
+        print(f"replication: {replicator.ship_all()} entries shipped, {replicator.stats()}")
+        sys.exit(0)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: replicator.stop())
+    thread = threading.Thread(target=replicator.run, name="edge-replicator")
+    thread.start()
+    print("edge replicator running")
+    while thread.is_alive():
+        thread.join(1)
+    print(f"edge replicator stopped: {replicator.stats()}")
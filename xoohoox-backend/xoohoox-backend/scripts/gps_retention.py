@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Downsample GPS tracks of trips idle for longer than the retention period and
+archive their raw points (see app/services/gps_retention.py).
+
+Usage: python scripts/gps_retention.py [--days N] [--tolerance METRES] [--chunk-size N]
+                                       [--archive-dir DIR] [--dry-run]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.services.gps_retention import run_retention
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=settings.GPS_RETENTION_DAYS)
+    parser.add_argument("--tolerance", type=float, default=settings.GPS_RETENTION_TOLERANCE_METERS)
+    parser.add_argument("--chunk-size", type=int, default=settings.GPS_RETENTION_CHUNK_SIZE)
+    parser.add_argument("--archive-dir", default=settings.GPS_ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be done without writing")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        report = run_retention(
+            db, older_than_days=args.days, tolerance_m=args.tolerance, chunk_size=args.chunk_size,
+            archive_dir=args.archive_dir, dry_run=args.dry_run,
+        )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Run background jobs outside the API processes (see app/services/jobs.py).
+Start as many as needed, and set JOBS_RUN_IN_API=false on the API so only
+these run jobs. With --once, run the jobs due now and exit.
+
+Usage: python scripts/job_worker.py [--once]
+"""
+import argparse
+import logging
+import signal
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import exports, gps_retention, jobs, route_tracks, sync  # noqa: F401 (the job types register on import)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="Run the jobs due now, then exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.once:
+        print(f"jobs: {jobs.runner.run_pending()} run")
+        sys.exit(0)
+
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+    jobs.runner.start()
+    print(f"job worker {jobs.runner.worker_id} running: {', '.join(jobs.JOB_TYPES)}")
+    stopped.wait()
+    jobs.runner.stop()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Learn delivery legs (farm to lab trip durations) from GPS tracks stored before
+the ETA service recorded them as points arrived. Batches that already have a
+leg are skipped, so this is safe to re-run. Restart the API afterwards for its
+ETAs to use the new legs.
+
+Usage: python scripts/learn_delivery_legs.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+
+from app.db.bulk import insert_ignoring_conflicts
+from app.db.database import SessionLocal
+from app.models.geolocation import DeliveryLeg, Harvest, LocationTracking
+from app.services import eta
+
+
+def learn() -> int:
+    table = LocationTracking.__table__
+    learned = []
+    with SessionLocal() as db:
+        connection = db.connection()
+        known = set(connection.execute(select(DeliveryLeg.__table__.c.batch_id)).scalars())
+        farm_ids = dict(connection.execute(select(Harvest.__table__.c.harvest_id, Harvest.__table__.c.farm_id)).all())
+        trip = None
+        rows = connection.execution_options(yield_per=10000).execute(
+            select(table.c.batch_id, table.c.harvest_id, table.c.latitude, table.c.longitude, table.c.timestamp, table.c.status)
+            .order_by(table.c.batch_id, table.c.timestamp)
+        ).mappings()
+        for point in rows:
+            if point["batch_id"] in known:
+                continue
+            if trip is not None and trip.batch_id != point["batch_id"]:
+                trip = None
+            trip, leg = eta.tracker.advance(trip, point, farm_ids.get(point["harvest_id"]))
+            if leg is not None:
+                learned.append(leg)
+        insert_ignoring_conflicts(connection, DeliveryLeg.__table__, learned, ["batch_id"])
+        db.commit()
+    return len(learned)
+
+
+if __name__ == "__main__":
+    print(f"delivery_legs: {learn()} learned")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Deliver outbound webhooks outside the API processes (see app/services/webhooks.py).
+Set WEBHOOKS_DISPATCH_IN_API=false on the API so only these deliver.
+With --once, deliver what is due now and exit.
+
+Usage: python scripts/webhook_dispatcher.py [--once]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import webhooks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="Deliver what is due now, then exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.once:
+        print(f"webhooks: {asyncio.run(webhooks.dispatcher.deliver_pending())} events delivered")
+        sys.exit(0)
+
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+    webhooks.dispatcher.start()
+    print("webhook dispatcher running")
+    stopped.wait()
+    webhooks.dispatcher.stop()
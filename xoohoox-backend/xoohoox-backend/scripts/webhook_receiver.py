@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a partner's webhook receiver: checks each POST's
+signature, prints its events and answers like a receiver would, so
+deliveries can be tried end to end without a partner. Point an endpoint at
+http://localhost:<port>/ with the same secret.
+
+Usage: python scripts/webhook_receiver.py --secret SECRET [--port 9000] [--fail-rate 0.2]
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI, Request, Response
+
+from app.services import webhooks
+
+
+def create_app(secret: str, fail_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Webhook receiver")
+    seen = set()
+
+    @app.post("/")
+    async def receive(request: Request):
+        body = await request.body()
+        if not webhooks.verify_signature(
+            secret, body,
+            request.headers.get(webhooks.TIMESTAMP_HEADER, ""),
+            request.headers.get(webhooks.SIGNATURE_HEADER, ""),
+        ):
+            print("rejected: bad signature")
+            return Response(status_code=401)
+        if random.random() < fail_rate:
+            print("failing on purpose")
+            return Response(status_code=503, headers={"Retry-After": "5"})
+        for item in json.loads(body)["events"]:
+            duplicate = " (duplicate)" if item["id"] in seen else ""
+            seen.add(item["id"])
+            print(f"{item['occurred_at']} {item['topic']}{duplicate}: {json.dumps(item['data'])}")
+        return Response(status_code=204)
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--secret", required=True, help="The endpoint's signing secret")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of POSTs answered with 503")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.secret, args.fail_rate), host="127.0.0.1", port=args.port)
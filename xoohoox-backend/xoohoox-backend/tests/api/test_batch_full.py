@@ -0,0 +1,111 @@
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.api import deps
+from app.core.config import settings
+from app.main import app
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import BatchStatus, FruitType, QualityCheckType, TestResult
+from app.models.fermentation_trial import FermentationTrial, JuiceVariant
+from app.models.quality_control import QualityControl
+from app.models.transformation import TransformationStage, TransformationType, JuicingResults, JuiceProcessingType
+from app.models.upscale import UpscaleRun, UpscaleStage
+from tests.utils import sqlite_test_session
+
+# batch + stages + 8 result types + trials + upscale runs + quality records
+QUERY_BUDGET = 13
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[deps.get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.pop(deps.get_db, None)
+
+
+def _seed(db, stages: int, batch_id: str = "240301-AP-JC-001"):
+    batch = BatchTracking(
+        batch_id=batch_id, name="Apple run", fruit_type=FruitType.APPLE, process_type="JC",
+        start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1),
+    )
+    db.add(batch)
+    db.flush()
+    for number in range(stages):
+        stage = TransformationStage(
+            batch_id=batch.id, stage_number=number + 1, stage_name=f"Stage {number + 1}",
+            stage_type=TransformationType.INITIAL_FERMENTATION, status=BatchStatus.IN_PROGRESS,
+        )
+        stage.juicing_results = JuicingResults(
+            juice_processing_type=JuiceProcessingType.JP3, juice_volume=500, brix=12.5, ph=3.4, temperature=18,
+        )
+        db.add(stage)
+        trial = FermentationTrial(
+            trial_id=f"T-{batch_id}-{number:02d}", batch_id=batch.batch_id, yeast_strain="EC-1118",
+            juice_variant=JuiceVariant.JP3, initial_volume=1.0, status="Fermenting",
+        )
+        trial.upscale_runs = [UpscaleRun(upscale_id=f"U-{batch_id}-{number:02d}-5L", stage=UpscaleStage.TEST_4, volume=5.0)]
+        db.add(trial)
+        db.add(QualityControl(
+            test_id=f"QC-{batch_id}-{number}", batch_id=batch.batch_id, test_type=QualityCheckType.PH,
+            test_date=datetime(2024, 3, 2), test_name="pH", test_method="probe", unit_of_measure="pH",
+            result=TestResult.PASS, tester_id=1, actual_value=3.4,
+        ))
+    db.commit()
+    db.expire_all()
+    return batch.batch_id
+
+
+def _count_queries(db, func):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return result, len(statements)
+
+
+def test_read_batch_full(client, db):
+    """The aggregate endpoint returns stages with results, trials and QC records"""
+    batch_id = _seed(db, stages=2)
+    response = client.get(f"{settings.API_V1_STR}/batches/{batch_id}/full")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["transformation_stages"]) == 2
+    assert data["transformation_stages"][0]["juicing_results"]["juice_processing_type"] == "JP3"
+    assert data["transformation_stages"][0]["fermentation_results"] is None
+    assert len(data["trials"]) == 2
+    assert data["trials"][0]["upscale_runs"][0]["upscale_id"].startswith(f"U-{batch_id}")
+    assert {record["test_id"] for record in data["quality_records"]} == {f"QC-{batch_id}-0", f"QC-{batch_id}-1"}
+
+
+def test_read_batch_full_not_found(client):
+    """Unknown batches return 404"""
+    response = client.get(f"{settings.API_V1_STR}/batches/missing/full")
+    assert response.status_code == 404
+
+
+def test_read_batch_full_query_budget(client, db):
+    """The query count is bounded and independent of the number of children"""
+    small = _seed(db, stages=1)
+    _, small_count = _count_queries(db, lambda: client.get(f"{settings.API_V1_STR}/batches/{small}/full"))
+
+    large = _seed(db, stages=5, batch_id="240301-AP-JC-002")
+    db.expire_all()
+    response, large_count = _count_queries(db, lambda: client.get(f"{settings.API_V1_STR}/batches/{large}/full"))
+
+    assert response.status_code == 200
+    assert len(response.json()["transformation_stages"]) == 5
+    assert large_count <= QUERY_BUDGET
+    assert large_count == small_count
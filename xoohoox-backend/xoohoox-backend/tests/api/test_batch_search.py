@@ -0,0 +1,102 @@
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.core.config import settings
+from app.crud.batch_tracking import batch_tracking, facet_cache
+from app.main import app
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType
+from tests.utils import sqlite_test_session
+
+BATCHES = [
+    ("240301-AP-JC-001", FruitType.APPLE, "JC", "planned", datetime(2024, 3, 1)),
+    ("240302-AP-JC-002", FruitType.APPLE, "JC", "in_progress", datetime(2024, 3, 2)),
+    ("240410-PR-FM-001", FruitType.PEAR, "FM", "in_progress", datetime(2024, 4, 10)),
+    ("240415-GR-FM-002", FruitType.GRAPE, "FM", "completed", datetime(2024, 4, 15)),
+    ("240501-AP-DS-001", FruitType.APPLE, "DS", "completed", datetime(2024, 5, 1)),
+]
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    for batch_id, fruit_type, process_type, status, start in BATCHES:
+        session.add(BatchTracking(
+            batch_id=batch_id, name=f"Batch {batch_id}", fruit_type=fruit_type, process_type=process_type,
+            status=status, start_date=start, end_date=start,
+        ))
+    session.commit()
+    facet_cache.clear()
+    yield session
+    session.close()
+    facet_cache.clear()
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[deps.get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.pop(deps.get_db, None)
+
+
+def test_search_returns_facets(client):
+    """Results come back with counts for every facet"""
+    response = client.get(f"{settings.API_V1_STR}/batches/search")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 5
+    assert len(data["items"]) == 5
+    assert data["facets"]["fruit_type"] == {"apple": 3, "pear": 1, "grape": 1}
+    assert data["facets"]["status"] == {"planned": 1, "in_progress": 2, "completed": 2}
+    assert data["facets"]["process_type"] == {"JC": 2, "FM": 2, "DS": 1}
+    assert data["facets"]["month"] == {"2024-03": 2, "2024-04": 2, "2024-05": 1}
+
+
+def test_search_filters_apply_to_results_and_facets(client):
+    """Filters narrow both the page and the facet counts"""
+    response = client.get(
+        f"{settings.API_V1_STR}/batches/search",
+        params={"fruit_type": "apple", "month": "2024-03", "fields": "batch_id,status"},
+    )
+    data = response.json()
+    assert data["total"] == 2
+    assert {item["batch_id"] for item in data["items"]} == {"240301-AP-JC-001", "240302-AP-JC-002"}
+    assert data["facets"]["status"] == {"planned": 1, "in_progress": 1}
+
+
+def test_total_is_exact_when_facets_are_cached(client, monkeypatch):
+    """The total is counted with the page, never read from the facet cache"""
+    monkeypatch.setattr(batch_tracking, "facet_counts", lambda db, **filters: (99, {}))
+    data = client.get(f"{settings.API_V1_STR}/batches/search", params={"status": "in_progress", "limit": 1}).json()
+    assert data["total"] == 2 and len(data["items"]) == 1
+    assert client.get(f"{settings.API_V1_STR}/batches/search", params={"skip": 10}).json()["total"] == 5
+    assert client.get(f"{settings.API_V1_STR}/batches/search", params={"status": "paused"}).status_code == 422
+
+
+def test_facets_cached(client, db):
+    """Facet counts take one query and are served from cache afterwards"""
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        client.get(f"{settings.API_V1_STR}/batches/search", params={"status": "completed"})
+        first = len(statements)
+        client.get(f"{settings.API_V1_STR}/batches/search", params={"status": "completed"})
+        second = len(statements) - first
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    assert first == 2
+    assert second == 1
+
+
+def test_postgres_facets_use_grouping_sets():
+    """On PostgreSQL the facet counts are a single GROUPING SETS query"""
+    session = Session(bind=create_engine("postgresql://localhost/xoohoox"))
+    sql = str(batch_tracking._facet_query(session, []).compile(dialect=postgresql.dialect()))
+    assert "GROUPING SETS" in sql
+    assert "UNION" not in sql
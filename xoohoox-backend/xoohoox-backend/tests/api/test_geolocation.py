@@ -0,0 +1,347 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.api import deps
+from app.core.config import settings
+from app.crud import geolocation as crud
+from app.main import app
+from app.models.geolocation import Geofence, Harvest, LocationTracking, Paddock, SimplifiedTrack
+from app.models.job import Job
+from app.services import geohash, jobs, route_tracks
+from app.services.gps_ingest import IngestBuffer
+from app.services.geometry import point_in_polygon
+from app.services.track_simplify import decode_polyline
+from tests.utils import sqlite_test_session
+
+GEOFENCES = [
+    # geofence_id, farm_id, type, status, coordinates
+    ("GEO_001", "FARM_001", "archive", "active", [[-34.286, 142.263], [-34.286, 142.273], [-34.296, 142.273], [-34.296, 142.263]]),
+    ("GEO_002", "FARM_002", "processing", "active", [[-43.0826, 147.1277], [-43.0826, 147.1377], [-43.0926, 147.1377], [-43.0926, 147.1277]]),
+    ("GEO_003", "FARM_001", "quality", "active", [[-34.29, 142.268], [-34.29, 142.28], [-34.30, 142.28], [-34.30, 142.268]]),
+    ("GEO_004", "FARM_001", "storage", "inactive", [[-34.28, 142.26], [-34.28, 142.28], [-34.30, 142.28], [-34.30, 142.26]]),
+]
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    for geofence_id, farm_id, geofence_type, status, coordinates in GEOFENCES:
+        session.add(Geofence(
+            id=geofence_id.lower(), geofence_id=geofence_id, farm_id=farm_id, name=f"Zone {geofence_id}",
+            type=geofence_type, status=status, coordinates=coordinates,
+        ))
+    for number in range(5):
+        session.add(Harvest(
+            id=f"harvest_{number}", harvest_id=f"HARVEST_{number:03d}", paddock_id="PADDOCK_001",
+            farm_id="FARM_001" if number % 2 else "FARM_002", batch_id=f"BATCH_{number:03d}",
+            fruit_type="Orange", harvest_date=datetime(2024, 3, 1 + number), quantity_kg=100,
+        ))
+    session.commit()
+    crud.geofence_index.invalidate()
+    crud.nearby_index.invalidate()
+    yield session
+    session.close()
+    crud.geofence_index.invalidate()
+    crud.nearby_index.invalidate()
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[deps.get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.pop(deps.get_db, None)
+
+
+def test_geofence_bbox_follows_coordinates(db):
+    """The bbox columns are kept in step with the polygon"""
+    geofence = db.query(Geofence).filter(Geofence.geofence_id == "GEO_001").one()
+    assert (geofence.min_lat, geofence.min_lng, geofence.max_lat, geofence.max_lng) == (-34.296, 142.263, -34.286, 142.273)
+    geofence.coordinates = [[1, 2], [3, 4], [1, 4]]
+    assert (geofence.min_lat, geofence.min_lng, geofence.max_lat, geofence.max_lng) == (1, 2, 3, 4)
+
+
+def test_filters_apply_before_pagination(client):
+    """Filtering happens in SQL, so a page holds only matching rows"""
+    base = f"{settings.API_V1_STR}/geolocation"
+    response = client.get(f"{base}/harvests/", params={"farm_id": "FARM_001", "limit": 1})
+    assert [item["harvest_id"] for item in response.json()] == ["HARVEST_003"]
+    response = client.get(f"{base}/harvests/", params={"farm_id": "FARM_001", "skip": 1, "limit": 1})
+    assert [item["harvest_id"] for item in response.json()] == ["HARVEST_001"]
+
+    response = client.get(f"{base}/geofences/", params={"farm_id": "FARM_001", "skip": 1})
+    assert [item["geofence_id"] for item in response.json()] == ["GEO_003", "GEO_004"]
+
+
+def test_geofences_containing_point(client):
+    """Only active geofences whose polygon holds the point are returned"""
+    base = f"{settings.API_V1_STR}/geolocation/geofences"
+    response = client.get(f"{base}/containing", params={"latitude": -34.291, "longitude": 142.27})
+    assert response.status_code == 200
+    assert [item["geofence_id"] for item in response.json()] == ["GEO_001", "GEO_003"]
+
+    response = client.get(f"{base}/containing", params={"latitude": -34.291, "longitude": 142.265})
+    assert [item["geofence_id"] for item in response.json()] == ["GEO_001"]
+
+    response = client.get(f"{base}/GEO_002/check-point", params={"latitude": -43.085, "longitude": 147.13})
+    assert response.json()["inside"] is True
+    assert client.get(f"{base}/GEO_404").status_code == 404
+
+
+def test_index_follows_geofence_writes(db):
+    """A committed geofence change invalidates the cached index; a rolled back one never reaches it"""
+    assert crud.geofence.get_geofences_containing_point(db, latitude=10.5, longitude=10.5) == []
+    db.add(Geofence(
+        id="geo_006", geofence_id="GEO_006", farm_id="FARM_003", name="Rolled back", type="transit", status="active",
+        coordinates=[[10, 10], [10, 11], [11, 11], [11, 10]],
+    ))
+    db.flush()
+    assert crud.geofence.get_geofences_containing_point(db, latitude=10.5, longitude=10.5) == []
+    db.rollback()
+    assert crud.geofence.get_geofences_containing_point(db, latitude=10.5, longitude=10.5) == []
+
+    db.add(Geofence(
+        id="geo_005", geofence_id="GEO_005", farm_id="FARM_003", name="New", type="transit", status="active",
+        coordinates=[[10, 10], [10, 11], [11, 11], [11, 10]],
+    ))
+    db.commit()
+    assert [g.geofence_id for g in crud.geofence.get_geofences_containing_point(db, latitude=10.5, longitude=10.5)] == ["GEO_005"]
+
+    geofence = crud.geofence.get_by_geofence_id(db, geofence_id="GEO_005")
+    geofence.status = "inactive"
+    db.commit()
+    assert crud.geofence.get_geofences_containing_point(db, latitude=10.5, longitude=10.5) == []
+
+
+def test_index_agrees_with_scan(db):
+    """The indexed lookup returns what a scan of every active geofence would"""
+    for lat, lng in [(-34.291, 142.27), (-34.299, 142.275), (-43.09, 147.13), (0, 0), (-34.285, 142.27)]:
+        expected = sorted(
+            geofence_id for geofence_id, _, _, status, coordinates in GEOFENCES
+            if status == "active" and point_in_polygon(lat, lng, coordinates)
+        )
+        found = crud.geofence.get_geofences_containing_point(db, latitude=lat, longitude=lng)
+        assert [g.geofence_id for g in found] == expected
+
+
+def test_bulk_check_points(client, db):
+    """The bulk endpoint maps each point inside a fence to its active geofences"""
+    url = f"{settings.API_V1_STR}/geolocation/geofences/check-points"
+    points = [
+        {"id": "truck-1", "latitude": -34.291, "longitude": 142.27},
+        {"latitude": -34.291, "longitude": 142.265},
+        {"latitude": 0, "longitude": 0},
+        {"latitude": -43.09, "longitude": 147.13},
+    ]
+    response = client.post(url, json={"points": points})
+    assert response.status_code == 200
+    assert response.json() == {
+        "points_checked": 4,
+        "geofences_checked": 3,
+        "matches": {"truck-1": ["GEO_001", "GEO_003"], "1": ["GEO_001"], "3": ["GEO_002"]},
+    }
+
+    geofence = crud.geofence.get_by_geofence_id(db, geofence_id="GEO_003")
+    geofence.coordinates = [[0.5, 0.5], [0.5, -0.5], [-0.5, -0.5], [-0.5, 0.5]]
+    db.commit()
+    response = client.post(url, json={"points": points})
+    assert response.json()["matches"] == {"truck-1": ["GEO_001"], "1": ["GEO_001"], "2": ["GEO_003"], "3": ["GEO_002"]}
+
+    assert client.post(url, json={"points": [{"latitude": 91, "longitude": 0}]}).status_code == 422
+
+
+def test_geofence_centroid_and_bounding_circle(db):
+    geofence = crud.geofence.get_by_geofence_id(db, geofence_id="GEO_001")
+    assert (round(geofence.centroid_lat, 6), round(geofence.centroid_lng, 6)) == (-34.291, 142.268)
+    assert 715 < geofence.bounding_radius_meters < 730  # half the diagonal of a ~1.11 x 0.92 km box
+
+
+def test_nearby_geofences(client, db):
+    """Nearest active geofences by distance to their bounding circle"""
+    url = f"{settings.API_V1_STR}/geolocation/nearby/geofences"
+    response = client.get(url, params={"latitude": -34.5, "longitude": 142.3, "k": 2})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["key"] for item in body] == ["GEO_003", "GEO_001"]
+    assert body[0]["distance_km"] < body[1]["distance_km"]
+
+    inside = crud.geofence.get_geofences_near_point(db, latitude=-34.291, longitude=142.27, radius_km=1)
+    assert sorted(g.geofence_id for g in inside) == ["GEO_001", "GEO_003"]
+    assert crud.geofence.get_geofences_near_point(db, latitude=-43.0876, longitude=147.1327, radius_km=50)[0].geofence_id == "GEO_002"
+    assert client.get(f"{settings.API_V1_STR}/geolocation/nearby/tractors", params={"latitude": 0, "longitude": 0}).status_code == 422
+
+
+def test_nearby_index_follows_commits(client, db):
+    """Committed paddock writes update the built index; rolled back ones don't"""
+    url = f"{settings.API_V1_STR}/geolocation/nearby/paddocks"
+    params = {"latitude": -37.81, "longitude": 144.96, "k": 1}
+
+    def add(paddock_id, latitude, longitude):
+        db.add(Paddock(
+            id=paddock_id.lower(), paddock_id=paddock_id, farm_id="FARM_001", name=paddock_id,
+            fruit_type="Apple", area_hectares=10, latitude=latitude, longitude=longitude,
+        ))
+
+    add("PADDOCK_FAR", -17.1, 145.6)
+    db.commit()
+    assert [item["key"] for item in client.get(url, params=params).json()] == ["PADDOCK_FAR"]
+
+    add("PADDOCK_NEAR", -37.8, 144.9)
+    db.commit()
+    assert [item["key"] for item in client.get(url, params=params).json()] == ["PADDOCK_NEAR"]
+
+    add("PADDOCK_NEAREST", -37.81, 144.96)
+    db.flush()
+    db.rollback()
+    assert [item["key"] for item in client.get(url, params=params).json()] == ["PADDOCK_NEAR"]
+
+    crud.paddock.get_by_paddock_id(db, paddock_id="PADDOCK_NEAR").latitude = None
+    db.commit()
+    assert [item["key"] for item in client.get(url, params=params).json()] == ["PADDOCK_FAR"]
+
+
+def test_batch_route_simplified_and_stored(client, db, tmp_path):
+    """Routes of completed trips are simplified by a job queued on delivery; the endpoint only reads them"""
+    url = f"{settings.API_V1_STR}/geolocation/batches/BATCH_001/route"
+    factory = sessionmaker(bind=db.get_bind())
+    buffer = IngestBuffer(factory, flush_interval=0, stages=[route_tracks.complete_trips])
+
+    def run_queued_job():
+        job = db.query(Job).filter(Job.type == route_tracks.SIMPLIFY_ROUTE, Job.state == jobs.QUEUED).one()
+        assert job.params == {"batch_id": "BATCH_001"}
+        route_tracks.simplify_route_job(jobs.JobContext(job.id, factory, str(tmp_path)), **job.params)
+        job.state = jobs.SUCCEEDED
+        db.commit()
+
+    start = datetime(2024, 3, 2, 6, 0)
+    buffer.offer([
+        {"batch_id": "BATCH_001", "harvest_id": "HARVEST_001", "latitude": -34.0 + n * 0.0005, "longitude": 142.0,
+         "timestamp": start + timedelta(minutes=n), "status": "Delivered" if n == 199 else "In transit"}
+        for n in range(200)
+    ])
+    buffer.flush()
+
+    raw = client.get(url).json()
+    assert (raw["source_points"], raw["point_count"], raw["completed"]) == (200, 200, True)
+    assert len(raw["latitudes"]) == len(raw["timestamps"]) == 200
+
+    # Until the job has run, the route is simplified on the fly and nothing is written
+    simplified = client.get(url, params={"tolerance_m": 25, "format": "polyline"}).json()
+    assert simplified["point_count"] == 2 and "latitudes" not in simplified
+    assert decode_polyline(simplified["polyline"]) == [(-34.0, 142.0), (-33.9005, 142.0)]
+    assert db.query(SimplifiedTrack).count() == 0
+
+    run_queued_job()
+    levels = settings.ROUTE_PRECOMPUTED_TOLERANCES_METERS
+    assert db.query(SimplifiedTrack).filter(SimplifiedTrack.batch_id == "BATCH_001").count() == 2 * len(levels)
+    stored = db.query(SimplifiedTrack).filter(
+        SimplifiedTrack.tolerance_meters == 25, SimplifiedTrack.algorithm == "douglas-peucker"
+    ).one()
+    stored.point_count = 99  # marks what the endpoint serves from the stored row
+    db.commit()
+    assert client.get(url, params={"tolerance_m": 25.0}).json()["point_count"] == 99
+    assert client.get(url, params={"tolerance_m": 25.5}).json()["point_count"] == 2
+
+    # A later point makes the stored route stale: served from the raw track until the queued job replaces it
+    buffer.offer([{"batch_id": "BATCH_001", "harvest_id": "HARVEST_001", "latitude": -33.8, "longitude": 142.1,
+                   "timestamp": start + timedelta(hours=5), "status": "Delivered"}])
+    buffer.flush()
+    assert client.get(url, params={"tolerance_m": 25}).json()["point_count"] == 3
+    assert db.query(SimplifiedTrack).filter(SimplifiedTrack.source_points == 201).count() == 0
+    run_queued_job()
+    db.expire_all()
+    assert db.query(SimplifiedTrack).filter(SimplifiedTrack.source_points == 201).count() == 2 * len(levels)
+    assert client.get(url, params={"tolerance_m": 25}).json()["point_count"] == 3
+    assert client.get(f"{settings.API_V1_STR}/geolocation/batches/NOPE/route").status_code == 404
+
+
+def test_heatmap(client, db):
+    """Cells are aggregated from the geohash columns kept in step on write"""
+    url = f"{settings.API_V1_STR}/geolocation/heatmap"
+    db.add(Paddock(
+        id="paddock_001", paddock_id="PADDOCK_001", farm_id="FARM_001", name="North block",
+        fruit_type="Orange", area_hectares=12, latitude=-34.29, longitude=142.27,
+    ))
+    now = datetime.utcnow()
+    for n, (latitude, longitude, age) in enumerate([(-34.29, 142.27, 1), (-34.291, 142.271, 2), (-43.08, 147.13, 3), (-43.08, 147.13, 24 * 40)]):
+        db.add(LocationTracking(
+            id=f"heat_{n}", tracking_id=f"TRACK_HEAT_{n}", batch_id=f"BATCH_00{n % 2}", harvest_id="HARVEST_000",
+            latitude=latitude, longitude=longitude, timestamp=now - timedelta(hours=age),
+        ))
+    db.commit()
+    assert db.query(Paddock).filter(Paddock.paddock_id == "PADDOCK_001").one().geohash == geohash.encode(-34.29, 142.27)
+    crud.heatmap_cache.clear()
+
+    harvests = client.get(url, params={"layer": "harvests", "precision": 4, "window": "all"}).json()
+    assert [(cell["cell"], cell["count"], cell["quantity_kg"]) for cell in harvests["cells"]] == [("r1vh", 5, 500.0)]
+
+    traffic = client.get(url, params={"layer": "traffic", "precision": 3, "window": "24h"}).json()["cells"]
+    assert [(cell["cell"], cell["count"], cell["batches"]) for cell in traffic] == [("r1v", 2, 2), ("r22", 1, 1)]
+    assert "quantity_kg" not in traffic[0]
+    assert traffic[0]["latitude"] < -33 and traffic[0]["longitude"] > 141
+
+    prefixed = client.get(url, params={"layer": "traffic", "precision": 5, "window": "all", "prefix": "r22"}).json()
+    assert [cell["count"] for cell in prefixed["cells"]] == [2]
+    assert client.get(url, params={"prefix": "r2a"}).status_code == 422
+    crud.heatmap_cache.clear()
+
+
+def test_conditional_get(client, db):
+    """JSON reads carry an ETag; revalidating an unchanged list is an empty 304"""
+    url = f"{settings.API_V1_STR}/geolocation/harvests/"
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"') and len(response.json()) == 5
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert (response.status_code, response.content, response.headers["ETag"]) == (304, b"", etag)
+    assert client.get(url, headers={"If-None-Match": f'"other", {etag[2:]}'}).status_code == 304
+
+    db.query(Harvest).filter(Harvest.harvest_id == "HARVEST_000").update({"quantity_kg": 250})
+    db.commit()
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert "ETag" not in client.get(f"{settings.API_V1_STR}/geolocation/harvests/NOPE").headers
+
+
+def test_clusters(client, db):
+    """Markers are aggregated per zoom level and limited to the viewport"""
+    crud.cluster_cache.clear()
+    url = f"{settings.API_V1_STR}/geolocation/clusters"
+    for n in range(30):
+        db.add(Paddock(
+            id=f"paddock_{n}", paddock_id=f"PADDOCK_{n:03d}", farm_id="FARM_001", name=f"Block {n}", fruit_type="Orange",
+            area_hectares=1, latitude=-34.29 + n * 1e-3 if n < 29 else -43.08, longitude=142.27,
+        ))
+    db.commit()
+
+    clusters = client.get(url, params={"layer": "paddocks", "zoom": 5}).json()
+    assert sorted(cluster["count"] for cluster in clusters["clusters"]) == [1, 29]
+    single = [cluster for cluster in clusters["clusters"] if cluster["count"] == 1][0]
+    assert (single["id"], single["label"]) == ("PADDOCK_029", "Block 29")
+    assert "id" not in [cluster for cluster in clusters["clusters"] if cluster["count"] == 29][0]
+
+    viewport = {"south": -35, "west": 142, "north": -34, "east": 143}
+    zoomed = client.get(url, params={"layer": "paddocks", "zoom": 18, **viewport}).json()
+    assert (len(zoomed["clusters"]), zoomed["total"]) == (29, 29)
+
+    # A rolled back write never reaches the cached index
+    db.add(Paddock(
+        id="paddock_gone", paddock_id="PADDOCK_GONE", farm_id="FARM_001", name="Gone", fruit_type="Orange",
+        area_hectares=1, latitude=-34.6, longitude=142.6,
+    ))
+    db.flush()
+    assert client.get(url, params={"layer": "paddocks", "zoom": 18, **viewport}).json()["total"] == 29
+    db.rollback()
+    assert client.get(url, params={"layer": "paddocks", "zoom": 18, **viewport}).json()["total"] == 29
+
+    # Committed paddocks drop the cached index
+    db.add(Paddock(
+        id="paddock_new", paddock_id="PADDOCK_NEW", farm_id="FARM_001", name="New", fruit_type="Orange",
+        area_hectares=1, latitude=-34.5, longitude=142.5,
+    ))
+    db.commit()
+    assert client.get(url, params={"layer": "paddocks", "zoom": 18, **viewport}).json()["total"] == 30
+    assert client.get(url, params={"layer": "paddocks", "zoom": 5, "south": -35}).status_code == 400
+    crud.cluster_cache.clear()
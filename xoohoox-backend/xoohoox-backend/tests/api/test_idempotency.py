@@ -0,0 +1,94 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.api.idempotency import IdempotencyMiddleware, MemoryStore
+
+
+class Reading(BaseModel):
+    value: float
+
+
+def _app(**options):
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, store=MemoryStore(), **options)
+    app.state.created = []
+
+    @app.post("/readings", status_code=201)
+    async def create_reading(reading: Reading):
+        await asyncio.sleep(0.1)
+        app.state.created.append(reading.value)
+        return {"id": len(app.state.created), "value": reading.value}
+
+    @app.post("/flaky")
+    async def flaky():
+        app.state.created.append(None)
+        return JSONResponse({"detail": "unavailable"}, 503)
+
+    @app.post("/busy")
+    async def busy():
+        app.state.created.append(None)
+        return JSONResponse({"detail": "buffer full"}, 429, headers={"Retry-After": "1"})
+
+    return app
+
+
+def test_retry_is_replayed_not_rerun():
+    app = _app()
+    client = TestClient(app)
+    first = client.post("/readings", json={"value": 3.4}, headers={"Idempotency-Key": "tablet-7-0001"})
+    retry = client.post("/readings", json={"value": 3.4}, headers={"Idempotency-Key": "tablet-7-0001"})
+    assert (first.status_code, retry.status_code) == (201, 201)
+    assert retry.json() == first.json() and retry.headers["idempotent-replayed"] == "true"
+    assert app.state.created == [3.4]
+
+    # Same key, different request
+    assert client.post("/readings", json={"value": 9.9}, headers={"Idempotency-Key": "tablet-7-0001"}).status_code == 422
+    # Other callers' keys don't collide, and requests without a key always run
+    other = client.post(
+        "/readings", json={"value": 3.4}, headers={"Idempotency-Key": "tablet-7-0001", "Authorization": "Bearer other"}
+    )
+    assert other.json()["id"] == 2 and "idempotent-replayed" not in other.headers
+    client.post("/readings", json={"value": 3.4})
+    assert len(app.state.created) == 3
+
+    # Server errors aren't stored: the retry runs again
+    for _ in range(2):
+        assert client.post("/flaky", headers={"Idempotency-Key": "tablet-7-0002"}).status_code == 503
+    assert app.state.created.count(None) == 2
+    # Nor are retryable answers such as a full ingest buffer
+    for _ in range(2):
+        response = client.post("/busy", headers={"Idempotency-Key": "tablet-7-0005"})
+        assert response.status_code == 429 and "idempotent-replayed" not in response.headers
+    assert app.state.created.count(None) == 4
+
+
+def test_concurrent_duplicates_run_once():
+    app = _app()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            post = lambda: client.post("/readings", json={"value": 1.0}, headers={"Idempotency-Key": "tablet-7-0003"})
+            return await asyncio.gather(post(), post(), post())
+
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [201] * 3
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sorted("idempotent-replayed" in response.headers for response in responses) == [False, True, True]
+    assert app.state.created == [1.0]
+
+    # One still running past the wait is answered with 409
+    impatient = _app(wait_seconds=0)
+
+    async def impatient_scenario():
+        transport = httpx.ASGITransport(app=impatient)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            post = lambda: client.post("/readings", json={"value": 1.0}, headers={"Idempotency-Key": "tablet-7-0004"})
+            return await asyncio.gather(post(), post())
+
+    assert sorted(response.status_code for response in asyncio.run(impatient_scenario())) == [201, 409]
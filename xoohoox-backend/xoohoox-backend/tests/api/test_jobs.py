@@ -0,0 +1,76 @@
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.api import deps
+from app.api.v1.endpoints.jobs import get_job_runner
+from app.core.config import settings
+from app.main import app
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType
+from app.services import jobs
+from tests.utils import sqlite_test_session, token_headers
+
+
+@pytest.fixture
+def db(tmp_path):
+    # A file, so the runner's threads each get their own connection
+    session = sqlite_test_session(f"sqlite:///{tmp_path / 'jobs.db'}")
+    for number, status in enumerate(["planned", "completed", "completed"]):
+        session.add(BatchTracking(
+            batch_id=f"240301-AP-JC-{number:03d}", name=f"Batch {number}", fruit_type=FruitType.APPLE,
+            process_type="JC", status=status, start_date=datetime(2024, 3, 1 + number), end_date=datetime(2024, 4, 1),
+        ))
+    session.commit()
+    yield session
+    session.close()
+    session.get_bind().dispose()
+
+
+@pytest.fixture
+def runner(db, tmp_path):
+    runner = jobs.JobRunner(sessionmaker(bind=db.get_bind()), results_dir=str(tmp_path))
+    app.dependency_overrides[deps.get_db] = lambda: db
+    app.dependency_overrides[get_job_runner] = lambda: runner
+    yield runner
+    app.dependency_overrides.pop(deps.get_db, None)
+    app.dependency_overrides.pop(get_job_runner, None)
+
+
+def test_batch_export_job(db, runner):
+    client = TestClient(app)
+    url = f"{settings.API_V1_STR}/jobs"
+    assert client.post(f"{url}/", json={"type": "batch_export", "params": {"colour": "red"}}).status_code == 400
+    response = client.post(f"{url}/", json={"type": "batch_export", "params": {"status": "completed"}})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["state"] == "queued"
+    assert client.get(f"{url}/{job['id']}/result").status_code == 400
+
+    runner.run_pending(timeout=5)
+    db.expire_all()  # the runner's own sessions recorded the outcome
+    job = client.get(f"{url}/{job['id']}").json()
+    assert (job["state"], job["result"]["rows"]) == ("succeeded", 2)
+
+    response = client.get(f"{url}/{job['id']}/result")
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0].startswith("batch_id,name,fruit_type") and len(lines) == 3
+    assert [item["id"] for item in client.get(f"{url}/", params={"state": "succeeded"}).json()] == [job["id"]]
+    assert client.get(f"{url}/missing").status_code == 404
+
+
+def test_destructive_jobs_take_a_superuser(db, runner):
+    client = TestClient(app)
+    url = f"{settings.API_V1_STR}/jobs"
+    admin, member = token_headers(db, "admin", superuser=True), token_headers(db, "member")
+    retention = {"type": "gps_retention", "params": {"older_than_days": 30}}
+    assert client.post(f"{url}/", json=retention).status_code == 401
+    assert client.post(f"{url}/", json=retention, headers=member).status_code == 400
+
+    response = client.post(f"{url}/", json=retention, headers=admin)
+    assert response.status_code == 202
+    job_url = f"{url}/{response.json()['id']}/cancel"
+    assert client.post(job_url).status_code == 401
+    assert client.post(job_url, headers=admin).json()["state"] == "cancelled"
@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints.live import get_broker
+from app.core.config import settings
+from app.main import app
+from app.services.live_events import BATCH_STATUS, GPS_POINT, QUALITY_CONTROL, Broker, LocalBackend
+
+
+@pytest.fixture
+def broker():
+    broker = Broker(LocalBackend())
+    app.dependency_overrides[get_broker] = lambda: broker
+    yield broker
+    app.dependency_overrides.pop(get_broker, None)
+
+
+def test_websocket_feed(broker):
+    url = f"{settings.API_V1_STR}/live/ws?topics=batch_status&batch_id=B1&last_event_id=unknown"
+    with TestClient(app).websocket_connect(url) as websocket:
+        # An id the broker doesn't know: the client is told to reload first
+        assert websocket.receive_json() == {"topic": "reset"}
+
+        broker.publish([(BATCH_STATUS, {"batch_id": "B2", "status": "planned"}),
+                        (GPS_POINT, {"batch_id": "B1", "latitude": -34.2}),
+                        (BATCH_STATUS, {"batch_id": "B1", "status": "in_production"})])
+        message = websocket.receive_json()
+        assert (message["topic"], message["data"]["status"]) == (BATCH_STATUS, "in_production")
+
+        websocket.send_json({"subscribe": [QUALITY_CONTROL], "unsubscribe": [BATCH_STATUS]})
+        assert websocket.receive_json() == {"topic": "subscribed", "data": {"topics": [QUALITY_CONTROL]}}
+        broker.publish([(BATCH_STATUS, {"batch_id": "B1", "status": "completed"}),
+                        (QUALITY_CONTROL, {"batch_id": "B1", "result": "pass"})])
+        message = websocket.receive_json()
+        assert (message["topic"], message["data"]["result"]) == (QUALITY_CONTROL, "pass")
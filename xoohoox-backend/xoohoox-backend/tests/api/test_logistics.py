@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.api import deps
+from app.api.v1.endpoints import logistics as endpoints
+from app.core.config import settings
+from app.main import app
+from app.models.geolocation import Harvest, Paddock
+from app.services.eta import EtaTracker
+from app.services.gps_ingest import IngestBuffer
+from tests.utils import sqlite_test_session
+
+URL = f"{settings.API_V1_STR}/logistics/routes/plan"
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    for number, (latitude, longitude) in enumerate([(-34.9, 148.9), (-35.6, 149.6), (None, None)]):
+        session.add(Paddock(
+            id=f"paddock_{number}", paddock_id=f"PADDOCK_{number}", farm_id="FARM_001", name=f"Block {number}",
+            fruit_type="Apple", area_hectares=5, latitude=latitude, longitude=longitude,
+        ))
+    for number, (paddock, collected) in enumerate([(0, False), (0, False), (1, False), (1, True), (2, False)]):
+        session.add(Harvest(
+            id=f"harvest_{number}", harvest_id=f"HARVEST_{number}", paddock_id=f"PADDOCK_{paddock}", farm_id="FARM_001",
+            batch_id=f"BATCH_{number}", fruit_type="Apple", harvest_date=datetime(2024, 3, 1), quantity_kg=100,
+            sample_collected=collected,
+        ))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[deps.get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.pop(deps.get_db, None)
+
+
+def test_plan_pending_sample_pickups(client):
+    response = client.post(URL, json={"vehicles": [{"id": "T001", "capacity_kg": 500}], "start_time": "2024-03-02T08:00:00Z"})
+    assert response.status_code == 200
+    plan = response.json()
+    (route,) = plan["routes"]
+    assert sorted(stop["id"] for stop in route["stops"]) == ["PADDOCK_0", "PADDOCK_1"]
+    assert route["load_kg"] == 3 * settings.ROUTING_SAMPLE_WEIGHT_KG
+    assert route["stops"][0]["arrival"] > "2024-03-02T08:00:00"
+    assert plan["depot"]["latitude"] == settings.LAB_LATITUDE
+
+
+def test_plan_explicit_stops(client):
+    payload = {
+        "vehicles": [{"id": "T001", "capacity_kg": 100, "shift_hours": 8}, {"id": "T002", "capacity_kg": 100}],
+        "stops": [
+            {"id": "A", "latitude": -35.0, "longitude": 149.0, "demand_kg": 80},
+            {"id": "B", "latitude": -35.1, "longitude": 149.1, "demand_kg": 80},
+            {"id": "C", "latitude": -35.2, "longitude": 149.2, "demand_kg": 500},
+        ],
+        "start_time": "2024-03-02T08:00:00",
+    }
+    plan = client.post(URL, json=payload).json()
+    assert len(plan["routes"]) == 2
+    assert [stop["id"] for stop in plan["unassigned"]] == ["C"]
+
+    payload["stops"][1]["id"] = "A"
+    assert client.post(URL, json=payload).status_code == 422
+
+
+def test_delivery_etas(db, client):
+    tracker = EtaTracker((settings.LAB_LATITUDE, settings.LAB_LONGITUDE), arrival_radius_m=500, speed_kmh=60, road_factor=1.0)
+    app.dependency_overrides[endpoints.get_eta_tracker] = lambda: tracker
+    buffer = IngestBuffer(sessionmaker(bind=db.get_bind()), flush_interval=0, stages=[tracker])
+    start = datetime(2024, 3, 2, 8, 0)
+    buffer.offer([
+        {
+            "batch_id": f"BATCH_{number}", "harvest_id": f"HARVEST_{number}", "latitude": settings.LAB_LATITUDE + offset,
+            "longitude": settings.LAB_LONGITUDE, "timestamp": start + timedelta(minutes=minutes),
+            "location_name": None, "status": None, "source": "GPS",
+        }
+        for number, points in ((0, [(0.5, 0), (0.4, 10)]), (1, [(0.2, 0)]), (2, [(0.0, 0)]))
+        for offset, minutes in points
+    ])
+    buffer.flush()
+    try:
+        etas = client.get(f"{settings.API_V1_STR}/logistics/deliveries/eta", params={"status": "in_transit"}).json()
+        assert [eta["batch_id"] for eta in etas] == ["BATCH_1", "BATCH_0"]
+        assert etas[0]["basis"] == "default"
+        assert etas[0]["eta"].startswith("2024-03-02T08:22")  # 22.2 km at 60 km/h
+
+        response = client.get(f"{settings.API_V1_STR}/logistics/deliveries/BATCH_2/eta")
+        assert response.json()["status"] == "waiting"
+        assert client.get(f"{settings.API_V1_STR}/logistics/deliveries/BATCH_9/eta").status_code == 404
+    finally:
+        app.dependency_overrides.pop(endpoints.get_eta_tracker, None)
@@ -0,0 +1,70 @@
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.api import deps
+from app.core.config import settings
+from app.main import app
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType
+from tests.utils import sqlite_test_session
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    for number in range(3):
+        session.add(BatchTracking(
+            batch_id=f"240301-AP-JC-{number:03d}", name=f"Batch {number}", fruit_type=FruitType.APPLE,
+            process_type="JC", start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1),
+            ingredients=[{"name": "apple", "kg": 100}] * 50, quality_checks=[], maintenance_records=[],
+        ))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[deps.get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.pop(deps.get_db, None)
+
+
+def test_list_batches_with_fields(client, db):
+    """Only the requested fields are selected and returned"""
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        response = client.get(f"{settings.API_V1_STR}/batches/", params={"fields": "batch_id,name,status"})
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 3
+    assert all(set(item) == {"batch_id", "name", "status"} for item in data["items"])
+    assert not any("ingredients" in statement for statement in statements)
+
+
+def test_list_batches_without_fields(client, db):
+    """Without fields the full response is returned"""
+    response = client.get(f"{settings.API_V1_STR}/batches/")
+    assert response.status_code == 200
+    assert len(response.json()["items"][0]["ingredients"]) == 50
+
+
+def test_read_batch_with_fields(client, db):
+    """Detail endpoint supports fields as well"""
+    response = client.get(f"{settings.API_V1_STR}/batches/240301-AP-JC-001", params={"fields": "name"})
+    assert response.status_code == 200
+    assert response.json() == {"name": "Batch 1"}
+
+
+def test_unknown_field_rejected(client, db):
+    """Fields that are not on the response schema return 400"""
+    response = client.get(f"{settings.API_V1_STR}/batches/", params={"fields": "name,password"})
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
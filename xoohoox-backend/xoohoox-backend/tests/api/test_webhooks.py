@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import deps
+from app.core.config import settings
+from app.main import app
+from tests.utils import sqlite_test_session, token_headers
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    app.dependency_overrides[deps.get_db] = lambda: session
+    yield session
+    app.dependency_overrides.pop(deps.get_db, None)
+    session.close()
+
+
+def test_managing_endpoints_requires_a_superuser(db):
+    client = TestClient(app)
+    url = f"{settings.API_V1_STR}/webhooks"
+    endpoint = {"name": "distillery", "url": "http://distillery.test/hooks", "topics": ["batch_status"]}
+    admin, member = token_headers(db, "admin", superuser=True), token_headers(db, "member")
+    assert client.post(f"{url}/", json=endpoint).status_code == 401
+    assert client.post(f"{url}/", json=endpoint, headers=member).status_code == 400
+    assert client.post(f"{url}/", json=endpoint, headers={"Authorization": "Bearer forged"}).status_code == 403
+    assert client.get(f"{url}/").json() == []
+
+    created = client.post(f"{url}/", json=endpoint, headers=admin)
+    assert created.status_code == 201 and created.json()["secret"]
+    endpoint_url = f"{url}/{created.json()['id']}"
+    assert client.put(endpoint_url, json={"active": False}).status_code == 401
+    assert client.put(endpoint_url, json={"active": False}, headers=admin).status_code == 200
+    assert client.post(f"{endpoint_url}/redeliver", headers=member).status_code == 400
+    assert client.post(f"{endpoint_url}/redeliver", headers=admin).status_code == 200
+    assert client.delete(endpoint_url).status_code == 401
+    assert client.delete(endpoint_url, headers=admin).status_code == 200
+    assert client.get(f"{url}/").json() == []
@@ -0,0 +1,132 @@
+from datetime import datetime
+import pytest
+
+from app.crud import search as crud
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import BatchStatus, FruitType, QualityCheckType, SearchEntityType, TestResult
+from app.models.geolocation import Harvest
+from app.models.quality_control import QualityControl
+from app.models.search import SearchDocument
+from app.models.transformation import TransformationStage, TransformationType, FermentationResults
+from tests.utils import sqlite_test_session
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    yield session
+    session.close()
+
+
+def _seed(db):
+    batch = BatchTracking(
+        batch_id="240301-AP-JC-001", name="Pink Lady cider", fruit_type=FruitType.APPLE, process_type="JC",
+        start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1),
+        issues=[{"issue_type": "aroma", "description": "Sulphur smell after racking"}],
+    )
+    other = BatchTracking(
+        batch_id="240302-PR-JC-001", name="Pear perry", fruit_type=FruitType.PEAR, process_type="JC",
+        start_date=datetime(2024, 3, 2), end_date=datetime(2024, 4, 2),
+    )
+    db.add_all([batch, other])
+    db.flush()
+    stage = TransformationStage(
+        batch_id=other.id, stage_number=1, stage_name="Primary", stage_type=TransformationType.INITIAL_FERMENTATION,
+        status=BatchStatus.FERMENTING,
+    )
+    stage.fermentation_results = FermentationResults(
+        trial_number=1, yeast_strain="EC-1118", inoculation_date=datetime(2024, 3, 3), initial_gravity=1.050,
+        aroma_notes="faint sulphurous note, green apple", flavor_notes="crisp",
+    )
+    db.add(stage)
+    db.add(QualityControl(
+        test_id="QC-1", batch_id=batch.batch_id, test_type=QualityCheckType.AROMA, test_date=datetime(2024, 3, 5),
+        test_name="Nose", test_method="panel", unit_of_measure="score", result=TestResult.FAIL, tester_id=1,
+        notes="Strong sulphur, recommend aeration",
+    ))
+    db.add(Harvest(
+        id="h1", harvest_id="HAR-1", paddock_id="PAD-1", farm_id="FARM-1", batch_id=batch.batch_id,
+        fruit_type="apple", harvest_date=datetime(2024, 2, 28), quantity_kg=100.0, notes="Wet morning, some bruising",
+    ))
+    db.commit()
+
+
+def test_documents_synced_on_write(db):
+    """Indexed records get search documents without a rebuild"""
+    _seed(db)
+    types = {doc.entity_type for doc in db.query(SearchDocument)}
+    assert types == {"batch", "quality_control", "fermentation_results", "harvest"}
+
+
+def test_search_ranks_across_entities(db):
+    """A term is found in every record type that mentions it"""
+    _seed(db)
+    hits = crud.search(db, query="sulphur")
+    assert {hit["entity_type"] for hit in hits} == {"batch", "quality_control", "fermentation_results"}
+    assert all(hit["rank"] is not None for hit in hits)
+    assert hits == sorted(hits, key=lambda hit: hit["rank"], reverse=True)
+    fermentation = next(hit for hit in hits if hit["entity_type"] == "fermentation_results")
+    assert fermentation["batch_id"] == "240302-PR-JC-001"
+
+
+def test_search_entity_type_filter(db):
+    """Results can be restricted to record types"""
+    _seed(db)
+    hits = crud.search(db, query="sulphur", entity_types=[SearchEntityType.QUALITY_CONTROL])
+    assert [hit["entity_key"] for hit in hits] == ["QC-1"]
+
+
+def test_search_update_and_delete(db):
+    """Edits and deletes are reflected in the index"""
+    _seed(db)
+    qc = db.query(QualityControl).filter(QualityControl.test_id == "QC-1").one()
+    qc.notes = "Clean nose after aeration"
+    db.commit()
+    assert "QC-1" not in {hit["entity_key"] for hit in crud.search(db, query="sulphur")}
+    assert [hit["entity_key"] for hit in crud.search(db, query="aeration")] == ["QC-1"]
+
+    db.delete(qc)
+    db.commit()
+    assert crud.search(db, query="aeration") == []
+
+
+def test_renamed_key_leaves_no_stale_document(db):
+    """A record whose key changes is found under the new key only"""
+    _seed(db)
+    harvest = db.query(Harvest).filter(Harvest.harvest_id == "HAR-1").one()
+    harvest.harvest_id = "HAR-2"
+    db.commit()
+    assert [hit["entity_key"] for hit in crud.search(db, query="bruising")] == ["HAR-2"]
+    assert db.query(SearchDocument).filter(SearchDocument.entity_type == "harvest").count() == 1
+
+
+def test_search_query_syntax_is_escaped(db):
+    """FTS operators in user input are treated as plain words"""
+    _seed(db)
+    assert crud.search(db, query='sulphur" OR (') == []
+    assert crud.search(db, query="   ") == []
+
+
+def test_rebuild_index(db):
+    """Rebuild reproduces the incrementally maintained documents"""
+    _seed(db)
+    before = {(doc.entity_type, doc.entity_key, doc.batch_id, doc.content) for doc in db.query(SearchDocument)}
+    assert crud.rebuild_index(db) == len(before)
+    after = {(doc.entity_type, doc.entity_key, doc.batch_id, doc.content) for doc in db.query(SearchDocument)}
+    assert before == after
+    assert len(crud.search(db, query="bruising")) == 1
+
+
+def test_common_terms_rank_only_the_newest_candidates(db, monkeypatch):
+    """Ranking is bounded to the newest SEARCH_RANK_CANDIDATES matches, after the type filter"""
+    for number in range(6):
+        db.add(SearchDocument(
+            entity_type=(SearchEntityType.QUALITY_CONTROL if number % 2 else SearchEntityType.HARVEST).value,
+            entity_key=str(number), content=f"apple note {number}",
+        ))
+    db.commit()
+    monkeypatch.setattr(crud.settings, "SEARCH_RANK_CANDIDATES", 2)
+    assert sorted(hit["entity_key"] for hit in crud.search(db, query="apple")) == ["4", "5"]
+    hits = crud.search(db, query="apple", entity_types=[SearchEntityType.QUALITY_CONTROL])
+    assert sorted(hit["entity_key"] for hit in hits) == ["3", "5"]
+    assert crud.search(db, query="pear") == []
@@ -0,0 +1,106 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.crud import traceability as crud
+from app.models.enums import TraceNodeType
+from app.models.geolocation import Farm, Paddock, Harvest, LocationTracking
+from app.models.traceability import TraceLink
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for model in (Farm, Paddock, Harvest, LocationTracking, TraceLink, *crud.TRACE_RULES):
+        model.__table__.create(bind=engine, checkfirst=True)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+def _seed(db):
+    db.add(Farm(id="f1", farm_id="FARM-1", name="Farm", farmer_name="Owner",
+                total_area_hectares=10.0))
+    db.add(Paddock(id="p1", paddock_id="PAD-1", farm_id="FARM-1", name="North", fruit_type="apple", area_hectares=2.0))
+    for i, batch_id in enumerate(["BATCH-1", "BATCH-2"]):
+        db.add(Harvest(id=f"h{i}", harvest_id=f"HAR-{i}", paddock_id="PAD-1", farm_id="FARM-1", batch_id=batch_id,
+                       fruit_type="apple", harvest_date=datetime(2024, 3, 1), quantity_kg=100.0))
+    db.add(LocationTracking(id="t1", tracking_id="TRK-1", batch_id="BATCH-1", harvest_id="HAR-0",
+                            latitude=0.0, longitude=0.0, timestamp=datetime(2024, 3, 1)))
+    db.commit()
+
+
+def test_links_maintained_on_flush(db):
+    """Creating traced records writes their links without a rebuild"""
+    _seed(db)
+    assert db.query(TraceLink).count() == 6
+
+
+def test_forward_trace_from_farm(db):
+    """A farm recall reaches every paddock, harvest and batch downstream"""
+    _seed(db)
+    result = crud.trace(db, node_type=TraceNodeType.FARM, node_key="FARM-1")
+    assert result["counts"] == {"paddock": 1, "harvest": 2, "batch": 2, "location_tracking": 1}
+    batch = next(n for n in result["nodes"] if n["key"] == "BATCH-2")
+    assert batch["depth"] == 3
+
+
+def test_backward_trace_from_batch(db):
+    """Provenance of a batch walks back to its farm"""
+    _seed(db)
+    result = crud.trace(db, node_type=TraceNodeType.BATCH, node_key="BATCH-1", direction="backward")
+    keys = {(n["type"], n["key"]) for n in result["nodes"]}
+    assert keys == {("harvest", "HAR-0"), ("paddock", "PAD-1"), ("farm", "FARM-1")}
+
+
+def test_update_and_delete_relink(db):
+    """Changing or deleting a record keeps the index consistent"""
+    _seed(db)
+    harvest = db.execute(select(Harvest).where(Harvest.harvest_id == "HAR-1")).scalar_one()
+    harvest.batch_id = "BATCH-3"
+    db.commit()
+    result = crud.trace(db, node_type=TraceNodeType.PADDOCK, node_key="PAD-1")
+    batches = {n["key"] for n in result["nodes"] if n["type"] == "batch"}
+    assert batches == {"BATCH-1", "BATCH-3"}
+
+    db.delete(harvest)
+    db.commit()
+    result = crud.trace(db, node_type=TraceNodeType.BATCH, node_key="BATCH-3", direction="backward")
+    assert result["nodes"] == []
+
+
+def test_update_keeps_links_owned_by_children(db):
+    """Relinking a record leaves the links its children own, and drops those under its old key"""
+    _seed(db)
+    db.add(Farm(id="f2", farm_id="FARM-2", name="Farm 2", farmer_name="Owner", total_area_hectares=5.0))
+    db.commit()
+    paddock = db.execute(select(Paddock).where(Paddock.paddock_id == "PAD-1")).scalar_one()
+    paddock.farm_id = "FARM-2"
+    harvest = db.execute(select(Harvest).where(Harvest.harvest_id == "HAR-0")).scalar_one()
+    harvest.batch_id = "BATCH-9"
+    db.commit()
+    result = crud.trace(db, node_type=TraceNodeType.FARM, node_key="FARM-2")
+    assert result["counts"] == {"paddock": 1, "harvest": 2, "batch": 2, "location_tracking": 1}
+    assert crud.trace(db, node_type=TraceNodeType.FARM, node_key="FARM-1")["nodes"] == []
+
+    harvest.harvest_id = "HAR-0B"
+    db.commit()
+    edges = {(link.parent_key, link.child_key) for link in db.query(TraceLink)}
+    assert ("PAD-1", "HAR-0") not in edges and ("HAR-0", "BATCH-9") not in edges
+    assert {("PAD-1", "HAR-0B"), ("HAR-0B", "BATCH-9"), ("HAR-0", "TRK-1")} <= edges
+    assert len(edges) == crud.rebuild_index(db)
+
+
+def test_rebuild_index(db):
+    """Rebuild reproduces the links maintained incrementally"""
+    _seed(db)
+    before = {(l.parent_type, l.parent_key, l.child_type, l.child_key) for l in db.query(TraceLink)}
+    assert crud.rebuild_index(db) == len(before)
+    after = {(l.parent_type, l.parent_key, l.child_type, l.child_key) for l in db.query(TraceLink)}
+    assert before == after
@@ -0,0 +1,64 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.db import cdc
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType
+from tests.utils import sqlite_test_session
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    yield session
+    session.close()
+
+
+def _batch(number: int) -> BatchTracking:
+    return BatchTracking(batch_id=f"240301-AP-JC-{number:03d}", name=f"Batch {number}", fruit_type=FruitType.APPLE,
+                         process_type="JC", start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1))
+
+
+def test_committed_changes_reach_consumers(db):
+    received = []
+    consumer = cdc.register("test", received.extend, entities=["batch_tracking"])
+    try:
+        batch = _batch(1)
+        db.add(batch)
+        db.commit()
+        batch.status = "in_production"
+        batch.progress = 10.0
+        db.commit()
+        batch.status = "rejected"
+        db.flush()
+        db.rollback()
+        db.delete(batch)
+        db.commit()
+        assert consumer.drain()
+    finally:
+        cdc.unregister("test")
+
+    assert [(change.entity, change.operation, change.id) for change in received] == [
+        ("batch_tracking", cdc.INSERT, batch.id), ("batch_tracking", cdc.UPDATE, batch.id), ("batch_tracking", cdc.DELETE, batch.id),
+    ]
+    assert set(received[1].columns) >= {"status", "progress"} and "name" not in received[1].columns
+    assert consumer.stats()["delivered"] == 3
+
+
+def test_full_queue_drops_and_counts(db):
+    release = threading.Event()
+    consumer = cdc.register("slow", lambda changes: release.wait(5), entities=["batch_tracking"], queue_size=1, batch_size=1)
+    try:
+        for number in range(5):
+            db.add(_batch(number))
+            db.commit()
+        release.set()
+        assert consumer.drain()
+        stats = consumer.stats()
+    finally:
+        cdc.unregister("slow")
+
+    assert stats["received"] == 5
+    assert stats["dropped"] >= 3 and stats["delivered"] + stats["dropped"] == 5
@@ -0,0 +1,143 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db import edge, replication
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType, QualityCheckType, TestResult
+from app.models.quality_control import QualityControl
+from app.models.replication import ReplicationLogEntry
+from app.models.user import User
+from tests.utils import sqlite_test_session
+
+
+@pytest.fixture
+def sites(monkeypatch):
+    monkeypatch.setattr(settings, "EDGE_CENTRAL_DATABASE_URI", "postgresql://central.test/xoohoox")
+    edge_db, central_db = sqlite_test_session(), sqlite_test_session()
+    # The same tester exists on both sites, under different ids
+    edge_db.add(_user("tester"))
+    central_db.add_all([_user("manager"), _user("tester")])
+    for db in (edge_db, central_db):
+        db.commit()
+    yield edge_db, central_db
+    edge_db.close()
+    central_db.close()
+
+
+def _user(name):
+    return User(email=f"{name}@xoohoox.test", username=name, hashed_password="-")
+
+
+def _batch(number, **fields):
+    return BatchTracking(batch_id=f"240301-AP-JC-{number:03d}", name=f"Batch {number}", fruit_type=FruitType.APPLE,
+                         process_type="JC", start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1), **fields)
+
+
+def _qc(number, batch_id="240301-AP-JC-000", tester_id=1):
+    return QualityControl(test_id=f"QC-{number}", batch_id=batch_id, test_type=QualityCheckType.PH,
+                          test_date=datetime(2024, 3, 2), test_name="pH", test_method="meter", actual_value=3.4,
+                          unit_of_measure="pH", result=TestResult.PASS, tester_id=tester_id)
+
+
+def _replicator(edge_db, central_db, **options):
+    return replication.Replicator(
+        sessionmaker(bind=edge_db.get_bind()), sessionmaker(bind=central_db.get_bind()), **options
+    )
+
+
+def test_edge_writes_ship_to_central_by_natural_key(sites):
+    edge_db, central_db = sites
+    central_db.execute(text("PRAGMA foreign_keys=ON"))
+    assert central_db.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    # Central already has rows of its own, so ids differ between the sites
+    central_db.add_all([_batch(90), _batch(91)])
+    central_db.commit()
+
+    edge_db.add_all([_batch(0), _batch(1), _qc(1)])
+    edge_db.commit()
+    batch = edge_db.query(BatchTracking).filter_by(batch_id="240301-AP-JC-001").one()
+    batch.status = "in_production"
+    edge_db.delete(edge_db.query(QualityControl).one())
+    edge_db.commit()
+    edge_db.add(_batch(2))
+    edge_db.flush()
+    edge_db.rollback()
+    assert [(entry.entity, entry.operation) for entry in edge_db.query(ReplicationLogEntry).order_by("seq")] == [
+        ("batch_tracking", replication.UPSERT), ("batch_tracking", replication.UPSERT),
+        ("quality_control", replication.UPSERT),
+        ("batch_tracking", replication.UPSERT), ("quality_control", replication.DELETE),
+    ]
+
+    replicator = _replicator(edge_db, central_db, batch_size=2)
+    assert replicator.ship_all() == 5
+    assert replicator.stats()["batches"] == 3 and edge_db.query(ReplicationLogEntry).count() == 0
+    shipped = {b.batch_id: b for b in central_db.query(BatchTracking)}
+    assert set(shipped) == {"240301-AP-JC-090", "240301-AP-JC-091", "240301-AP-JC-000", "240301-AP-JC-001"}
+    assert shipped["240301-AP-JC-001"].status == "in_production" and shipped["240301-AP-JC-001"].id == 4
+    assert central_db.query(QualityControl).count() == 0
+
+    # Shipping the same entries again (a crash before the edge commit) changes nothing
+    edge_db.add(_qc(2, "240301-AP-JC-001"))
+    edge_db.commit()
+    entry = edge_db.query(ReplicationLogEntry).one()
+    replicator._apply_batch([entry])
+    assert replicator.ship_all() == 1 and central_db.query(QualityControl).count() == 1
+    central_db.expire_all()
+    qc = central_db.query(QualityControl).one()
+    assert qc.test_id == "QC-2" and qc.tester_id == central_db.query(User).filter_by(username="tester").one().id == 2
+
+    # A tester central doesn't know is parked rather than misattributed
+    stranger = _user("stranger")
+    edge_db.add(stranger)
+    edge_db.commit()
+    edge_db.add(_qc(3, "240301-AP-JC-001", tester_id=stranger.id))
+    edge_db.commit()
+    assert replicator.ship_all() == 1 and replicator.stats()["parked"] == 1
+    assert "stranger@xoohoox.test" in edge_db.query(ReplicationLogEntry).one().error
+
+
+def test_rejected_entries_are_parked_and_gps_points_bulk_shipped(sites):
+    edge_db, central_db = sites
+    edge_db.add(_batch(0))
+    edge_db.commit()
+    # An entry central can't apply: an unknown result
+    edge_db.add(ReplicationLogEntry(entity="quality_control", operation=replication.UPSERT, key="QC-9",
+                                    row={"test_id": "QC-9", "result": "inconclusive"}, created_at=datetime.utcnow()))
+    edge_db.add(_qc(1))
+    edge_db.commit()
+    points = [
+        {"id": f"TRACK_{n}", "tracking_id": f"TRACK_{n}", "batch_id": "240301-AP-JC-000", "harvest_id": "H-1",
+         "latitude": -37.8, "longitude": 145.0 + n / 1000, "timestamp": datetime(2024, 3, 1, 6, n)}
+        for n in range(3)
+    ]
+    with edge_db.get_bind().begin() as connection:
+        replication.log_rows(connection, replication.LocationTracking, points)
+        replication.log_rows(connection, replication.LocationTracking, points[:1])
+
+    replicator = _replicator(edge_db, central_db)
+    assert replicator.ship_all() == 7
+    assert replicator.stats()["parked"] == 1
+    assert replication.backlog(edge_db)["pending"] == 0 and replication.backlog(edge_db)["failed"] == 1
+    assert [qc.test_id for qc in central_db.query(QualityControl)] == ["QC-1"]
+    assert [row.tracking_id for row in central_db.query(replication.LocationTracking).order_by("timestamp")] == [
+        "TRACK_0", "TRACK_1", "TRACK_2",
+    ]
+
+    assert replication.retry_failed(edge_db) == 1
+    assert replicator.ship_all() == 1 and replication.backlog(edge_db)["failed"] == 1
+
+
+def test_edge_engine_pragmas(tmp_path):
+    engine = edge.sqlite_engine(f"sqlite:///{tmp_path / 'edge.db'}")
+    with engine.connect() as connection:
+        pragma = lambda name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("cache_size") == -settings.EDGE_SQLITE_CACHE_SIZE_KB
+        assert pragma("busy_timeout") == settings.EDGE_SQLITE_BUSY_TIMEOUT_MS
+    assert engine.pool.size() == settings.EDGE_SQLITE_POOL_SIZE
+    engine.dispose()
@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.tables import has_table
+from app.models.geolocation import Farm, Harvest, Paddock
+from app.models.search import SearchDocument
+from app.models.sync import SyncTombstone
+from app.services import sync  # noqa: F401 (registers the tombstone hooks)
+
+
+def _add_and_delete(db, paddock_id: str) -> None:
+    db.add(Paddock(id=paddock_id.lower(), paddock_id=paddock_id, farm_id="FARM-1", name="North",
+                   fruit_type="apple", area_hectares=1.0))
+    db.commit()
+    db.delete(db.get(Paddock, paddock_id.lower()))
+    db.commit()
+
+
+def test_listeners_skip_tables_the_database_lacks():
+    """Writes to a database without the search or tombstone tables succeed; the tables are used once created"""
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    for model in (Farm, Paddock, Harvest):
+        model.__table__.create(bind=engine)
+    db = sessionmaker(bind=engine)()
+    _add_and_delete(db, "PAD-1")
+    with engine.connect() as connection:
+        assert not has_table(connection, SyncTombstone.__table__)
+
+    SyncTombstone.__table__.create(bind=engine)
+    _add_and_delete(db, "PAD-2")
+    assert [row.key for row in db.query(SyncTombstone)] == ["PAD-2"]
+    with engine.connect() as connection:
+        assert has_table(connection, SyncTombstone.__table__)
+        assert not has_table(connection, SearchDocument.__table__)
+    db.close()
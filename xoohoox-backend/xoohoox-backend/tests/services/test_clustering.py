@@ -0,0 +1,28 @@
+import numpy as np
+
+from app.services.clustering import MAX_ZOOM, ClusterIndex
+
+
+def test_levels_conserve_points_and_refine():
+    rng = np.random.default_rng(7)
+    latitudes = np.concatenate([rng.normal(-34.29, 0.01, 500), rng.normal(-43.08, 0.01, 300), [-12.46]])
+    longitudes = np.concatenate([rng.normal(142.27, 0.01, 500), rng.normal(147.13, 0.01, 300), [130.84]])
+    index = ClusterIndex(latitudes, longitudes)
+
+    counts = [len(index.clusters(zoom)) for zoom in range(MAX_ZOOM + 2)]
+    assert all(sum(cluster.count for cluster in index.clusters(zoom)) == 801 for zoom in range(MAX_ZOOM + 2))
+    assert counts == sorted(counts) and counts[-1] == 801
+    assert sorted(cluster.count for cluster in index.clusters(4)) == [1, 300, 500]
+
+    (mildura,) = [cluster for cluster in index.clusters(4) if cluster.count == 500]
+    assert abs(mildura.latitude - latitudes[:500].mean()) < 1e-6
+    assert abs(mildura.longitude - longitudes[:500].mean()) < 1e-6
+    (darwin,) = [cluster for cluster in index.clusters(4) if cluster.count == 1]
+    assert darwin.index == 800
+
+
+def test_bbox():
+    index = ClusterIndex([-34.0, -34.0, 10.0], [142.0, 179.9, -179.9])
+    assert [cluster.index for cluster in index.clusters(10, (-35, 141, -33, 143))] == [0]
+    assert sorted(cluster.index for cluster in index.clusters(10, (-90, 179, 90, -179))) == [1, 2]
+    assert ClusterIndex([], []).clusters(3, (-90, -180, 90, 180)) == []
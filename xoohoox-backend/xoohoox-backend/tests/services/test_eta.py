@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.geolocation import DeliveryLeg, Harvest
+from app.services.eta import DELIVERED, IN_TRANSIT, WAITING, EtaTracker
+from app.services.gps_ingest import IngestBuffer
+from tests.utils import sqlite_test_session
+
+START = datetime(2024, 3, 1, 8, 0)
+LAB = (settings.LAB_LATITUDE, settings.LAB_LONGITUDE)
+FARM = (LAB[0] + 0.9, LAB[1])  # about 100 km due north
+
+
+def _trip(batch_id: str, steps, start: datetime = START):
+    """Points every 10 minutes on a straight run from the farm, reaching the lab at step 12"""
+    return [
+        {
+            "batch_id": batch_id, "harvest_id": f"H-{batch_id}", "latitude": FARM[0] + (LAB[0] - FARM[0]) * step / 12,
+            "longitude": FARM[1], "timestamp": start + timedelta(minutes=10 * step), "location_name": None,
+            "status": None, "source": "GPS",
+        }
+        for step in steps
+    ]
+
+
+def _tracker() -> EtaTracker:
+    return EtaTracker(LAB, arrival_radius_m=500, speed_kmh=70, road_factor=1.3)
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    for batch_id in ("B1", "B2"):
+        session.add(Harvest(
+            id=f"harvest_{batch_id}", harvest_id=f"H-{batch_id}", paddock_id="PADDOCK_001", farm_id="FARM_001",
+            batch_id=batch_id, fruit_type="Apple", harvest_date=START, quantity_kg=100,
+        ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _ingest(db, tracker: EtaTracker, points) -> None:
+    buffer = IngestBuffer(sessionmaker(bind=db.get_bind()), flush_interval=0, stages=[tracker])
+    buffer.offer(points)
+    buffer.flush()
+
+
+def test_learns_legs_and_updates_estimates(db):
+    tracker = _tracker()
+    _ingest(db, tracker, _trip("B2", range(4), start=START + timedelta(hours=3)))
+    estimate = tracker.get(db, "B2")
+    assert (estimate.status, estimate.basis, estimate.farm_id) == (IN_TRANSIT, "default", "FARM_001")
+    assert estimate.eta == estimate.last_seen + timedelta(minutes=estimate.remaining_km * 60 * 1.3 / 70)
+
+    _ingest(db, tracker, _trip("B1", range(13)))
+    (leg,) = db.query(DeliveryLeg).all()
+    assert (leg.batch_id, leg.farm_id, leg.duration_minutes) == ("B1", "FARM_001", 120)
+    assert leg.distance_km == pytest.approx(100, abs=0.2)
+    assert tracker.get(db, "B1").status == DELIVERED
+
+    # The new leg re-estimates B2 without new points: 9 of 12 steps to go at 10 minutes each
+    estimate = tracker.get(db, "B2")
+    assert (estimate.basis, estimate.legs) == ("farm", 1)
+    assert abs(estimate.eta - (estimate.last_seen + timedelta(minutes=90))) < timedelta(seconds=1)
+    assert estimate.progress == pytest.approx(0.25)
+
+    _ingest(db, tracker, _trip("B2", range(4, 7), start=START + timedelta(hours=3)))
+    estimate = tracker.get(db, "B2")
+    assert abs(estimate.eta - (START + timedelta(hours=5))) < timedelta(seconds=1)
+
+
+def test_seeds_from_stored_legs_and_points(db):
+    _ingest(db, _tracker(), _trip("B1", range(13)) + _trip("B2", range(7), start=START + timedelta(hours=3)))
+
+    tracker = _tracker()
+    tracker.warm(db, since=START + timedelta(hours=2, minutes=30))
+    assert {estimate.batch_id for estimate in tracker.estimates(db)} == {"B2"}
+    estimate = tracker.get(db, "B2")
+    assert (estimate.departed_at, estimate.basis) == (START + timedelta(hours=3), "farm")
+    assert abs(estimate.eta - (START + timedelta(hours=5))) < timedelta(seconds=1)
+
+    # Batches missing from memory are picked up from the database as their points arrive
+    tracker = _tracker()
+    _ingest(db, tracker, _trip("B2", [12], start=START + timedelta(hours=3)))
+    assert tracker.get(db, "B2").status == DELIVERED
+    leg = db.query(DeliveryLeg).filter(DeliveryLeg.batch_id == "B2").one()
+    assert leg.duration_minutes == 120
+    assert tracker.get(db, "B1") is None
+
+
+def test_waits_until_leaving_the_lab():
+    tracker = _tracker()
+    point = {"batch_id": "B3", "latitude": LAB[0], "longitude": LAB[1], "timestamp": START}
+    trip, leg = tracker.advance(None, point, None)
+    assert leg is None and tracker.estimate(trip, {}).status == WAITING
+    trip, _ = tracker.advance(trip, {**point, "latitude": LAB[0] + 0.1, "timestamp": START + timedelta(minutes=10)}, None)
+    trip, leg = tracker.advance(trip, {**point, "status": "Delivered", "timestamp": START + timedelta(minutes=25)}, None)
+    assert leg["duration_minutes"] == 15
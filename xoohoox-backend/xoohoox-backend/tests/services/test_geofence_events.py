@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.api import deps
+from app.core.config import settings
+from app.crud import geolocation as crud
+from app.main import app
+from app.models.geolocation import Geofence, GeofenceAlert, LocationTracking
+from app.services import live_events
+from app.services.geofence_events import GeofenceEventDetector
+from app.services.gps_ingest import IngestBuffer
+from tests.utils import sqlite_test_session
+
+START = datetime(2024, 3, 1, 8, 0)
+INSIDE_ALERTING = (-34.005, 142.005)
+INSIDE_SILENT = (-35.005, 143.005)
+OUTSIDE = (-36.0, 144.0)
+
+
+def _square(lat: float, lng: float):
+    return [[lat, lng], [lat, lng + 0.01], [lat - 0.01, lng + 0.01], [lat - 0.01, lng]]
+
+
+def _point(batch_id: str, minutes: int, location):
+    return {
+        "batch_id": batch_id, "harvest_id": f"H-{batch_id}", "latitude": location[0], "longitude": location[1],
+        "timestamp": START + timedelta(minutes=minutes), "location_name": None, "status": None, "source": "GPS",
+    }
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    session.add(Geofence(id="geo_a", geofence_id="GEO_A", farm_id="FARM_001", name="Packing shed",
+                         type="processing", status="active", coordinates=_square(-34.0, 142.0)))
+    session.add(Geofence(id="geo_b", geofence_id="GEO_B", farm_id="FARM_001", name="Orchard",
+                         type="quality", status="active", alerts_enabled=False, coordinates=_square(-35.0, 143.0)))
+    session.commit()
+    crud.geofence_index.invalidate()
+    yield session
+    session.close()
+    crud.geofence_index.invalidate()
+
+
+@pytest.fixture
+def detector():
+    return GeofenceEventDetector(dwell_seconds=600)
+
+
+@pytest.fixture
+def buffer(db, detector):
+    return IngestBuffer(sessionmaker(bind=db.get_bind()), flush_interval=0, stages=[detector])
+
+
+def _alerts(db, batch_id: str):
+    alerts = db.query(GeofenceAlert).filter(GeofenceAlert.batch_id == batch_id).order_by(GeofenceAlert.timestamp).all()
+    return [(alert.alert_type, alert.geofence_id, alert.timestamp.minute) for alert in alerts]
+
+
+def test_enter_dwell_exit(db, buffer):
+    """Transitions are detected within a flush and across flushes"""
+    buffer.offer([_point("B1", 0, OUTSIDE), _point("B1", 1, INSIDE_ALERTING), _point("B1", 5, INSIDE_ALERTING)])
+    buffer.flush()
+    buffer.offer([_point("B1", 11, INSIDE_ALERTING), _point("B1", 12, INSIDE_ALERTING), _point("B1", 13, OUTSIDE)])
+    buffer.flush()
+    assert _alerts(db, "B1") == [("enter", "GEO_A", 1), ("dwell", "GEO_A", 11), ("exit", "GEO_A", 13)]
+
+    rows = db.query(LocationTracking).order_by(LocationTracking.timestamp).all()
+    assert [row.geofence_id for row in rows] == [None, "GEO_A", "GEO_A", "GEO_A", "GEO_A", None]
+
+
+def test_fences_without_alerts_are_tracked_silently(db, buffer):
+    buffer.offer([_point("B2", 0, INSIDE_SILENT), _point("B2", 20, INSIDE_SILENT), _point("B2", 21, OUTSIDE)])
+    buffer.flush()
+    assert _alerts(db, "B2") == []
+    assert db.query(LocationTracking).filter(LocationTracking.geofence_id == "GEO_B").count() == 2
+
+
+def test_state_is_seeded_from_stored_alerts(db, buffer, detector):
+    """A detector that lost its state (restart) doesn't repeat the enter alert"""
+    buffer.offer([_point("B3", 0, INSIDE_ALERTING)])
+    buffer.flush()
+    detector.reset()
+    buffer.offer([_point("B3", 1, INSIDE_ALERTING), _point("B3", 10, INSIDE_ALERTING), _point("B3", 11, OUTSIDE)])
+    buffer.flush()
+    assert _alerts(db, "B3") == [("enter", "GEO_A", 0), ("dwell", "GEO_A", 10), ("exit", "GEO_A", 11)]
+
+
+def test_replayed_points_do_not_repeat_alerts(db, buffer):
+    """Points uploaded again after a restart match the stored alerts instead of adding copies"""
+    points = [_point("B6", 0, INSIDE_ALERTING), _point("B6", 10, INSIDE_ALERTING), _point("B6", 11, OUTSIDE)]
+    buffer.offer([dict(point) for point in points])
+    buffer.flush()
+    restarted = IngestBuffer(sessionmaker(bind=db.get_bind()), flush_interval=0, stages=[GeofenceEventDetector(600)])
+    restarted.offer([dict(point) for point in points])
+    restarted.flush()
+    assert _alerts(db, "B6") == [("enter", "GEO_A", 0), ("dwell", "GEO_A", 10), ("exit", "GEO_A", 11)]
+
+
+def test_alerts_are_published_after_commit(buffer):
+    async def receive():
+        subscription, _ = live_events.broker.subscribe([live_events.GEOFENCE_ALERT], {"batch_id": "B4"})
+        buffer.offer([_point("B4", 0, OUTSIDE), _point("B4", 1, INSIDE_ALERTING)])
+        await asyncio.get_running_loop().run_in_executor(None, buffer.flush)
+        event = await subscription.get(timeout=5)
+        subscription.close()
+        return event.data
+
+    alert = asyncio.run(receive())
+    assert (alert["batch_id"], alert["geofence_id"], alert["alert_type"]) == ("B4", "GEO_A", "enter")
+
+
+def test_alerts_endpoint(db, buffer):
+    buffer.offer([_point("B5", 0, INSIDE_ALERTING), _point("B5", 2, OUTSIDE)])
+    buffer.flush()
+    app.dependency_overrides[deps.get_db] = lambda: db
+    try:
+        response = TestClient(app).get(f"{settings.API_V1_STR}/geolocation/alerts/", params={"batch_id": "B5"})
+    finally:
+        app.dependency_overrides.pop(deps.get_db, None)
+    assert response.status_code == 200
+    alerts = response.json()
+    assert [alert["alert_type"] for alert in alerts] == ["exit", "enter"]
+    assert alerts[1]["location"] == {"latitude": INSIDE_ALERTING[0], "longitude": INSIDE_ALERTING[1]}
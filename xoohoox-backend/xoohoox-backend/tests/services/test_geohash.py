@@ -0,0 +1,18 @@
+import numpy as np
+
+from app.services import geohash
+
+
+def test_encode_matches_reference():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash.encode(-34.2, 142.1, 5) == "r1vj3"
+
+
+def test_vectorized_encoding_agrees_and_nests():
+    rng = np.random.default_rng(3)
+    lats, lngs = rng.uniform(-90, 90, 500), rng.uniform(-180, 180, 500)
+    cells = geohash.encode_many(lats, lngs)
+    for lat, lng, cell in zip(lats.tolist(), lngs.tolist(), cells):
+        assert geohash.encode(lat, lng, 4) == cell[:4]
+        min_lat, min_lng, max_lat, max_lng = geohash.bounds(cell)
+        assert min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
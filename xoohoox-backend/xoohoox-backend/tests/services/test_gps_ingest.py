@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.api import deps
+from app.api.v1.endpoints import geolocation as endpoints
+from app.core.config import settings
+from app.main import app
+from app.models.geolocation import LocationTracking, LocationTrackingQuarantine
+from app.models.traceability import TraceLink
+from app.services import geohash
+from app.services.gps_ingest import BufferFull, IngestBuffer
+from tests.utils import sqlite_test_session
+
+START = datetime(2024, 3, 1, 8, 0)
+
+
+def _point(batch_id: str, seconds: int, **extra):
+    return {
+        "batch_id": batch_id, "harvest_id": f"H-{batch_id}", "latitude": -34.0 - seconds / 1e4,
+        "longitude": 142.0, "timestamp": START + timedelta(seconds=seconds), "location_name": None,
+        "status": None, "source": "GPS", **extra,
+    }
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def buffer(db):
+    return IngestBuffer(sessionmaker(bind=db.get_bind()), max_points=100, flush_size=50, flush_interval=0)
+
+
+def test_flush_dedupes_and_orders(db, buffer):
+    """Re-sent points are dropped in the queue and against stored rows"""
+    result = buffer.offer([_point("B1", 2), _point("B1", 1), _point("B1", 2), _point("B2", 1)])
+    assert result == {"accepted": 3, "duplicates": 1, "buffered": 3}
+    assert buffer.flush() == 3
+
+    buffer.offer([_point("B1", 1), _point("B1", 3)])
+    buffer.flush()
+    rows = db.query(LocationTracking).filter(LocationTracking.batch_id == "B1").order_by(LocationTracking.timestamp).all()
+    assert [row.timestamp.second for row in rows] == [1, 2, 3]
+    assert rows[0].geohash == geohash.encode(rows[0].latitude, rows[0].longitude)
+    assert db.query(TraceLink).filter(TraceLink.child_key == rows[0].tracking_id).count() == 1
+
+    stats = buffer.stats()
+    assert (stats["accepted"], stats["duplicates"], stats["late"], stats["written"], stats["flushes"]) == (5, 1, 1, 5, 2)
+
+
+def test_rejected_point_is_isolated_then_quarantined(db):
+    """One point the database rejects doesn't hold back the rest of its flush"""
+    def foreign_key_check(connection, points):
+        if any(point["batch_id"] == "B2" for point in points):
+            raise IntegrityError("INSERT INTO geofence_alerts ...", {}, Exception("FOREIGN KEY constraint failed"))
+
+    buffer = IngestBuffer(sessionmaker(bind=db.get_bind()), max_points=100, flush_size=50, flush_interval=0,
+                          max_attempts=2, stages=[foreign_key_check])
+    buffer.offer([_point("B1", seconds) for seconds in range(10)] + [_point("B2", 1)])
+    assert buffer.flush() == 10
+    assert buffer.stats()["buffered"] == 1 and db.query(LocationTracking).count() == 10
+
+    assert buffer.flush() == 0
+    quarantined = db.query(LocationTrackingQuarantine).one()
+    assert (quarantined.batch_id, quarantined.attempts) == ("B2", 2) and "FOREIGN KEY" in quarantined.error
+    stats = buffer.stats()
+    assert (stats["buffered"], stats["written"], stats["point_errors"], stats["quarantined"]) == (0, 10, 2, 1)
+
+
+def test_stages_see_in_order_points_only(buffer):
+    """Late points are stored but not passed on to stages"""
+    seen = []
+    buffer.stages.append(lambda connection, points: seen.append([(p["batch_id"], p["timestamp"].second) for p in points]))
+    buffer.offer([_point("B1", 5), _point("B2", 1), _point("B1", 4)])
+    buffer.flush()
+    buffer.offer([_point("B1", 3), _point("B1", 6)])
+    buffer.flush()
+    assert seen == [[("B1", 4), ("B1", 5), ("B2", 1)], [("B1", 6)]]
+
+
+def test_backpressure(buffer):
+    buffer.offer([_point("B1", n) for n in range(90)])
+    with pytest.raises(BufferFull):
+        buffer.offer([_point("B2", n) for n in range(20)])
+    assert buffer.stats()["rejected"] == 20
+    buffer.flush()
+    assert buffer.offer([_point("B2", n) for n in range(20)])["accepted"] == 20
+
+
+def test_ingest_endpoint(db, buffer):
+    """NDJSON and msgpack uploads are queued; a full buffer answers 429"""
+    app.dependency_overrides[deps.get_db] = lambda: db
+    app.dependency_overrides[endpoints.get_ingest_buffer] = lambda: buffer
+    client = TestClient(app)
+    url = f"{settings.API_V1_STR}/geolocation/location-tracking/ingest"
+    try:
+        ndjson = "\n".join(
+            f'{{"batch_id": "B1", "harvest_id": "H1", "latitude": -34.1, "longitude": 142.2, "timestamp": "2024-03-01T08:00:{n:02d}Z"}}'
+            for n in range(10)
+        )
+        response = client.post(url, content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 202
+        assert response.json() == {"accepted": 10, "duplicates": 0, "buffered": 10}
+
+        packed = msgpack.packb([
+            {"batch_id": "B2", "harvest_id": "H2", "latitude": -34.1, "longitude": 142.2, "timestamp": f"2024-03-01T09:00:{n:02d}"}
+            for n in range(5)
+        ])
+        response = client.post(url, content=packed, headers={"Content-Type": "application/msgpack"})
+        assert response.json()["accepted"] == 5
+
+        assert client.post(url, content='{"batch_id": "B1"}').status_code == 422
+        assert client.post(url, content="{not json").status_code == 422
+        assert client.post(url, content=b"\x93", headers={"Content-Type": "application/msgpack"}).status_code == 400
+
+        buffer.flush()
+        assert db.query(LocationTracking).count() == 15
+        assert db.query(LocationTracking).filter(LocationTracking.batch_id == "B1").first().timestamp.tzinfo is None
+
+        buffer.max_points = 3
+        response = client.post(url, content=ndjson.replace("B1", "B3"))
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        assert client.get(f"{url}/stats").json()["rejected"] == 10
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,89 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+import pytest
+
+from app.models.geolocation import LocationTracking, LocationTrackingArchive
+from app.models.traceability import TraceLink
+from app.services import gps_retention
+from app.services.gps_retention import run_retention
+from tests.utils import sqlite_test_session
+
+NOW = datetime(2024, 9, 1)
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    yield session
+    session.close()
+
+
+def _add_trip(db, batch_id: str, start: datetime, points: int = 300, first: int = 0):
+    """A straight northbound trip through geofence GEO_A (points 100-149), delivered at the end"""
+    for n in range(first, first + points):
+        db.add(LocationTracking(
+            id=f"{batch_id}_{n}", tracking_id=f"TRACK_{batch_id}_{n}", batch_id=batch_id, harvest_id="HARVEST_001",
+            latitude=-34.0 + n * 0.001, longitude=142.0, timestamp=start + timedelta(minutes=n),
+            geofence_id="GEO_A" if 100 <= n < 150 else None,
+            status="Delivered" if n == first + points - 1 else "In transit",
+        ))
+    db.commit()
+
+
+def test_old_trips_are_downsampled_and_archived(db, tmp_path):
+    _add_trip(db, "OLD", NOW - timedelta(days=200))
+    _add_trip(db, "RECENT", NOW - timedelta(days=10))
+
+    dry_run = run_retention(db, older_than_days=90, tolerance_m=25, chunk_size=50, archive_dir=str(tmp_path), now=NOW, dry_run=True)
+    assert (dry_run["batches"], dry_run["points_deleted"], dry_run["archive_files"]) == (1, 293, 0)
+    assert db.query(LocationTracking).count() == 600
+
+    report = run_retention(db, older_than_days=90, tolerance_m=25, chunk_size=50, archive_dir=str(tmp_path), now=NOW)
+    assert (report["batches"], report["points_archived"], report["points_kept"], report["points_deleted"]) == (1, 300, 7, 293)
+    assert report["raw_bytes_deleted"] > 0 and report["reclaimed_bytes"] is not None
+
+    kept = db.query(LocationTracking).filter(LocationTracking.batch_id == "OLD").order_by(LocationTracking.timestamp).all()
+    # Ends of the line, both sides of the geofence entry and exit, both sides of the status change
+    assert [row.id for row in kept] == [f"OLD_{n}" for n in (0, 99, 100, 149, 150, 298, 299)]
+    assert db.query(LocationTracking).filter(LocationTracking.batch_id == "RECENT").count() == 300
+    assert db.query(TraceLink).filter(TraceLink.child_key.like("TRACK_OLD_%")).count() == 7
+
+    archive = db.query(LocationTrackingArchive).one()
+    with gzip.open(archive.path, "rt") as lines:
+        archived = [json.loads(line) for line in lines]
+    assert len(archived) == 300 and archived[100]["geofence_id"] == "GEO_A"
+    assert archive.bytes == report["archive_bytes"]
+
+    again = run_retention(db, older_than_days=90, archive_dir=str(tmp_path), now=NOW)
+    assert again["batches"] == 0
+
+
+def test_interrupted_run_is_resumed_without_losing_raw_points(db, tmp_path, monkeypatch):
+    _add_trip(db, "OLD", NOW - timedelta(days=200))
+    unindex = gps_retention.traceability.unindex_keys
+    calls = []
+
+    def fail_second_chunk(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return unindex(*args)
+
+    monkeypatch.setattr(gps_retention.traceability, "unindex_keys", fail_second_chunk)
+    with pytest.raises(RuntimeError):
+        run_retention(db, older_than_days=90, tolerance_m=25, chunk_size=50, archive_dir=str(tmp_path), now=NOW)
+    db.rollback()
+    assert db.query(LocationTracking).count() == 250
+
+    report = run_retention(db, older_than_days=90, tolerance_m=25, chunk_size=50, archive_dir=str(tmp_path), now=NOW)
+    assert (report["batches"], report["points_deleted"]) == (0, 243)
+    assert db.query(LocationTracking).count() == 7
+
+    # Points arriving later are archived to a file of their own
+    _add_trip(db, "OLD", NOW - timedelta(days=150), points=10, first=300)
+    run_retention(db, older_than_days=90, tolerance_m=25, chunk_size=50, archive_dir=str(tmp_path), now=NOW)
+    first, second = db.query(LocationTrackingArchive).order_by(LocationTrackingArchive.id).all()
+    assert first.path != second.path and first.completed_at and second.completed_at
+    with gzip.open(first.path, "rt") as lines:
+        assert sum(1 for _ in lines) == first.points_archived == 300
@@ -0,0 +1,148 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.job import Job
+from app.services import jobs
+from tests.utils import sqlite_test_session
+
+
+@pytest.fixture
+def db(tmp_path):
+    # A file, so the runner's threads each get their own connection as they would in production
+    session = sqlite_test_session(f"sqlite:///{tmp_path / 'jobs.db'}")
+    yield session
+    session.close()
+    session.get_bind().dispose()
+
+
+@pytest.fixture
+def runner(db, tmp_path):
+    return jobs.JobRunner(sessionmaker(bind=db.get_bind()), max_workers=4, results_dir=str(tmp_path))
+
+
+@pytest.fixture
+def job_types():
+    registered = []
+
+    def register(name, handler, **options):
+        jobs.job_type(name, **options)(handler)
+        registered.append(name)
+
+    yield register
+    for name in registered:
+        jobs.JOB_TYPES.pop(name, None)
+
+
+def test_progress_result_and_params(db, runner, job_types):
+    def count(context, to):
+        for n in range(to):
+            context.progress(n / to, f"{n} of {to}")
+        return {"counted": to}
+
+    job_types("test_count", count)
+    with pytest.raises(ValueError):
+        runner.submit(db, "test_count", {"upto": 3})
+    with pytest.raises(ValueError):
+        runner.submit(db, "test_missing", {})
+    job = runner.submit(db, "test_count", {"to": 3})
+
+    assert runner.run_pending(timeout=5) == 1
+    db.refresh(job)
+    assert (job.state, job.result, job.progress, job.attempts) == (jobs.SUCCEEDED, {"counted": 3}, 1.0, 1)
+    assert job.message == "2 of 3" and job.finished_at is not None
+
+
+def test_retry_with_backoff_then_fail(db, runner, job_types):
+    calls = []
+
+    def flaky(context):
+        calls.append(datetime.utcnow())
+        raise RuntimeError("unavailable")
+
+    def broken(context):
+        raise jobs.JobError("bad input")
+
+    job_types("test_flaky", flaky, max_attempts=2, backoff_seconds=60)
+    job_types("test_broken", broken, max_attempts=3)
+    job = runner.submit(db, "test_flaky", {})
+    permanent = runner.submit(db, "test_broken", {})
+
+    runner.run_pending(timeout=5)
+    db.refresh(job)
+    assert job.state == jobs.QUEUED and job.run_after >= calls[0] + timedelta(seconds=59)
+    assert "unavailable" in job.error
+    db.refresh(permanent)
+    assert (permanent.state, permanent.attempts) == (jobs.FAILED, 1)
+
+    # Not due until the backoff has passed
+    assert runner.run_pending(timeout=5) == 0
+    job.run_after = datetime.utcnow()
+    db.commit()
+    runner.run_pending(timeout=5)
+    db.refresh(job)
+    assert (job.state, job.attempts, len(calls)) == (jobs.FAILED, 2, 2)
+
+
+def test_concurrency_limit_and_cancel(db, runner, job_types):
+    release = threading.Event()
+    job_types("test_wait", lambda context: release.wait(5), concurrency=2)
+    submitted = [runner.submit(db, "test_wait", {}) for _ in range(4)]
+
+    assert runner.poll() == 2
+    assert runner.poll() == 0
+    runner.cancel(db, submitted[3])
+    with pytest.raises(ValueError):
+        runner.cancel(db, submitted[3])
+    release.set()
+    # Waits for the two running, then runs the third
+    assert runner.run_pending(timeout=5) == 1
+
+    states = [state for state, in db.query(Job.state).order_by(Job.created_at, Job.id)]
+    assert sorted(states) == [jobs.CANCELLED] + [jobs.SUCCEEDED] * 3
+
+
+def test_runners_polling_at_once_share_the_concurrency_limit(db, tmp_path, job_types):
+    release = threading.Event()
+    job_types("test_single", lambda context: release.wait(5), concurrency=1)
+    for _ in range(4):
+        jobs.JobRunner(sessionmaker(bind=db.get_bind())).submit(db, "test_single", {})
+    runners = [jobs.JobRunner(sessionmaker(bind=db.get_bind()), results_dir=str(tmp_path)) for _ in range(4)]
+    barrier = threading.Barrier(len(runners))
+    started = []
+
+    def poll(runner):
+        barrier.wait()
+        started.append(runner.poll())
+
+    threads = [threading.Thread(target=poll, args=(runner,)) for runner in runners]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert sum(started) == 1
+        assert db.query(Job).filter(Job.state == jobs.RUNNING).count() == 1
+    finally:
+        release.set()
+        for runner in runners:
+            runner.run_pending(timeout=5)
+
+
+def test_cancel_follows_the_stored_state(db, runner, job_types):
+    """A job claimed after the caller loaded it is asked to stop rather than marked cancelled under its runner"""
+    release = threading.Event()
+    job_types("test_wait", lambda context: release.wait(5))
+    job = runner.submit(db, "test_wait", {})
+    stale = db.get(Job, job.id)
+    assert runner.poll() == 1
+    runner.cancel(db, stale)
+    assert (stale.state, stale.cancel_requested) == (jobs.RUNNING, True)
+    release.set()
+    runner.run_pending(timeout=5)
+    db.refresh(stale)
+    assert stale.state == jobs.SUCCEEDED
+    with pytest.raises(ValueError, match="already succeeded"):
+        runner.cancel(db, stale)
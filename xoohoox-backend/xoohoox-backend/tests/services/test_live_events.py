@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType
+from app.services import live_events
+from app.services.live_events import BATCH_STATUS, GPS_POINT, Broker, LocalBackend
+from tests.utils import sqlite_test_session
+
+
+def _drain(subscription, timeout=0.2):
+    async def drain():
+        events = []
+        while (event := await subscription.get(timeout=timeout)) is not None:
+            events.append(event)
+        return events
+    return drain()
+
+
+def test_topics_filters_and_resume():
+    broker = Broker(LocalBackend(), replay_size=3)
+
+    async def scenario():
+        points, _ = broker.subscribe([GPS_POINT], {"batch_id": "B1"})
+        everything, _ = broker.subscribe(live_events.TOPICS)
+        broker.publish([(GPS_POINT, {"batch_id": "B1", "n": 1}), (GPS_POINT, {"batch_id": "B2", "n": 2}),
+                        (BATCH_STATUS, {"batch_id": "B1", "status": "in_production"})])
+        received = await _drain(points), await _drain(everything)
+
+        # Reconnect after the first event: the two since are replayed
+        resumed, ok = broker.subscribe(live_events.TOPICS, last_event_id=received[1][0].id)
+        replayed = await _drain(resumed)
+        # Once events after it have left the log (3 events), resuming isn't possible
+        broker.publish([(GPS_POINT, {"batch_id": "B3", "n": 3}), (GPS_POINT, {"batch_id": "B3", "n": 4})])
+        _, stale = broker.subscribe(live_events.TOPICS, last_event_id=received[1][0].id)
+        _, unknown = broker.subscribe(live_events.TOPICS, last_event_id="not-an-id")
+        return received, ok, replayed, stale, unknown
+
+    (points, everything), ok, replayed, stale, unknown = asyncio.run(scenario())
+    assert [event.data["n"] for event in points] == [1]
+    assert [event.topic for event in everything] == [GPS_POINT, GPS_POINT, BATCH_STATUS]
+    assert ok and [event.id for event in replayed] == [event.id for event in everything[1:]]
+    assert not stale and not unknown
+
+
+def test_lagging_subscriber_is_dropped():
+    broker = Broker(LocalBackend(), queue_size=2)
+
+    async def scenario():
+        subscription, _ = broker.subscribe([GPS_POINT])
+        broker.publish([(GPS_POINT, {"n": n}) for n in range(5)])
+        await asyncio.sleep(0)
+        received = [await subscription.get(timeout=1), await subscription.get(timeout=1)]
+        try:
+            await subscription.get(timeout=1)
+        except live_events.SubscriberLagged:
+            return received, True
+        return received, False
+
+    received, lagged = asyncio.run(scenario())
+    assert [event.data["n"] for event in received] == [0, 1] and lagged
+
+
+def test_batch_status_published_on_commit_only():
+    db = sqlite_test_session()
+
+    async def scenario():
+        subscription, _ = live_events.broker.subscribe([BATCH_STATUS], {"batch_id": "240301-AP-JC-900"})
+        batch = BatchTracking(batch_id="240301-AP-JC-900", name="Live", fruit_type=FruitType.APPLE,
+                              process_type="JC", start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1))
+        db.add(batch)
+        db.commit()
+        batch.status = "in_production"
+        db.flush()
+        db.rollback()
+        assert batch.status == "planned"
+        batch.status = "quality_check"
+        db.commit()
+        events = await _drain(subscription)
+        subscription.close()
+        return events
+
+    events = asyncio.run(scenario())
+    db.close()
+    assert [(event.data["previous_status"], event.data["status"]) for event in events] == [
+        (None, "planned"), ("planned", "quality_check"),
+    ]
@@ -0,0 +1,117 @@
+import math
+import random
+
+from app.services.geofence_matcher import compile_polygon, match_points
+from app.services.geometry import haversine_km, point_in_polygon, polygon_bbox
+from app.services.nearest import NearestIndex, haversine_matrix
+from app.services.spatial_index import RTree
+
+
+def _square(lat: float, lng: float, size: float):
+    return [[lat, lng], [lat, lng + size], [lat + size, lng + size], [lat + size, lng]]
+
+
+def test_point_in_polygon():
+    """Ray casting handles inside, outside and concave polygons"""
+    square = _square(0, 0, 1)
+    assert point_in_polygon(0.5, 0.5, square)
+    assert not point_in_polygon(1.5, 0.5, square)
+    notch = [[0, 0], [0, 3], [3, 3], [3, 2], [1, 2], [1, 1], [3, 1], [3, 0]]
+    assert point_in_polygon(0.5, 1.5, notch)
+    assert not point_in_polygon(2, 1.5, notch)
+    assert not point_in_polygon(0, 0, [[0, 0], [1, 1]])
+
+
+def test_rtree_matches_brute_force():
+    """Point and window queries return exactly the intersecting boxes"""
+    rng = random.Random(7)
+    boxes = []
+    for number in range(2000):
+        lat, lng = rng.uniform(-44, -10), rng.uniform(113, 154)
+        boxes.append((polygon_bbox(_square(lat, lng, rng.uniform(0.01, 0.5))), number))
+    tree = RTree(boxes, node_capacity=8)
+    assert len(tree) == 2000
+
+    for _ in range(200):
+        lat, lng = rng.uniform(-44, -10), rng.uniform(113, 154)
+        expected = {value for (a, b, c, d), value in boxes if a <= lat <= c and b <= lng <= d}
+        assert set(tree.query_point(lat, lng)) == expected
+
+    window = (-30, 130, -25, 140)
+    expected = {value for (a, b, c, d), value in boxes if a <= window[2] and window[0] <= c and b <= window[3] and window[1] <= d}
+    assert set(tree.query(window)) == expected
+
+
+def test_empty_rtree():
+    assert RTree([]).query_point(0, 0) == []
+
+
+def test_vectorized_match_agrees_with_ray_cast():
+    """match_points gives the same point -> polygon mapping as the scalar ray cast"""
+    rng = random.Random(11)
+    polygons = {}
+    for number in range(40):
+        lat, lng = rng.uniform(0, 10), rng.uniform(0, 10)
+        vertices = rng.randint(3, 12)
+        polygons[f"P{number}"] = [
+            [lat + rng.uniform(0.2, 1.5) * math.cos(2 * math.pi * i / vertices),
+             lng + rng.uniform(0.2, 1.5) * math.sin(2 * math.pi * i / vertices)]
+            for i in range(vertices)
+        ]
+    points = [(rng.uniform(-1, 11), rng.uniform(-1, 11)) for _ in range(3000)]
+
+    matches = match_points(
+        [lat for lat, _ in points], [lng for _, lng in points],
+        [compile_polygon(name, polygon) for name, polygon in polygons.items()],
+    )
+    expected = {}
+    for index, (lat, lng) in enumerate(points):
+        inside = [name for name, polygon in polygons.items() if point_in_polygon(lat, lng, polygon)]
+        if inside:
+            expected[index] = inside
+    assert matches == expected
+    assert match_points([], [], []) == {}
+
+
+def test_haversine_matrix_matches_scalar():
+    lats1, lngs1 = [-34.28, -43.08, 0.0], [142.26, 147.12, 0.0]
+    lats2, lngs2 = [-37.81, -17.11], [144.96, 145.67]
+    matrix = haversine_matrix(lats1, lngs1, lats2, lngs2)
+    assert matrix.shape == (3, 2)
+    for i in range(3):
+        for j in range(2):
+            assert math.isclose(matrix[i, j], haversine_km(lats1[i], lngs1[i], lats2[j], lngs2[j]), rel_tol=1e-9)
+
+
+def test_nearest_index_matches_brute_force():
+    """k-nearest and radius queries agree with a full scan, across incremental updates"""
+    rng = random.Random(3)
+    items = {
+        f"F{number}": (rng.uniform(-44, -10), rng.uniform(113, 154), rng.choice([0.0, rng.uniform(0, 3)]))
+        for number in range(1500)
+    }
+    index = NearestIndex(((key, *value) for key, value in items.items()), rebuild_threshold=50)
+
+    def check():
+        for _ in range(30):
+            lat, lng = rng.uniform(-45, -9), rng.uniform(112, 155)
+            distances = sorted(
+                (max(haversine_km(lat, lng, a, b) - r, 0.0), key) for key, (a, b, r) in items.items()
+            )
+            nearest = index.nearest(lat, lng, k=7)
+            assert [round(d, 6) for _, d in nearest] == [round(d, 6) for d, _ in distances[:7]]
+            within = index.within(lat, lng, 150)
+            assert {key for key, _ in within} == {key for d, key in distances if d <= 150}
+        assert len(index) == len(items)
+
+    check()
+    for number in range(120):  # crosses the rebuild threshold twice
+        key = f"F{rng.randrange(2000)}"
+        if rng.random() < 0.3:
+            items.pop(key, None)
+            index.remove(key)
+        else:
+            items[key] = (rng.uniform(-44, -10), rng.uniform(113, 154), 0.0)
+            index.upsert(key, *items[key])
+    check()
+    assert NearestIndex().nearest(0, 0) == []
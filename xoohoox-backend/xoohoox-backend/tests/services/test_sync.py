@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType
+from app.models.geolocation import Farm, Paddock
+from app.schemas.sync import SyncWrite
+from app.services import sync
+from tests.utils import sqlite_test_session
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_COMMIT_LAG_SECONDS", 0)
+    session = sqlite_test_session()
+    # The legacy models registry created its own farms table first; sync reads the geolocation one
+    with session.get_bind().begin() as connection:
+        Farm.__table__.drop(connection)
+        Farm.__table__.create(connection)
+    yield session
+    session.close()
+
+
+def _batch(number, **fields):
+    return BatchTracking(batch_id=f"240301-AP-JC-{number:03d}", name=f"Batch {number}", fruit_type=FruitType.APPLE,
+                         process_type="JC", start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1), **fields)
+
+
+def _sync(db, cursor=None, limit=2):
+    """Every page of one sync: changed keys per entity, deleted keys, the next cursor"""
+    changed, deleted, pages = {}, {}, 0
+    while True:
+        page = sync.pull(db, cursor, limit)
+        pages += 1
+        for name, rows in page.changes.items():
+            key = rows["columns"].index(sync.BY_NAME[name].key)
+            changed.setdefault(name, []).extend(row[key] for row in rows["rows"])
+        for name, keys in page.deleted.items():
+            deleted.setdefault(name, []).extend(keys)
+        cursor = page.cursor
+        if not page.has_more:
+            return changed, deleted, cursor, pages
+
+
+def test_pull_pages_then_deltas_and_deletes(db):
+    db.add(Farm(id="f1", farm_id="FARM-1", name="Orchard", farmer_name="Sam"))
+    db.add(Paddock(id="p1", paddock_id="PAD-1", farm_id="FARM-1", name="North", fruit_type="apple", area_hectares=2.0))
+    db.add_all([_batch(n) for n in range(3)])
+    db.commit()
+
+    changed, deleted, cursor, pages = _sync(db)
+    assert changed == {
+        "farms": ["FARM-1"], "paddocks": ["PAD-1"], "batches": ["240301-AP-JC-000", "240301-AP-JC-001", "240301-AP-JC-002"],
+    }
+    assert deleted == {} and pages == 3
+
+    batches = db.query(BatchTracking).order_by(BatchTracking.id).all()
+    batches[1].status = "in_production"
+    db.delete(batches[2])
+    db.commit()
+    changed, deleted, cursor, _ = _sync(db, cursor)
+    assert changed == {"batches": ["240301-AP-JC-001"]} and deleted == {"batches": ["240301-AP-JC-002"]}
+    # A recreated key is no longer reported deleted
+    db.add(_batch(2))
+    db.commit()
+    assert _sync(db, cursor)[:2] == ({"batches": ["240301-AP-JC-002"]}, {})
+
+    with pytest.raises(ValueError):
+        sync.pull(db, "not-a-cursor")
+
+
+def test_push_resolves_conflicts_per_record(db):
+    new = {"name": "Tablet batch", "fruit_type": "apple", "process_type": "JC",
+           "start_date": "2024-03-01T00:00:00", "end_date": "2024-04-01T00:00:00"}
+    results = sync.push(db, [
+        SyncWrite(entity="batches", key="240301-AP-JC-010", data=new),
+        SyncWrite(entity="batches", key="240301-AP-JC-011", data={**new, "colour": "red"}),
+        SyncWrite(entity="batches", key="240301-AP-JC-010", data=new),
+    ])
+    assert [result["status"] for result in results] == [sync.CREATED, sync.ERROR, sync.UNCHANGED]
+    seen = results[0]["record"]
+    assert db.query(BatchTracking).count() == 1
+
+    # The server renames the batch after the tablet last synced it
+    batch = db.query(BatchTracking).one()
+    batch.name = "Renamed at the lab"
+    db.commit()
+    base = {"base_updated_at": seen["updated_at"], "base": {"name": seen["name"], "status": seen["status"]}}
+    edit = {"status": "in_production", "name": "Renamed on the tablet"}
+    server_wins, merged = sync.push(db, [
+        SyncWrite(entity="batches", key="240301-AP-JC-010", data=edit, **base),
+        SyncWrite(entity="batches", key="240301-AP-JC-010", data=edit, strategy="merge", **base),
+    ])
+    assert server_wins["status"] == sync.CONFLICT and server_wins["record"]["name"] == "Renamed at the lab"
+    assert (merged["status"], merged["conflicts"]) == (sync.MERGED, ["name"])
+    db.refresh(batch)
+    assert (batch.status, batch.name) == ("in_production", "Renamed at the lab")
+
+    stale = {"base_updated_at": seen["updated_at"]}
+    conflict, removed = sync.push(db, [
+        SyncWrite(entity="batches", op="delete", key="240301-AP-JC-010", **stale),
+        SyncWrite(entity="batches", op="delete", key="240301-AP-JC-010", strategy="client_wins", **stale),
+    ])
+    assert (conflict["status"], removed["status"]) == (sync.CONFLICT, sync.DELETED)
+    assert db.query(BatchTracking).count() == 0
+    assert sync.pull(db).deleted == {"batches": ["240301-AP-JC-010"]}
@@ -0,0 +1,43 @@
+import numpy as np
+
+from app.services.track_simplify import (
+    DOUGLAS_PEUCKER, VISVALINGAM, Track, decode_polyline, encode_polyline, simplify, track_length_km
+)
+
+
+def _zigzag_track(points: int = 1001) -> Track:
+    """A 10 km northbound line with ±2 m of jitter and a 500 m detour in the middle"""
+    rng = np.random.default_rng(7)
+    latitudes = np.linspace(-34.0, -33.91, points)
+    longitudes = 142.0 + rng.uniform(-2, 2, points) / 92000
+    longitudes[points // 2] += 500 / 92000
+    return Track(latitudes, longitudes, np.arange(points, dtype=np.int64) * 10)
+
+
+def test_polyline_round_trip():
+    """Matches the reference example of the encoded polyline format"""
+    encoded = encode_polyline([38.5, 40.7, 43.252], [-120.2, -120.95, -126.453])
+    assert encoded == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert decode_polyline(encoded) == [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline([], []) == ""
+
+
+def test_simplification_drops_jitter_and_keeps_shape():
+    track = _zigzag_track()
+    for algorithm in (DOUGLAS_PEUCKER, VISVALINGAM):
+        simplified = simplify(track, 10, algorithm)
+        assert 3 <= len(simplified.latitudes) <= len(track.latitudes) // 5, algorithm
+        assert simplified.latitudes[0] == track.latitudes[0] and simplified.latitudes[-1] == track.latitudes[-1]
+        assert track.longitudes[500] in simplified.longitudes, algorithm
+        assert np.all(np.diff(simplified.timestamps) > 0)
+
+
+def test_douglas_peucker_bounds_the_error():
+    track = _zigzag_track()
+    assert len(simplify(track, 10, DOUGLAS_PEUCKER).latitudes) <= 10
+    assert len(simplify(track, 0, DOUGLAS_PEUCKER).latitudes) == len(track.latitudes)
+
+
+def test_track_length():
+    straight = Track(np.linspace(-34.0, -33.91, 101), np.full(101, 142.0), np.arange(101, dtype=np.int64))
+    assert abs(track_length_km(straight) - 10.007) < 0.001
@@ -0,0 +1,49 @@
+import math
+import random
+
+from app.services.vrp import Stop, Vehicle, distance_matrix, solve
+
+DEPOT = (-35.2809, 149.13)
+
+
+def _stops(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        Stop(f"S{n}", DEPOT[0] + rng.uniform(-1.5, 1.5), DEPOT[1] + rng.uniform(-1.5, 1.5), rng.uniform(5, 40), 5)
+        for n in range(count)
+    ]
+
+
+def test_200_stops_are_all_served_within_capacity():
+    stops = _stops(200)
+    plan = solve(DEPOT, stops, [Vehicle(f"T{n}", 500, 600) for n in range(12)], time_limit=0.8)
+    assert plan.unassigned == []
+    assert sorted(stop.id for route in plan.routes for stop in route.stops) == sorted(stop.id for stop in stops)
+    for route in plan.routes:
+        assert route.load <= route.vehicle.capacity + 1e-6
+        assert route.end_minutes <= route.vehicle.shift_minutes + 1e-6
+    # Far shorter than sending a truck out and back for every stop
+    matrix = distance_matrix([DEPOT] + [(stop.latitude, stop.longitude) for stop in stops])
+    assert plan.distance_km < 0.25 * 2 * matrix[0, 1:].sum()
+    assert plan.solve_ms < 1500
+
+
+def test_time_windows_and_unservable_stops():
+    stops = [
+        Stop("EARLY", -35.0, 149.1, 10, 10, latest=60),
+        Stop("LATE", -35.0, 149.12, 10, 10, earliest=240),
+        Stop("HEAVY", -35.1, 149.2, 900),
+        Stop("TOO_FAR", -12.4, 130.8, 10, latest=120),
+    ]
+    plan = solve(DEPOT, stops, [Vehicle("T1", 500)])
+    assert [stop.id for stop in plan.unassigned] == ["HEAVY", "TOO_FAR"]
+    (route,) = plan.routes
+    assert [stop.id for stop in route.stops] == ["EARLY", "LATE"]
+    assert route.arrivals[0] <= 60 and route.arrivals[1] == 240
+
+
+def test_vehicle_shift_limits_split_routes():
+    stops = _stops(30, seed=2)
+    plan = solve(DEPOT, stops, [Vehicle("T1", math.inf, 300), Vehicle("T2", math.inf, 300), Vehicle("T3", math.inf, 300)])
+    assert all(route.end_minutes <= 300 for route in plan.routes)
+    assert len(plan.routes) >= 2
@@ -0,0 +1,115 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.batch_tracking import BatchTracking
+from app.models.enums import FruitType, QualityCheckType, TestResult
+from app.models.quality_control import QualityControl
+from app.models.webhook import WebhookDelivery, WebhookEndpoint
+from app.services import webhooks
+from tests.utils import sqlite_test_session
+
+
+@pytest.fixture
+def db():
+    session = sqlite_test_session()
+    yield session
+    session.close()
+
+
+class Receiver:
+    """Stand-in partner: checks signatures, records events, answers with the queued statuses"""
+
+    def __init__(self, secret, statuses=()):
+        self.secret = secret
+        self.statuses = list(statuses)
+        self.posts = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        assert webhooks.verify_signature(
+            self.secret, request.content,
+            request.headers[webhooks.TIMESTAMP_HEADER], request.headers[webhooks.SIGNATURE_HEADER],
+        )
+        self.posts.append((str(request.url), json.loads(request.content)["events"]))
+        return httpx.Response(self.statuses.pop(0) if self.statuses else 204)
+
+
+def _dispatcher(db, receiver, **options):
+    return webhooks.Dispatcher(
+        sessionmaker(bind=db.get_bind()), transport=httpx.MockTransport(receiver), **options
+    )
+
+
+def _batch(number, **fields):
+    return BatchTracking(batch_id=f"240301-AP-JC-{number:03d}", name=f"Batch {number}", fruit_type=FruitType.APPLE,
+                         process_type="JC", start_date=datetime(2024, 3, 1), end_date=datetime(2024, 4, 1), **fields)
+
+
+def _qc(number, result):
+    return QualityControl(test_id=f"QC-{number}", batch_id="240301-AP-JC-000", test_type=QualityCheckType.PH,
+                          test_date=datetime(2024, 3, 2), test_name="pH", test_method="meter", actual_value=3.4,
+                          unit_of_measure="pH", result=result, tester_id=1)
+
+
+def test_outbox_batching_and_signing(db):
+    distillery = WebhookEndpoint(name="distillery", url="http://distillery.test/hooks", secret="s" * 32,
+                                 topics=[webhooks.BATCH_STATUS], batch_size=2)
+    grower = WebhookEndpoint(name="grower", url="http://grower.test/hooks", secret="s" * 32,
+                             topics=[webhooks.QUALITY_CONTROL_FAILED])
+    db.add_all([distillery, grower])
+    db.commit()
+
+    db.add_all([_batch(n) for n in range(3)])
+    db.commit()
+    db.add_all([_qc(1, TestResult.FAIL), _qc(2, TestResult.PASS)])
+    db.commit()
+    # Rolled back changes owe no deliveries
+    db.get(BatchTracking, 1).status = "in_production"
+    db.flush()
+    db.rollback()
+    assert db.query(WebhookDelivery).count() == 4
+
+    receiver = Receiver("s" * 32)
+    dispatcher = _dispatcher(db, receiver)
+    assert asyncio.run(dispatcher.deliver_pending()) == 4
+    posts = sorted((url, [event["topic"] for event in events]) for url, events in receiver.posts)
+    assert posts == [
+        ("http://distillery.test/hooks", [webhooks.BATCH_STATUS]),
+        ("http://distillery.test/hooks", [webhooks.BATCH_STATUS] * 2),
+        ("http://grower.test/hooks", [webhooks.QUALITY_CONTROL_FAILED]),
+    ]
+    failed_qc = next(events for url, events in receiver.posts if "grower" in url)[0]
+    assert failed_qc["data"]["test_id"] == "QC-1" and failed_qc["id"]
+    assert asyncio.run(dispatcher.deliver_pending()) == 0
+    assert dispatcher.stats()[distillery.id]["posts"] == 2
+    assert webhooks.outbox_counts(db)[distillery.id][webhooks.DELIVERED] == 3
+
+
+def test_retry_with_backoff_then_fail(db):
+    endpoint = WebhookEndpoint(name="distillery", url="http://distillery.test/hooks", secret="s" * 32,
+                               topics=[webhooks.BATCH_STATUS])
+    db.add(endpoint)
+    db.commit()
+    db.add(_batch(1))
+    db.commit()
+
+    receiver = Receiver("s" * 32, statuses=[503, 500])
+    dispatcher = _dispatcher(db, receiver, max_attempts=2, backoff_seconds=60)
+    started = datetime.utcnow()
+    assert asyncio.run(dispatcher.deliver_pending()) == 0
+    delivery = db.query(WebhookDelivery).one()
+    assert (delivery.state, delivery.attempts) == (webhooks.PENDING, 1)
+    assert delivery.next_attempt_at >= started + timedelta(seconds=59) and "503" in delivery.last_error
+
+    # Not due until the backoff has passed
+    assert asyncio.run(dispatcher.deliver_pending()) == 0 and len(receiver.posts) == 1
+    delivery.next_attempt_at = datetime.utcnow()
+    db.commit()
+    asyncio.run(dispatcher.deliver_pending())
+    db.refresh(delivery)
+    assert (delivery.state, delivery.attempts, len(receiver.posts)) == (webhooks.FAILED, 2, 2)
+    assert dispatcher.stats()[endpoint.id]["failed"] == 1
@@ -1,10 +1,45 @@
 from typing import Dict, Optional
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.crud import user
 from app.schemas.user import UserCreate
 from app.core.config import settings
+from app.core.security import create_access_token
+
+def sqlite_test_session(url: str = "sqlite:///:memory:") -> Session:
+    """
+    Session on a fresh SQLite database with the tables of both model
+    registries, including the index tables maintained by flush listeners.
+    In memory by default (one connection, shared by every session); give a
+    file URL when threads must each have their own connection.
+    """
+    from app.db import base as db_base
+    from app.models.base import Base as ModelsBase
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        **({"poolclass": StaticPool} if url == "sqlite:///:memory:" else {}),
+    )
+    ModelsBase.metadata.create_all(bind=engine)
+    for table in db_base.Base.metadata.sorted_tables:
+        table.create(bind=engine, checkfirst=True)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+def token_headers(db: Session, username: str, superuser: bool = False) -> Dict[str, str]:
+    """Bearer headers for a user stored straight into the test session"""
+    from app.models.user import User
+
+    account = User(
+        email=f"{username}@example.com", username=username, hashed_password="-",
+        is_active=True, is_superuser=superuser,
+    )
+    db.add(account)
+    db.commit()
+    return {"Authorization": f"Bearer {create_access_token(account.id)}"}
 
 def create_random_user(
     client: TestClient,